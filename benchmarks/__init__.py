@@ -0,0 +1,14 @@
+"""Benchmarks for PyRefine, to be run with airspeed velocity (asv).
+
+Run ``asv run`` from the top of the repository to benchmark the current
+commit, or ``asv continuous master HEAD`` to compare against master.
+
+* :mod:`benchmarks.operations` times each registered operation on its own
+* :mod:`benchmarks.scripts` times the fixture scripts end to end
+* :mod:`benchmarks.startup` times the command line starting up
+* :mod:`benchmarks.checkpoints` times resuming a script from checkpoints
+* The remaining modules compare individual operations against the
+  implementations they replaced
+
+Datasets are generated by :mod:`benchmarks.data`.
+"""
@@ -0,0 +1,54 @@
+"""Compare batch mode against executing a script once per file.
+
+Each file is a small daily drop of DOAJ articles, so the cost of starting
+Python, importing pandas and loading the script is a large part of
+executing it on one file.
+"""
+
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import pyrefine
+from pyrefine.batch import BatchExecutor
+
+from .data import FIXTURES_PATH, doaj_data
+
+SCRIPT = FIXTURES_PATH / 'doaj-article-clean.json'
+
+
+class Batch:
+    """Time to clean a directory of files with the DOAJ script."""
+
+    params = ([20, 100], [1000, 10000])
+    param_names = ['files', 'rows']
+    timeout = 1800
+
+    def setup(self, files, rows):
+        self.temp = tempfile.TemporaryDirectory()
+        self.in_dir = Path(self.temp.name) / 'in'
+        self.out_dir = Path(self.temp.name) / 'out'
+        self.in_dir.mkdir()
+        self.paths = []
+        for i in range(files):
+            path = self.in_dir / 'drop-{}.csv'.format(i)
+            doaj_data(rows, seed=i).to_csv(path, index=False)
+            self.paths.append(str(path))
+
+    def teardown(self, files, rows):
+        self.temp.cleanup()
+
+    def time_batch(self, files, rows):
+        script = pyrefine.load_script(SCRIPT)
+        with BatchExecutor(script) as executor:
+            for result in executor.execute(self.paths, self.out_dir):
+                pass
+
+    def time_execute_per_file(self, files, rows):
+        self.out_dir.mkdir(exist_ok=True)
+        for path in self.paths:
+            subprocess.run([sys.executable, '-m', 'pyrefine.cli', 'execute',
+                            str(SCRIPT), path, '-o',
+                            str(self.out_dir / Path(path).name)],
+                           check=True)
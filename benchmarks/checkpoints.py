@@ -0,0 +1,52 @@
+"""Compare executing a script afresh against resuming from checkpoints.
+
+Each timed call changes the description of an operation, which is enough
+to change the keys of the checkpoints from that operation on: changing
+the first operation measures the cost of storing every checkpoint, and
+changing the last measures resuming a script whose tail is being edited.
+"""
+
+import itertools
+import tempfile
+
+from pyrefine.arrow import use_arrow_strings
+from pyrefine.checkpoints import CheckpointStore
+
+from .data import ROWS, doaj_data
+from .scripts import load
+
+
+class Checkpoints:
+    """Time to execute the DOAJ script with and without checkpoints."""
+
+    params = (ROWS, ['objects', 'arrow'])
+    param_names = ['rows', 'strings']
+    timeout = 1800
+
+    def setup(self, rows, strings):
+        self.script = load('doaj')
+        self.data = doaj_data(rows)
+        if strings == 'arrow':
+            self.data = use_arrow_strings(self.data)
+        self.temp = tempfile.TemporaryDirectory()
+        self.store = CheckpointStore(self.temp.name, max_size=None)
+        self.counter = itertools.count()
+        self.script.execute(self.data, checkpoints=self.store)
+
+    def teardown(self, rows, strings):
+        self.temp.cleanup()
+
+    def change(self, index):
+        self.script.parsed_script[index]['description'] = \
+            'Changed {}'.format(next(self.counter))
+
+    def time_execute(self, rows, strings):
+        self.script.execute(self.data)
+
+    def time_store_every_step(self, rows, strings):
+        self.change(0)
+        self.script.execute(self.data, checkpoints=self.store)
+
+    def time_change_last_step(self, rows, strings):
+        self.change(-1)
+        self.script.execute(self.data, checkpoints=self.store)
@@ -0,0 +1,41 @@
+"""Compare column-split against splitting each value in Python."""
+
+import pandas as pd
+
+from pyrefine.arrow import use_arrow_strings
+from pyrefine.ops import ColumnSplitOperation
+
+from .data import ROWS, doaj_data
+
+
+def loop_split(column, separator):
+    """Split each value in turn, padding short rows with None."""
+    rows = [value.split(separator) if isinstance(value, str) and value
+            else [] for value in column]
+    count = max(map(len, rows), default=0)
+    return pd.DataFrame([row + [None] * (count - len(row)) for row in rows],
+                        index=column.index)
+
+
+class ColumnSplit:
+    """Split the subjects of each article into columns."""
+
+    params = ([False, True], ROWS)
+    param_names = ['arrow', 'rows']
+    timeout = 600
+
+    def setup(self, arrow, rows):
+        self.data = doaj_data(rows)
+        if arrow:
+            self.data = use_arrow_strings(self.data)
+        self.op = ColumnSplitOperation({
+            'description': 'Split subjects', 'columnName': 'Subjects',
+            'mode': 'separator', 'separator': '|', 'regex': False,
+            'maxColumns': 0, 'guessCellType': False,
+            'removeOriginalColumn': True})
+
+    def time_split(self, arrow, rows):
+        self.op(self.data, in_place=True)
+
+    def time_loop_split(self, arrow, rows):
+        loop_split(self.data['Subjects'], '|')
@@ -0,0 +1,75 @@
+"""Generate synthetic datasets for benchmarking.
+
+The generators scale up the sample datasets in ``tests/fixtures`` to any
+number of rows by resampling their rows, so the generated data has the
+same columns, types and value distributions as the real thing.
+
+Benchmarks default to :data:`ROWS`; set the environment variable
+``PYREFINE_BENCHMARK_LARGE`` to add 10^7-row runs too.
+"""
+
+from functools import lru_cache
+import os
+from pathlib import Path
+
+import pandas as pd
+
+FIXTURES_PATH = Path(__file__).parent.parent / 'tests' / 'fixtures'
+
+ROWS = [10 ** 4, 10 ** 5, 10 ** 6]
+if os.environ.get('PYREFINE_BENCHMARK_LARGE'):
+    ROWS.append(10 ** 7)
+
+
+def _resample(sample, rows, seed):
+    return sample.sample(rows, replace=True, random_state=seed) \
+                 .reset_index(drop=True)
+
+
+@lru_cache(maxsize=None)
+def _fixture(name):
+    return pd.read_csv(FIXTURES_PATH / name)
+
+
+@lru_cache(maxsize=4)
+def _doaj_data(rows, seed):
+    return _resample(_fixture('doaj-article-sample.csv'), rows, seed)
+
+
+@lru_cache(maxsize=4)
+def _workshops_data(rows, seed):
+    return _resample(_fixture('workshops-raw.csv'), rows, seed)
+
+
+def doaj_data(rows, seed=42):
+    """Generate data shaped like ``doaj-article-sample.csv``.
+
+    Args:
+        rows (int): Number of rows to generate.
+        seed (int): Random seed, so that runs are repeatable.
+
+    Returns:
+        DataFrame: A new copy of the generated data.
+
+    """
+    return _doaj_data(rows, seed).copy()
+
+
+def workshops_data(rows, seed=42):
+    """Generate data shaped like ``workshops-raw.csv``.
+
+    Args:
+        rows (int): Number of rows to generate.
+        seed (int): Random seed, so that runs are repeatable.
+
+    Returns:
+        DataFrame: A new copy of the generated data.
+
+    """
+    return _workshops_data(rows, seed).copy()
+
+
+def write_csv(data, path):
+    """Write generated data to a CSV file, e.g. for command-line runs."""
+    data.to_csv(path, index=False)
+    return path
@@ -0,0 +1,51 @@
+"""Compare ways of evaluating expressions over a column.
+
+Vectorised and memoized evaluation are compared against calling the
+expression once per cell, for the same transformations written in Jython
+and in GREL.
+"""
+
+from pyrefine.expressions import (ColumnExpression, ExpressionCache,
+                                  compile_expression)
+
+from .data import workshops_data
+
+EXPRESSIONS = {
+    'year': 'jython:import re\n'
+            'result = re.search(r\'\\d{4}\', value)\n'
+            'return result.group(0)',
+    'strip-lower': 'jython:return value.strip().lower()',
+    'format': 'jython:return \'%s (%s)\' % (value, value[:3])',
+    'grel-year': 'value.match(/.*?(\\d{4}).*/)[0]',
+    'grel-strip-lower': 'value.trim().toLowercase()',
+    'grel-format': 'value + " (" + value[0, 3] + ")"',
+    'grel-split': 'value.split(" ")[0].toUppercase()',
+}
+
+
+class ColumnExpressionEvaluation:
+    """Evaluate expressions over the WHEN column of the workshops data."""
+
+    params = (sorted(EXPRESSIONS), [10 ** 4, 10 ** 5, 10 ** 6],
+              ['object', 'string[pyarrow]'])
+    param_names = ['expression', 'rows', 'dtype']
+
+    def setup(self, name, rows, dtype):
+        try:
+            self.column = workshops_data(rows)['WHEN'].astype(dtype)
+        except ImportError:
+            raise NotImplementedError('pyarrow is not installed')
+        self.expression = ColumnExpression(EXPRESSIONS[name])
+        self.function = compile_expression(EXPRESSIONS[name])
+
+    def time_vectorised(self, name, rows, dtype):
+        self.expression(self.column)
+
+    def time_memoized(self, name, rows, dtype):
+        # A fresh cache each time, so only repeats within the column count
+        self.expression.cache = ExpressionCache()
+        self.expression(self.column)
+        self.expression.cache = None
+
+    def time_per_cell(self, name, rows, dtype):
+        self.column.map(self.function)
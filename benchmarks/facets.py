@@ -0,0 +1,76 @@
+"""Benchmark operations restricted to rows selected by facets."""
+
+import json
+
+import pyrefine
+from pyrefine.facets import Engine
+
+from .data import ROWS, doaj_data
+
+FACETS = {
+    'list': {'type': 'list', 'name': 'Publisher', 'columnName': 'Publisher',
+             'expression': 'value', 'selection': [
+                 {'v': {'v': 'MDPI AG', 'l': 'MDPI AG'}}],
+             'selectBlank': False, 'selectError': False, 'invert': False},
+    'text': {'type': 'text', 'name': 'Title', 'columnName': 'Title',
+             'query': 'water', 'mode': 'text', 'caseSensitive': False,
+             'invert': False},
+    'blank': {'type': 'list', 'name': 'Subjects', 'columnName': 'Subjects',
+              'expression': 'isBlank(value)', 'selection': [
+                  {'v': {'v': False, 'l': 'false'}}],
+              'selectBlank': False, 'selectError': False, 'invert': False},
+}
+
+
+def _script(facet, steps=3):
+    """Add several columns computed from the titles of the faceted rows."""
+    config = {'mode': 'row-based',
+              'facets': [] if facet is None else [FACETS[facet]]}
+    return pyrefine.parse(json.dumps([{
+        'op': 'core/column-addition', 'description': 'Add title words',
+        'engineConfig': config, 'baseColumnName': 'Title',
+        'newColumnName': 'Words {}'.format(i), 'columnInsertIndex': 1,
+        'expression': 'jython:return len(value.split()) + {}'.format(i),
+        'onError': 'set-to-blank'} for i in range(steps)]))
+
+
+class Mask:
+    """Time to compute the mask for a single facet."""
+
+    params = (sorted(FACETS), ROWS)
+    param_names = ['facet', 'rows']
+
+    def setup(self, facet, rows):
+        self.data = doaj_data(rows)
+        self.config = {'mode': 'row-based', 'facets': [FACETS[facet]]}
+
+    def time_mask(self, facet, rows):
+        Engine(self.config).mask(self.data)
+
+    def time_mask_records(self, facet, rows):
+        Engine(dict(self.config, mode='record-based')).mask(self.data)
+
+
+class FacetedScript:
+    """Time of a script whose expressions only apply to faceted rows.
+
+    Compare with ``facet=None``, which evaluates the expressions for
+    every row. The operations share one facet, so its mask is computed
+    only once.
+    """
+
+    params = ([None] + sorted(FACETS), ROWS)
+    param_names = ['facet', 'rows']
+    timeout = 600
+
+    def setup(self, facet, rows):
+        self.data = doaj_data(rows)
+        self.script = _script(facet)
+
+    def time_execute(self, facet, rows):
+        self.script.execute(self.data, in_place=True)
+
+    def time_execute_unshared(self, facet, rows):
+        for op in self.script.operations:
+            op.engine = Engine(op.engine.config)
+        self.script.execute(self.data, in_place=True)
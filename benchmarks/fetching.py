@@ -0,0 +1,61 @@
+"""Compare fetching URLs concurrently against fetching one at a time.
+
+The URLs are served by a local server that takes a fixed time to answer
+each request, standing in for a slow web service.
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+import time
+import urllib.request
+
+from pyrefine.fetching import URLFetcher
+
+LATENCY = 0.02
+
+
+class _SlowHandler(BaseHTTPRequestHandler):
+    """Answer every request with its path, after :data:`LATENCY`."""
+
+    def do_GET(self):
+        time.sleep(LATENCY)
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(self.path.encode('utf-8'))
+
+    def log_message(self, *args):
+        pass
+
+
+def loop_fetch(urls):
+    """Fetch each URL in turn, even if it was fetched before."""
+    bodies = []
+    for url in urls:
+        with urllib.request.urlopen(url) as response:
+            bodies.append(response.read().decode('utf-8'))
+    return bodies
+
+
+class Fetch:
+    """Fetch a column of URLs, half of them repeated."""
+
+    params = [100, 1000]
+    param_names = ['urls']
+    timeout = 600
+
+    def setup(self, urls):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _SlowHandler)
+        threading.Thread(target=self.server.serve_forever,
+                         daemon=True).start()
+        self.urls = ['http://127.0.0.1:{}/{}'.format(
+            self.server.server_port, i % (urls // 2)) for i in range(urls)]
+
+    def teardown(self, urls):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def time_fetch(self, urls):
+        URLFetcher(max_connections=8, per_host=8).fetch(self.urls)
+
+    def time_loop_fetch(self, urls):
+        loop_fetch(self.urls)
@@ -0,0 +1,40 @@
+"""Benchmark reading and writing data in each supported file format."""
+
+import os
+import shutil
+import tempfile
+
+from pyrefine.io import read_data, write_data
+
+from .data import doaj_data
+
+
+class FileFormats:
+    """Read and write the DOAJ data as CSV, compressed CSV and columnar."""
+
+    params = [['data.csv', 'data.csv.gz', 'data.parquet', 'data.feather'],
+              [10 ** 4, 10 ** 5]]
+    param_names = ['file', 'rows']
+    timeout = 300
+
+    def setup(self, name, rows):
+        self.data = doaj_data(rows)
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, name)
+        write_data(self.data, self.path)
+
+    def teardown(self, name, rows):
+        shutil.rmtree(self.directory)
+
+    def time_read(self, name, rows):
+        read_data(self.path)
+
+    def peakmem_read(self, name, rows):
+        read_data(self.path)
+
+    def time_read_chunked(self, name, rows):
+        for chunk in read_data(self.path, chunksize=10000):
+            pass
+
+    def time_write(self, name, rows):
+        write_data(self.data, self.path)
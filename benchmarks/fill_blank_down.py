@@ -0,0 +1,77 @@
+"""Compare fill-down and blank-down against the original per-row loops."""
+
+import numpy as np
+import pandas as pd
+
+from pyrefine.ops import BlankDownOperation, FillDownOperation
+
+
+def loop_fill_down(column):
+    """Fill down the way FillDownOperation did before vectorisation."""
+    new_column = column.copy()
+    last_val = None
+
+    for i, val in enumerate(new_column):
+        if val is None:
+            new_column.iloc[i] = last_val
+        else:
+            last_val = val
+
+    return new_column
+
+
+def loop_blank_down(column):
+    """Blank down the way BlankDownOperation did before vectorisation."""
+    new_column = column.copy()
+    last_val = None
+
+    for i, val in enumerate(new_column):
+        if val == last_val:
+            new_column.iloc[i] = None
+        else:
+            last_val = val
+
+    return new_column
+
+
+class FillDown:
+    """Fill down a column in which most cells are blank."""
+
+    params = [10 ** 3, 10 ** 4, 10 ** 5]
+    param_names = ['rows']
+
+    def setup(self, rows):
+        rng = np.random.RandomState(42)
+        values = rng.choice(['alpha', 'beta', 'gamma', None, None, None,
+                             None, None, None, None, None, None],
+                            size=rows)
+        self.data = pd.DataFrame({'tidy_up': values.astype(object)})
+        self.op = FillDownOperation({'description': 'Fill down',
+                                     'columnName': 'tidy_up'})
+
+    def time_vectorised(self, rows):
+        self.op(self.data)
+
+    def time_loop(self, rows):
+        loop_fill_down(self.data['tidy_up'])
+
+
+class BlankDown:
+    """Blank down a sorted column with runs of repeated values."""
+
+    params = [10 ** 3, 10 ** 4, 10 ** 5]
+    param_names = ['rows']
+
+    def setup(self, rows):
+        rng = np.random.RandomState(42)
+        values = np.sort(rng.randint(0, rows // 4 + 1, size=rows))
+        self.data = pd.DataFrame({'tidy_up': values.astype(str)
+                                                   .astype(object)})
+        self.op = BlankDownOperation({'description': 'Blank down',
+                                      'columnName': 'tidy_up'})
+
+    def time_vectorised(self, rows):
+        self.op(self.data)
+
+    def time_loop(self, rows):
+        loop_blank_down(self.data['tidy_up'])
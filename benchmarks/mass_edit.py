@@ -0,0 +1,68 @@
+"""Compare mass-edit against the original one-pass-per-value approach."""
+
+import numpy as np
+import pandas as pd
+
+from pyrefine.ops import MassEditOperation
+
+
+def loop_mass_edit(column, edits):
+    """Mass edit the way MassEditOperation did before compiling edits."""
+    def transform(val, from_val, to_val):
+        if val == from_val:
+            return to_val
+        elif type(val) is list:
+            return [transform(x, from_val, to_val) for x in val]
+        else:
+            return val
+
+    for edit in edits:
+        for from_val in edit['from']:
+            column = column.apply(transform,
+                                  from_val=from_val, to_val=edit['to'])
+
+        if edit['fromBlank']:
+            column[column.isnull()] = edit['to']
+
+    return column
+
+
+class MassEdit:
+    """Mass edit a column of clustered names, as OpenRefine would produce."""
+
+    params = ([10 ** 3, 10 ** 4, 10 ** 5], [10, 100, 500], [False, True])
+    param_names = ['rows', 'edits', 'lists']
+
+    def setup(self, rows, edits, lists):
+        rng = np.random.RandomState(42)
+        names = np.array(['name {}'.format(i) for i in range(edits * 4)],
+                         dtype=object)
+        values = rng.choice(names, size=rows)
+        if lists:
+            values = np.array([list(values[i:i + 3])
+                               for i in range(0, rows, 3)] + [None],
+                              dtype=object)[:-1]
+
+        self.data = pd.DataFrame({'names': values})
+        self.edits = [{'from': ['name {}'.format(i * 4 + j)
+                                for j in range(1, 4)],
+                       'to': 'name {}'.format(i * 4),
+                       'fromBlank': False,
+                       'fromError': False}
+                      for i in range(edits)]
+        self.op = MassEditOperation({'description': 'Mass edit',
+                                     'columnName': 'names',
+                                     'edits': self.edits})
+
+    def time_compile(self, rows, edits, lists):
+        MassEditOperation({'description': 'Mass edit',
+                           'columnName': 'names',
+                           'edits': self.edits})
+
+    def time_lookup(self, rows, edits, lists):
+        self.op(self.data)
+
+    def time_loop(self, rows, edits, lists):
+        if rows * edits > 10 ** 6:
+            raise NotImplementedError('Too slow to be worth measuring')
+        loop_mass_edit(self.data['names'], self.edits)
@@ -0,0 +1,54 @@
+"""Benchmark splitting, editing and joining multivalued cells.
+
+This is the usual OpenRefine pattern for cleaning up a list of names held
+in one cell: split the cell, mass-edit the individual names, then join
+them up again. Arrow-backed strings (as with ``--arrow-strings``) are
+split into Arrow list arrays, and Python strings into Python lists.
+"""
+
+import pandas as pd
+
+from pyrefine.arrow import use_arrow_strings
+from pyrefine.ops import MassEditOperation, MultivaluedCellJoinOperation, \
+    MultivaluedCellSplitOperation
+
+from .data import ROWS, doaj_data
+
+
+class SplitEditJoin:
+    """Split, mass-edit and join the authors of DOAJ articles."""
+
+    params = ROWS
+    param_names = ['rows']
+    timeout = 600
+
+    def setup(self, rows):
+        self.data = doaj_data(rows).dropna(subset=['Authors'])
+        authors = pd.unique(self.data['Authors'].str.split('|').explode()
+                            .str.strip())
+        parameters = {'description': 'Authors', 'columnName': 'Authors',
+                      'separator': '|'}
+        self.split = MultivaluedCellSplitOperation(parameters)
+        self.edit = MassEditOperation(dict(parameters, edits=[
+            {'from': [name], 'to': name.upper(), 'fromBlank': False,
+             'fromError': False} for name in authors[::10]]))
+        self.join = MultivaluedCellJoinOperation(parameters)
+        self.arrow = use_arrow_strings(self.data)
+
+    def time_split(self, rows):
+        self.split(self.arrow)
+
+    def time_split_python_lists(self, rows):
+        self.split(self.data)
+
+    def time_split_edit_join(self, rows):
+        self.join(self.edit(self.split(self.arrow)))
+
+    def peakmem_split_edit_join(self, rows):
+        self.join(self.edit(self.split(self.arrow)))
+
+    def time_split_edit_join_python_lists(self, rows):
+        self.join(self.edit(self.split(self.data)))
+
+    def peakmem_split_edit_join_python_lists(self, rows):
+        self.join(self.edit(self.split(self.data)))
@@ -0,0 +1,156 @@
+"""Benchmark each built-in operation individually.
+
+Every built-in operation needs an entry in :data:`CASES` giving the
+parameters to create it with and the data to run it on. Operations
+without an entry are skipped.
+"""
+
+from pyrefine.ops import create
+from pyrefine.ops.base import OPERATION_MODULES
+
+from .data import ROWS, doaj_data, workshops_data
+
+
+def _split_authors(data):
+    return create({'op': 'core/multivalued-cell-split',
+                   'description': 'Split authors',
+                   'columnName': 'Authors',
+                   'separator': '|'})(data)
+
+
+def _blank_down_publisher(data):
+    return create({'op': 'core/blank-down',
+                   'description': 'Blank down publisher',
+                   'columnName': 'Publisher'})(data)
+
+
+# Operation name -> (parameters, data generator, preparation function)
+CASES = {
+    'core/mass-edit': (
+        {'description': 'Abbreviate languages',
+         'columnName': 'Language',
+         'edits': [{'from': ['English'], 'to': 'EN',
+                    'fromBlank': False, 'fromError': False},
+                   {'from': ['Spanish', 'Español'], 'to': 'ES',
+                    'fromBlank': False, 'fromError': False},
+                   {'from': [], 'to': 'Unknown',
+                    'fromBlank': True, 'fromError': False}]},
+        doaj_data, None),
+    'core/blank-down': (
+        {'description': 'Blank down publisher',
+         'columnName': 'Publisher'},
+        doaj_data, None),
+    'core/fill-down': (
+        {'description': 'Fill down publisher',
+         'columnName': 'Publisher'},
+        doaj_data, _blank_down_publisher),
+    'core/text-transform': (
+        {'description': 'Lower-case publishers',
+         'columnName': 'Publisher',
+         'expression': 'jython:return value.lower()',
+         'onError': 'keep-original',
+         'repeat': False,
+         'repeatCount': 10},
+        doaj_data, None),
+    'core/multivalued-cell-split': (
+        {'description': 'Split subjects',
+         'columnName': 'Subjects',
+         'separator': '|'},
+        doaj_data, None),
+    'core/multivalued-cell-join': (
+        {'description': 'Join authors',
+         'columnName': 'Authors',
+         'separator': '|'},
+        doaj_data, _split_authors),
+    'core/transpose-rows-into-columns': (
+        {'description': 'Transpose titles',
+         'columnName': 'Title',
+         'rowCount': 3},
+        doaj_data, None),
+    'core/column-removal': (
+        {'description': 'Remove citation',
+         'columnName': 'Citation'},
+        doaj_data, None),
+    'core/column-rename': (
+        {'description': 'Rename citation',
+         'oldColumnName': 'Citation',
+         'newColumnName': 'Reference'},
+        doaj_data, None),
+    'core/column-move': (
+        {'description': 'Move licence',
+         'columnName': 'Licence',
+         'index': 0},
+        doaj_data, None),
+    'core/column-reorder': (
+        {'description': 'Reorder columns',
+         'columnNames': ['DOI', 'Title', 'Authors', 'Date', 'Publisher']},
+        doaj_data, None),
+    'core/column-split': (
+        {'description': 'Split dates',
+         'columnName': 'Date',
+         'mode': 'separator',
+         'separator': '/',
+         'regex': False,
+         'maxColumns': 0,
+         'guessCellType': True,
+         'removeOriginalColumn': True},
+        doaj_data, None),
+    'core/column-addition': (
+        {'description': 'Extract year',
+         'newColumnName': 'year',
+         'columnInsertIndex': 1,
+         'baseColumnName': 'WHEN',
+         'expression': 'jython:import re\n'
+                       'result = re.search(r\'\\d{4}\', value)\n'
+                       'return result.group(0)',
+         'onError': 'set-to-blank'},
+        workshops_data, None),
+    'core/column-addition-by-fetching-urls': (
+        {'description': 'Fetch hosts',
+         'newColumnName': 'host',
+         'columnInsertIndex': 2,
+         'baseColumnName': 'WHERE ',
+         'urlExpression': 'jython:import urllib.parse\n'
+                          'return "data:text/plain," '
+                          '+ urllib.parse.quote(value)',
+         'onError': 'set-to-blank',
+         'delay': 0,
+         'cacheResponses': False},
+        workshops_data, None),
+}
+
+
+def prepare(name, rows):
+    """Create the named operation and the data to benchmark it on.
+
+    Raises:
+        NotImplementedError: If there is no benchmark case for the
+            operation, which makes asv skip the benchmark.
+
+    """
+    if name not in CASES:
+        raise NotImplementedError('No benchmark case for ' + name)
+
+    params, generate, prep = CASES[name]
+    data = generate(rows)
+    if prep is not None:
+        data = prep(data)
+
+    return create(dict(params, op=name)), data
+
+
+class Operation:
+    """Time and peak memory of each operation on its own."""
+
+    params = (sorted(OPERATION_MODULES), ROWS)
+    param_names = ['op', 'rows']
+    timeout = 600
+
+    def setup(self, name, rows):
+        self.op, self.data = prepare(name, rows)
+
+    def time_operation(self, name, rows):
+        self.op(self.data)
+
+    def peakmem_operation(self, name, rows):
+        self.op(self.data)
@@ -0,0 +1,59 @@
+"""Benchmark reading only the columns a script needs from a wide CSV."""
+
+import json
+import os
+import tempfile
+
+import pandas as pd
+
+import pyrefine
+
+from .data import doaj_data
+
+WIDTH = 200
+
+
+class WideCSV:
+    """Read and transform a CSV of the DOAJ data padded out to 200 columns.
+
+    The script keeps only the original columns, as is common for exports
+    from databases with many more fields than are of interest.
+    """
+
+    params = [10 ** 4, 10 ** 5]
+    param_names = ['rows']
+    timeout = 600
+
+    def setup(self, rows):
+        data = doaj_data(rows)
+        short = ['Language', 'Date', 'ISSNs']
+        extra = {'Extra {}'.format(i): data[short[i % len(short)]]
+                 for i in range(WIDTH - len(data.columns))}
+        wide = pd.concat([data, pd.DataFrame(extra)], axis=1)
+
+        handle, self.path = tempfile.mkstemp(suffix='.csv')
+        os.close(handle)
+        wide.to_csv(self.path, index=False)
+
+        self.script = pyrefine.parse(json.dumps([
+            {'op': 'core/column-removal', 'description': 'Remove column',
+             'columnName': col} for col in extra]))
+
+    def teardown(self, rows):
+        os.remove(self.path)
+
+    def time_read_all(self, rows):
+        self.script.execute(pd.read_csv(self.path))
+
+    def peakmem_read_all(self, rows):
+        self.script.execute(pd.read_csv(self.path))
+
+    def time_read_required(self, rows):
+        columns = pd.read_csv(self.path, nrows=0).columns
+        script, usecols = self.script.project(columns)
+        script.execute(pd.read_csv(self.path, usecols=usecols))
+
+    def peakmem_read_required(self, rows):
+        columns = pd.read_csv(self.path, nrows=0).columns
+        script, usecols = self.script.project(columns)
+        script.execute(pd.read_csv(self.path, usecols=usecols))
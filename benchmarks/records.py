@@ -0,0 +1,92 @@
+"""Benchmark operations in record mode."""
+
+import json
+
+import numpy as np
+
+import pyrefine
+from pyrefine.records import RecordIndex, RecordTracker
+
+from .data import ROWS, doaj_data
+
+RECORD_MODE = {'mode': 'record-based', 'facets': []}
+
+
+def record_data(rows, seed=42):
+    """DOAJ data in records of four rows on average.
+
+    The key column is blanked in three rows out of four, and a third of
+    the publishers are blanked for filling down.
+    """
+    data = doaj_data(rows, seed)
+    rng = np.random.RandomState(seed)
+    data.loc[rng.random_sample(rows) < 0.75, 'Title'] = None
+    data.loc[rng.random_sample(rows) < 1 / 3, 'Publisher'] = None
+    return data
+
+
+def loop_fill_down(data, column):
+    """Fill down within each record, a record at a time."""
+    ids = RecordIndex.from_data(data).ids
+    starts = np.flatnonzero(np.diff(ids, prepend=-1))
+    values = data[column].to_numpy(copy=True)
+    for start, stop in zip(starts, np.append(starts[1:], len(values))):
+        last_val = None
+        for i in range(start, stop):
+            if values[i] is None:
+                values[i] = last_val
+            else:
+                last_val = values[i]
+    return values
+
+
+class Records:
+    """Time to index records, and to fill down within them."""
+
+    params = ROWS
+    param_names = ['rows']
+    timeout = 600
+
+    def setup(self, rows):
+        self.data = record_data(rows)
+        self.script = pyrefine.parse(json.dumps([{
+            'op': 'core/fill-down', 'description': 'Fill down',
+            'columnName': 'Publisher', 'engineConfig': RECORD_MODE}]))
+
+    def time_index(self, rows):
+        RecordIndex.from_data(self.data)
+
+    def time_fill_down(self, rows):
+        self.script.execute(self.data, in_place=True)
+
+    def time_loop_fill_down(self, rows):
+        loop_fill_down(self.data, 'Publisher')
+
+
+class RecordScript:
+    """Time of a script of several operations in record mode.
+
+    The operations share a record index while the key column is unchanged;
+    compare ``time_execute_unshared``, which indexes the records for every
+    operation.
+    """
+
+    params = ROWS
+    param_names = ['rows']
+    timeout = 600
+
+    def setup(self, rows):
+        self.data = record_data(rows)
+        self.script = pyrefine.parse(json.dumps([
+            {'op': 'core/' + op, 'description': op, 'columnName': column,
+             'engineConfig': RECORD_MODE}
+            for column in ['Publisher', 'Language', 'Licence']
+            for op in ['fill-down', 'blank-down']]))
+
+    def time_execute(self, rows):
+        self.script.execute(self.data, in_place=True)
+
+    def time_execute_unshared(self, rows):
+        for op in self.script.operations:
+            op.engine.records = RecordTracker()
+        self.script.execute(self.data, in_place=True)
@@ -0,0 +1,135 @@
+"""Benchmark whole scripts from the test fixtures end to end."""
+
+import tempfile
+
+import pyrefine
+from pyrefine import expressions, grel
+from pyrefine.arrow import use_arrow_strings
+from pyrefine.expressions import CodeCache
+
+from .data import FIXTURES_PATH, ROWS, doaj_data, workshops_data
+
+SCRIPTS = {
+    'doaj': ('doaj-article-clean.json', doaj_data),
+    'workshops': ('workshops-script.json', workshops_data),
+}
+
+
+def load(name):
+    """Load the named fixture script.
+
+    Raises:
+        NotImplementedError: If the script uses operations that are not
+            implemented yet, which makes asv skip the benchmark.
+
+    """
+    try:
+        return pyrefine.load_script(FIXTURES_PATH / SCRIPTS[name][0])
+    except RuntimeError as error:
+        raise NotImplementedError(str(error))
+
+
+class Script:
+    """Time and peak memory of executing fixture scripts."""
+
+    params = (sorted(SCRIPTS), ROWS)
+    param_names = ['script', 'rows']
+    timeout = 1800
+
+    def setup(self, name, rows):
+        self.script = load(name)
+        self.data = SCRIPTS[name][1](rows)
+
+    def time_execute(self, name, rows):
+        self.script.execute(self.data)
+
+    def peakmem_execute(self, name, rows):
+        self.script.execute(self.data)
+
+    def track_memory_per_cell(self, name, rows):
+        return self.data.memory_usage(deep=True).sum() / self.data.size
+
+    track_memory_per_cell.unit = 'bytes'
+
+    def time_execute_in_place(self, name, rows):
+        self.script.execute(self.data, in_place=True)
+
+    def peakmem_execute_in_place(self, name, rows):
+        self.script.execute(self.data, in_place=True)
+
+    def time_execute_optimized(self, name, rows):
+        self.script.optimize(self.data.columns).execute(self.data)
+
+    def time_execute_parallel(self, name, rows):
+        self.script.execute_parallel(self.data, jobs=4)
+
+    def time_execute_chunked(self, name, rows):
+        chunks = (self.data.iloc[i:i + 10 ** 5]
+                  for i in range(0, rows, 10 ** 5))
+        for _ in self.script.execute_chunked(chunks):
+            pass
+
+    def peakmem_execute_chunked(self, name, rows):
+        chunks = (self.data.iloc[i:i + 10 ** 5]
+                  for i in range(0, rows, 10 ** 5))
+        for _ in self.script.execute_chunked(chunks):
+            pass
+
+
+class ArrowStrings:
+    """Time and peak memory of executing fixture scripts on Arrow strings.
+
+    Compare with :class:`Script`, which holds strings as Python objects.
+    """
+
+    params = (sorted(SCRIPTS), ROWS)
+    param_names = ['script', 'rows']
+    timeout = 1800
+
+    def setup(self, name, rows):
+        self.script = load(name)
+        self.data = use_arrow_strings(SCRIPTS[name][1](rows))
+
+    def time_execute(self, name, rows):
+        self.script.execute(self.data)
+
+    def peakmem_execute(self, name, rows):
+        self.script.execute(self.data)
+
+    def track_memory_per_cell(self, name, rows):
+        return self.data.memory_usage(deep=True).sum() / self.data.size
+
+    track_memory_per_cell.unit = 'bytes'
+
+
+class LoadScript:
+    """Time taken to parse and compile fixture scripts.
+
+    The expressions are compiled from scratch ("cold"), found already
+    compiled in memory, or loaded from compiled code on disk, as another
+    process would.
+    """
+
+    params = (sorted(SCRIPTS), ['cold', 'memory', 'disk'])
+    param_names = ['script', 'code_cache']
+
+    def setup(self, name, cache):
+        self.saved = expressions.code_cache
+        self.temp_dir = None
+        if cache == 'disk':
+            self.temp_dir = tempfile.TemporaryDirectory()
+            expressions.code_cache = CodeCache(path=self.temp_dir.name)
+        else:
+            expressions.code_cache = CodeCache()
+        load(name)
+
+    def teardown(self, name, cache):
+        expressions.code_cache = self.saved
+        if self.temp_dir is not None:
+            self.temp_dir.cleanup()
+
+    def time_load(self, name, cache):
+        if cache != 'memory':
+            expressions.code_cache.clear()
+            grel.parse.cache_clear()
+        load(name)
@@ -0,0 +1,60 @@
+"""Compare the script server against executing a script once per upload.
+
+Each upload is a small file, so the cost of starting Python, importing
+pandas and loading the script is most of the time ``pyrefine execute``
+takes, which the server's warm workers do not pay.
+"""
+
+import subprocess
+import sys
+import tempfile
+import threading
+import urllib.request
+from pathlib import Path
+
+from pyrefine.server import ScriptServer, make_server
+
+from .data import FIXTURES_PATH, doaj_data
+
+SCRIPT = FIXTURES_PATH / 'doaj-article-clean.json'
+
+
+class Server:
+    """Time to transform one upload with the DOAJ script."""
+
+    params = [100, 10000]
+    param_names = ['rows']
+    timeout = 600
+
+    def setup(self, rows):
+        self.temp = tempfile.TemporaryDirectory()
+        self.path = Path(self.temp.name) / 'upload.csv'
+        doaj_data(rows).to_csv(self.path, index=False)
+        self.body = self.path.read_bytes()
+
+        self.scripts = ScriptServer(jobs=1)
+        self.scripts.register('doaj', SCRIPT.read_text())
+        self.httpd = make_server(self.scripts, port=0)
+        threading.Thread(target=self.httpd.serve_forever,
+                         daemon=True).start()
+        self.url = 'http://127.0.0.1:{}/scripts/doaj'.format(
+            self.httpd.server_address[1])
+        # Let the worker parse the script before timing starts
+        self.time_request(rows)
+
+    def teardown(self, rows):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.scripts.shutdown()
+        self.temp.cleanup()
+
+    def time_request(self, rows):
+        request = urllib.request.Request(self.url, data=self.body,
+                                         method='POST')
+        with urllib.request.urlopen(request) as response:
+            response.read()
+
+    def time_execute(self, rows):
+        subprocess.run([sys.executable, '-m', 'pyrefine.cli', 'execute',
+                        str(SCRIPT), str(self.path)],
+                       check=True, stdout=subprocess.DEVNULL)
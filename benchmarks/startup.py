@@ -0,0 +1,36 @@
+"""Time how long the command-line interface takes to start.
+
+Each command is run in a fresh Python process, as it would be from cron,
+so the time is mostly that of importing what the command needs. Neither
+``--help`` nor ``validate`` imports pandas; ``explain`` parses the script
+into operations, so it does.
+"""
+
+import subprocess
+import sys
+
+from .data import FIXTURES_PATH
+
+SCRIPT = str(FIXTURES_PATH / 'workshops-script.json')
+
+COMMANDS = {
+    'help': ['--help'],
+    'validate': ['validate', SCRIPT],
+    'explain': ['explain', SCRIPT],
+}
+
+
+class Startup:
+    """Time to run a command that loads no data."""
+
+    params = sorted(COMMANDS)
+    param_names = ['command']
+
+    def time_command(self, command):
+        subprocess.run([sys.executable, '-m', 'pyrefine.cli']
+                       + COMMANDS[command],
+                       check=True, stdout=subprocess.DEVNULL)
+
+
+def timeraw_import():
+    return 'import pyrefine'
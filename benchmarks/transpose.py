@@ -0,0 +1,54 @@
+"""Benchmark transposing rows into columns on long columns."""
+
+import pandas as pd
+
+from pyrefine.ops import TransposeRowsIntoColumnsOperation
+
+from .data import doaj_data
+
+
+def strided_transpose(data, column, row_count):
+    """Transpose the way TransposeRowsIntoColumnsOperation did before.
+
+    An empty Series is created for each new column and filled by strided
+    assignment, then all of the columns are assigned to a copy of the data.
+    """
+    old_col = data[column]
+    new_col = [pd.Series(index=data.index, dtype=old_col.dtype)
+               for _ in range(row_count)]
+    n_rows = len(old_col)
+    for i in range(row_count):
+        new_col[i][0:n_rows - i:row_count] = old_col[i:n_rows:row_count]
+
+    return data.drop(column, axis=1) \
+        .assign(**{'{} {}'.format(column, i + 1): new_col[i]
+                   for i in range(row_count)})
+
+
+class Transpose:
+    """Transpose the titles of DOAJ articles in groups of rows."""
+
+    params = ([10 ** 4, 10 ** 5, 10 ** 6], [2, 10, 100],
+              ['object', 'arrow'])
+    param_names = ['rows', 'row_count', 'strings']
+    timeout = 600
+
+    def setup(self, rows, row_count, strings):
+        self.data = doaj_data(rows)[['DOI', 'Title']]
+        if strings == 'arrow':
+            self.data = self.data.astype('string[pyarrow]')
+        self.op = TransposeRowsIntoColumnsOperation({
+            'description': 'Transpose titles', 'columnName': 'Title',
+            'rowCount': row_count})
+
+    def time_transpose(self, rows, row_count, strings):
+        self.op(self.data)
+
+    def peakmem_transpose(self, rows, row_count, strings):
+        self.op(self.data)
+
+    def time_transpose_strided(self, rows, row_count, strings):
+        strided_transpose(self.data, 'Title', row_count)
+
+    def peakmem_transpose_strided(self, rows, row_count, strings):
+        strided_transpose(self.data, 'Title', row_count)
@@ -1,10 +1,40 @@
 # -*- coding: utf-8 -*-
+"""Execute OpenRefine JSON scripts with pandas.
 
-from .script import Script, load_script, parse
-from . import ops
+The names below are imported from their modules when first used, so that
+importing :mod:`pyrefine` (or just :mod:`pyrefine.cli`) does not import
+pandas and every operation up front.
+"""
+
+import importlib
 
 __author__ = """Jez Cope"""
 __email__ = 'j.cope@erambler.co.uk'
 __version__ = '0.1.0'
 
-# flake8: noqa
+_EXPORTS = {
+    'Script': 'script',
+    'load_script': 'script',
+    'parse': 'script',
+    'ExecutionHook': 'profiling',
+    'Profiler': 'profiling',
+    'ParallelExecutor': 'parallel',
+    'BatchExecutor': 'batch',
+    'CheckpointStore': 'checkpoints',
+}
+
+
+def __getattr__(name):
+    if name == 'ops':
+        return importlib.import_module('.ops', __name__)
+    if name not in _EXPORTS:
+        raise AttributeError('module {!r} has no attribute {!r}'
+                             .format(__name__, name))
+    value = getattr(importlib.import_module('.' + _EXPORTS[name], __name__),
+                    name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_EXPORTS) + ['ops'])
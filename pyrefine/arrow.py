@@ -0,0 +1,190 @@
+"""Columns of strings and lists of strings backed by Apache Arrow.
+
+By default pandas stores each string as a separate Python object. With
+:mod:`pyarrow` installed, a column of strings can instead be held as a
+single Arrow array (the ``string[pyarrow]`` dtype): the characters of all
+of the strings in one buffer, plus their offsets. A column of lists of
+strings is likewise held as an Arrow list array
+(``list<item: string>[pyarrow]``), which adds one offset per cell to a
+flat array of all of the items, rather than a Python list per cell.
+:class:`~pyrefine.ops.cell.MultivaluedCellSplitOperation` splits
+Arrow-backed strings into such lists.
+
+The operations check the type of each column they are given, and
+transform Arrow-backed columns with Arrow compute kernels where they can,
+returning Arrow-backed columns in turn. Where no kernel will do, the values
+are converted to Python objects and back again, so a column keeps its
+representation from one operation to the next. In Arrow-backed columns
+every missing value is null; null values are passed to expressions as
+``None``.
+
+.. autosummary::
+
+    use_arrow_strings
+    is_arrow_string
+    is_arrow_list
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def is_arrow_string(column):
+    """Return whether a Series holds Arrow-backed strings."""
+    return isinstance(column.dtype, pd.StringDtype) \
+        and column.dtype.storage == 'pyarrow'
+
+
+def is_arrow_list(column):
+    """Return whether a Series holds Arrow-backed lists of strings."""
+    arrow_type = getattr(column.dtype, 'pyarrow_dtype', None)
+    if arrow_type is None:
+        return False
+
+    import pyarrow as pa
+    return pa.types.is_list(arrow_type) \
+        and pa.types.is_string(arrow_type.value_type)
+
+
+def to_arrow(column):
+    """Return the values of an Arrow-backed Series as a single array."""
+    import pyarrow as pa
+    array = pa.array(column.array)
+    if isinstance(array, pa.ChunkedArray):
+        array = array.combine_chunks()
+    return array
+
+
+def to_arrow_strings(column):
+    """Return the values of a Series of strings as an Arrow array.
+
+    Args:
+        column (:class:`pandas.Series`): Strings, either Arrow-backed or as
+            Python objects. Blank values become null.
+
+    Returns:
+        :class:`pyarrow.Array`: The strings.
+
+    Raises:
+        :exc:`TypeError`: If any value is neither a string nor blank.
+
+    """
+    if is_arrow_string(column):
+        return to_arrow(column)
+
+    import pyarrow as pa
+    try:
+        return pa.array(column.to_numpy(dtype=object), type=pa.string(),
+                        from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as error:
+        raise TypeError(str(error))
+
+
+def from_arrow(array, like):
+    """Wrap an Arrow array of strings or lists in a Series.
+
+    Args:
+        array (:class:`pyarrow.Array`): The values.
+        like (:class:`pandas.Series`): A Series whose index and name the
+            new one should have.
+
+    Returns:
+        :class:`pandas.Series`: The values, still backed by Arrow.
+
+    """
+    import pyarrow as pa
+    if pa.types.is_string(array.type):
+        values = pd.arrays.ArrowStringArray(array)
+    else:
+        values = pd.arrays.ArrowExtensionArray(array)
+    return pd.Series(values, index=like.index, name=like.name)
+
+
+def to_objects(column):
+    """Return the values of a Series as Python objects in a new array.
+
+    Null values of Arrow-backed columns become ``None``.
+    """
+    if is_arrow_string(column) or is_arrow_list(column):
+        return column.to_numpy(dtype=object, na_value=None)
+    return column.to_numpy(dtype=object, copy=True)
+
+
+def _string_lists(values):
+    """Return whether every value is a list of strings or blank."""
+    return all((type(value) is list
+                and all(type(item) is str for item in value))
+               or (not isinstance(value, list) and pd.isnull(value))
+               for value in values)
+
+
+def to_arrow_column(column):
+    """Convert a Series of Python objects to an Arrow-backed one if possible.
+
+    Args:
+        column (:class:`pandas.Series`): The column to convert.
+
+    Returns:
+        :class:`pandas.Series`: The column as Arrow-backed strings, if all
+        of its values are strings or blank, or as Arrow-backed lists of
+        strings, if all of its values are lists of strings or blank.
+        Otherwise the column itself.
+
+    """
+    if column.dtype != object:
+        return column
+
+    kind = pd.api.types.infer_dtype(column, skipna=True)
+    if kind == 'string':
+        return column.astype('string[pyarrow]')
+
+    values = column.to_numpy()
+    if kind == 'mixed' and _string_lists(values):
+        import pyarrow as pa
+        values = np.where(pd.isnull(values), None, values)
+        return from_arrow(pa.array(values, type=pa.list_(pa.string())),
+                          column)
+
+    return column
+
+
+def use_arrow_strings(data):
+    """Convert the columns of strings in a dataset to Arrow-backed ones.
+
+    Columns of lists of strings (multivalued cells) are converted too.
+
+    Example::
+
+        data = use_arrow_strings(pd.read_csv('input.csv'))
+        output_data = script.execute(data)
+
+    Args:
+        data (:class:`pandas.DataFrame`): The dataset to convert.
+
+    Returns:
+        :class:`pandas.DataFrame`: The converted dataset.
+
+    Raises:
+        :exc:`ImportError`: If :mod:`pyarrow` is not installed.
+
+    """
+    import pyarrow  # noqa: F401
+    return data.assign(**{name: to_arrow_column(column)
+                          for name, column in data.items()
+                          if column.dtype == object})
+
+
+def pandas_dtype(arrow_type):
+    """Return the pandas dtype for an Arrow type when reading Arrow data.
+
+    Suitable as the ``types_mapper`` of :meth:`pyarrow.Table.to_pandas`:
+    strings and lists of strings stay backed by Arrow, and other types are
+    converted as usual.
+    """
+    import pyarrow as pa
+    if pa.types.is_string(arrow_type):
+        return pd.StringDtype('pyarrow')
+    if pa.types.is_list(arrow_type) \
+            and pa.types.is_string(arrow_type.value_type):
+        return pd.ArrowDtype(arrow_type)
+    return None
@@ -0,0 +1,193 @@
+"""Execute one script over many input files.
+
+A script is often applied to a steady stream of similar files, such as a
+daily export. Rather than starting ``pyrefine execute`` for each of them,
+which imports pandas and parses and compiles the script every time,
+:class:`BatchExecutor` parses the script once and transforms the files in
+a pool of worker processes. Each worker is sent the script when it starts
+and compiles its expressions once (see
+:class:`~pyrefine.expressions.ColumnExpression`), then reads, transforms
+and writes one whole file at a time. A file that cannot be read or
+transformed is reported as failed without affecting the others.
+
+Outputs are written to a temporary file first and renamed once complete,
+so a failed file never leaves a partial output behind.
+
+.. autosummary::
+
+    BatchExecutor
+    FileResult
+    output_path
+"""
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import os
+from pathlib import Path
+import time
+
+from .io import _COMPRESSION, _SUFFIXES, detect_format, read_data, \
+    write_data
+
+FileResult = namedtuple('FileResult', ['input', 'output', 'rows', 'seconds',
+                                       'error'])
+FileResult.__doc__ = """The outcome of transforming one file.
+
+Attributes:
+    input (str): The input file.
+    output (str): The output file, whether or not it was written.
+    rows (int): The number of rows written, or ``None`` on failure.
+    seconds (float): The time taken to read, transform and write the file.
+    error (str): What went wrong, or ``None`` on success.
+"""
+
+_EXTENSIONS = {'csv': '.csv', 'parquet': '.parquet', 'feather': '.feather'}
+
+
+def output_path(path, out_dir, format=None):
+    """Work out where to write the output for an input file.
+
+    The output has the same name as the input, in ``out_dir``. If an output
+    format is given, the input's format and compression extensions are
+    replaced by that format's.
+
+    Args:
+        path (str): The input file.
+        out_dir (str): The directory for outputs.
+        format (str): The output format, if not the same as the input's.
+
+    Returns:
+        :class:`pathlib.Path`: The output file.
+
+    """
+    name = Path(path).name
+    if format is not None:
+        stem, suffix = os.path.splitext(name)
+        if suffix.lower() in _COMPRESSION:
+            stem, suffix = os.path.splitext(stem)
+        if suffix.lower() not in _SUFFIXES:
+            stem += suffix
+        name = stem + _EXTENSIONS[format]
+    return Path(out_dir) / name
+
+
+def _transform(script, options, path, output):
+    """Read, transform and write one file, reporting any failure."""
+    start = time.perf_counter()
+    # Keep the extension, which decides how a CSV file is compressed
+    temp = output.with_name('.tmp{}-{}'.format(os.getpid(), output.name))
+    try:
+        data = read_data(path, options['input_format'],
+                         arrow_strings=options['arrow_strings'])
+        if options['optimize']:
+            script = script.optimize(data.columns)
+        data = script.execute(data, in_place=True)
+        write_data(data, temp, options['output_format']
+                   or options['input_format'] or detect_format(path))
+        os.replace(temp, output)
+    except Exception as error:
+        if temp.exists():
+            temp.unlink()
+        return FileResult(str(path), str(output), None,
+                          time.perf_counter() - start,
+                          '{}: {}'.format(type(error).__name__, error))
+    return FileResult(str(path), str(output), len(data),
+                      time.perf_counter() - start, None)
+
+
+# The script and options sent to this worker process when it started
+_worker_args = None
+
+
+def _init_worker(script, options):
+    global _worker_args
+    _worker_args = (script, options)
+
+
+def _transform_in_worker(path, output):
+    return _transform(*_worker_args, path, output)
+
+
+class BatchExecutor:
+    """Execute a script over many files in a pool of worker processes.
+
+    Example::
+
+        with BatchExecutor(script, jobs=8) as executor:
+            for result in executor.execute(paths, 'out'):
+                print(result.input, result.error or 'OK')
+
+    Args:
+        script (:class:`~pyrefine.script.Script`): The script to execute.
+        jobs (int): The number of worker processes. Defaults to the number
+            of CPUs. With one job, files are transformed in this process.
+        input_format (str): The format of the inputs, if not to be
+            detected for each file.
+        output_format (str): The format of the outputs. By default each is
+            written in the format of its input.
+        arrow_strings (bool): Whether to read strings into Arrow arrays.
+        optimize (bool): Whether to optimise the script for the columns of
+            each file before executing it (see
+            :meth:`Script.optimize <pyrefine.script.Script.optimize>`).
+    """
+
+    def __init__(self, script, jobs=None, input_format=None,
+                 output_format=None, arrow_strings=False, optimize=False):
+        """Configure the executor; workers are started when first needed."""
+        self.script = script
+        self.jobs = jobs or os.cpu_count() or 1
+        self.options = {'input_format': input_format,
+                        'output_format': output_format,
+                        'arrow_strings': arrow_strings,
+                        'optimize': optimize}
+        self._pool = None
+
+    def __enter__(self):
+        """Return the executor itself."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Shut down the worker processes."""
+        self.shutdown()
+
+    def shutdown(self):
+        """Shut down the worker processes, if any were started."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def execute(self, paths, out_dir):
+        """Transform each of a list of files.
+
+        Args:
+            paths (list): The input files.
+            out_dir (str): The directory to write outputs to, which is
+                created if need be. Outputs are named by
+                :func:`output_path`.
+
+        Returns:
+            iterator: A :class:`FileResult` for each file, in the order in
+            which they finish.
+
+        Raises:
+            :exc:`ValueError`: If two inputs would have the same output.
+
+        """
+        outputs = [output_path(path, out_dir, self.options['output_format'])
+                   for path in paths]
+        if len(set(outputs)) < len(outputs):
+            raise ValueError('Several inputs would be written to the same '
+                             'output file')
+        Path(out_dir).mkdir(parents=True, exist_ok=True)
+
+        if self.jobs == 1 or len(paths) == 1:
+            return (_transform(self.script, self.options, path, output)
+                    for path, output in zip(paths, outputs))
+
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.jobs, initializer=_init_worker,
+                initargs=(self.script, self.options))
+        futures = [self._pool.submit(_transform_in_worker, path, output)
+                   for path, output in zip(paths, outputs)]
+        return (future.result() for future in as_completed(futures))
@@ -0,0 +1,275 @@
+"""Intermediate results of scripts, kept on disk between runs.
+
+A script extracted from OpenRefine is often refined a step at a time: the
+last few operations are changed and the whole script is executed again.
+Given a :class:`CheckpointStore`, :meth:`Script.execute
+<pyrefine.script.Script.execute>` stores the data after each operation,
+under a key that depends on the input data and on the parameters of every
+operation up to that point. Executing a script whose first operations
+are unchanged then starts from the data after the last of them rather
+than from the input.
+
+Datasets whose columns are all numbers, dates or Arrow-backed strings
+(see :mod:`pyrefine.arrow`) are stored as Arrow IPC files, which are fast
+to write and read. Columns of Python objects may hold lists, errors or a
+mix of types that Arrow would not give back unchanged, so datasets with
+any such columns are pickled instead.
+
+.. autosummary::
+
+    CheckpointStore
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+from .arrow import is_arrow_list, is_arrow_string, pandas_dtype, to_arrow
+
+_ARROW_MAGIC = b'ARROW1'
+
+
+def _code_version():
+    """Identify this version of pyrefine and pandas.
+
+    The result of an operation may change with either, so checkpoints
+    written by other versions are never used.
+    """
+    digest = hashlib.sha256(pd.__version__.encode())
+    package = Path(__file__).parent
+    for module in sorted(package.rglob('*.py')):
+        digest.update(str(module.relative_to(package)).encode())
+        digest.update(module.read_bytes())
+    return digest.hexdigest()
+
+
+def _hash_column(digest, column):
+    """Add the values of a column or index to a digest."""
+    digest.update(str(column.dtype).encode())
+    if is_arrow_string(column) or is_arrow_list(column):
+        # Hashing the buffers themselves saves converting every value to a
+        # Python object. The same values may be laid out differently, but
+        # that only means a checkpoint is missed.
+        array = to_arrow(column)
+        digest.update('{} {}'.format(array.offset, len(array)).encode())
+        for buffer in array.buffers():
+            digest.update(b'' if buffer is None else buffer)
+        return
+    try:
+        hashes = pd.util.hash_pandas_object(column, index=False)
+    except TypeError:
+        # Lists and other unhashable values are hashed as their text
+        hashes = pd.util.hash_pandas_object(column.astype(str), index=False)
+    digest.update(hashes.to_numpy().tobytes())
+    if column.dtype == object:
+        # Python objects are hashed by their text, so 1 and '1' would
+        # otherwise look the same
+        types = column.map(type).astype(str)
+        digest.update(pd.util.hash_pandas_object(types, index=False)
+                      .to_numpy().tobytes())
+
+
+def _arrow_safe(data):
+    """Whether a dataset would be read back from Arrow unchanged."""
+    def safe(values):
+        if is_arrow_string(values) or is_arrow_list(values):
+            return True
+        return isinstance(values.dtype, pd.DatetimeTZDtype) \
+            or values.dtype.kind in 'biufmM'
+
+    return all(isinstance(name, str) for name in data.columns) \
+        and data.columns.is_unique \
+        and (isinstance(data.index, pd.RangeIndex) or safe(data.index)) \
+        and all(safe(column) for _, column in data.items())
+
+
+class CheckpointStore:
+    """The data after each operation of a script, kept on disk.
+
+    Each checkpoint is stored in a file of its own, named after its key, so
+    that several processes can share a store safely. Once the files take
+    up more than ``max_size`` bytes, those least recently used are deleted.
+
+    Example::
+
+        store = CheckpointStore('checkpoints')
+        output_data = script.execute(input_data, checkpoints=store)
+
+    Args:
+        path (str): The directory to keep checkpoints in. It is created
+            when the first checkpoint is stored.
+        max_size (int): The most bytes of checkpoints to keep, or ``None``
+            for no limit.
+
+    Attributes:
+        hits (int): How many operations were skipped by starting from a
+            checkpoint.
+        misses (int): How many operations were executed.
+    """
+
+    def __init__(self, path, max_size=2 * 1024 ** 3):
+        """Use the checkpoints in the given directory."""
+        self.path = Path(path)
+        self.max_size = max_size
+        self.hits = self.misses = 0
+
+    def keys(self, data, steps):
+        """Return the key of the data before and after each step.
+
+        Args:
+            data (:class:`pandas.DataFrame`): The input data.
+            steps (list): The JSON parameters of each operation.
+
+        Returns:
+            list: One more key than there are steps. The first identifies
+            the input data; each of the others also depends on every step
+            up to and including its own.
+
+        """
+        digest = hashlib.sha256(_code_version().encode())
+        digest.update(json.dumps([str(name) for name in data.columns])
+                      .encode())
+        _hash_column(digest, data.index.to_series())
+        for _, column in data.items():
+            _hash_column(digest, column)
+
+        keys = [digest.hexdigest()]
+        for step in steps:
+            step = json.dumps(step, sort_keys=True, separators=(',', ':'))
+            keys.append(hashlib.sha256((keys[-1] + step).encode())
+                        .hexdigest())
+        return keys
+
+    def _file(self, key):
+        return self.path / key[:2] / key
+
+    def resume(self, keys):
+        """Find the last step for which there is a checkpoint.
+
+        Args:
+            keys (list): The keys returned by :meth:`keys`.
+
+        Returns:
+            tuple: How many steps the checkpoint skips, and the data after
+            them; or ``(0, None)`` if there is none.
+
+        """
+        for index in range(len(keys) - 1, 0, -1):
+            data = self.get(keys[index])
+            if data is not None:
+                self.hits += index
+                self.misses += len(keys) - 1 - index
+                return index, data
+        self.misses += len(keys) - 1
+        return 0, None
+
+    def get(self, key):
+        """Return the data stored under a key, or ``None``."""
+        path = self._file(key)
+        try:
+            with open(path, 'rb') as f:
+                if f.read(len(_ARROW_MAGIC)) == _ARROW_MAGIC:
+                    data = self._read_arrow(path)
+                else:
+                    f.seek(0)
+                    data = pickle.load(f)
+            # Mark the checkpoint as recently used
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # Whatever is there cannot be used, so make way for a new one
+            self._remove(path)
+            return None
+        return data if isinstance(data, pd.DataFrame) else None
+
+    def put(self, key, data):
+        """Store the data under a key, then evict old checkpoints."""
+        path = self._file(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first, so readers never see half of it
+        fd, temp = tempfile.mkstemp(dir=str(path.parent), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                if not self._write_arrow(data, f):
+                    pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp, str(path))
+        except BaseException:
+            os.unlink(temp)
+            raise
+        self.evict()
+
+    def _write_arrow(self, data, f):
+        """Write the data to a file as Arrow, if it can be read back."""
+        if not _arrow_safe(data):
+            return False
+        try:
+            import pyarrow as pa
+            import pyarrow.feather as feather
+        except ImportError:
+            return False
+
+        try:
+            table = pa.Table.from_pandas(data, preserve_index=True)
+        except (TypeError, ValueError):
+            return False
+        metadata = json.loads(table.schema.metadata[b'pandas'])
+        for column in metadata['columns']:
+            # pandas cannot parse the names of Arrow list dtypes, so leave
+            # them to pandas_dtype when reading
+            if column['numpy_type'].endswith('[pyarrow]'):
+                column['numpy_type'] = 'object'
+        table = table.replace_schema_metadata(
+            {b'pandas': json.dumps(metadata).encode()})
+        feather.write_feather(table, f, compression='uncompressed')
+        return True
+
+    def _read_arrow(self, path):
+        import pyarrow.feather as feather
+        return feather.read_table(str(path), memory_map=False) \
+            .to_pandas(types_mapper=pandas_dtype)
+
+    def _remove(self, path):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    def evict(self):
+        """Delete the least recently used checkpoints over ``max_size``."""
+        if self.max_size is None:
+            return
+        files = []
+        for path in self.path.glob('*/*'):
+            if path.suffix == '.tmp':
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+
+        size = sum(file[1] for file in files)
+        for _, file_size, path in sorted(files):
+            if size <= self.max_size:
+                break
+            self._remove(path)
+            size -= file_size
+
+    def clear(self):
+        """Delete every checkpoint."""
+        for path in self.path.glob('*/*'):
+            self._remove(path)
+
+    def __getstate__(self):
+        """Leave out the statistics, for pickling."""
+        return {'path': self.path, 'max_size': self.max_size}
+
+    def __setstate__(self, state):
+        """Restore the store with fresh statistics."""
+        self.__init__(state['path'], state['max_size'])
@@ -1,9 +1,23 @@
 # -*- coding: utf-8 -*-
-"""Command-line interface for PyRefine."""
+"""Command-line interface for PyRefine.
+
+Modules that import pandas are only imported by the commands that need
+them, so that ``pyrefine --help`` and ``pyrefine validate`` start quickly.
+"""
+
+import glob
+import io
+from itertools import chain
+import os
+import re
+import signal
+import time
 
 import click
-import pandas as pd
-from .script import load_script
+from .batch import BatchExecutor
+from .io import FORMATS, detect_format, read_columns, read_data, write_data
+from .profiling import Profiler
+from .validation import validate_script
 
 
 @click.group()
@@ -14,15 +28,351 @@ def main(args=None):
 
 @main.command()
 @click.argument('script', type=click.File('r'))
-@click.argument('data', type=click.File('r'))
-@click.option('--outfile', '-o', default='-', type=click.File('w'))
-def execute(script, data, outfile):
-    """Execute a JSON script against a CSV data file."""
+@click.argument('data', type=click.Path(dir_okay=False, allow_dash=True))
+@click.option('--outfile', '-o', default='-',
+              type=click.Path(dir_okay=False, writable=True, allow_dash=True))
+@click.option('--input-format', type=click.Choice(FORMATS), default=None,
+              help='Format of DATA. By default this is detected from its '
+                   'name or contents.')
+@click.option('--output-format', type=click.Choice(FORMATS), default=None,
+              help='Format of the output. By default this is detected from '
+                   'its name, or CSV for standard output.')
+@click.option('--arrow-strings', is_flag=True,
+              help='Hold strings in Arrow arrays rather than as Python '
+                   'objects, which uses much less memory (needs pyarrow).')
+@click.option('--chunksize', type=click.IntRange(min=1), default=None,
+              help='Stream the data through the script this many rows '
+                   'at a time, rather than loading it all at once.')
+@click.option('--jobs', '-j', type=click.IntRange(min=1), default=None,
+              help='Spread row-local operations over this many worker '
+                   'processes.')
+@click.option('--optimize', is_flag=True,
+              help='Fuse and drop redundant operations before executing '
+                   'the script (see the explain command), and skip reading '
+                   'columns that are never used.')
+@click.option('--memoize', is_flag=True,
+              help='Evaluate expressions once for each distinct value '
+                   'rather than once per cell.')
+@click.option('--checkpoints', type=click.Path(file_okay=False),
+              default=None,
+              help='Keep the data after each operation in this directory, '
+                   'and resume from the last operation that is unchanged '
+                   'since a previous run.')
+@click.option('--profile', is_flag=True,
+              help='Report the time and memory used by each operation '
+                   'on standard error.')
+@click.option('--profile-format', type=click.Choice(['table', 'json']),
+              default='table', show_default=True,
+              help='Format of the profiling report.')
+def execute(script, data, outfile, input_format, output_format,
+            arrow_strings, chunksize, jobs, optimize, memoize, checkpoints,
+            profile, profile_format):
+    """Execute a JSON script against a data file.
+
+    DATA may be CSV (optionally compressed), Parquet or Feather, as may the
+    output.
+    """
+    from .expressions import code_cache
+    from .script import load_script
+
+    if profile and chunksize is not None:
+        raise click.UsageError('--profile cannot be used with --chunksize')
+    if jobs is not None and (profile or chunksize is not None):
+        raise click.UsageError('--jobs cannot be used with --profile or '
+                               '--chunksize')
+    if checkpoints is not None \
+            and (chunksize is not None or jobs is not None or optimize):
+        raise click.UsageError('--checkpoints cannot be used with '
+                               '--chunksize, --jobs or --optimize')
+    if chunksize is not None \
+            and os.path.splitext(outfile.lower())[1] == '.zip':
+        raise click.UsageError('--chunksize cannot be used to write a zip '
+                               'archive')
+
     parsed = load_script(script)
-    input_data = pd.read_csv(data)
+    caches = parsed.memoize() if memoize else {}
+    if checkpoints is not None:
+        from .checkpoints import CheckpointStore
+        checkpoints = CheckpointStore(checkpoints)
+
+    data, input_format = _open_input(data, input_format)
+    outfile, output_format = _open_output(outfile, output_format)
+
+    columns = None
+    if optimize:
+        parsed, columns = _project(parsed, data, input_format)
+        # If that was not possible, optimise once the columns are known
+        optimize = columns is None
+
+    input_data = read_data(data, input_format, columns=columns,
+                           chunksize=chunksize, arrow_strings=arrow_strings)
+
+    if chunksize is None:
+        hooks = [Profiler()] if profile else []
+        if optimize:
+            parsed = parsed.optimize(input_data.columns)
+        if jobs is not None:
+            output_data = parsed.execute_parallel(input_data, jobs=jobs)
+        else:
+            output_data = parsed.execute(input_data, hooks=hooks,
+                                         in_place=True,
+                                         checkpoints=checkpoints)
+        write_data(output_data, outfile, output_format)
+
+        for hook in hooks:
+            click.echo(hook.report(profile_format), err=True)
+        if profile and profile_format == 'table':
+            for index, cache in sorted(caches.items()):
+                info = cache.cache_info()
+                click.echo('Expression cache for operation {}: {} hits, '
+                           '{} misses, {} cached'.format(
+                               index, info.hits, info.misses, info.currsize),
+                           err=True)
+            info = code_cache.cache_info()
+            click.echo('Compiled expressions: {} reused, {} loaded from disk, '
+                       '{} compiled'.format(info.hits, info.disk_hits,
+                                            info.misses),
+                       err=True)
+            if checkpoints is not None:
+                click.echo('Checkpoints: {} operations skipped, {} executed'
+                           .format(checkpoints.hits, checkpoints.misses),
+                           err=True)
+    else:
+        chunks = iter(input_data)
+        if optimize:
+            first = next(chunks)
+            parsed = parsed.optimize(first.columns)
+            chunks = chain([first], chunks)
+        write_data(parsed.execute_chunked(chunks), outfile, output_format)
+
+
+def _open_input(path, format):
+    """Return something to read the input data from, and its format."""
+    if path != '-':
+        return path, format or detect_format(path)
+    elif format in (None, 'csv'):
+        return click.get_text_stream('stdin'), 'csv'
+    else:
+        # Columnar formats need to seek, which a pipe cannot do
+        return io.BytesIO(click.get_binary_stream('stdin').read()), format
+
+
+def _open_output(path, format):
+    """Return something to write the output data to, and its format."""
+    if path != '-':
+        return path, format or detect_format(path)
+    elif format in (None, 'csv'):
+        return click.get_text_stream('stdout'), 'csv'
+    else:
+        return click.get_binary_stream('stdout'), format
+
+
+def _project(script, data, format):
+    """Optimise a script to read only the columns of a file it needs.
+
+    The columns are read first, so this is only possible for files, not
+    standard input. Projection is also skipped if column names may be
+    repeated, as pandas renames the duplicates (``a``, ``a.1``, ...).
+
+    Returns:
+        tuple: The optimised script and a list of the columns to read, or
+        the original script and ``None``.
+
+    """
+    if not isinstance(data, str):
+        return script, None
+
+    header = read_columns(data, format)
+    for column in header:
+        match = re.match(r'(.*)\.\d+$', str(column))
+        if match and match.group(1) in header:
+            return script, None
+
+    return script.project(header)
+
+
+@main.command()
+@click.argument('script', type=click.File('r'))
+@click.argument('inputs', nargs=-1, required=True)
+@click.option('--out-dir', '-d', required=True,
+              type=click.Path(file_okay=False, writable=True),
+              help='Directory to write the outputs to, each named after its '
+                   'input.')
+@click.option('--input-format', type=click.Choice(FORMATS), default=None,
+              help='Format of the inputs. By default this is detected for '
+                   'each file.')
+@click.option('--output-format', type=click.Choice(FORMATS), default=None,
+              help='Format of the outputs. By default each is written in '
+                   'the format of its input.')
+@click.option('--arrow-strings', is_flag=True,
+              help='Hold strings in Arrow arrays rather than as Python '
+                   'objects (needs pyarrow).')
+@click.option('--jobs', '-j', type=click.IntRange(min=1), default=None,
+              help='Transform this many files at once, in worker processes. '
+                   'Defaults to the number of CPUs.')
+@click.option('--optimize', is_flag=True,
+              help='Fuse and drop redundant operations for the columns of '
+                   'each file before executing the script.')
+@click.option('--memoize', is_flag=True,
+              help='Evaluate expressions once for each distinct value '
+                   'rather than once per cell.')
+def batch(script, inputs, out_dir, input_format, output_format,
+          arrow_strings, jobs, optimize, memoize):
+    """Execute a JSON script against many data files.
+
+    INPUTS are data files or glob patterns matching them (quote patterns
+    to stop the shell expanding them, e.g. 'drops/*.csv' or
+    'drops/**/*.csv'). The script is parsed once, and the files are
+    transformed in parallel; a line is printed for each as it finishes,
+    then a summary. Files that fail do not stop the others, but make the
+    exit status 1.
+    """
+    from .script import load_script
+
+    parsed = load_script(script)
+    if memoize:
+        parsed.memoize()
+
+    paths = list(dict.fromkeys(chain.from_iterable(
+        sorted(glob.glob(pattern, recursive=True))
+        if glob.has_magic(pattern) else [pattern] for pattern in inputs)))
+    if not paths:
+        raise click.UsageError('No input files match {}'
+                               .format(' '.join(inputs)))
+
+    start = time.perf_counter()
+    rows = failed = 0
+    with BatchExecutor(parsed, jobs=jobs, input_format=input_format,
+                       output_format=output_format,
+                       arrow_strings=arrow_strings,
+                       optimize=optimize) as executor:
+        try:
+            results = executor.execute(paths, out_dir)
+        except ValueError as error:
+            raise click.UsageError(str(error))
+        for result in results:
+            if result.error is None:
+                rows += result.rows
+                click.echo('OK     {} -> {} ({} rows, {:.2f} s)'.format(
+                    result.input, result.output, result.rows,
+                    result.seconds))
+            else:
+                failed += 1
+                click.echo('FAILED {}: {}'.format(result.input,
+                                                  result.error))
+
+    seconds = time.perf_counter() - start
+    click.echo('{} files ({} failed), {} rows in {:.2f} s: {:.1f} files/s, '
+               '{:.0f} rows/s'.format(len(paths), failed, rows, seconds,
+                                      len(paths) / seconds, rows / seconds))
+    if failed:
+        raise SystemExit(1)
+
+
+@main.command()
+@click.argument('script', type=click.File('r'))
+@click.argument('data', type=click.Path(exists=True, dir_okay=False),
+                required=False)
+def explain(script, data):
+    """Show how a JSON script would be optimised.
+
+    If a DATA file is given, its columns are taken into account.
+    """
+    from .script import load_script
+
+    columns = None if data is None else read_columns(data)
+    click.echo(load_script(script).explain(columns))
+
+
+@main.command()
+@click.option('--host', default='127.0.0.1', show_default=True,
+              help='Address to listen on.')
+@click.option('--port', '-p', type=click.IntRange(min=0), default=8000,
+              show_default=True, help='Port to listen on.')
+@click.option('--socket', 'socket_path', type=click.Path(dir_okay=False),
+              default=None,
+              help='Listen on this Unix socket instead of a TCP port.')
+@click.option('--script', '-s', 'scripts', multiple=True,
+              metavar='NAME=PATH',
+              help='Register the script in PATH as NAME at startup. May be '
+                   'given more than once.')
+@click.option('--jobs', '-j', type=click.IntRange(min=1), default=None,
+              help='Number of worker processes. Defaults to the number of '
+                   'CPUs.')
+@click.option('--max-pending', type=click.IntRange(min=1), default=None,
+              help='Turn requests away once this many are waiting or being '
+                   'transformed. Defaults to four per worker.')
+@click.option('--arrow-strings', is_flag=True,
+              help='Hold strings in Arrow arrays rather than as Python '
+                   'objects (needs pyarrow).')
+def serve(host, port, socket_path, scripts, jobs, max_pending,
+          arrow_strings):
+    """Serve scripts over HTTP from warm worker processes.
+
+    Scripts are registered with PUT /scripts/NAME (or --script), and data
+    is transformed by POSTing it to /scripts/NAME; GET /metrics reports
+    the number of requests and their latency. See pyrefine.server for
+    the details.
+    """
+    from .server import ScriptServer, make_server
+
+    paths = {}
+    for option in scripts:
+        name, sep, path = option.partition('=')
+        if not sep:
+            raise click.UsageError('--script must be given as NAME=PATH')
+        paths[name] = path
+
+    with ScriptServer(jobs=jobs, max_pending=max_pending,
+                      arrow_strings=arrow_strings) as server:
+        for name, path in paths.items():
+            with open(path) as f:
+                try:
+                    server.register(name, f.read())
+                except ValueError as error:
+                    message, problems = error.args
+                    raise click.UsageError('Script {} is not valid: {}'.format(
+                        path, '; '.join([message] + [
+                            'operation {}: {}'.format(problem.index,
+                                                      problem.message)
+                            for problem in problems])))
+        httpd = make_server(server, host, port, socket_path)
+        click.echo('Serving {} workers on {}'.format(
+            server.jobs, socket_path or 'http://{}:{}/'.format(
+                host, httpd.server_address[1])), err=True)
+        # Stop cleanly, shutting down the workers, when terminated too
+        signal.signal(signal.SIGTERM, _interrupt)
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            httpd.server_close()
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+@main.command()
+@click.argument('script', type=click.File('r'))
+def validate(script):
+    """Check a JSON script without executing it.
 
-    output_data = parsed.execute(input_data)
-    output_data.to_csv(outfile, index=False)
+    Each problem found is printed, with the position of its operation in
+    the script, and makes the exit status 1. Neither pandas nor any data is
+    loaded, so this is quick enough to run before every execution.
+    """
+    problems = validate_script(script)
+    for problem in problems:
+        if problem.index is None:
+            click.echo(problem.message)
+        else:
+            click.echo('Operation {} ({}): {}'.format(
+                problem.index, problem.op or 'unknown', problem.message))
+    if problems:
+        raise SystemExit(1)
+    click.echo('OK')
 
 
 if __name__ == "__main__":
@@ -1,15 +1,60 @@
 """Handle the expressions found in OpenRefine operations.
 
-Currently, only Jython is supported inasmuch as it is passed directly
-to the current Python interpreter.
+Two languages are supported. Jython expressions (``jython:...``) are passed
+directly to the current Python interpreter. GREL expressions, which are
+those with a ``grel:`` prefix or none at all, are parsed by
+:mod:`pyrefine.grel`.
+
+Expressions are written to act on a single cell ``value``, but calling a
+Python function once per cell is slow. :class:`ColumnExpression` evaluates
+an expression over a whole column at once: :func:`vectorize_expression`
+recognises common patterns (string methods, slicing, concatenation and
+``%`` formatting, regular expression searches) and translates them into
+pandas' vectorised string methods, and anything else falls back to calling
+the compiled expression on each cell. For GREL, the parsed expression is
+translated function by function: ``trim()``, ``toLowercase()``,
+``replace()``, ``split()``, ``match()``, ``toNumber()``, ``toDate()``,
+``length()``, ``+`` and many others have column equivalents, and an
+expression using any function that does not is evaluated per cell.
+
+Columns often hold few distinct values. Given an :class:`ExpressionCache`,
+a :class:`ColumnExpression` evaluates the expression only once for each
+distinct value and remembers the results, provided the expression is pure
+(see :func:`is_pure`).
 
 .. autosummary::
 
     compile_expression
+    vectorize_expression
+    is_pure
+    referenced_columns
+    ColumnExpression
+    ExpressionCache
+    CodeCache
+    code_cache
     ExpressionError
 """
 
+import ast
+from collections import namedtuple, OrderedDict
+import copy
+from functools import lru_cache
+import hashlib
 from itertools import chain
+import marshal
+import os
+from pathlib import Path
+import re
+import sys
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+from . import grel
+from .arrow import from_arrow, is_arrow_list, is_arrow_string, to_arrow, \
+    to_arrow_column, to_objects
 
 
 class ExpressionError(RuntimeError):
@@ -39,21 +84,1580 @@ def _handle_errors(lines, on_error):
 
 
 def compile_expression(expression, on_error='set-to-blank'):
-    """Compile the given expression into a callable function."""
-    try:
-        language, code = expression.split(':', 1)
-    except ValueError as error:
-        raise ExpressionError(f'No language given in expression: {expression}',
-                              error)
+    """Compile the given expression into a callable function.
 
-    if language != 'jython':
+    Jython expressions are compiled as the body of a Python function, and
+    GREL expressions are translated into Python (see
+    :func:`pyrefine.grel.to_python`). The compiled code is looked up in
+    :data:`code_cache` first.
+
+    Raises:
+        :exc:`ExpressionError`: If the language is not supported, or a
+            GREL expression is invalid.
+        :exc:`SyntaxError`: If a Jython expression is invalid.
+
+    """
+    compiled = code_cache.get(expression, on_error)
+    return _make_function(compiled.code, compiled.constants)
+
+
+def _compile(expression, on_error):
+    """Compile and analyse an expression, for :class:`CodeCache`."""
+    language, code = grel.split_language(expression)
+    if language == 'grel':
+        try:
+            source, constants = grel.to_python(grel.parse(code))
+        except grel.GrelSyntaxError as error:
+            raise ExpressionError(f'Invalid GREL expression: {code}', error)
+        lines = ['return ' + source]
+    elif language == 'jython':
+        lines, constants = code.splitlines(), None
+    else:
         raise ExpressionError(f'Unknown expression language: {language}')
 
-    func_body = _handle_errors(
-                      code.splitlines(),
-                      on_error)
+    func_body = _handle_errors(lines, on_error)
     func_code = '\n'.join(chain(['def expression_func(value):'],
                                 _indent_lines(func_body)))
-    context = {}
-    eval(compile(func_code, 'pyrefine_exp', 'exec'), None, context)
-    return context['expression_func']
+    filename = 'pyrefine_exp' if constants is None else 'pyrefine_grel'
+    columns = referenced_columns(expression)
+    return CompiledCode(compile(func_code, filename, 'exec'), constants,
+                        is_pure(expression),
+                        None if columns is None else frozenset(columns))
+
+
+def _make_function(code, constants):
+    """Run compiled code to define the expression's function."""
+    if constants is None:
+        context = {}
+        eval(code, None, context)
+        return context['expression_func']
+    names = grel.namespace(constants)
+    eval(code, names)
+    return names['expression_func']
+
+
+class _Unsupported(Exception):
+    """Raised internally for code that cannot be vectorised."""
+
+    pass
+
+
+# Methods of ``str`` that have an equivalent in pandas' ``.str`` accessor.
+# Arguments must be constants. Each maps to a function taking the accessor
+# and the arguments, and whether the method returns a string.
+_STRING_METHODS = {
+    name: (lambda name: lambda acc, *args: getattr(acc, name)(*args))(name)
+    for name in ['capitalize', 'casefold', 'lower', 'upper', 'swapcase',
+                 'title', 'strip', 'lstrip', 'rstrip', 'zfill', 'center',
+                 'ljust', 'rjust']
+}
+_STRING_METHODS['replace'] = \
+    lambda acc, old, new, count=-1: acc.replace(old, new, n=count,
+                                                regex=False)
+
+_OTHER_METHODS = {
+    name: (lambda name: lambda acc, *args: getattr(acc, name)(*args))(name)
+    for name in ['startswith', 'endswith', 'find', 'rfind',
+                 'isalnum', 'isalpha', 'isdigit', 'isspace', 'islower',
+                 'isupper', 'istitle', 'isnumeric', 'isdecimal']
+}
+_OTHER_METHODS['split'] = \
+    lambda acc, sep=None, maxsplit=-1: acc.split(sep, n=maxsplit,
+                                                 regex=False)
+_OTHER_METHODS['rsplit'] = \
+    lambda acc, sep=None, maxsplit=-1: acc.rsplit(sep, n=maxsplit)
+
+# Methods whose Arrow kernels map case and classify characters by simpler
+# rules than Python for some non-ASCII text (e.g. ``'ß'.upper()``), so
+# non-ASCII Arrow strings are evaluated per cell instead.
+_UNICODE_METHODS = {'capitalize', 'casefold', 'lower', 'upper', 'swapcase',
+                    'title', 'isalnum', 'isalpha', 'isdigit', 'isspace',
+                    'islower', 'isupper', 'istitle', 'isnumeric',
+                    'isdecimal'}
+
+_REGEX_FUNCTIONS = {
+    'search': '({})',
+    'match': r'\A({})',
+    'fullmatch': r'\A({})\Z',
+}
+
+_GLOBAL_FLAGS = re.compile(r'\A\(\?[aiLmsux]+\)')
+
+_Pattern = type(_GLOBAL_FLAGS)
+
+
+def _constant(node):
+    """Return the value of a constant node, or raise _Unsupported."""
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        value = _constant(node.operand)
+        if isinstance(value, int):
+            return -value
+    elif type(node).__name__ == 'Constant':
+        return node.value
+    elif type(node).__name__ in ('Str', 'Num', 'NameConstant'):
+        return getattr(node, 's', getattr(node, 'n', getattr(node, 'value',
+                                                             None)))
+    raise _Unsupported()
+
+
+def _combine(*valids):
+    """Combine masks of valid rows, any of which may be None (all valid)."""
+    valids = [v for v in valids if v is not None]
+    if not valids:
+        return None
+    return np.logical_and.reduce(valids)
+
+
+def _ascii(strings):
+    """Mark the rows of Arrow strings that are ASCII, or None if not Arrow.
+
+    Missing values are marked too, as they have no characters at all.
+    """
+    if not is_arrow_string(strings):
+        return None
+    import pyarrow.compute as pc
+    mask = pc.string_is_ascii(to_arrow(strings))
+    return mask.fill_null(True).to_numpy(zero_copy_only=False)
+
+
+def _join(values):
+    """Concatenate a list of Series and literal strings element-wise."""
+    series = next(value for value in values if not isinstance(value, str))
+    if not is_arrow_string(series):
+        result = values[0]
+        for value in values[1:]:
+            result = result + value
+        return result
+
+    # pandas has no + for Arrow strings, but Arrow itself can join them
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    arrays = [value if isinstance(value, str) else pa.array(value.array)
+              for value in values]
+    joined = pc.binary_join_element_wise(*arrays, '')
+    return pd.Series(pd.arrays.ArrowStringArray(joined), index=series.index)
+
+
+class _Vectorizer:
+    """Translate the body of a Jython expression into column operations.
+
+    Each node of the syntax tree is compiled to a pair ``(kind, func)``.
+    ``func`` takes a dictionary of local variables (``value`` being a
+    Series of strings) and returns the node's value as a pair
+    ``(result, valid)``, where ``valid`` is a boolean mask of the rows for
+    which the result is correct, or ``None`` for all of them. ``kind`` is
+    "str" if the result is a Series of strings, "literal" for a string
+    constant, the compiled pattern for the result of a regular expression
+    search, or "other".
+    """
+
+    def __init__(self, body):
+        self.names = {'value': 'str'}
+        self.imports = set()
+        self.steps = []
+        self.uses_regex = False
+
+        for i, stmt in enumerate(body):
+            if isinstance(stmt, ast.Import):
+                for alias in stmt.names:
+                    if alias.name != 're' or alias.asname is not None:
+                        raise _Unsupported()
+                    self.imports.add('re')
+            elif (isinstance(stmt, ast.Assign) and len(stmt.targets) == 1
+                  and isinstance(stmt.targets[0], ast.Name)):
+                kind, func = self.compile(stmt.value)
+                if kind == 'literal':
+                    raise _Unsupported()
+                self.names[stmt.targets[0].id] = kind
+                self.steps.append((stmt.targets[0].id, func))
+            elif isinstance(stmt, ast.Return) and i == len(body) - 1:
+                kind, self.result = self.compile(stmt.value)
+                if kind == 'literal':
+                    raise _Unsupported()
+                return
+            else:
+                raise _Unsupported()
+
+        raise _Unsupported()
+
+    def __call__(self, strings):
+        """Evaluate over a Series of strings, returning (result, valid)."""
+        env = {'value': (strings, None)}
+        for name, func in self.steps:
+            env[name] = func(env)
+        return self.result(env)
+
+    def compile(self, node):
+        """Compile a node to a ``(kind, func)`` pair."""
+        method = getattr(self, '_compile_' + type(node).__name__, None)
+        if method is None:
+            return 'literal', self._compile_literal(node)
+        return method(node)
+
+    def _compile_literal(self, node):
+        value = _constant(node)
+        if not isinstance(value, str):
+            raise _Unsupported()
+        return value
+
+    def _compile_str(self, node):
+        """Compile a node that must evaluate to strings or a literal."""
+        kind, func = self.compile(node)
+        if kind not in ('str', 'literal'):
+            raise _Unsupported()
+        if kind == 'literal':
+            return lambda env: (func, None)
+        return func
+
+    def _compile_Name(self, node):
+        if node.id not in self.names:
+            raise _Unsupported()
+        return self.names[node.id], lambda env: env[node.id]
+
+    def _compile_BinOp(self, node):
+        if isinstance(node.op, ast.Add):
+            parts = [node.left, node.right]
+        elif isinstance(node.op, ast.Mod):
+            parts = self._parse_format(node.left, node.right)
+        else:
+            raise _Unsupported()
+        return self._concatenate(parts)
+
+    def _compile_JoinedStr(self, node):
+        parts = []
+        for part in node.values:
+            if type(part).__name__ == 'FormattedValue':
+                if part.conversion not in (-1, ord('s')) \
+                        or part.format_spec is not None:
+                    raise _Unsupported()
+                parts.append(part.value)
+            else:
+                parts.append(part)
+        return self._concatenate(parts)
+
+    def _parse_format(self, fmt_node, args_node):
+        fmt = _constant(fmt_node)
+        if not isinstance(fmt, str):
+            raise _Unsupported()
+        if isinstance(args_node, ast.Tuple):
+            args = list(args_node.elts)
+        else:
+            args = [args_node]
+
+        parts = []
+        for i, piece in enumerate(re.split(r'(%.?)', fmt)):
+            if i % 2 == 0:
+                if piece:
+                    parts.append(piece)
+            elif piece == '%%':
+                parts.append('%')
+            elif piece == '%s' and args:
+                parts.append(args.pop(0))
+            else:
+                raise _Unsupported()
+        if args:
+            raise _Unsupported()
+        return parts
+
+    def _concatenate(self, parts):
+        funcs = [part if isinstance(part, str) else self._compile_str(part)
+                 for part in parts]
+        if all(isinstance(func, str) for func in funcs):
+            raise _Unsupported()
+
+        def concatenate(env):
+            values, valids = [], []
+            for func in funcs:
+                if isinstance(func, str):
+                    values.append(func)
+                else:
+                    value, valid = func(env)
+                    values.append(value)
+                    valids.append(valid)
+            return _join(values), _combine(*valids)
+
+        return 'str', concatenate
+
+    def _compile_Subscript(self, node):
+        kind, func = self.compile(node.value)
+        index = getattr(node.slice, 'value', node.slice) \
+            if type(node.slice).__name__ == 'Index' else node.slice
+
+        if isinstance(kind, _Pattern):
+            return self._group(kind, func, [index])
+        if kind != 'str' or not isinstance(index, ast.Slice):
+            raise _Unsupported()
+
+        bounds = [None if bound is None else _constant(bound)
+                  for bound in (index.lower, index.upper, index.step)]
+        if not all(bound is None or isinstance(bound, int)
+                   for bound in bounds) or bounds[2] == 0:
+            raise _Unsupported()
+
+        def subscript(env):
+            strings, valid = func(env)
+            return strings.str.slice(*bounds), valid
+
+        return 'str', subscript
+
+    def _compile_Call(self, node):
+        if node.keywords:
+            raise _Unsupported()
+
+        if isinstance(node.func, ast.Name):
+            if node.func.id == 'len' and len(node.args) == 1:
+                func = self._compile_str(node.args[0])
+                return 'other', lambda env: self._map(func, env,
+                                                      lambda s: s.str.len())
+            if node.func.id == 'str' and len(node.args) == 1:
+                return 'str', self._compile_str(node.args[0])
+            raise _Unsupported()
+
+        if not isinstance(node.func, ast.Attribute):
+            raise _Unsupported()
+        name = node.func.attr
+        obj = node.func.value
+
+        if isinstance(obj, ast.Name) and obj.id == 're' \
+                and 're' in self.imports and 're' not in self.names:
+            return self._regex(name, node.args)
+
+        kind, func = self.compile(obj)
+        if isinstance(kind, _Pattern) and name == 'group':
+            return self._group(kind, func, node.args)
+        if kind != 'str':
+            raise _Unsupported()
+
+        args = [_constant(arg) for arg in node.args]
+        if name == 'split' or name == 'rsplit':
+            if len(args) > 1 and args[1] <= 0:
+                raise _Unsupported()
+        if name in _STRING_METHODS:
+            method, result_kind = _STRING_METHODS[name], 'str'
+        elif name in _OTHER_METHODS:
+            method, result_kind = _OTHER_METHODS[name], 'other'
+        else:
+            raise _Unsupported()
+
+        return result_kind, \
+            lambda env: self._map(func, env,
+                                  lambda s: method(s.str, *args),
+                                  ascii_only=name in _UNICODE_METHODS)
+
+    @staticmethod
+    def _map(func, env, transform, ascii_only=False):
+        strings, valid = func(env)
+        if ascii_only:
+            valid = _combine(valid, _ascii(strings))
+        return transform(strings), valid
+
+    def _regex(self, name, args):
+        if name not in _REGEX_FUNCTIONS or len(args) != 2:
+            raise _Unsupported()
+        pattern = _constant(args[0])
+        if not isinstance(pattern, str) or re.search(r'\\[1-9]', pattern):
+            raise _Unsupported()
+        try:
+            compiled = re.compile(pattern)
+        except re.error:
+            raise _Unsupported()
+
+        wrapped = _REGEX_FUNCTIONS[name].format(
+            _GLOBAL_FLAGS.sub('', pattern))
+        func = self._compile_str(args[1])
+        self.uses_regex = True
+
+        def regex(env):
+            strings, valid = func(env)
+            groups = strings.str.extract(wrapped, flags=compiled.flags,
+                                         expand=True)
+            return groups, _combine(valid, groups[0].notna().to_numpy())
+
+        return compiled, regex
+
+    def _group(self, compiled, func, args):
+        if len(args) > 1:
+            raise _Unsupported()
+        group = _constant(args[0]) if args else 0
+        if isinstance(group, str):
+            group = compiled.groupindex.get(group, -1)
+        if not isinstance(group, int) or not 0 <= group <= compiled.groups:
+            raise _Unsupported()
+
+        def select(env):
+            groups, valid = func(env)
+            column = groups[group]
+            if group:
+                column = column.astype(object).where(column.notna(), None)
+            return column, valid
+
+        return ('str' if group == 0 else 'other'), select
+
+
+def _objects(strings):
+    """Strings as Python objects, for pandas' regular expression methods.
+
+    pandas hands some regular expressions on Arrow strings to Arrow, whose
+    syntax is not quite Python's.
+    """
+    return strings.astype(object) if is_arrow_string(strings) else strings
+
+
+def _bools(result):
+    """Make a boolean array from a comparison, with missing values false."""
+    if isinstance(result, pd.Series):
+        return result.to_numpy(dtype=bool, na_value=False)
+    return np.asarray(result, dtype=bool)
+
+
+def _checked(series, valid):
+    """Leave rows whose result is missing to be evaluated per cell."""
+    missing = series.isna().to_numpy()
+    if missing.any():
+        valid = _combine(valid, ~missing)
+        if pd.api.types.is_extension_array_dtype(series.dtype) \
+                and series.dtype.kind in 'iub':
+            # Nullable integers from Arrow: make them ordinary ones
+            series = series.fillna(0).astype(series.dtype.numpy_dtype)
+    elif pd.api.types.is_extension_array_dtype(series.dtype) \
+            and series.dtype.kind in 'iub':
+        series = series.astype(series.dtype.numpy_dtype)
+    return series, valid
+
+
+def _group_lists(groups):
+    """Make the lists of groups returned by GREL's ``match()``, or None."""
+    matches, index = groups
+    return pd.Series([None if match is None else list(match.groups())
+                      for match in matches], index=index, dtype=object)
+
+
+def _split_arrow(strings, separator):
+    """Split Arrow-backed strings, finding the rows with empty pieces."""
+    import pyarrow.compute as pc
+    lists = pc.split_pattern(to_arrow(strings), separator)
+    empty = np.zeros(len(lists), dtype=bool)
+    rows = pc.list_parent_indices(lists).filter(
+        pc.equal(pc.list_flatten(lists), ''))
+    empty[rows.to_numpy()] = True
+    return from_arrow(lists, strings), empty
+
+
+def _list_element(lists, i):
+    """Take item ``i`` of each Arrow-backed list, or null if there is none."""
+    import pyarrow as pa
+    array = to_arrow(lists)
+    offsets = array.offsets.to_numpy()
+    lengths = np.diff(offsets)
+    if i >= 0:
+        present, positions = i < lengths, offsets[:-1] + i
+    else:
+        present, positions = -i <= lengths, offsets[1:] + i
+    items = array.values.take(pa.array(positions, mask=~present))
+    return from_arrow(items, lists)
+
+
+def _to_strings(kind, values, fmt='%Y-%m-%dT%H:%M:%SZ'):
+    """Convert a column of some kind to strings, as GREL's ``toString()``."""
+    if kind == 'str':
+        return values
+    elif kind == 'num':
+        return values.map(grel.to_string)
+    elif kind == 'date':
+        return values.dt.strftime(fmt)
+    elif kind == 'bool':
+        return pd.Series(np.where(values, 'true', 'false'), dtype=object)
+    raise _Unsupported()
+
+
+_TRANSFORMS = {
+    'trim': lambda s: s.str.strip(),
+    'strip': lambda s: s.str.strip(),
+    'toLowercase': lambda s: s.str.lower(),
+    'toUppercase': lambda s: s.str.upper(),
+}
+
+# As for _UNICODE_METHODS
+_CASE_TRANSFORMS = {'toLowercase', 'toUppercase'}
+
+_COLUMN_OPERATORS = {'+': np.add, '-': np.subtract, '*': np.multiply,
+                     '<': np.less, '<=': np.less_equal, '>': np.greater,
+                     '>=': np.greater_equal, '==': np.equal,
+                     '!=': np.not_equal}
+
+_NUMBER = (int, float)
+
+_LITERAL_KINDS = {str: 'str', int: 'num', float: 'num', bool: 'bool'}
+
+
+class _GrelVectorizer:
+    """Translate a parsed GREL expression into column operations.
+
+    As for :class:`_Vectorizer`, each node of the syntax tree is compiled
+    to a pair ``(kind, func)``, where ``func`` takes a dictionary of
+    variables and returns a pair ``(result, valid)``. Results that come out
+    missing (e.g. ``get()`` beyond the end of a string) are marked as not
+    valid, so that those rows are evaluated per cell instead. ``kind`` is
+    one of:
+
+    - "str": a Series of strings.
+    - "num": a Series of numbers.
+    - "bool": a boolean array.
+    - "date": a Series of UTC timestamps.
+    - "list": a Series of lists of strings.
+    - "groups": the result of ``match()``, as a pair of a list of match
+      objects (or None) and the index.
+    - "other": a Series of anything, which can only be the final result.
+    - "literal" or "regex": a constant, given in place of ``func``.
+    """
+
+    def __init__(self, tree):
+        self.names = {'value': 'str'}
+        self.kind, self.result = self.compile(tree)
+        if self.kind in ('literal', 'regex'):
+            raise _Unsupported()
+
+    def __call__(self, strings):
+        """Evaluate over a Series of strings, returning (result, valid)."""
+        result, valid = self.result({'value': (strings, None)})
+        if self.kind == 'groups':
+            result = _group_lists(result)
+        elif self.kind == 'list' and is_arrow_list(result):
+            result = pd.Series(to_arrow(result).to_pylist(),
+                               index=strings.index, dtype=object)
+        elif self.kind == 'bool':
+            result = pd.Series(result, index=strings.index)
+        return result, valid
+
+    def compile(self, node):
+        """Compile a node to a ``(kind, func)`` pair."""
+        method = getattr(self, '_compile_' + node.type, None)
+        if method is None:
+            raise _Unsupported()
+        return method(node)
+
+    def operand(self, node, kinds, types=()):
+        """Compile a node that must have one of the given kinds.
+
+        Literals of the given Python types are accepted too, and returned
+        as functions giving the constant.
+
+        Returns:
+            tuple: The node's kind and function.
+
+        """
+        kind, func = self.compile(node)
+        if kind == 'literal' and type(func) in types:
+            return kind, lambda env, value=func: (value, None)
+        if kind not in kinds:
+            raise _Unsupported()
+        return kind, func
+
+    def constant(self, node, types):
+        """Return the value of a literal node of one of the given types."""
+        if node.type != 'literal' or type(node.value) not in types:
+            raise _Unsupported()
+        return node.value
+
+    def condition(self, node):
+        """Compile a node used as a condition, to a boolean array."""
+        kind, func = self.operand(node, ('bool', 'str'))
+        if kind == 'bool':
+            return func
+        return lambda env: self._map(
+            func, env, lambda s: _bools(s.str.lower() == 'true'))
+
+    @staticmethod
+    def _map(func, env, transform, ascii_only=False):
+        result, valid = func(env)
+        if ascii_only:
+            valid = _combine(valid, _ascii(result))
+        return transform(result), valid
+
+    @staticmethod
+    def _apply(funcs, env, transform):
+        results, valids = zip(*(func(env) for func in funcs))
+        return transform(*results), _combine(*valids)
+
+    def _compile_literal(self, node):
+        return 'literal', node.value
+
+    def _compile_regex(self, node):
+        return 'regex', node.value
+
+    def _compile_variable(self, node):
+        if node.value not in self.names:
+            raise _Unsupported()
+        return self.names[node.value], lambda env: env[node.value]
+
+    def _compile_operator(self, node):
+        if node.value == '+' and not self._numeric(node.args):
+            return self._concatenate(node.args)
+        if node.value == 'neg':
+            _, func = self.operand(node.args[0], ('num',))
+            return 'num', lambda env: self._map(func, env, np.negative)
+        if node.value not in _COLUMN_OPERATORS:
+            raise _Unsupported()
+
+        operands = [self.operand(arg, ('num', 'str'), _NUMBER + (str,))
+                    for arg in node.args]
+        kinds = {kind for kind, _ in operands} - {'literal'}
+        literals = {type(self.constant(arg, _NUMBER + (str,)))
+                    for arg, (kind, _) in zip(node.args, operands)
+                    if kind == 'literal'}
+        numeric = kinds == {'num'} and literals <= set(_NUMBER)
+        equality = kinds == {'str'} and literals <= {str} \
+            and node.value in ('==', '!=')
+        if not (numeric or equality):
+            raise _Unsupported()
+
+        function = _COLUMN_OPERATORS[node.value]
+        funcs = [func for _, func in operands]
+        if node.value in ('+', '-', '*'):
+            return 'num', lambda env: _checked(
+                *self._apply(funcs, env, function))
+        return 'bool', lambda env: self._map(
+            lambda env: self._apply(funcs, env, function), env, _bools)
+
+    def _numeric(self, args):
+        """Check whether ``+`` adds the nodes as numbers, or joins them."""
+        kinds = [self.compile(arg) for arg in args]
+        return any(kind == 'num' for kind, _ in kinds) and all(
+            kind == 'num' or kind == 'literal' and type(value) in _NUMBER
+            for kind, value in kinds)
+
+    def _concatenate(self, args):
+        parts = []
+        for arg in args:
+            kind, func = self.compile(arg)
+            if kind == 'literal':
+                if isinstance(func, re.Pattern):
+                    raise _Unsupported()
+                parts.append(grel.to_string(func))
+            else:
+                parts.append((lambda kind, func: lambda env: self._map(
+                    func, env, lambda values: _to_strings(kind, values)))(
+                        kind, func))
+        if all(isinstance(part, str) for part in parts):
+            raise _Unsupported()
+
+        def concatenate(env):
+            values, valids = [], []
+            for part in parts:
+                if isinstance(part, str):
+                    values.append(part)
+                else:
+                    value, valid = part(env)
+                    values.append(value)
+                    valids.append(valid)
+            series = [value for value in values
+                      if not isinstance(value, str)]
+            if not all(map(is_arrow_string, series)):
+                index = series[0].index
+                values = [value if isinstance(value, str)
+                          else value.astype(object).set_axis(index)
+                          for value in values]
+            return _checked(_join(values), _combine(*valids))
+
+        return 'str', concatenate
+
+    def _compile_call(self, node):
+        name, args = node.value, node.args
+        if name in _TRANSFORMS and len(args) == 1:
+            _, func = self.operand(args[0], ('str',))
+            transform = _TRANSFORMS[name]
+            return 'str', lambda env: self._map(
+                func, env, transform, ascii_only=name in _CASE_TRANSFORMS)
+        method = getattr(self, '_call_' + name, None)
+        if method is None:
+            raise _Unsupported()
+        try:
+            return method(*args)
+        except TypeError:
+            # The wrong number of arguments: leave the error to each cell
+            raise _Unsupported()
+
+    def _call_if(self, condition, then, otherwise):
+        test = self.condition(condition)
+        branches = [self.compile(then), self.compile(otherwise)]
+        literals = [func for kind, func in branches if kind == 'literal']
+        kinds = {kind for kind, _ in branches if kind != 'literal'}
+        kinds.update(_LITERAL_KINDS.get(type(value), 'regex')
+                     for value in literals if value is not None)
+        if len(kinds) != 1 or not kinds <= {'str', 'num', 'bool'}:
+            raise _Unsupported()
+        kind = kinds.pop()
+        if any(value is None for value in literals):
+            kind = 'other'
+        funcs = [func if branch_kind != 'literal'
+                 else (lambda value: lambda env: (value, None))(func)
+                 for branch_kind, func in branches]
+
+        def choose(env):
+            chosen, valid = test(env)
+            index = env['value'][0].index
+            results, valids = [], []
+            for func in funcs:
+                result, branch_valid = func(env)
+                if isinstance(result, pd.Series):
+                    result = result.to_numpy(dtype=object)
+                results.append(result)
+                valids.append(np.ones(len(index), dtype=bool)
+                              if branch_valid is None else branch_valid)
+            output = np.where(chosen, *results)
+            if output.dtype.kind == 'U':
+                output = output.astype(object)
+            valid = _combine(valid, np.where(chosen, *valids))
+            if kind == 'bool':
+                return output.astype(bool), valid
+            return pd.Series(output, index=index).infer_objects(), valid
+
+        return kind, choose
+
+    def _call_with(self, value, name, body):
+        kind, func = self.compile(value)
+        if kind in ('literal', 'regex'):
+            raise _Unsupported()
+        outer = dict(self.names)
+        self.names[name.value] = kind
+        try:
+            body_kind, body_func = self.compile(body)
+        finally:
+            self.names = outer
+
+        def bind(env):
+            return body_func(dict(env, **{name.value: func(env)}))
+
+        return body_kind, bind
+
+    def _logical(self, args, function):
+        tests = [self.condition(arg) for arg in args]
+        if not tests:
+            raise _Unsupported()
+        return 'bool', lambda env: self._apply(
+            tests, env, lambda *bools: function.reduce(bools))
+
+    def _call_and(self, *args):
+        return self._logical(args, np.logical_and)
+
+    def _call_or(self, *args):
+        return self._logical(args, np.logical_or)
+
+    def _call_not(self, arg):
+        test = self.condition(arg)
+        return 'bool', lambda env: self._map(test, env, np.logical_not)
+
+    def _blank(self, arg, blank, negate):
+        kind, func = self.operand(arg, ('str', 'num', 'other'))
+
+        def test(values):
+            if kind == 'num':
+                result = np.zeros(len(values), dtype=bool)
+            elif kind == 'other':
+                result = values.isna().to_numpy()
+                if blank:
+                    result |= _bools(values == '')
+            else:
+                result = _bools(values == '') if blank \
+                    else np.zeros(len(values), dtype=bool)
+            return ~result if negate else result
+
+        return 'bool', lambda env: self._map(func, env, test)
+
+    def _call_isBlank(self, arg):
+        return self._blank(arg, True, False)
+
+    def _call_isNonBlank(self, arg):
+        return self._blank(arg, True, True)
+
+    def _call_isNull(self, arg):
+        return self._blank(arg, False, False)
+
+    def _call_isNotNull(self, arg):
+        return self._blank(arg, False, True)
+
+    def _call_length(self, arg):
+        _, func = self.operand(arg, ('str', 'list'))
+        return 'num', lambda env: _checked(*self._map(
+            func, env, lambda s: pd.Series(
+                np.diff(to_arrow(s).offsets.to_numpy()), index=s.index)
+            if is_arrow_list(s) else s.str.len()))
+
+    def _call_replace(self, s, find, replacement):
+        _, func = self.operand(s, ('str',))
+        replacement = self.constant(replacement, (str,))
+        if find.type == 'regex':
+            pattern = find.value
+            replacement = grel._java_replacement(replacement)
+            return 'str', lambda env: self._map(
+                func, env, lambda s: _objects(s).str.replace(
+                    pattern, replacement, regex=True))
+        find = self.constant(find, (str,))
+        if not find:
+            raise _Unsupported()
+        return 'str', lambda env: self._map(
+            func, env, lambda s: s.str.replace(find, replacement,
+                                               regex=False))
+
+    def _call_split(self, s, separator, preserve=None):
+        _, func = self.operand(s, ('str',))
+        separator = self.constant(separator, (str,))
+        preserve = False if preserve is None \
+            else grel._truthy(self.constant(preserve, (bool, str)))
+        if not separator:
+            raise _Unsupported()
+
+        def split(env):
+            strings, valid = func(env)
+            if is_arrow_string(strings):
+                pieces, empty = _split_arrow(strings, separator)
+            else:
+                pieces = strings.str.split(separator, regex=False)
+                empty = np.fromiter((type(piece) is list and '' in piece
+                                     for piece in pieces),
+                                    dtype=bool, count=len(pieces))
+            if not preserve:
+                # GREL leaves out empty pieces
+                valid = _combine(valid, ~empty)
+            return pieces, valid
+
+        return 'list', split
+
+    def _call_match(self, s, regex):
+        _, func = self.operand(s, ('str',))
+        if regex.type != 'regex':
+            raise _Unsupported()
+        fullmatch = regex.value.fullmatch
+
+        def match(env):
+            strings, valid = func(env)
+            # A single pass of the regular expression engine, without the
+            # DataFrame of groups that .str.extract() would build
+            matches = [fullmatch(string) if type(string) is str else None
+                       for string in _objects(strings)]
+            return (matches, strings.index), valid
+
+        return 'groups', match
+
+    def _call_contains(self, s, sub):
+        _, func = self.operand(s, ('str',))
+        if sub.type == 'regex':
+            pattern = sub.value
+            return 'bool', lambda env: self._map(
+                func, env,
+                lambda s: _bools(_objects(s).str.contains(pattern)))
+        sub = self.constant(sub, (str,))
+        return 'bool', lambda env: self._map(
+            func, env, lambda s: _bools(s.str.contains(sub, regex=False)))
+
+    def _call_startsWith(self, s, prefix):
+        _, func = self.operand(s, ('str',))
+        prefix = self.constant(prefix, (str,))
+        return 'bool', lambda env: self._map(
+            func, env, lambda s: _bools(s.str.startswith(prefix)))
+
+    def _call_endsWith(self, s, suffix):
+        _, func = self.operand(s, ('str',))
+        suffix = self.constant(suffix, (str,))
+        return 'bool', lambda env: self._map(
+            func, env, lambda s: _bools(s.str.endswith(suffix)))
+
+    def _call_indexOf(self, s, sub):
+        _, func = self.operand(s, ('str',))
+        sub = self.constant(sub, (str,))
+        return 'num', lambda env: _checked(
+            *self._map(func, env, lambda s: s.str.find(sub)))
+
+    def _call_get(self, obj, start, end=None):
+        kind, func = self.operand(obj, ('str', 'list', 'groups'))
+        start = self.constant(start, (int,))
+        if kind == 'groups':
+            # The number of groups is known only from the match() itself
+            if obj.type != 'call' or obj.value != 'match':
+                raise _Unsupported()
+            groups = obj.args[1].value.groups
+            if end is not None or not -groups <= start < groups:
+                raise _Unsupported()
+            column = start % groups + 1
+
+            def group(env):
+                (matches, index), valid = func(env)
+                groups = pd.Series([None if match is None
+                                    else match.group(column)
+                                    for match in matches], index=index,
+                                   dtype=object)
+                return _checked(groups, valid)
+
+            return 'str', group
+        if end is None:
+            return 'str', lambda env: _checked(*self._map(
+                func, env, lambda s: _list_element(s, start)
+                if is_arrow_list(s) else s.str.get(start)))
+        end = self.constant(end, (int,))
+        if kind != 'str':
+            raise _Unsupported()
+        return 'str', lambda env: self._map(
+            func, env, lambda s: s.str.slice(start, end))
+
+    _call_slice = _call_get
+
+    def _call_substring(self, s, start, end=None):
+        _, func = self.operand(s, ('str',))
+        start = self.constant(start, (int,))
+        end = None if end is None else self.constant(end, (int,))
+        return 'str', lambda env: self._map(
+            func, env, lambda s: s.str.slice(start, end))
+
+    def _call_toNumber(self, s):
+        kind, func = self.operand(s, ('str', 'num'))
+        if kind == 'num':
+            return kind, func
+
+        def to_number(env):
+            strings, valid = func(env)
+            strings = _objects(strings).str.strip()
+            numbers = pd.to_numeric(strings, errors='coerce') \
+                .to_numpy(dtype=float)
+            integers = _bools(strings.str.fullmatch(grel._INTEGER.pattern))
+            # Leave large integers, which floats can't hold exactly, to
+            # Python
+            exact = np.isfinite(numbers) & ~(integers
+                                             & (np.abs(numbers) >= 2 ** 53))
+            whole = np.where(integers & exact, numbers, 0).astype('int64')
+            if integers.all():
+                output = whole
+            else:
+                # Integers stay integers, as in OpenRefine
+                output = numbers.astype(object)
+                output[integers] = whole[integers].astype(object)
+            return pd.Series(output, index=strings.index), \
+                _combine(valid, exact)
+
+        return 'num', to_number
+
+    def _call_toDate(self, s, option=None):
+        _, func = self.operand(s, ('str',))
+        if option is None or option.type == 'literal' \
+                and type(option.value) is bool:
+            dayfirst = option is not None and not option.value
+            return 'date', lambda env: _checked(*self._map(
+                func, env, lambda s: pd.to_datetime(
+                    _objects(s), dayfirst=dayfirst, utc=True,
+                    errors='coerce')))
+        try:
+            fmt = grel.java_date_format(self.constant(option, (str,)))
+        except ValueError:
+            raise _Unsupported()
+        return 'date', lambda env: _checked(*self._map(
+            func, env, lambda s: pd.to_datetime(
+                _objects(s), format=fmt, utc=True, errors='coerce')))
+
+    def _call_toString(self, value, fmt=None):
+        kind, func = self.compile(value)
+        if fmt is not None:
+            if kind != 'date':
+                raise _Unsupported()
+            try:
+                fmt = grel.java_date_format(self.constant(fmt, (str,)))
+            except ValueError:
+                raise _Unsupported()
+        else:
+            fmt = '%Y-%m-%dT%H:%M:%SZ'
+        if kind not in ('str', 'num', 'date', 'bool'):
+            raise _Unsupported()
+
+        def to_string(env):
+            values, valid = func(env)
+            strings = _to_strings(kind, values, fmt)
+            return strings.set_axis(env['value'][0].index), valid
+
+        return 'str', to_string
+
+
+def vectorize_expression(expression):
+    """Translate an expression into an operation on a column of strings.
+
+    Only some common patterns can be translated; see the module
+    documentation.
+
+    Args:
+        expression (str): The expression, including its language prefix.
+
+    Returns:
+        callable: A function taking a :class:`pandas.Series` of strings and
+        returning a pair ``(result, valid)``: a Series of the expression's
+        results, and a boolean array of the rows for which those results
+        are correct (or ``None`` if they all are). The expression must be
+        evaluated normally for any other rows, e.g. because a regular
+        expression did not match. Returns ``None`` if the expression cannot
+        be translated.
+
+    """
+    language, code = grel.split_language(expression)
+    if language == 'grel':
+        try:
+            return _GrelVectorizer(grel.parse(code))
+        except (grel.GrelSyntaxError, _Unsupported):
+            return None
+    if language != 'jython':
+        return None
+
+    try:
+        tree = ast.parse(code)
+        return _Vectorizer(tree.body)
+    except (SyntaxError, _Unsupported, TypeError):
+        return None
+
+
+# Names which give an expression access to more than the value itself
+_IMPURE_NAMES = {'row', 'cells', 'cell', 'rowIndex', 'recon',
+                 'open', 'input', 'print', 'id', 'globals', 'eval', 'exec'}
+_IMPURE_MODULES = {'random', 'secrets', 'uuid', 'time', 'datetime', 'os',
+                   'sys', 'io', 'socket', 'urllib', 'http', 'subprocess'}
+
+
+def is_pure(expression):
+    """Guess whether an expression depends only on the cell's value.
+
+    An expression is considered impure if it refers to other parts of the
+    row (``row``, ``cells``, ...), imports a module with side effects or
+    whose results vary (such as :mod:`random` or :mod:`datetime`), uses
+    I/O functions, or declares global variables. This is a conservative
+    syntactic check, not a proof.
+
+    Args:
+        expression (str): The expression, including its language prefix.
+
+    Returns:
+        bool: Whether the expression's result can safely be reused for
+        equal values.
+
+    """
+    language, code = grel.split_language(expression)
+    if language == 'grel':
+        try:
+            return grel.is_pure(grel.parse(code))
+        except grel.GrelSyntaxError:
+            return False
+    if language != 'jython':
+        return False
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return False
+
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Global, ast.Nonlocal)):
+            return False
+        elif isinstance(node, ast.Name) and node.id in _IMPURE_NAMES:
+            return False
+        elif isinstance(node, ast.Import):
+            modules = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            modules = [node.module or '']
+        else:
+            continue
+        if any(module.partition('.')[0] in _IMPURE_MODULES
+               for module in modules):
+            return False
+
+    return True
+
+
+def referenced_columns(expression):
+    """Find the other columns whose values an expression uses.
+
+    Other cells of the row are available to an expression as
+    ``cells["Column name"]["value"]``.
+
+    Args:
+        expression (str): The expression, including its language prefix.
+
+    Returns:
+        set: The names of the columns referenced through ``cells``, or
+        ``None`` if they cannot be determined: e.g. because ``cells`` is
+        indexed by a variable, or the whole ``row`` is used.
+
+    """
+    language, code = grel.split_language(expression)
+    if language == 'grel':
+        try:
+            return grel.referenced_columns(grel.parse(code))
+        except grel.GrelSyntaxError:
+            return None
+    if language != 'jython':
+        return None
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+
+    columns = set()
+    subscripted = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Subscript) and isinstance(node.value,
+                                                          ast.Name) \
+                and node.value.id == 'cells':
+            index = getattr(node.slice, 'value', node.slice) \
+                if type(node.slice).__name__ == 'Index' else node.slice
+            try:
+                name = _constant(index)
+            except _Unsupported:
+                return None
+            if not isinstance(name, str):
+                return None
+            columns.add(name)
+            subscripted.add(id(node.value))
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id in ('cells', 'row') \
+                and id(node) not in subscripted:
+            return None
+
+    return columns
+
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize',
+                                     'currsize'])
+
+
+class ExpressionCache:
+    """A bounded cache of the results of an expression.
+
+    The least recently used results are discarded once the cache is full.
+    The cache is shared between calls, so values seen in one chunk of a
+    dataset need not be evaluated again for the next.
+
+    Args:
+        maxsize (int): The most results to keep, or ``None`` for no limit.
+
+    Attributes:
+        hits (int): The number of cells whose result did not require the
+            expression to be evaluated.
+        misses (int): The number of times the expression was evaluated.
+    """
+
+    def __init__(self, maxsize=10 ** 5):
+        """Create an empty cache."""
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+
+    def __len__(self):
+        """Return the number of results held."""
+        return len(self._results)
+
+    def cache_info(self):
+        """Report the cache's statistics.
+
+        Returns:
+            CacheInfo: A named tuple of ``hits``, ``misses``, ``maxsize``
+            and ``currsize``, as for :func:`functools.lru_cache`.
+
+        """
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self))
+
+    def lookup(self, keys, results):
+        """Fill in results for the keys that are cached.
+
+        Args:
+            keys (list): Hashable keys.
+            results (:class:`numpy.ndarray`): Array to fill in, the same
+                length as ``keys``.
+
+        Returns:
+            list: The positions of the keys that were not found.
+
+        """
+        missing = []
+        cached = self._results
+        for i, key in enumerate(keys):
+            try:
+                results[i] = cached[key]
+            except KeyError:
+                missing.append(i)
+            else:
+                cached.move_to_end(key)
+        return missing
+
+    def store(self, keys, results):
+        """Cache results for the given keys, evicting old ones if full."""
+        self._results.update(zip(keys, results))
+        if self.maxsize is not None:
+            while len(self._results) > self.maxsize:
+                self._results.popitem(last=False)
+
+    def clear(self):
+        """Discard all results and reset the statistics."""
+        self._results.clear()
+        self.hits = self.misses = 0
+
+
+CompiledCode = namedtuple('CompiledCode', ['code', 'constants', 'pure',
+                                           'columns'])
+CompiledCode.__doc__ = """An expression compiled by :class:`CodeCache`.
+
+Attributes:
+    code: The code object, which defines ``expression_func(value)``.
+    constants (tuple): The constants of a GREL expression (see
+        :func:`pyrefine.grel.to_python`), or ``None`` for Jython.
+    pure (bool): Whether the expression is pure (see :func:`is_pure`).
+    columns (frozenset): The columns it refers to (see
+        :func:`referenced_columns`).
+"""
+
+CodeCacheInfo = namedtuple('CodeCacheInfo', ['hits', 'disk_hits', 'misses',
+                                             'maxsize', 'currsize'])
+
+
+@lru_cache(maxsize=None)
+def _code_version():
+    """Identify this interpreter and the code that translates expressions.
+
+    Marshalled code only loads into the Python version that wrote it, and
+    the code generated for an expression changes with pyrefine itself.
+    """
+    digest = hashlib.sha256()
+    for module in (__file__, grel.__file__):
+        with open(module, 'rb') as f:
+            digest.update(f.read())
+    return '{}-{}'.format(sys.implementation.cache_tag,
+                          digest.hexdigest()[:12])
+
+
+class CodeCache:
+    """Expressions compiled once, for every operation that uses them.
+
+    Compiling an expression, and finding out whether it is pure and which
+    columns it uses, takes far longer than building a whole script of
+    operations otherwise does. The results are kept for each expression
+    and ``onError`` setting, discarding the least recently used once the
+    cache is full. Given a directory, the cache also keeps compiled code
+    there as :mod:`marshal` files, one per expression, so that other
+    processes (and later runs) can load it rather than compile it again.
+
+    Args:
+        maxsize (int): The most expressions to keep in memory.
+        path (str): The directory to keep compiled code in, or ``None`` to
+            keep it only in memory. It is created when first needed.
+
+    Attributes:
+        hits (int): How many expressions were found in memory.
+        disk_hits (int): How many were loaded from disk.
+        misses (int): How many had to be compiled.
+    """
+
+    def __init__(self, maxsize=1024, path=None):
+        """Create an empty cache."""
+        self.maxsize = maxsize
+        self.path = None if path is None else Path(path)
+        self.hits = self.disk_hits = self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Return the number of expressions held in memory."""
+        return len(self._entries)
+
+    def cache_info(self):
+        """Report the cache's statistics.
+
+        Returns:
+            CodeCacheInfo: A named tuple of ``hits``, ``disk_hits``,
+            ``misses``, ``maxsize`` and ``currsize``.
+
+        """
+        return CodeCacheInfo(self.hits, self.disk_hits, self.misses,
+                             self.maxsize, len(self))
+
+    def get(self, expression, on_error='set-to-blank'):
+        """Return an expression compiled, compiling it if need be.
+
+        Args:
+            expression (str): The expression, including its language prefix.
+            on_error (str): What the code does if the expression fails.
+
+        Returns:
+            CompiledCode: The compiled expression.
+
+        Raises:
+            :exc:`ExpressionError`: As for :func:`compile_expression`.
+            :exc:`SyntaxError`: As for :func:`compile_expression`.
+
+        """
+        key = (expression, on_error)
+        with self._lock:
+            compiled = self._entries.get(key)
+            if compiled is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return compiled
+
+        compiled = self._load(key)
+        if compiled is None:
+            compiled = _compile(expression, on_error)
+            self._save(key, compiled)
+            with self._lock:
+                self.misses += 1
+        else:
+            with self._lock:
+                self.disk_hits += 1
+
+        with self._lock:
+            self._entries[key] = compiled
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return compiled
+
+    def clear(self):
+        """Discard the expressions held in memory and reset the statistics.
+
+        Compiled code kept on disk is left alone.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.disk_hits = self.misses = 0
+
+    def _file(self, key):
+        digest = hashlib.sha256('\0'.join(key).encode('utf-8')).hexdigest()
+        return self.path / _code_version() / digest[:2] / digest
+
+    def _load(self, key):
+        if self.path is None:
+            return None
+        try:
+            with open(self._file(key), 'rb') as f:
+                entry = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        if not isinstance(entry, tuple) or entry[:2] != key:
+            return None
+        return CompiledCode(*entry[2:])
+
+    def _save(self, key, compiled):
+        if self.path is None:
+            return
+        path = self._file(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a temporary file first, so readers never see half
+            fd, temp = tempfile.mkstemp(dir=str(path.parent), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    marshal.dump(key + tuple(compiled), f)
+                os.replace(temp, str(path))
+            except BaseException:
+                os.unlink(temp)
+                raise
+        except OSError:
+            # The cache only saves time: carry on without it
+            pass
+
+
+def _default_code_cache_dir():
+    root = os.environ.get('PYREFINE_CACHE_DIR')
+    return Path(root) / 'expressions' if root else None
+
+
+code_cache = CodeCache(path=_default_code_cache_dir())
+"""The :class:`CodeCache` used by :func:`compile_expression`.
+
+Compiled code is only kept on disk if the environment variable
+``PYREFINE_CACHE_DIR`` is set, in its ``expressions`` subdirectory.
+"""
+
+
+# Kinds of column for which equal values are interchangeable
+_MEMOIZABLE = {'string', 'integer', 'boolean'}
+_MUTABLE = (list, dict, set)
+
+
+def _is_string(column):
+    """Return a boolean mask of the values in column that are strings."""
+    kind = pd.api.types.infer_dtype(column, skipna=True)
+    if kind == 'string':
+        return column.notna().to_numpy()
+    elif kind == 'empty' or column.dtype != object:
+        return np.zeros(len(column), dtype=bool)
+    else:
+        return np.fromiter((type(val) is str for val in column),
+                           dtype=bool, count=len(column))
+
+
+class ColumnExpression:
+    """An expression compiled for evaluation over a whole column.
+
+    Strings are transformed in a single pass if the expression can be
+    vectorised (see :func:`vectorize_expression`) and the column holds
+    Arrow-backed strings, where the ``.str`` methods use compiled kernels.
+    For columns of Python objects, the ``.str`` methods are no faster than
+    calling the expression for each value, so that is what is done. Values,
+    including strings for which the vectorised version does not apply, are
+    passed to the expression compiled by :func:`compile_expression` one at
+    a time, so the result is the same either way.
+
+    Values of Arrow-backed columns are passed to the expression as Python
+    objects, with ``None`` for nulls. If all of the results for an
+    Arrow-backed column of strings are strings too, they are returned as
+    an Arrow-backed column (see :mod:`pyrefine.arrow`).
+
+    If the expression is pure and a ``cache`` is set, each distinct value
+    in a column of strings, integers or booleans is evaluated only once,
+    and the result is copied to every cell with that value.
+
+    Args:
+        expression (str): The expression, including its language prefix.
+        on_error (str): What to do if the expression fails for a value:
+            "set-to-blank", "store-error" or "keep-original".
+        cache (ExpressionCache): Where to remember results, or ``None`` to
+            evaluate every cell.
+        pure (bool): Whether the expression depends only on the value. If
+            ``None``, this is determined by :func:`is_pure`.
+
+    Attributes:
+        function (callable): The expression compiled for a single value.
+        vectorized (callable): The vectorised expression, or ``None``.
+        cache (ExpressionCache): The cache of results, or ``None``.
+        pure (bool): Whether results may be cached.
+        columns (frozenset): The columns the expression refers to, or
+            ``None`` if they cannot be known (see :func:`referenced_columns`).
+    """
+
+    def __init__(self, expression, on_error='set-to-blank', cache=None,
+                 pure=None):
+        """Compile the expression."""
+        self.expression = expression
+        self.on_error = on_error
+        self.language, _ = grel.split_language(expression)
+        compiled = code_cache.get(expression, on_error)
+        self.function = _make_function(compiled.code, compiled.constants)
+        self.vectorized = vectorize_expression(expression)
+        self.cache = cache
+        self.pure = compiled.pure if pure is None else pure
+        self.columns = compiled.columns
+
+    def __getstate__(self):
+        """Reduce to the expression's source, for pickling.
+
+        Compiled functions cannot be pickled, so the expression is compiled
+        again when unpickled (e.g. in another process). A cache is replaced
+        by an empty one of the same size, so its statistics are not shared.
+        """
+        return {'expression': self.expression, 'on_error': self.on_error,
+                'pure': self.pure,
+                'maxsize': None if self.cache is None else self.cache.maxsize,
+                'cached': self.cache is not None}
+
+    def __setstate__(self, state):
+        """Compile the expression again after unpickling."""
+        cache = ExpressionCache(state['maxsize']) if state['cached'] else None
+        self.__init__(state['expression'], state['on_error'], cache=cache,
+                      pure=state['pure'])
+
+    def _worth_vectorizing(self, column):
+        if self.vectorized is None:
+            return False
+        if self.language == 'grel':
+            # Each GREL function is a Python call per cell, which costs
+            # more than the .str methods even for Python strings
+            return is_arrow_string(column) or column.dtype == object
+        return is_arrow_string(column)
+
+    def __call__(self, column):
+        """Evaluate the expression for every value in a column.
+
+        Args:
+            column (:class:`pandas.Series`): The input values.
+
+        Returns:
+            :class:`pandas.Series`: The results, with the same index.
+
+        """
+        result = None
+        if self.cache is not None and self.pure:
+            kind = pd.api.types.infer_dtype(column, skipna=True)
+            if kind in _MEMOIZABLE:
+                result = self._memoized(column, kind)
+        if result is None:
+            result = self._evaluate(column)
+
+        if is_arrow_string(column):
+            # Keep strings in the same representation as they came in
+            result = to_arrow_column(result)
+        return result
+
+    def _memoized(self, column, kind):
+        codes, uniques = pd.factorize(column)
+        uniques = pd.Series(uniques)
+        # Keep equal values of different types (1 and True) apart
+        keys = [(kind, value) for value in uniques.to_numpy(dtype=object)]
+
+        results = np.empty(len(keys), dtype=object)
+        missing = self.cache.lookup(keys, results)
+        if missing:
+            computed = self._evaluate(uniques.iloc[missing]) \
+                .to_numpy(dtype=object)
+            results[missing] = computed
+            self.cache.store([keys[i] for i in missing], computed)
+
+        blank = codes < 0
+        self.cache.misses += len(missing)
+        self.cache.hits += len(codes) - int(blank.sum()) - len(missing)
+
+        output = np.empty(len(codes), dtype=object)
+        output[~blank] = results.take(codes[~blank])
+        mutable = np.fromiter((isinstance(result, _MUTABLE)
+                               for result in results),
+                              dtype=bool, count=len(results))
+        if mutable.any():
+            # Don't let cells share a list that could be edited later
+            for i in np.flatnonzero(~blank)[mutable.take(codes[~blank])]:
+                output[i] = copy.copy(output[i])
+        blanks = np.flatnonzero(blank)
+        values = to_objects(column.iloc[blanks])
+        for i, value in zip(blanks, values):
+            output[i] = self.function(value)
+
+        return pd.Series(output, index=column.index,
+                         name=column.name).infer_objects()
+
+    def _evaluate(self, column):
+        if not self._worth_vectorizing(column):
+            if is_arrow_string(column) or is_arrow_list(column):
+                return pd.Series(list(map(self.function, to_objects(column))),
+                                 index=column.index, name=column.name,
+                                 dtype=object).infer_objects()
+            return column.map(self.function)
+
+        remaining = ~_is_string(column)
+        strings = np.flatnonzero(~remaining)
+        output = None
+        if len(strings):
+            try:
+                output, valid = self.vectorized(column.iloc[strings])
+            except Exception:
+                # Fall back to evaluating each value individually
+                remaining[strings] = True
+                strings, valid = strings[:0], None
+            if valid is not None:
+                remaining[strings[~valid]] = True
+                strings = strings[valid]
+                output = output[valid]
+
+        if not remaining.any():
+            output = output.set_axis(column.index).rename(column.name)
+            if column.dtype == object:
+                output = output.infer_objects()
+            return output
+
+        result = np.empty(len(column), dtype=object)
+        if len(strings):
+            result[strings] = output.to_numpy(dtype=object)
+        others = np.flatnonzero(remaining)
+        values = to_objects(column.iloc[others])
+        for i, value in zip(others, values):
+            result[i] = self.function(value)
+
+        return pd.Series(result, index=column.index,
+                         name=column.name).infer_objects()
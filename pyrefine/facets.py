@@ -0,0 +1,539 @@
+"""Restrict operations to the rows selected by OpenRefine facets.
+
+Operations recorded by OpenRefine carry an ``engineConfig``: the facets
+that were active in the project when the operation was applied, and
+whether they selected rows or records. Only the selected rows were
+changed. An :class:`Engine` compiles an ``engineConfig`` into a boolean
+mask over a whole dataset, computed a column at a time:
+
+* list facets (``"type": "list"``) select the rows whose value is one of
+  those chosen (text such as ``"2000"`` also choosing the number, date or
+  boolean it spells), or is blank or an error if those are chosen;
+* range facets (``"type": "range"``) select numbers from ``from`` up to
+  but not including ``to``, and optionally non-numeric, blank and error
+  values;
+* text facets (``"type": "text"``) select values containing the query,
+  or matching it as a regular expression; and
+* facets by blank are list facets of the expression ``isBlank(value)``.
+
+Facet expressions ``value``, ``isBlank(value)``, ``isNonBlank(value)``
+and ``isError(value)`` are evaluated directly; others must be supported
+by :class:`~pyrefine.expressions.ColumnExpression`.
+
+In record mode (``"mode": "record-based"``) rows are grouped into records,
+each starting at a row whose first column is not blank (see
+:mod:`pyrefine.records`). A record is selected if every facet selects at
+least one of its rows, and then all of its rows are.
+
+Consecutive operations often share the same facets. The operations of a
+script with the same ``engineConfig`` share an :class:`Engine` (see
+:func:`share_engines`), which remembers the last mask it computed and
+reuses it for as long as the columns it was computed from are unchanged.
+All of the engines of a script also share a
+:class:`~pyrefine.records.RecordTracker`, for the records of the dataset.
+
+.. autosummary::
+
+    Engine
+    ListFacet
+    RangeFacet
+    TextFacet
+    create_facet
+    share_engines
+    update_rows
+    expand_rows
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+from .arrow import from_arrow, is_arrow_list, is_arrow_string, to_arrow, \
+    to_arrow_column, to_arrow_strings, to_objects
+from .expressions import ColumnExpression, ExpressionError
+from .records import RecordTracker, blank_mask
+
+
+def _error_mask(column):
+    """Return a boolean array of the cells of a Series holding errors."""
+    if column.dtype != object:
+        return np.zeros(len(column), dtype=bool)
+    return np.fromiter((isinstance(value, Exception) for value in column),
+                       dtype=bool, count=len(column))
+
+
+def _value(column):
+    return column
+
+
+def _is_blank(column):
+    return pd.Series(blank_mask(column), index=column.index)
+
+
+def _is_non_blank(column):
+    return pd.Series(~blank_mask(column), index=column.index)
+
+
+def _is_error(column):
+    return pd.Series(_error_mask(column), index=column.index)
+
+
+_EXPRESSIONS = {
+    'value': _value,
+    'isBlank(value)': _is_blank,
+    'isNonBlank(value)': _is_non_blank,
+    'isError(value)': _is_error,
+}
+
+
+def _compile(expression):
+    """Compile a facet expression into a function of a column."""
+    code = expression[5:] if expression.startswith('grel:') else expression
+    if code in _EXPRESSIONS:
+        return _EXPRESSIONS[code]
+    try:
+        return ColumnExpression(expression, on_error='store-error')
+    except ExpressionError:
+        raise ExpressionError('Unsupported facet expression: {}'
+                              .format(expression))
+
+
+class _Facet:
+    """Shared behaviour of facets on the values of an expression."""
+
+    def __init__(self, config):
+        self.column = config['columnName']
+        self.columns = {self.column}
+        self.expression = config.get('expression', 'value')
+        self._evaluate = _compile(self.expression)
+
+    def values(self, data):
+        """Return the values of the facet's expression for every row."""
+        return self._evaluate(data[self.column])
+
+
+class ListFacet(_Facet):
+    """Select rows by their value, as chosen from a list.
+
+    Args:
+        config (dict): The facet, as found in an ``engineConfig``.
+
+    Attributes:
+        columns (set): The columns whose values the facet uses.
+        selects_all (bool): Whether the facet selects every row.
+    """
+
+    def __init__(self, config):
+        """Compile the facet."""
+        super().__init__(config)
+        self.choices = [choice['v']['v'] for choice in config['selection']]
+        self.select_blank = config.get('selectBlank', False)
+        self.select_error = config.get('selectError', False)
+        self.invert = config.get('invert', False)
+        self.selects_all = not (self.choices or self.select_blank
+                                or self.select_error)
+
+    def mask(self, data):
+        """Return a boolean array of the rows the facet selects."""
+        values = self.values(data)
+        if is_arrow_list(values):
+            selected = self._lists_selected(values)
+        else:
+            selected = values.isin(self._choices(values)).to_numpy()
+            if pd.api.types.infer_dtype(values, skipna=True) == 'mixed':
+                self._python_lists_selected(values.to_numpy(), selected)
+
+        if self.select_blank:
+            selected |= blank_mask(values)
+        if self.select_error:
+            selected |= _error_mask(values)
+        return ~selected if self.invert else selected
+
+    def _choices(self, values):
+        """Return the choices, with text also as values of the column's type.
+
+        OpenRefine shows every choice as text, and the same dataset may
+        hold it as text or as numbers depending on how it was read: a
+        choice of ``"2000"`` also selects the number 2000.
+        """
+        kind = values.dtype.kind
+        choices = list(self.choices)
+        for choice in self.choices:
+            if not isinstance(choice, str):
+                continue
+            if kind == 'b' and choice in ('true', 'false'):
+                choices.append(choice == 'true')
+            elif kind in 'iuf':
+                try:
+                    number = float(choice)
+                except ValueError:
+                    continue
+                if np.isfinite(number):
+                    choices.append(number)
+            elif kind == 'M':
+                try:
+                    choices.append(pd.Timestamp(choice))
+                except ValueError:
+                    continue
+        return choices
+
+    def _lists_selected(self, values):
+        """Select Arrow lists with any item that is one of the choices."""
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        lists = to_arrow(values)
+        choices = pa.array([choice for choice in self.choices
+                            if isinstance(choice, str)], type=pa.string())
+        found = np.asarray(pc.is_in(lists.flatten(), value_set=choices))
+        parents = np.asarray(pc.list_parent_indices(lists))
+        return np.bincount(parents[found], minlength=len(lists)) > 0
+
+    def _python_lists_selected(self, values, selected):
+        """Select lists with any item that is one of the choices."""
+        choices = set(self.choices)
+        for i, value in enumerate(values):
+            if type(value) is list:
+                selected[i] = not choices.isdisjoint(value)
+
+
+class RangeFacet(_Facet):
+    """Select rows by whether their value is a number in a range.
+
+    Args:
+        config (dict): The facet, as found in an ``engineConfig``.
+
+    Attributes:
+        columns (set): The columns whose values the facet uses.
+        selects_all (bool): Whether the facet selects every row.
+    """
+
+    def __init__(self, config):
+        """Compile the facet."""
+        super().__init__(config)
+        self.start = config.get('from')
+        self.stop = config.get('to')
+        self.select_numeric = config.get('selectNumeric', True)
+        self.select_non_numeric = config.get('selectNonNumeric', True)
+        self.select_blank = config.get('selectBlank', True)
+        self.select_error = config.get('selectError', True)
+        self.selects_all = (self.start is None and self.stop is None
+                            and self.select_numeric
+                            and self.select_non_numeric
+                            and self.select_blank and self.select_error)
+
+    def mask(self, data):
+        """Return a boolean array of the rows the facet selects."""
+        values = self.values(data)
+        blank = blank_mask(values)
+        error = _error_mask(values)
+        numbers = self._numbers(values)
+        numeric = ~np.isnan(numbers)
+
+        selected = np.zeros(len(values), dtype=bool)
+        if self.select_numeric:
+            in_range = numeric.copy()
+            if self.start is not None:
+                in_range &= numbers >= self.start
+            if self.stop is not None:
+                in_range &= numbers < self.stop
+            selected |= in_range
+        if self.select_non_numeric:
+            selected |= ~(numeric | blank | error)
+        if self.select_blank:
+            selected |= blank
+        if self.select_error:
+            selected |= error
+        return selected
+
+    @staticmethod
+    def _numbers(values):
+        """Return the values as floats, with NaN for any but numbers."""
+        if values.dtype.kind in 'iuf':
+            return values.to_numpy(dtype=float, na_value=np.nan)
+        elif values.dtype != object:
+            return np.full(len(values), np.nan)
+        return np.fromiter(
+            (value if isinstance(value, (int, float))
+             and not isinstance(value, bool) else np.nan
+             for value in values),
+            dtype=float, count=len(values))
+
+
+class TextFacet(_Facet):
+    """Select rows whose value contains some text or matches a pattern.
+
+    Args:
+        config (dict): The facet, as found in an ``engineConfig``.
+
+    Attributes:
+        columns (set): The columns whose values the facet uses.
+        selects_all (bool): Whether the facet selects every row.
+    """
+
+    def __init__(self, config):
+        """Compile the facet."""
+        super().__init__(config)
+        self.query = config.get('query')
+        self.regex = config.get('mode', 'text') == 'regex'
+        self.case_sensitive = config.get('caseSensitive', False)
+        self.invert = config.get('invert', False)
+        self.selects_all = not self.query
+
+    def mask(self, data):
+        """Return a boolean array of the rows the facet selects."""
+        values = self.values(data)
+        if not is_arrow_string(values):
+            # Other values are matched as strings, but blanks never are
+            values = pd.Series(values.to_numpy(dtype=object)) \
+                .where(~blank_mask(values)).map(str, na_action='ignore')
+        selected = None
+        if not self.regex:
+            # Regular expressions are left to Python, whose syntax is
+            # closer to OpenRefine's than Arrow's is
+            try:
+                selected = self._match_arrow(to_arrow_strings(values))
+            except ImportError:
+                pass
+        if selected is None:
+            selected = values.str.contains(
+                self.query, case=self.case_sensitive, regex=self.regex,
+                na=False).to_numpy(dtype=bool)
+        return ~selected if self.invert else selected
+
+    def _match_arrow(self, strings):
+        import pyarrow.compute as pc
+        return np.asarray(pc.fill_null(pc.match_substring(
+            strings, self.query, ignore_case=not self.case_sensitive),
+            False))
+
+
+_FACETS = {
+    'list': ListFacet,
+    'range': RangeFacet,
+    'text': TextFacet,
+}
+
+
+def create_facet(config):
+    """Compile a facet from its configuration.
+
+    Args:
+        config (dict): The facet, as found in an ``engineConfig``.
+
+    Returns:
+        ``object``: A :class:`ListFacet`, :class:`RangeFacet` or
+        :class:`TextFacet`.
+
+    Raises:
+        :exc:`RuntimeError`: If the type of facet is not supported.
+
+    """
+    facet_type = config.get('type', 'list')
+    if facet_type not in _FACETS:
+        raise RuntimeError('Unknown facet type "{}"'.format(facet_type))
+    return _FACETS[facet_type](config)
+
+
+class Engine:
+    """Select the rows of a dataset that an operation applies to.
+
+    Example::
+
+        engine = Engine(parameters.get('engineConfig'))
+        mask = engine.mask(data)
+        if mask is not None:
+            data = data[mask]
+
+    Args:
+        config (dict): The ``engineConfig`` of an operation, or ``None``
+            for one that applies to every row.
+
+    Attributes:
+        config (dict): The ``engineConfig``.
+        key (str): The configuration as canonical JSON, to compare
+            engines by.
+        record_based (bool): Whether records are selected, rather than
+            individual rows.
+        facets (list): The facets, leaving out any that select every row.
+        columns (set): The columns whose values the facets use, or
+            ``None`` if they cannot be named in advance (in record mode,
+            where records depend on the first column).
+        records (:class:`~pyrefine.records.RecordTracker`): Keeps track
+            of the records of the dataset, in record mode.
+        hits (int): How many masks were reused.
+        misses (int): How many masks were computed.
+    """
+
+    def __init__(self, config=None):
+        """Compile the facets."""
+        self.config = config or {}
+        self.key = json.dumps(self.config, sort_keys=True)
+        self.record_based = self.config.get('mode') == 'record-based'
+        facets = (create_facet(facet)
+                  for facet in self.config.get('facets', []))
+        self.facets = [facet for facet in facets if not facet.selects_all]
+
+        self.columns = set()
+        for facet in self.facets:
+            self.columns |= facet.columns
+        if self.record_based:
+            self.columns = None
+
+        self.records = RecordTracker()
+        self.hits = self.misses = 0
+        self._cached = None
+
+    def __getstate__(self):
+        """Leave out the cached mask, for pickling."""
+        state = self.__dict__.copy()
+        state['_cached'] = None
+        return state
+
+    def reads(self, columns):
+        """Add the columns the facets use to those an operation reads.
+
+        Args:
+            columns (set): The columns the operation itself reads, or
+                ``None`` if they are not known.
+
+        Returns:
+            set: All of the columns read (see :mod:`pyrefine.planner`), or
+            ``None`` if they are not known.
+
+        """
+        if columns is None or self.columns is None:
+            return None
+        return columns | self.columns
+
+    @property
+    def row_local(self):
+        """Whether the rows selected in one chunk don't depend on others."""
+        return not (self.record_based and self.facets)
+
+    def mask(self, data):
+        """Select the rows of a dataset that the facets select.
+
+        Args:
+            data (:class:`pandas.DataFrame`): The dataset.
+
+        Returns:
+            :class:`numpy.ndarray`: A boolean array with an element for
+            each row, or ``None`` if every row is selected. It must not be
+            modified.
+
+        """
+        if not self.facets:
+            return None
+
+        columns = self._columns(data)
+        if self._cached is not None and self._still_valid(data, columns):
+            self.hits += 1
+            return self._cached[2]
+
+        masks = [facet.mask(data) for facet in self.facets]
+        if self.record_based:
+            records = self.records(data)
+            mask = np.logical_and.reduce([records.any(row_mask)
+                                          for row_mask in masks])
+        else:
+            mask = np.logical_and.reduce(masks)
+
+        mask.flags.writeable = False
+        self.misses += 1
+        self._cached = (data.index, [data[col] for col in columns], mask)
+        return mask
+
+    def _columns(self, data):
+        """List the columns a mask for the dataset depends on."""
+        columns = []
+        if self.record_based and len(data.columns):
+            columns.append(data.columns[0])
+        for facet in self.facets:
+            columns.extend(col for col in sorted(facet.columns)
+                           if col not in columns)
+        return columns
+
+    def _still_valid(self, data, columns):
+        """Check the cached mask was computed from the same values."""
+        index, snapshot, _ = self._cached
+        if len(snapshot) != len(columns) or not (
+                index is data.index or index.equals(data.index)):
+            return False
+        return all(old.name == col and data[col].equals(old)
+                   for old, col in zip(snapshot, columns))
+
+
+def share_engines(operations):
+    """Let operations with the same ``engineConfig`` share an engine.
+
+    Each operation's masks can then be reused by the next, as long as
+    the columns they depend on are unchanged. All of the engines share one
+    :class:`~pyrefine.records.RecordTracker`.
+
+    Args:
+        operations (list): Operations, some with an ``engine`` attribute.
+
+    """
+    engines = {}
+    records = RecordTracker()
+    for op in operations:
+        engine = getattr(op, 'engine', None)
+        if engine is None:
+            continue
+        if engine.facets:
+            op.engine = engine = engines.setdefault(engine.key, engine)
+        engine.records = records
+
+
+def update_rows(column, mask, values):
+    """Replace the values of some rows of a column.
+
+    Args:
+        column (:class:`pandas.Series`): The original column.
+        mask (:class:`numpy.ndarray`): Which rows to replace.
+        values (:class:`pandas.Series`): The new values for those rows.
+
+    Returns:
+        :class:`pandas.Series`: A new column. Arrow-backed strings stay
+        Arrow-backed if the new values are too.
+
+    """
+    if is_arrow_string(column) and is_arrow_string(values):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        return from_arrow(pc.replace_with_mask(
+            to_arrow(column), pa.array(mask), to_arrow(values)), column)
+
+    if column.dtype == values.dtype and isinstance(column.dtype, np.dtype):
+        new_values = column.to_numpy(copy=True)
+        new_values[mask] = values.to_numpy()
+        return pd.Series(new_values, index=column.index, name=column.name)
+
+    new_values = to_objects(column)
+    new_values[mask] = to_objects(values)
+    new_column = pd.Series(new_values, index=column.index, name=column.name)
+    if is_arrow_string(column) or is_arrow_list(column):
+        return to_arrow_column(new_column)
+    return new_column.infer_objects()
+
+
+def expand_rows(values, mask, like):
+    """Spread values computed for some rows over all of them.
+
+    Args:
+        values (:class:`pandas.Series`): A value for each selected row.
+        mask (:class:`numpy.ndarray`): Which rows were selected.
+        like (:class:`pandas.Series`): A column of the dataset, whose
+            index the result should have.
+
+    Returns:
+        :class:`pandas.Series`: The values in the selected rows, and
+        missing values elsewhere.
+
+    """
+    indexer = np.full(len(mask), -1)
+    indexer[mask] = np.arange(len(values))
+    return pd.Series(values.array.take(indexer, allow_fill=True),
+                     index=like.index, name=values.name)
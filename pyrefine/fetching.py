@@ -0,0 +1,234 @@
+"""Fetch the contents of many URLs at once, politely.
+
+OpenRefine's "add column by fetching URLs" fetches one URL at a time,
+waiting for a fixed delay after each. :class:`URLFetcher` instead fetches
+many at once from an :mod:`asyncio` event loop, while still keeping to the
+delay between requests to each host and never having more than a few
+requests open to any one host. Each distinct URL is only fetched once,
+and responses are kept in a :class:`ResponseCache` on disk, so that
+executing a script again does not fetch them again.
+
+Requests are made with :mod:`urllib.request` on a bounded pool of
+threads, so no HTTP library beyond the standard library is needed; the
+event loop decides when each request may start.
+
+The cache is kept in ``$PYREFINE_CACHE_DIR/urls`` if that environment
+variable is set, and in ``~/.cache/pyrefine/urls`` (or the equivalent
+under ``$XDG_CACHE_HOME``) otherwise. Only successful responses are
+cached.
+
+.. autosummary::
+
+    URLFetcher
+    ResponseCache
+    default_cache_dir
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import os
+from pathlib import Path
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+
+
+def default_cache_dir():
+    """Return the directory in which to cache responses by default."""
+    root = os.environ.get('PYREFINE_CACHE_DIR')
+    if not root:
+        root = Path(os.environ.get('XDG_CACHE_HOME')
+                    or Path.home() / '.cache') / 'pyrefine'
+    return Path(root) / 'urls'
+
+
+class ResponseCache:
+    """Responses to URLs, kept on disk between runs.
+
+    Each response is stored in a file of its own, named after a hash of
+    its URL, so that several processes can share a cache safely.
+
+    Args:
+        path (str): The directory to keep responses in. It is created
+            when the first response is stored.
+
+    Attributes:
+        hits (int): How many responses were found in the cache.
+        misses (int): How many were not.
+    """
+
+    def __init__(self, path):
+        """Use the cache in the given directory."""
+        self.path = Path(path)
+        self.hits = self.misses = 0
+
+    def _file(self, url):
+        digest = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return self.path / digest[:2] / digest
+
+    def get(self, url):
+        """Return the cached response to a URL, or ``None``."""
+        try:
+            with open(self._file(url), encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            entry = None
+        if entry is None or entry.get('url') != url:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry['body']
+
+    def put(self, url, body):
+        """Store the response to a URL, if the cache can be written to."""
+        path = self._file(url)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a temporary file first, so readers never see half of it
+            fd, temp = tempfile.mkstemp(dir=str(path.parent), suffix='.tmp')
+        except OSError:
+            # The cache only saves time, so a full disk or a path that is
+            # not a directory should not lose the response
+            return
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'url': url, 'body': body}, f)
+            os.replace(temp, str(path))
+        except OSError:
+            _remove(temp)
+        except BaseException:
+            _remove(temp)
+            raise
+
+    def __getstate__(self):
+        """Leave out the statistics, for pickling."""
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        """Restore the cache with fresh statistics."""
+        self.__init__(state['path'])
+
+
+def _remove(path):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+class URLFetcher:
+    """Fetch the text of many URLs concurrently.
+
+    Example::
+
+        fetcher = URLFetcher(delay=1, cache=ResponseCache('cache'))
+        bodies = fetcher.fetch(['https://example.org/a',
+                                'https://example.org/b'])
+
+    Args:
+        max_connections (int): The most requests open at once.
+        per_host (int): The most requests open at once to any one host.
+        delay (float): The least time in seconds between the start of one
+            request to a host and the next.
+        timeout (float): How long to wait for a response, in seconds.
+        headers (dict): HTTP headers to send with every request.
+        cache (ResponseCache): Where to keep responses, or ``None`` to
+            fetch every URL afresh.
+
+    Attributes:
+        requests (int): How many requests have been made.
+    """
+
+    def __init__(self, max_connections=8, per_host=2, delay=0, timeout=30,
+                 headers=None, cache=None):
+        """Set up the fetcher."""
+        self.max_connections = max_connections
+        self.per_host = per_host
+        self.delay = delay
+        self.timeout = timeout
+        self.headers = dict(headers or {})
+        self.headers.setdefault('User-Agent', 'pyrefine')
+        self.cache = cache
+        self.requests = 0
+        # When each host may next be sent a request, by time.monotonic()
+        self._next_start = {}
+
+    def __getstate__(self):
+        """Leave out the request times, for pickling."""
+        state = self.__dict__.copy()
+        state['_next_start'] = {}
+        return state
+
+    def fetch(self, urls):
+        """Fetch the text of a list of URLs.
+
+        Args:
+            urls (list): The URLs, as strings. Repeated URLs are only
+                fetched once.
+
+        Returns:
+            list: The text of the response to each URL, or the exception
+            raised in fetching it.
+
+        """
+        results = {}
+        if self.cache is not None:
+            for url in dict.fromkeys(urls):
+                body = self.cache.get(url)
+                if body is not None:
+                    results[url] = body
+        missing = [url for url in dict.fromkeys(urls) if url not in results]
+        if missing:
+            results.update(zip(missing, _run(self._fetch_all(missing))))
+        return [results[url] for url in urls]
+
+    async def _fetch_all(self, urls):
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(self.max_connections) as pool:
+            hosts = {}
+
+            async def fetch_one(url):
+                host = urllib.parse.urlsplit(url).netloc
+                if host not in hosts:
+                    hosts[host] = asyncio.Semaphore(self.per_host)
+                async with hosts[host]:
+                    await self._wait_turn(host)
+                    self.requests += 1
+                    try:
+                        return await loop.run_in_executor(pool, self._get,
+                                                          url)
+                    except Exception as error:
+                        return error
+
+            return await asyncio.gather(*map(fetch_one, urls))
+
+    async def _wait_turn(self, host):
+        """Wait until a request may be sent to a host, and book the slot."""
+        now = time.monotonic()
+        start = max(now, self._next_start.get(host, now))
+        self._next_start[host] = start + self.delay
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    def _get(self, url):
+        """Fetch a single URL, in a worker thread."""
+        request = urllib.request.Request(url, headers=self.headers)
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            charset = response.headers.get_content_charset() or 'utf-8'
+            body = response.read().decode(charset, errors='replace')
+        if self.cache is not None:
+            self.cache.put(url, body)
+        return body
+
+
+def _run(coroutine):
+    """Run a coroutine to completion, even from within an event loop."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    with ThreadPoolExecutor(1) as thread:
+        return thread.submit(asyncio.run, coroutine).result()
@@ -0,0 +1,1063 @@
+r"""Parse and compile the General Refine Expression Language (GREL).
+
+GREL is OpenRefine's default expression language: expressions without a
+language prefix, or prefixed with ``grel:``, are GREL. For example::
+
+    value.trim().toLowercase()
+    if(value.contains(/\d{4}/), value.match(/.*(\d{4}).*/)[0], null)
+    cells["Publisher"].value + " (" + value.length() + ")"
+
+:func:`parse` turns an expression into a tree of :class:`Node` tuples,
+built once per expression (parses are cached). The tree is then compiled
+by one of two back ends. :func:`to_python` translates it into the source
+of a single Python expression calling the functions of :data:`FUNCTIONS`,
+which :func:`~pyrefine.expressions.compile_expression` compiles for
+evaluation one cell at a time. The columnar back end in
+:mod:`pyrefine.expressions` evaluates the common functions over a whole
+column at once, and leaves any rows it cannot handle to the first.
+
+Evaluation follows OpenRefine. Integers and floating-point numbers are
+kept apart, so ``7 / 2`` is ``3``. ``+`` adds numbers and otherwise joins
+the values as strings, with ``null`` as the empty string. Conditions are
+only true for ``true`` or the string "true". Dates are UTC
+:class:`pandas.Timestamp` objects. Where OpenRefine would produce an
+error value, an exception is raised, which is then handled according to
+the operation's ``onError`` setting; ``isError()`` and the other ``is``
+functions catch them.
+
+Only ``value`` is available to expressions; ``cells``, ``row`` and the
+like can be parsed, and are found by :func:`referenced_columns`, but
+evaluating them fails.
+
+.. autosummary::
+
+    split_language
+    parse
+    to_python
+    namespace
+    is_pure
+    referenced_columns
+    FUNCTIONS
+    GrelSyntaxError
+"""
+
+from collections import namedtuple
+from datetime import datetime, timezone
+from functools import lru_cache
+import hashlib
+import json
+import math
+import re
+import unicodedata
+
+
+class GrelSyntaxError(ValueError):
+    """Raised when an expression is not valid GREL."""
+
+    pass
+
+
+Node = namedtuple('Node', ['type', 'value', 'args'])
+Node.__doc__ = """A node of a parsed GREL expression.
+
+Attributes:
+    type (str): One of "literal", "regex", "variable", "field" (``value``
+        is the field's name), "call" (``value`` is the function's name),
+        "operator" (``value`` is the operator) and "array".
+    value: The literal value, compiled pattern, name or operator.
+    args (tuple): The child nodes.
+"""
+
+_TOKEN = re.compile(r'''
+    (?P<space>\s+)
+  | (?P<number>\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+  | (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+  | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<operator>==|!=|<=|>=|[-+*/%<>])
+  | (?P<punctuation>[()\[\],.])
+''', re.VERBOSE | re.DOTALL)
+
+_REGEX = re.compile(r'/((?:[^/\\]|\\.)*)/(i?)', re.DOTALL)
+
+_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f'}
+
+# Tokens after which a slash starts a regular expression, not a division
+_BEFORE_REGEX = {None, '(', '[', ',', '==', '!=', '<=', '>=', '<', '>',
+                 '+', '-', '*', '/', '%'}
+
+_COMPARISONS = ('==', '!=', '<', '<=', '>', '>=')
+
+
+def _unescape(text):
+    return re.sub(r'\\(u[0-9a-fA-F]{4}|.)',
+                  lambda m: chr(int(m.group(1)[1:], 16))
+                  if len(m.group(1)) == 5
+                  else _ESCAPES.get(m.group(1), m.group(1)),
+                  text, flags=re.DOTALL)
+
+
+def _tokenize(code):
+    """Split an expression into ``(kind, value, position)`` tuples."""
+    tokens = []
+    pos = 0
+    while pos < len(code):
+        previous = tokens[-1][1] if tokens and tokens[-1][0] in (
+            'operator', 'punctuation') else (None if not tokens else '')
+        if code[pos] == '/' and previous in _BEFORE_REGEX:
+            match = _REGEX.match(code, pos)
+            if match is None:
+                raise GrelSyntaxError('Unterminated regular expression at '
+                                      'position {}'.format(pos))
+            try:
+                pattern = re.compile(match.group(1), re.IGNORECASE
+                                     if match.group(2) else 0)
+            except re.error as error:
+                raise GrelSyntaxError('Bad regular expression at position '
+                                      '{}: {}'.format(pos, error))
+            tokens.append(('regex', pattern, pos))
+            pos = match.end()
+            continue
+
+        match = _TOKEN.match(code, pos)
+        if match is None:
+            raise GrelSyntaxError('Unexpected character {!r} at position {}'
+                                  .format(code[pos], pos))
+        kind, text = match.lastgroup, match.group()
+        if kind == 'number':
+            value = float(text) if re.search('[.eE]', text) else int(text)
+            tokens.append((kind, value, pos))
+        elif kind == 'string':
+            tokens.append((kind, _unescape(text[1:-1]), pos))
+        elif kind != 'space':
+            tokens.append((kind, text, pos))
+        pos = match.end()
+    return tokens
+
+
+class _Parser:
+    """A recursive descent parser over the tokens of an expression."""
+
+    def __init__(self, code):
+        self.tokens = _tokenize(code)
+        self.pos = 0
+
+    def peek(self, *values):
+        """Return whether the next token is one of the given symbols."""
+        if self.pos >= len(self.tokens):
+            return False
+        kind, value, _ = self.tokens[self.pos]
+        return kind in ('operator', 'punctuation') and value in values
+
+    def take(self, *values):
+        """Consume the next token, checking that it is as expected."""
+        if self.pos >= len(self.tokens):
+            raise GrelSyntaxError('Unexpected end of expression')
+        token = self.tokens[self.pos]
+        if values and not self.peek(*values):
+            raise GrelSyntaxError('Expected {} at position {}'.format(
+                ' or '.join(map(repr, values)), token[2]))
+        self.pos += 1
+        return token
+
+    def parse(self):
+        node = self.expression()
+        if self.pos < len(self.tokens):
+            raise GrelSyntaxError('Unexpected {!r} at position {}'.format(
+                self.tokens[self.pos][1], self.tokens[self.pos][2]))
+        return node
+
+    def binary(self, operators, operand):
+        node = operand()
+        while self.peek(*operators):
+            op = self.take()[1]
+            node = Node('operator', op, (node, operand()))
+        return node
+
+    def expression(self):
+        return self.binary(_COMPARISONS, self.additive)
+
+    def additive(self):
+        return self.binary(('+', '-'), self.term)
+
+    def term(self):
+        return self.binary(('*', '/', '%'), self.factor)
+
+    def factor(self):
+        if self.peek('-'):
+            self.take()
+            operand = self.factor()
+            if operand.type == 'literal' and _is_number(operand.value):
+                return Node('literal', -operand.value, ())
+            return Node('operator', 'neg', (operand,))
+        node = self.primary()
+        while self.peek('.', '['):
+            if self.take()[1] == '.':
+                kind, name, pos = self.take()
+                if kind != 'name':
+                    raise GrelSyntaxError('Expected a name at position {}'
+                                          .format(pos))
+                if self.peek('('):
+                    node = _call(name, (node,) + self.arguments(')'), pos)
+                else:
+                    node = Node('field', name, (node,))
+            else:
+                args = (node,) + self.arguments(']', opened=True)
+                if len(args) not in (2, 3):
+                    raise GrelSyntaxError('Expected one or two indexes')
+                node = Node('call', 'get', args)
+        return node
+
+    def arguments(self, close, opened=False):
+        """Parse a bracketed, comma-separated list of expressions."""
+        if not opened:
+            self.take('(')
+        args = []
+        if not self.peek(close):
+            args.append(self.expression())
+            while self.peek(','):
+                self.take()
+                args.append(self.expression())
+        self.take(close)
+        return tuple(args)
+
+    def primary(self):
+        kind, value, pos = self.take()
+        if kind in ('number', 'string'):
+            return Node('literal', value, ())
+        elif kind == 'regex':
+            return Node('regex', value, ())
+        elif kind == 'name':
+            if value in ('true', 'false'):
+                return Node('literal', value == 'true', ())
+            elif value == 'null':
+                return Node('literal', None, ())
+            elif self.peek('('):
+                return _call(value, self.arguments(')'), pos)
+            return Node('variable', value, ())
+        elif value == '(':
+            node = self.expression()
+            self.take(')')
+            return node
+        elif value == '[':
+            return Node('array', None, self.arguments(']', opened=True))
+        raise GrelSyntaxError('Unexpected {!r} at position {}'
+                              .format(value, pos))
+
+
+def _call(name, args, pos):
+    """Make a function call node, checking the function exists."""
+    if name in _CONTROLS:
+        arity, bound = _CONTROLS[name]
+        if len(args) not in arity:
+            raise GrelSyntaxError('Wrong number of arguments to {}() at '
+                                  'position {}'.format(name, pos))
+        for i in bound:
+            if args[i].type != 'variable':
+                raise GrelSyntaxError('Argument {} of {}() must be a '
+                                      'variable name'.format(i + 1, name))
+    elif name not in FUNCTIONS:
+        raise GrelSyntaxError('Unknown function {}() at position {}'
+                              .format(name, pos))
+    return Node('call', name, args)
+
+
+# The languages OpenRefine accepts as a prefix, e.g. "jython:return value"
+_LANGUAGES = {'grel', 'jython', 'clojure'}
+
+
+def split_language(expression):
+    """Split an expression into its language and code.
+
+    Expressions without a known language prefix are GREL, as in OpenRefine.
+
+    Returns:
+        tuple: The language, e.g. "grel" or "jython", and the code.
+
+    """
+    language, sep, code = expression.partition(':')
+    if sep and language in _LANGUAGES:
+        return language, code
+    return 'grel', expression
+
+
+@lru_cache(maxsize=1024)
+def parse(code):
+    """Parse a GREL expression.
+
+    Args:
+        code (str): The expression, without any ``grel:`` prefix.
+
+    Returns:
+        Node: The root of the expression's syntax tree.
+
+    Raises:
+        :exc:`GrelSyntaxError`: If the expression is not valid, or calls a
+            function that does not exist.
+
+    """
+    return _Parser(code).parse()
+
+
+def walk(node):
+    """Iterate over a node and all of its descendants."""
+    yield node
+    for arg in node.args:
+        yield from walk(arg)
+
+
+# -- Evaluation --------------------------------------------------------------
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _is_blank(value):
+    return value is None or value == '' or (isinstance(value, float)
+                                            and math.isnan(value))
+
+
+def _string(value, function):
+    if not isinstance(value, str):
+        raise TypeError('{}() expects a string'.format(function))
+    return value
+
+
+def _number(value, function):
+    if not _is_number(value):
+        raise TypeError('{}() expects a number'.format(function))
+    return value
+
+
+def _sequence(value, function):
+    if isinstance(value, (str, list, tuple)):
+        return value
+    raise TypeError('{}() expects a string or an array'.format(function))
+
+
+def _truthy(value):
+    """Whether a value counts as true in a condition."""
+    if isinstance(value, bool):
+        return value
+    return isinstance(value, str) and value.lower() == 'true'
+
+
+def to_string(value):
+    """Convert a value to a string the way GREL's ``toString()`` does."""
+    if value is None:
+        return ''
+    elif isinstance(value, str):
+        return value
+    elif isinstance(value, bool):
+        return 'true' if value else 'false'
+    elif isinstance(value, float) and value.is_integer() \
+            and abs(value) < 1e7:
+        return repr(value)
+    elif isinstance(value, datetime):
+        return _utc(value).strftime('%Y-%m-%dT%H:%M:%SZ')
+    elif isinstance(value, (list, tuple)):
+        return '[' + ', '.join(map(to_string, value)) + ']'
+    return str(value)
+
+
+def _add(a, b):
+    if _is_number(a) and _is_number(b):
+        return a + b
+    if a is None and b is None:
+        return None
+    return to_string(a) + to_string(b)
+
+
+def _arithmetic(function):
+    def operator(a, b):
+        return function(_number(a, 'arithmetic'), _number(b, 'arithmetic'))
+    return operator
+
+
+def _divide(a, b):
+    if isinstance(a, int) and isinstance(b, int):
+        # Java's integer division truncates towards zero
+        quotient = abs(a) // abs(b)
+        return quotient if (a < 0) == (b < 0) else -quotient
+    return a / b
+
+
+def _modulo(a, b):
+    if isinstance(a, int) and isinstance(b, int):
+        return int(math.fmod(a, b))
+    return math.fmod(a, b)
+
+
+def _equals(a, b):
+    if _is_number(a) and _is_number(b):
+        return a == b
+    if isinstance(a, bool) != isinstance(b, bool):
+        return False
+    return a == b
+
+
+def _compare(function):
+    def operator(a, b):
+        if a is None or b is None:
+            return False
+        if _is_number(a) != _is_number(b):
+            raise TypeError('Cannot compare {} and {}'.format(
+                type(a).__name__, type(b).__name__))
+        return function(a, b)
+    return operator
+
+
+OPERATORS = {
+    '+': _add,
+    '-': _arithmetic(lambda a, b: a - b),
+    '*': _arithmetic(lambda a, b: a * b),
+    '/': _arithmetic(_divide),
+    '%': _arithmetic(_modulo),
+    '==': _equals,
+    '!=': lambda a, b: not _equals(a, b),
+    '<': _compare(lambda a, b: a < b),
+    '<=': _compare(lambda a, b: a <= b),
+    '>': _compare(lambda a, b: a > b),
+    '>=': _compare(lambda a, b: a >= b),
+    'neg': lambda a: -_number(a, 'negation'),
+}
+
+
+def _field(obj, name):
+    """Look up ``obj.name``, e.g. ``cell.value``."""
+    if isinstance(obj, dict):
+        return obj.get(name)
+    if obj is None:
+        raise TypeError('Cannot get field {} of null'.format(name))
+    return getattr(obj, name)
+
+
+def _index(obj, i, length):
+    if i < 0:
+        i += length
+    return min(max(i, 0), length)
+
+
+def _get(obj, start, end=None):
+    if isinstance(obj, dict):
+        return obj.get(start)
+    obj = _sequence(obj, 'get')
+    if not isinstance(start, int):
+        raise TypeError('get() expects an integer index')
+    if end is None:
+        if start < 0:
+            start += len(obj)
+        return obj[start] if 0 <= start < len(obj) else None
+    return obj[_index(obj, start, len(obj)):_index(obj, end, len(obj))]
+
+
+def _substring(s, start, end=None):
+    s = _string(s, 'substring')
+    end = len(s) if end is None else end
+    return s[_index(s, start, len(s)):_index(s, end, len(s))]
+
+
+def _java_replacement(replacement):
+    r"""Translate a Java regex replacement (``$1``) to Python (``\g<1>``)."""
+    return re.sub(r'\\(.)|\$(\d+)|\\',
+                  lambda m: m.group(1).replace('\\', '\\\\')
+                  if m.group(1) is not None
+                  else ('\\g<' + m.group(2) + '>' if m.group(2) is not None
+                        else '\\\\'),
+                  replacement)
+
+
+def _replace(s, find, replacement):
+    s = _string(s, 'replace')
+    if isinstance(find, re.Pattern):
+        return find.sub(_java_replacement(replacement), s)
+    return s.replace(_string(find, 'replace'), to_string(replacement))
+
+
+def _replace_chars(s, find, replacement):
+    s = _string(s, 'replaceChars')
+    table = {ord(c): replacement[i] if i < len(replacement) else None
+             for i, c in enumerate(find)}
+    return s.translate(table)
+
+
+def _java_split(pattern, s):
+    """Split like Java's ``Pattern.split``, dropping trailing empties."""
+    pieces = pattern.split(s) if pattern.groups == 0 else \
+        [s[start:end] for start, end in _spans(pattern, s)]
+    while pieces and pieces[-1] == '':
+        pieces.pop()
+    return pieces or ([s] if s == '' else [])
+
+
+def _spans(pattern, s):
+    start = 0
+    for match in pattern.finditer(s):
+        if match.end() == 0:
+            continue
+        yield start, match.start()
+        start = match.end()
+    yield start, len(s)
+
+
+def _split(s, separator, preserve_tokens=False):
+    s = _string(s, 'split')
+    if isinstance(separator, re.Pattern):
+        return _java_split(separator, s)
+    pieces = s.split(_string(separator, 'split'))
+    if _truthy(preserve_tokens):
+        return pieces
+    # Like Apache Commons' splitByWholeSeparator, skip empty pieces
+    return [piece for piece in pieces if piece]
+
+
+def _split_by_lengths(s, *lengths):
+    s = _string(s, 'splitByLengths')
+    pieces, start = [], 0
+    for length in lengths:
+        if start >= len(s):
+            break
+        pieces.append(s[start:start + length])
+        start += length
+    return pieces
+
+
+def _match(s, pattern):
+    match = pattern.fullmatch(_string(s, 'match'))
+    return None if match is None else list(match.groups())
+
+
+def _find(s, pattern):
+    s = _string(s, 'find')
+    if isinstance(pattern, re.Pattern):
+        return [match.group() for match in pattern.finditer(s)]
+    return [pattern] * s.count(pattern) if pattern else []
+
+
+def _contains(s, sub):
+    s = _string(s, 'contains')
+    if isinstance(sub, re.Pattern):
+        return sub.search(s) is not None
+    return _string(sub, 'contains') in s
+
+
+def _length(value):
+    if isinstance(value, dict):
+        return len(value)
+    return len(_sequence(value, 'length'))
+
+
+def _title(s):
+    # Like Apache Commons' WordUtils.capitalizeFully
+    return re.sub(r'\S+', lambda m: m.group()[0].upper()
+                  + m.group()[1:].lower(), _string(s, 'toTitlecase'))
+
+
+def _chomp(s, separator):
+    s = _string(s, 'chomp')
+    return s[:-len(separator)] if separator and s.endswith(separator) else s
+
+
+def _fingerprint(s):
+    s = _string(s, 'fingerprint').strip().lower()
+    s = unicodedata.normalize('NFKD', s).encode('ascii', 'ignore') \
+        .decode('ascii')
+    words = re.sub(r'[^\w\s]', '', s).split()
+    return ' '.join(sorted(set(words)))
+
+
+_INTEGER = re.compile(r'[+-]?[0-9]+')
+
+
+def _to_number(value):
+    if _is_number(value):
+        return value
+    s = _string(value, 'toNumber').strip()
+    if _INTEGER.fullmatch(s):
+        return int(s)
+    number = float(s)
+    if not math.isfinite(number):
+        raise ValueError('Cannot parse {!r} as a number'.format(value))
+    return number
+
+
+# Java SimpleDateFormat pattern letters, longest first
+_DATE_FIELDS = [
+    ('yyyy', '%Y'), ('yy', '%y'), ('MMMM', '%B'), ('MMM', '%b'),
+    ('MM', '%m'), ('M', '%m'), ('dd', '%d'), ('d', '%d'), ('HH', '%H'),
+    ('H', '%H'), ('hh', '%I'), ('h', '%I'), ('mm', '%M'), ('m', '%M'),
+    ('ss', '%S'), ('s', '%S'), ('SSS', '%f'), ('a', '%p'), ('EEEE', '%A'),
+    ('EEE', '%a'), ('Z', '%z'), ('X', '%z'), ('XXX', '%z'),
+]
+
+
+@lru_cache(maxsize=64)
+def java_date_format(pattern):
+    """Translate a Java date format such as ``dd/MM/yyyy`` to strftime's.
+
+    Raises:
+        :exc:`ValueError`: If the pattern uses fields with no equivalent.
+
+    """
+    fields = sorted(_DATE_FIELDS, key=lambda field: -len(field[0]))
+    out, pos = [], 0
+    while pos < len(pattern):
+        char = pattern[pos]
+        if char == "'":
+            end = pattern.find("'", pos + 1)
+            end = len(pattern) if end < 0 else end
+            out.append(pattern[pos + 1:end].replace('%', '%%') or "'")
+            pos = end + 1
+        elif char.isalpha():
+            for java, python in fields:
+                if pattern.startswith(java, pos):
+                    out.append(python)
+                    pos += len(java)
+                    break
+            else:
+                raise ValueError('Unsupported date format field {!r}'
+                                 .format(char))
+        else:
+            out.append('%%' if char == '%' else char)
+            pos += 1
+    return ''.join(out)
+
+
+def _utc(value):
+    import pandas as pd
+
+    value = pd.Timestamp(value)
+    if value.tzinfo is None:
+        return value.tz_localize('UTC')
+    return value.tz_convert('UTC')
+
+
+def _to_date(value, *options):
+    if isinstance(value, datetime):
+        return _utc(value)
+    s = _string(value, 'toDate')
+    month_first = True
+    formats = []
+    for option in options:
+        if isinstance(option, bool):
+            month_first = option
+        else:
+            formats.append(java_date_format(_string(option, 'toDate')))
+    for fmt in formats:
+        try:
+            return _utc(datetime.strptime(s, fmt))
+        except ValueError:
+            pass
+    if formats:
+        raise ValueError('Cannot parse {!r} as a date'.format(s))
+    import pandas as pd
+
+    result = pd.to_datetime(s, dayfirst=not month_first, utc=True)
+    if result is pd.NaT:
+        raise ValueError('Cannot parse {!r} as a date'.format(s))
+    return result
+
+
+def _date_to_string(value, fmt=None):
+    if isinstance(value, datetime) and fmt is not None:
+        return _utc(value).strftime(java_date_format(fmt))
+    return to_string(value)
+
+
+_DATE_PARTS = {
+    'years': lambda d: d.year, 'year': lambda d: d.year,
+    'months': lambda d: d.month, 'month': lambda d: d.month,
+    'weeks': lambda d: d.isocalendar()[1],
+    'week': lambda d: d.isocalendar()[1],
+    'days': lambda d: d.day, 'day': lambda d: d.day,
+    'hours': lambda d: d.hour, 'hour': lambda d: d.hour,
+    'minutes': lambda d: d.minute, 'minute': lambda d: d.minute,
+    'seconds': lambda d: d.second, 'sec': lambda d: d.second,
+    'milliseconds': lambda d: d.microsecond // 1000,
+    'weekday': lambda d: d.strftime('%A').upper(),
+    'time': lambda d: int(d.timestamp() * 1000),
+}
+
+
+def _date_part(value, part):
+    if not isinstance(value, datetime):
+        raise TypeError('datePart() expects a date')
+    return _DATE_PARTS[part](_utc(value))
+
+
+def _type(value):
+    if value is None:
+        return 'undefined'
+    if isinstance(value, bool):
+        return 'boolean'
+    if _is_number(value):
+        return 'number'
+    if isinstance(value, str):
+        return 'string'
+    if isinstance(value, datetime):
+        return 'date'
+    if isinstance(value, (list, tuple)):
+        return 'array'
+    if isinstance(value, Exception):
+        return 'error'
+    return type(value).__name__
+
+
+def _round(x):
+    # Java's Math.round rounds halves up, unlike Python's round
+    return int(math.floor(_number(x, 'round') + 0.5))
+
+
+def _hash(name):
+    def digest(s):
+        return hashlib.new(name, to_string(s).encode('utf-8')).hexdigest()
+    return digest
+
+
+def _all(*values):
+    return all(_truthy(value) for value in values)
+
+
+def _any(*values):
+    return any(_truthy(value) for value in values)
+
+
+FUNCTIONS = {
+    # Strings
+    'length': _length,
+    'toLowercase': lambda s: _string(s, 'toLowercase').lower(),
+    'toUppercase': lambda s: _string(s, 'toUppercase').upper(),
+    'toTitlecase': _title,
+    'trim': lambda s: _string(s, 'trim').strip(),
+    'strip': lambda s: _string(s, 'strip').strip(),
+    'chomp': _chomp,
+    'substring': _substring,
+    'slice': _get,
+    'get': _get,
+    'indexOf': lambda s, sub: _string(s, 'indexOf').find(sub),
+    'lastIndexOf': lambda s, sub: _string(s, 'lastIndexOf').rfind(sub),
+    'startsWith': lambda s, sub: _string(s, 'startsWith').startswith(sub),
+    'endsWith': lambda s, sub: _string(s, 'endsWith').endswith(sub),
+    'contains': _contains,
+    'replace': _replace,
+    'replaceChars': _replace_chars,
+    'split': _split,
+    'splitByLengths': _split_by_lengths,
+    'match': _match,
+    'find': _find,
+    'fingerprint': _fingerprint,
+    'md5': _hash('md5'),
+    'sha1': _hash('sha1'),
+    'parseJson': lambda s: json.loads(_string(s, 'parseJson')),
+    # Conversions
+    'toString': _date_to_string,
+    'toNumber': _to_number,
+    'toDate': _to_date,
+    'datePart': _date_part,
+    'now': lambda: _utc(datetime.now(timezone.utc)),
+    'type': _type,
+    # Arrays
+    'join': lambda a, sep: sep.join(map(to_string, _sequence(a, 'join'))),
+    'reverse': lambda a: _sequence(a, 'reverse')[::-1],
+    'sort': lambda a: sorted(_sequence(a, 'sort')),
+    'uniques': lambda a: list(dict.fromkeys(_sequence(a, 'uniques'))),
+    # Numbers
+    'abs': lambda x: abs(_number(x, 'abs')),
+    'round': _round,
+    'floor': lambda x: math.floor(_number(x, 'floor')),
+    'ceil': lambda x: math.ceil(_number(x, 'ceil')),
+    'min': lambda a, b: min(_number(a, 'min'), _number(b, 'min')),
+    'max': lambda a, b: max(_number(a, 'max'), _number(b, 'max')),
+    'mod': lambda a, b: _modulo(_number(a, 'mod'), _number(b, 'mod')),
+    'pow': lambda a, b: math.pow(_number(a, 'pow'), _number(b, 'pow')),
+    'exp': lambda x: math.exp(_number(x, 'exp')),
+    'ln': lambda x: math.log(_number(x, 'ln')),
+    'log': lambda x: math.log10(_number(x, 'log')),
+    # Booleans
+    'and': _all,
+    'or': _any,
+    'not': lambda x: not _truthy(x),
+    'xor': lambda a, b: _truthy(a) != _truthy(b),
+}
+"""The functions available to expressions, by name."""
+
+# Functions which control the evaluation of their arguments: the numbers
+# of arguments they take, and which arguments name variables
+_CONTROLS = {
+    'if': ((3,), ()),
+    'with': ((3,), (1,)),
+    'forEach': ((3,), (1,)),
+    'forEachIndex': ((4,), (1, 2)),
+    'filter': ((3,), (1,)),
+    'forNonBlank': ((4,), (1,)),
+    'isNull': ((1,), ()),
+    'isNotNull': ((1,), ()),
+    'isBlank': ((1,), ()),
+    'isNonBlank': ((1,), ()),
+    'isNumeric': ((1,), ()),
+    'isError': ((1,), ()),
+}
+
+
+def _attempt(thunk):
+    """Evaluate a deferred argument, returning any error instead."""
+    try:
+        return thunk()
+    except Exception as error:
+        return error
+
+
+def _for_each(array, body):
+    return [body(item) for item in _sequence(array, 'forEach')]
+
+
+def _for_each_index(array, body):
+    return [body(i, item)
+            for i, item in enumerate(_sequence(array, 'forEachIndex'))]
+
+
+def _filter(array, condition):
+    return [item for item in _sequence(array, 'filter')
+            if _truthy(condition(item))]
+
+
+def _for_non_blank(value, body, otherwise):
+    return otherwise() if _is_blank(value) else body(value)
+
+
+def _is_numeric(thunk):
+    value = _attempt(thunk)
+    if _is_number(value):
+        return True
+    try:
+        return isinstance(value, str) and math.isfinite(float(value))
+    except ValueError:
+        return False
+
+
+def _null(value):
+    """Treat pandas' markers of missing values as ``null``."""
+    if value is None or isinstance(value, (str, int)):
+        return value
+    if isinstance(value, float):
+        return None if math.isnan(value) else value
+    # Only values taken from pandas can be its markers
+    import pandas as pd
+
+    return None if value is pd.NA or value is pd.NaT else value
+
+
+def _unavailable(name):
+    raise NameError('{} is not available to expressions'.format(name))
+
+
+RUNTIME = {
+    '_f': FUNCTIONS,
+    '_op': OPERATORS,
+    '_truthy': _truthy,
+    '_field': _field,
+    '_attempt': _attempt,
+    '_for_each': _for_each,
+    '_for_each_index': _for_each_index,
+    '_filter': _filter,
+    '_for_non_blank': _for_non_blank,
+    '_is_blank': lambda thunk: _is_blank(_attempt(thunk)),
+    '_is_null': lambda thunk: _attempt(thunk) is None,
+    '_is_error': lambda thunk: isinstance(_attempt(thunk), Exception),
+    '_is_numeric': _is_numeric,
+    '_null': _null,
+    '_unavailable': _unavailable,
+}
+"""The names available to the Python code made by :func:`to_python`."""
+
+
+class _PythonCompiler:
+    """Translate a syntax tree into the source of a Python expression."""
+
+    def __init__(self):
+        self.constants = []
+        self.bound = set()
+
+    def compile(self, node):
+        return getattr(self, '_' + node.type)(node)
+
+    def _constant(self, value):
+        self.constants.append(value)
+        return '_c[{}]'.format(len(self.constants) - 1)
+
+    def _literal(self, node):
+        if isinstance(node.value, float) and not math.isfinite(node.value):
+            return self._constant(node.value)
+        return repr(node.value)
+
+    def _regex(self, node):
+        # Kept as its source, so compiled expressions can be marshalled
+        return self._constant((node.value.pattern, node.value.flags))
+
+    def _variable(self, node):
+        if node.value in self.bound:
+            return '_v_' + node.value
+        elif node.value == 'value':
+            return '_null(value)'
+        return '_unavailable({!r})'.format(node.value)
+
+    def _field(self, node):
+        return '_field({}, {!r})'.format(self.compile(node.args[0]),
+                                         node.value)
+
+    def _array(self, node):
+        return '[{}]'.format(', '.join(map(self.compile, node.args)))
+
+    def _operator(self, node):
+        return '_op[{!r}]({})'.format(node.value,
+                                      ', '.join(map(self.compile, node.args)))
+
+    def _call(self, node):
+        name = node.value
+        if name in _CONTROLS:
+            return getattr(self, '_control_' + name)(*node.args)
+        return '_f[{!r}]({})'.format(name,
+                                     ', '.join(map(self.compile, node.args)))
+
+    def _lambda(self, names, body):
+        """Compile ``body`` with variables bound to the given names."""
+        outer = set(self.bound)
+        self.bound.update(name.value for name in names)
+        try:
+            return '(lambda {}: {})'.format(
+                ', '.join('_v_' + name.value for name in names),
+                self.compile(body))
+        finally:
+            self.bound = outer
+
+    def _thunk(self, node):
+        return '(lambda: {})'.format(self.compile(node))
+
+    def _control_if(self, condition, then, otherwise):
+        return '({} if _truthy({}) else {})'.format(
+            self.compile(then), self.compile(condition),
+            self.compile(otherwise))
+
+    def _control_with(self, value, name, body):
+        return '{}({})'.format(self._lambda([name], body),
+                               self.compile(value))
+
+    def _control_forEach(self, array, name, body):
+        return '_for_each({}, {})'.format(self.compile(array),
+                                          self._lambda([name], body))
+
+    def _control_forEachIndex(self, array, index, name, body):
+        return '_for_each_index({}, {})'.format(
+            self.compile(array), self._lambda([index, name], body))
+
+    def _control_filter(self, array, name, condition):
+        return '_filter({}, {})'.format(self.compile(array),
+                                        self._lambda([name], condition))
+
+    def _control_forNonBlank(self, value, name, body, otherwise):
+        return '_for_non_blank({}, {}, {})'.format(
+            self.compile(value), self._lambda([name], body),
+            self._thunk(otherwise))
+
+    def _control_isNull(self, value):
+        return '_is_null({})'.format(self._thunk(value))
+
+    def _control_isNotNull(self, value):
+        return '(not _is_null({}))'.format(self._thunk(value))
+
+    def _control_isBlank(self, value):
+        return '_is_blank({})'.format(self._thunk(value))
+
+    def _control_isNonBlank(self, value):
+        return '(not _is_blank({}))'.format(self._thunk(value))
+
+    def _control_isNumeric(self, value):
+        return '_is_numeric({})'.format(self._thunk(value))
+
+    def _control_isError(self, value):
+        return '_is_error({})'.format(self._thunk(value))
+
+
+def to_python(tree):
+    """Translate a parsed expression into Python.
+
+    Args:
+        tree (Node): The expression, as returned by :func:`parse`.
+
+    Returns:
+        tuple: The source of a Python expression of ``value``, and the
+        constants it uses, which :func:`namespace` turns into the global
+        names it needs. The constants hold only values that
+        :mod:`marshal` can store.
+
+    """
+    compiler = _PythonCompiler()
+    source = compiler.compile(tree)
+    return source, tuple(compiler.constants)
+
+
+def namespace(constants):
+    """Make the global names for code translated by :func:`to_python`.
+
+    Args:
+        constants (tuple): The constants returned by :func:`to_python`.
+
+    Returns:
+        dict: :data:`RUNTIME`, and the constants.
+
+    """
+    return dict(RUNTIME, _c=tuple(re.compile(*constant)
+                                  if isinstance(constant, tuple)
+                                  else constant
+                                  for constant in constants))
+
+
+# Variables which give an expression access to more than the value itself
+_IMPURE_VARIABLES = {'row', 'cells', 'cell', 'rowIndex', 'recon'}
+_IMPURE_FUNCTIONS = {'now'}
+
+
+def is_pure(tree):
+    """Check whether a parsed expression depends only on the cell's value."""
+    bound = {node.args[i].value for node in walk(tree)
+             if node.type == 'call' and node.value in _CONTROLS
+             for i in _CONTROLS[node.value][1]}
+    return not any(
+        (node.type == 'variable' and node.value in _IMPURE_VARIABLES
+         and node.value not in bound)
+        or (node.type == 'call' and node.value in _IMPURE_FUNCTIONS)
+        for node in walk(tree))
+
+
+def referenced_columns(tree):
+    """Find the columns a parsed expression refers to through ``cells``.
+
+    Both ``cells["Column"]`` and ``cells.Column`` are recognised.
+
+    Returns:
+        set: The names of the columns, or ``None`` if they cannot be
+        determined.
+
+    """
+    columns = set()
+    used = set()
+    for node in walk(tree):
+        if node.type not in ('field', 'call') or not node.args:
+            continue
+        cells = node.args[0]
+        if cells.type != 'variable' or cells.value != 'cells':
+            continue
+        if node.type == 'field':
+            columns.add(node.value)
+        elif node.value == 'get' and len(node.args) == 2 \
+                and node.args[1].type == 'literal' \
+                and isinstance(node.args[1].value, str):
+            columns.add(node.args[1].value)
+        else:
+            return None
+        used.add(id(cells))
+
+    for node in walk(tree):
+        if node.type == 'variable' and node.value in ('cells', 'row') \
+                and id(node) not in used:
+            return None
+    return columns
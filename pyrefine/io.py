@@ -0,0 +1,458 @@
+"""Read and write datasets in several file formats.
+
+Besides CSV (optionally compressed with gzip, bzip2, xz, zip or zstd),
+datasets can be stored in the columnar formats Parquet and Feather (the
+Arrow IPC file format). These keep the type of each column, so there is no
+need to parse text and infer types again between steps of a pipeline.
+The columnar formats need :mod:`pyarrow`, and zstd compression needs
+:mod:`zstandard`.
+
+The format is worked out from the file name, or from the first few bytes
+of an input file if its name is not recognised.
+
+pandas is only imported once data is read or written, so that commands
+that never load any (such as ``pyrefine validate``) start quickly.
+
+.. autosummary::
+
+    detect_format
+    read_columns
+    read_data
+    write_data
+"""
+
+import bz2
+import gzip
+import lzma
+import os
+import shutil
+import tempfile
+
+FORMATS = ('csv', 'parquet', 'feather')
+
+_SUFFIXES = {
+    '.csv': 'csv',
+    '.parquet': 'parquet', '.pq': 'parquet',
+    '.feather': 'feather', '.arrow': 'feather', '.ipc': 'feather',
+}
+
+_COMPRESSION = {
+    '.gz': 'gzip', '.bz2': 'bz2', '.xz': 'xz', '.zip': 'zip',
+    '.zst': 'zstd', '.zstd': 'zstd',
+}
+
+_MAGIC = [
+    (b'PAR1', 'parquet'),
+    (b'ARROW1', 'feather'),
+    (b'\x1f\x8b', 'csv'),
+    (b'\x28\xb5\x2f\xfd', 'csv'),
+]
+
+
+def detect_format(path):
+    """Work out the format of a data file.
+
+    Args:
+        path (str): Path to the file, which need not exist if its name has
+            a recognised extension (e.g. ``data.csv.gz``,
+            ``data.parquet``).
+
+    Returns:
+        str: One of "csv", "parquet" or "feather". Files that are not
+        recognised are assumed to be CSV.
+
+    """
+    name = os.fspath(path).lower()
+    stem, suffix = os.path.splitext(name)
+    if suffix in _COMPRESSION:
+        stem, suffix = os.path.splitext(stem)
+    if suffix in _SUFFIXES:
+        return _SUFFIXES[suffix]
+
+    try:
+        with open(path, 'rb') as f:
+            start = f.read(8)
+    except OSError:
+        return 'csv'
+    for magic, format in _MAGIC:
+        if start.startswith(magic):
+            return format
+    return 'csv'
+
+
+def _import_pyarrow(format):
+    try:
+        import pyarrow
+        import pyarrow.feather
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError('pyarrow is required to read and write {} files'
+                          .format(format))
+    return pyarrow
+
+
+def _is_path(path):
+    return isinstance(path, (str, os.PathLike))
+
+
+def _csv_options(path):
+    """Work out how to read a CSV file that may be compressed."""
+    if not _is_path(path):
+        return {}
+    name = os.fspath(path).lower()
+    if os.path.splitext(name)[1] in _COMPRESSION:
+        return {'compression': 'infer'}
+    try:
+        with open(path, 'rb') as f:
+            start = f.read(4)
+    except OSError:
+        return {}
+    if start.startswith(b'\x1f\x8b'):
+        return {'compression': 'gzip'}
+    if start.startswith(b'\x28\xb5\x2f\xfd'):
+        return {'compression': 'zstd'}
+    return {}
+
+
+def read_columns(path, format=None):
+    """Read just the column names of a data file.
+
+    Only the header or schema is read, not the data itself.
+
+    Args:
+        path (str): Path to the file.
+        format (str): The file's format, if not to be detected.
+
+    Returns:
+        list: The names of the columns.
+
+    """
+    format = format or detect_format(path)
+    if format == 'csv':
+        import pandas as pd
+
+        return list(pd.read_csv(path, nrows=0, **_csv_options(path)).columns)
+
+    pa = _import_pyarrow(format)
+    if format == 'parquet':
+        schema = pa.parquet.read_schema(path)
+    else:
+        with pa.memory_map(os.fspath(path)) as source:
+            schema = pa.ipc.open_file(source).schema
+    # Ignore any index stored by pandas alongside the data
+    index = (schema.pandas_metadata or {}).get('index_columns', [])
+    return [name for name in schema.names if name not in index]
+
+
+def read_data(path, format=None, columns=None, chunksize=None,
+              arrow_strings=False):
+    """Read a dataset from a file.
+
+    Args:
+        path: Path to the file, or an open file object for CSV.
+        format (str): The file's format, if not to be detected.
+        columns (list): Read only these columns, if given. They must be in
+            the order they appear in the file.
+        chunksize (int): If given, read the data this many rows at a time.
+            Parquet files are streamed one row group at a time, and
+            Feather files one record batch at a time, so chunks of these
+            may be smaller than this.
+        arrow_strings (bool): Whether to read columns of strings (and lists
+            of strings) as Arrow-backed columns; see :mod:`pyrefine.arrow`.
+            Columnar files are converted without any Python strings being
+            created.
+
+    Returns:
+        :class:`pandas.DataFrame` or iterator: The data, or an iterator of
+        chunks of it if ``chunksize`` is given.
+
+    """
+    import pandas as pd
+
+    from .arrow import pandas_dtype, use_arrow_strings
+
+    format = format or (detect_format(path) if _is_path(path) else 'csv')
+    if format == 'csv':
+        data = pd.read_csv(path, usecols=columns, chunksize=chunksize,
+                           **_csv_options(path))
+        if not arrow_strings:
+            return data
+        elif chunksize is None:
+            return use_arrow_strings(data)
+        return (use_arrow_strings(chunk) for chunk in data)
+
+    pa = _import_pyarrow(format)
+    types_mapper = pandas_dtype if arrow_strings else None
+    if format == 'parquet':
+        if chunksize is None:
+            return pa.parquet.read_table(path, columns=columns) \
+                .to_pandas(types_mapper=types_mapper)
+        parquet = pa.parquet.ParquetFile(path)
+        batches = parquet.iter_batches(batch_size=chunksize,
+                                       columns=columns)
+        if parquet.metadata.num_rows == 0:
+            # Give one empty chunk, as for CSV, so that the columns are known
+            empty = parquet.schema_arrow.empty_table()
+            batches = [empty if columns is None else empty.select(columns)]
+        return (batch.to_pandas(types_mapper=types_mapper)
+                for batch in batches)
+
+    if chunksize is None:
+        return pa.feather.read_table(path, columns=columns) \
+            .to_pandas(types_mapper=types_mapper)
+    return _read_feather_chunks(pa, path, columns, chunksize, types_mapper)
+
+
+def _read_feather_chunks(pa, path, columns, chunksize, types_mapper):
+    source = pa.memory_map(os.fspath(path)) if _is_path(path) \
+        else pa.PythonFile(path, mode='r')
+    with source:
+        reader = pa.ipc.open_file(source)
+        rows = 0
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            if columns is not None:
+                batch = batch.select(columns)
+            rows += batch.num_rows
+            for start in range(0, batch.num_rows, chunksize):
+                yield batch.slice(start, chunksize) \
+                    .to_pandas(types_mapper=types_mapper)
+        if rows == 0:
+            # Give one empty chunk, as for CSV, so that the columns are known
+            empty = reader.schema.empty_table()
+            if columns is not None:
+                empty = empty.select(columns)
+            yield empty.to_pandas(types_mapper=types_mapper)
+
+
+def write_data(data, path, format=None):
+    """Write a dataset to a file.
+
+    A file named by a path is written under a temporary name and renamed
+    once complete, so that a failure part way through leaves no output
+    that looks whole.
+
+    Chunks written to a columnar format may differ in their column types.
+    A column that is blank in the first chunks takes its type from the
+    first chunk in which it is not, integers become floating-point numbers
+    once a chunk has fractions, and any other conflicting types become
+    strings. Chunks already written are written again if their types
+    change.
+
+    Args:
+        data: A :class:`pandas.DataFrame`, or an iterable of them to be
+            written one after another (e.g. as returned by
+            :meth:`Script.execute_chunked
+            <pyrefine.script.Script.execute_chunked>`).
+        path: Path to the file, or an open file object.
+        format (str): The format to write, if not to be detected from the
+            file name.
+
+    Raises:
+        :exc:`ValueError`: If chunks to be written to a columnar format
+            have different columns, or columns of lists or other values
+            that cannot become strings; or if chunks are to be written to
+            a zip archive, which has to be written all at once.
+
+    """
+    import pandas as pd
+
+    if isinstance(data, pd.DataFrame):
+        chunks = iter([data])
+    else:
+        chunks = iter(data)
+        if _is_path(path) and _compression(path) == 'zip':
+            raise ValueError('Zip archives cannot be written a chunk at a '
+                             'time')
+
+    format = format or (detect_format(path) if _is_path(path) else 'csv')
+    if not _is_path(path):
+        if format == 'csv':
+            _write_csv(chunks, path)
+            return
+        # Columns may have to be written again with wider types, which
+        # needs a file to read them back from
+        fd, temp = tempfile.mkstemp(suffix='.tmp')
+        os.close(fd)
+        try:
+            _write_columnar(chunks, temp, format)
+            with open(temp, 'rb') as f:
+                shutil.copyfileobj(f, path)
+        finally:
+            os.unlink(temp)
+        return
+
+    path = os.fspath(path)
+    directory, name = os.path.split(path)
+    # Keep the extension, which decides how a CSV file is compressed
+    temp = os.path.join(directory, '.tmp{}-{}'.format(os.getpid(), name))
+    try:
+        if format == 'csv':
+            _write_csv(chunks, temp, name)
+        else:
+            _write_columnar(chunks, temp, format)
+        os.replace(temp, path)
+    except BaseException:
+        if os.path.exists(temp):
+            os.unlink(temp)
+        raise
+
+
+def _write_columnar(chunks, path, format):
+    pa = _import_pyarrow(format)
+    schema = writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                schema = _writable(pa, table.schema)
+                writer = _open_writer(pa, path, format, schema)
+            elif not table.schema.equals(schema):
+                wider = _writable(pa, _widen(pa, schema, table.schema))
+                if not wider.equals(schema):
+                    writer.close()
+                    # Do not close it again if rewriting fails
+                    writer = None
+                    writer = _rewrite(pa, path, format, wider)
+                    schema = wider
+                table = _cast(pa, table, schema)
+            writer.write_table(table)
+        if writer is None:
+            # Write no columns at all, rather than leave no file
+            writer = _open_writer(pa, path, format, pa.schema([]))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _writable(pa, schema):
+    if any(pa.types.is_list(field.type) for field in schema):
+        # pandas cannot read back the dtype it records for Arrow lists
+        return schema.remove_metadata()
+    return schema
+
+
+def _open_writer(pa, path, format, schema):
+    if format == 'parquet':
+        return pa.parquet.ParquetWriter(path, schema)
+    return pa.ipc.new_file(path, schema)
+
+
+def _rewrite(pa, path, format, schema):
+    """Write a file again with wider column types, and leave it open."""
+    old = path + '.old'
+    os.replace(path, old)
+    try:
+        writer = _open_writer(pa, path, format, schema)
+        try:
+            for batch in _read_batches(pa, old, format):
+                writer.write_table(
+                    _cast(pa, pa.Table.from_batches([batch]), schema))
+        except BaseException:
+            writer.close()
+            raise
+    finally:
+        os.unlink(old)
+    return writer
+
+
+def _read_batches(pa, path, format):
+    if format == 'parquet':
+        with pa.OSFile(path) as source:
+            yield from pa.parquet.ParquetFile(source).iter_batches()
+        return
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            yield reader.get_batch(i)
+
+
+def _widen(pa, schema, other):
+    """Find column types that can hold the chunks of two schemas."""
+    if schema.names != other.names:
+        raise ValueError('Columns of chunks do not match: {} and {}'
+                         .format(schema.names, other.names))
+    fields = []
+    for field, other_field in zip(schema, other):
+        try:
+            type = _wider_type(pa, field.type, other_field.type)
+        except TypeError:
+            raise ValueError('Column {!r} has types {} and {} in different '
+                             'chunks'.format(field.name, field.type,
+                                             other_field.type))
+        fields.append(field.with_type(type))
+    return pa.schema(fields, metadata=schema.metadata)
+
+
+def _wider_type(pa, type, other):
+    types = pa.types
+    if type.equals(other) or types.is_null(other):
+        return type
+    if types.is_null(type):
+        return other
+    if types.is_list(type) and types.is_list(other):
+        return pa.list_(_wider_type(pa, type.value_type, other.value_type))
+    if any(types.is_nested(t) for t in (type, other)):
+        raise TypeError
+    if all(types.is_integer(t) for t in (type, other)):
+        return pa.int64()
+    if all(types.is_integer(t) or types.is_floating(t)
+           for t in (type, other)):
+        return pa.float64()
+    if any(types.is_large_string(t) for t in (type, other)):
+        return pa.large_string()
+    return pa.string()
+
+
+def _cast(pa, table, schema):
+    """Convert a chunk to the column types of those already written."""
+    try:
+        return table.cast(schema)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError,
+            pa.ArrowTypeError, ValueError) as error:
+        raise ValueError('Column types of chunk do not match those already '
+                         'written: {}'.format(error))
+
+
+def _compression(path):
+    return _COMPRESSION.get(os.path.splitext(os.fspath(path).lower())[1])
+
+
+def _open_text(path):
+    """Open a file for writing text, compressed according to its name."""
+    compression = _compression(path)
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError('zstandard is required to write zstd files')
+        return zstandard.open(path, 'wt', newline='')
+    opener = {'gzip': gzip.open, 'bz2': bz2.open, 'xz': lzma.open,
+              None: open}.get(compression)
+    if opener is None:
+        # Zip archives cannot be written to incrementally
+        return None
+    return opener(path, 'wt', newline='')
+
+
+def _write_csv(chunks, path, name=None):
+    """Write chunks as CSV, naming the file in a zip archive ``name``."""
+    if _is_path(path):
+        f = _open_text(path)
+        if f is None:
+            # Name the file in the archive after the output rather than
+            # the temporary file
+            name = os.path.splitext(name or os.path.basename(path))[0]
+            next(chunks).to_csv(path, index=False, compression={
+                'method': 'zip', 'archive_name': name})
+            return
+    else:
+        f = path
+
+    try:
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(f, index=False, header=(i == 0))
+    finally:
+        if f is not path:
+            f.close()
@@ -1,6 +1,21 @@
-"""Operations package."""
+"""Operations package.
+
+The registry (see :mod:`pyrefine.ops.base`) is imported straight away, but
+the modules defining the operations only when one of their operations is
+created, or one of their names is looked up here.
+"""
+
+import importlib
 
 from .base import *             # noqa: F401, F403
 
-from .cell import *             # noqa: F401, F403
-from .column import *           # noqa: F401, F403
+_MODULES = ('cell', 'column')
+
+
+def __getattr__(name):
+    for module in _MODULES:
+        module = importlib.import_module('.' + module, __name__)
+        if not name.startswith('_') and hasattr(module, name):
+            return getattr(module, name)
+    raise AttributeError('module {!r} has no attribute {!r}'
+                         .format(__name__, name))
@@ -4,10 +4,43 @@ This module provides two key functions: :func:`create` constructs an instance
 of an operation based on a provided dictionary of parameters;
 :func:`operation` decorates a class and registers it to handle a named
 operation.
+
+The built-in operations are also listed in :data:`OPERATION_MODULES`, with
+the module that defines each, so that a module is only imported (and its
+classes registered) when a script first uses one of its operations. This
+module itself does not import pandas, so the names of the operations can
+be checked without it.
+
+Operations that set ``supports_in_place = True`` accept an ``in_place``
+argument: if true, they may modify the DataFrame they are given rather than
+a copy of it (see :meth:`Script.execute <pyrefine.script.Script.execute>`).
+They never write into the arrays holding existing columns, only replace,
+add, remove or rearrange columns, for which :func:`set_columns` helps.
 """
 
+import importlib
+import warnings
+
 _operations = {}
 
+OPERATION_MODULES = {
+    'core/mass-edit': 'pyrefine.ops.cell',
+    'core/blank-down': 'pyrefine.ops.cell',
+    'core/fill-down': 'pyrefine.ops.cell',
+    'core/text-transform': 'pyrefine.ops.cell',
+    'core/multivalued-cell-split': 'pyrefine.ops.cell',
+    'core/multivalued-cell-join': 'pyrefine.ops.cell',
+    'core/transpose-rows-into-columns': 'pyrefine.ops.cell',
+    'core/column-removal': 'pyrefine.ops.column',
+    'core/column-rename': 'pyrefine.ops.column',
+    'core/column-move': 'pyrefine.ops.column',
+    'core/column-reorder': 'pyrefine.ops.column',
+    'core/column-addition': 'pyrefine.ops.column',
+    'core/column-addition-by-fetching-urls': 'pyrefine.ops.column',
+    'core/column-split': 'pyrefine.ops.column',
+}
+"""The module defining each built-in operation, keyed by operation name."""
+
 
 def create(parameters):
     """Construct an appropriate subclass of :class:`Operation`.
@@ -27,6 +60,8 @@ def create(parameters):
 
     """
     op_name = parameters['op']
+    if op_name not in _operations and op_name in OPERATION_MODULES:
+        importlib.import_module(OPERATION_MODULES[op_name])
     if op_name not in _operations:
         raise RuntimeError('Unknown operation "{}"'.format(op_name))
 
@@ -52,3 +87,36 @@ def operation(name, mod='core'):
         return cls
 
     return register_with_name
+
+
+def set_columns(data, columns, in_place=False):
+    """Replace or add columns of a dataset.
+
+    Args:
+        data (:class:`pandas.DataFrame`): The dataset.
+        columns (:class:`dict`): The new columns, keyed by name. Existing
+            columns keep their positions, and others are added at the end.
+        in_place (bool): Whether to modify ``data`` itself. Otherwise it
+            is copied first, as by :meth:`pandas.DataFrame.assign`.
+
+    Returns:
+        :class:`pandas.DataFrame`: The dataset with the new columns.
+
+    """
+    if not in_place:
+        return data.assign(**columns)
+
+    import pandas as pd
+
+    # Setting an existing column copies the rest of its block, but deleting
+    # it just splits the block, which can leave many small blocks
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', pd.errors.PerformanceWarning)
+        for name, column in columns.items():
+            if name in data.columns:
+                position = data.columns.get_loc(name)
+                del data[name]
+                data.insert(position, name, column)
+            else:
+                data[name] = column
+    return data
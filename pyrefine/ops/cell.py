@@ -3,76 +3,355 @@
 .. autosummary::
 
     MassEditOperation
+    BlankDownOperation
+    FillDownOperation
+    TextTransformOperation
     MultivaluedCellSplitOperation
     MultivaluedCellJoinOperation
+    TransposeRowsIntoColumnsOperation
+
+Operations with ``row_local = True`` transform each row independently of
+the others, so they can be applied to a dataset one chunk at a time. The
+remaining operations depend on the order of rows and instead provide a
+``stream`` method, which transforms an iterable of chunks while carrying
+whatever state is needed across chunk boundaries.
+
+When the ``engineConfig`` of an operation is in record mode, its facets
+select whole records (see :mod:`pyrefine.facets`), and fill down and blank
+down work within each record: values are never filled or blanked from
+one record into the next. Records are looked up in a
+:class:`~pyrefine.records.RecordIndex` rather than by looping over rows.
+
+Each operation lists the columns whose values it uses in ``reads``, for
+the benefit of :mod:`pyrefine.planner`; all but
+:class:`TransposeRowsIntoColumnsOperation` edit a column in place.
+
+Columns of Arrow-backed strings and lists of strings (see
+:mod:`pyrefine.arrow`) are transformed with Arrow compute kernels where
+possible, and stay Arrow-backed.
 """
 
-from .base import operation
+from itertools import chain
+import warnings
 
+from .base import operation, set_columns
+from ..arrow import from_arrow, is_arrow_list, is_arrow_string, to_arrow, \
+    to_arrow_column, to_objects
+from ..expressions import ColumnExpression
+from ..facets import Engine, update_rows
+from ..records import record_chunks
+
+import numpy as np
 import pandas as pd
 
 
+_BLANK = object()
+
+
+def _is_blank(value):
+    return value is None or (isinstance(value, float) and np.isnan(value))
+
+
+def _filtered(transform, column, mask, last_val=None, ids=None):
+    """Fill or blank down only the rows selected by mask.
+
+    Returns the new column along with the value to carry on to the next
+    chunk, like ``transform``.
+    """
+    if mask is None:
+        return transform(column, last_val, ids)
+    if ids is not None:
+        ids = ids[mask]
+    new_rows, last_val = transform(column[mask], last_val, ids)
+    return update_rows(column, mask, new_rows), last_val
+
+
+def _record_ids(engine, data):
+    """Return the record of each row in record mode, or else None."""
+    return engine.records(data).ids if engine.record_based else None
+
+
+def _continues_record(ids):
+    """Return whether each row is in the same record as the one before."""
+    same = np.zeros(len(ids), dtype=bool)
+    np.equal(ids[1:], ids[:-1], out=same[1:])
+    return same
+
+
+def _fill_sources(blank, ids=None):
+    """For each row, find the closest non-blank row at or above it.
+
+    Rows with none are given -1, except that if ``ids`` is given, only the
+    rows of the same record are considered and rows with none are given
+    their own position.
+    """
+    positions = np.arange(len(blank))
+    sources = np.where(blank, -1, positions)
+    np.maximum.accumulate(sources, out=sources)
+    if ids is not None:
+        unfilled = (sources < 0) | (ids.take(np.maximum(sources, 0)) != ids)
+        sources[unfilled] = positions[unfilled]
+    return sources
+
+
+class _EditTable:
+    """A lookup table equivalent to applying a series of mass edits in turn.
+
+    Applying edits one after another means a value can be edited more than
+    once: with edits ``a -> b`` then ``b -> c``, ``a`` ends up as ``c``.
+    The table maps each original value straight to its final value, so a
+    column only needs to be looked up once however many edits there are.
+
+    Args:
+        edits (list): List of edits as found in the OpenRefine JSON script.
+        blanks (bool): Whether to honour ``fromBlank`` edits.
+
+    Attributes:
+        keys (:class:`pandas.Index`): Original values that are edited.
+        values (:class:`numpy.ndarray`): Final value for each key.
+        blank (bool): Whether blank values are edited.
+        blank_value: Final value for blank values, if edited.
+    """
+
+    def __init__(self, edits, blanks=True):
+        """Build the table."""
+        current = {}            # original value -> value after edits so far
+        holders = {}            # value after edits so far -> original values
+
+        def replace(old, new):
+            moved = holders.pop(old, set())
+            if old not in current:
+                moved.add(old)
+            for original in moved:
+                current[original] = new
+            holders.setdefault(_BLANK if pd.isnull(new) else new,
+                               set()).update(moved)
+
+        for edit in edits:
+            for from_val in edit['from']:
+                replace(from_val, edit['to'])
+            if blanks and edit['fromBlank']:
+                replace(_BLANK, edit['to'])
+
+        self.blank = _BLANK in current
+        self.blank_value = current.pop(_BLANK, None)
+        self.keys = pd.Index(list(current.keys()), dtype=object)
+        self.values = np.empty(len(current), dtype=object)
+        self.values[:] = list(current.values())
+
+    def apply(self, values):
+        """Edit an array of (non-list) values in place.
+
+        Returns:
+            bool: Whether any values were changed.
+
+        """
+        positions = self.keys.get_indexer(values)
+        found = positions >= 0
+        values[found] = self.values[positions[found]]
+        changed = found.any()
+
+        if self.blank:
+            blank = pd.isnull(values) & ~found
+            if blank.any():
+                values[blank] = self.blank_value
+                changed = True
+
+        return changed
+
+    def apply_arrow(self, array):
+        """Edit an Arrow array of strings.
+
+        Returns:
+            :class:`pyarrow.Array`: The edited array, or ``None`` if a
+            string would be replaced by something that is neither a string
+            nor blank, which Arrow strings cannot hold.
+
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        targets = list(self.values)
+        if self.blank:
+            targets.append(self.blank_value)
+        if not all(isinstance(value, str) or _is_blank(value)
+                   for value in targets):
+            return None
+
+        # Only string keys can match Arrow strings
+        pairs = [(key, None if _is_blank(value) else value)
+                 for key, value in zip(self.keys, self.values)
+                 if isinstance(key, str)]
+        keys = pa.array([key for key, _ in pairs], type=pa.string())
+        values = pa.array([value for _, value in pairs], type=pa.string())
+
+        positions = pc.index_in(array, value_set=keys)
+        edited = pc.if_else(pc.is_valid(positions), values.take(positions),
+                            array)
+        if self.blank:
+            # A null scalar here gives invalid results for sliced arrays
+            if _is_blank(self.blank_value):
+                blank_value = pa.nulls(len(array), type=pa.string())
+            else:
+                blank_value = pa.scalar(self.blank_value, type=pa.string())
+            edited = pc.if_else(pc.is_null(array), blank_value, edited)
+        return edited
+
+
 @operation('mass-edit')
 class MassEditOperation:
     """Apply a simple substition to a whole column.
 
     Expects a ``dict`` as loaded from OpenRefine JSON script.
 
+    The edits are compiled into a lookup table when the operation is
+    created, so the column is scanned only once however many edits there
+    are. Cells containing lists (as created by
+    :class:`MultivaluedCellSplitOperation`) have each of their items edited
+    instead, except that ``fromBlank`` edits only apply to whole cells.
+    Arrow-backed columns are edited with a single vectorised lookup of the
+    strings, or of the items of the lists. Only the rows selected by the
+    facets of ``engineConfig`` are edited (see :mod:`pyrefine.facets`).
+
     Args:
         parameters['description'] (str): Human-readable description
         parameters['columnName'] (str): Column to edit
         parameters['edits'] (list): List of edits to make
+        parameters['engineConfig'] (dict): Facets selecting rows to edit
     """
 
+    row_local = True
+    supports_in_place = True
+
     def __init__(self, parameters):
         """Initialise the operation."""
         self.description = parameters['description']
         self.column = parameters['columnName']
         self.edits = parameters['edits']
+        self.engine = Engine(parameters.get('engineConfig'))
+        self.reads = self.engine.reads({self.column})
+        self.row_local = self.engine.row_local
+        self._cell_edits = _EditTable(self.edits)
+        self._item_edits = _EditTable(self.edits, blanks=False)
 
-    def __call__(self, data):
+    def __call__(self, data, in_place=False):
         """Execute the operation.
 
         Args:
             data (DataFrame): The data to transform.
+            in_place (bool): Whether ``data`` may be modified.
 
         Returns:
             DataFrame: The transformed data.
 
         """
-        column_data = data[self.column].copy()
-        if data[self.column].dtype == object:
-            do_replace = self._do_replace_object
+        column = data[self.column]
+        mask = self.engine.mask(data)
+        if mask is None:
+            new_column = self._edit(column)
+        elif mask.any():
+            new_column = self._edit(column[mask])
+            if new_column is not None:
+                new_column = update_rows(column, mask, new_column)
         else:
-            do_replace = self._do_replace
+            new_column = None
 
-        for edit in self.edits:
-            for from_val in edit['from']:
-                column_data = do_replace(column_data, from_val, edit['to'])
+        if new_column is None:
+            return data if in_place else data.copy()
+        self.engine.records.replace(data, new_column, mask)
+        return set_columns(data, {self.column: new_column}, in_place)
 
-            if edit['fromBlank']:
-                column_data[column_data.isnull()] = edit['to']
+    def stream(self, chunks):
+        """Execute the operation on consecutive chunks of a dataset.
 
-        return data.assign(**{self.column: column_data})
+        Only needed if the facets select records: the chunks are re-cut so
+        that no record is split between two (see
+        :func:`~pyrefine.records.record_chunks`).
 
-    @classmethod
-    def _do_replace(cls, column, from_val, to_val):
-        column[column == from_val] = to_val
-        return column
+        Args:
+            chunks (iterable): DataFrames to transform, in order.
 
-    @classmethod
-    def _do_replace_object(cls, column, from_val, to_val):
-        return column.apply(cls._transform,
-                            from_val=from_val, to_val=to_val)
+        Returns:
+            iterator: The transformed chunks.
 
-    @classmethod
-    def _transform(cls, val, from_val, to_val):
-        if val == from_val:
-            return to_val
-        elif type(val) is list:
-            return [cls._transform(x, from_val, to_val) for x in val]
+        """
+        return map(self, record_chunks(chunks))
+
+    def _edit(self, column):
+        """Return the edited column, or None if nothing needs editing."""
+        arrow = is_arrow_string(column) or is_arrow_list(column)
+        if arrow:
+            edited = self._edit_arrow(column)
+            if edited is not None:
+                return edited
+
+        values = to_objects(column)
+        if column.dtype == object or is_arrow_list(column):
+            is_list = np.fromiter((type(val) is list for val in values),
+                                  dtype=bool, count=len(values))
         else:
-            return val
+            is_list = np.zeros(len(values), dtype=bool)
+
+        if is_list.any():
+            cells = values[~is_list]
+            changed = self._cell_edits.apply(cells)
+            values[~is_list] = cells
+            changed |= self._edit_lists(values, np.flatnonzero(is_list))
+        else:
+            changed = self._cell_edits.apply(values)
+
+        if not changed:
+            return None
+
+        new_column = pd.Series(values, index=column.index, name=column.name)
+        if arrow:
+            return to_arrow_column(new_column)
+        elif column.dtype != object:
+            return new_column.infer_objects()
+        return new_column
+
+    def _edit_arrow(self, column):
+        """Edit an Arrow-backed column, or return None if that's not possible.
+
+        Lists are edited by looking up all of their items at once, then
+        putting them back into lists with the same offsets.
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        array = to_arrow(column)
+        if is_arrow_string(column):
+            edited = self._cell_edits.apply_arrow(array)
+        elif self._cell_edits.blank and array.null_count:
+            # Blank cells would become strings, in a column of lists
+            return None
+        else:
+            start = array.offsets[0]
+            items = self._item_edits.apply_arrow(
+                array.values[start.as_py():array.offsets[-1].as_py()])
+            if items is None:
+                return None
+            edited = pa.ListArray.from_arrays(
+                pc.subtract(array.offsets, start), items,
+                mask=array.is_null() if array.null_count else None)
+
+        return None if edited is None else from_arrow(edited, column)
+
+    def _edit_lists(self, values, positions):
+        """Edit the items of the lists at the given positions in values."""
+        lists = values[positions]
+        lengths = np.fromiter(map(len, lists), dtype=int, count=len(lists))
+        items = np.empty(lengths.sum(), dtype=object)
+        items[:] = list(chain.from_iterable(lists))
+
+        if not self._item_edits.apply(items):
+            return False
+
+        for i, new_list in zip(positions,
+                               np.split(items, np.cumsum(lengths)[:-1])):
+            values[i] = new_list.tolist()
+
+        return True
 
 
 @operation('blank-down')
@@ -81,21 +360,31 @@ class BlankDownOperation:
 
     Expects a ``dict`` as loaded from OpenRefine JSON script.
 
+    If the facets of ``engineConfig`` select only some rows, the others are
+    skipped over, as if they were not there.
+
     Args:
         parameters['description'] (str): Human-readable description
         parameters['columnName'] (str): Column to edit
+        parameters['engineConfig'] (dict): Facets selecting rows to edit
     """
 
+    row_local = False
+    supports_in_place = True
+
     def __init__(self, parameters):
         """Initialise the operation."""
         self.description = parameters['description']
         self.column = parameters['columnName']
+        self.engine = Engine(parameters.get('engineConfig'))
+        self.reads = self.engine.reads({self.column})
 
-    def __call__(self, data):
+    def __call__(self, data, in_place=False):
         """Execute the operation.
 
         Args:
             data (DataFrame): The data to transform.
+            in_place (bool): Whether ``data`` may be modified.
 
         Returns:
             DataFrame: The transformed data.
@@ -104,16 +393,87 @@ class BlankDownOperation:
             TypeError: If data in the relevant column is not a string.
 
         """
-        new_column = data[self.column].copy()
-        last_val = None
+        mask = self.engine.mask(data)
+        new_column, _ = _filtered(self._blank_down, data[self.column], mask,
+                                  ids=_record_ids(self.engine, data))
 
-        for i, val in enumerate(new_column):
-            if val == last_val:
-                new_column[i] = None
-            else:
-                last_val = val
+        self.engine.records.replace(data, new_column, mask)
+        return set_columns(data, {self.column: new_column}, in_place)
+
+    def stream(self, chunks):
+        """Execute the operation on consecutive chunks of a dataset.
+
+        The last value seen is carried over from one chunk to the next.
+        In record mode, the chunks are instead re-cut so that no record is
+        split between two (see :func:`~pyrefine.records.record_chunks`).
+
+        Args:
+            chunks (iterable): DataFrames to transform, in order.
+
+        Returns:
+            iterator: The transformed chunks.
+
+        """
+        if self.engine.record_based:
+            return map(self, record_chunks(chunks))
+        return self._stream(chunks)
 
-        return data.assign(**{self.column: new_column})
+    def _stream(self, chunks):
+        last_val = None
+        for chunk in chunks:
+            new_column, last_val = _filtered(
+                self._blank_down, chunk[self.column], self.engine.mask(chunk),
+                last_val)
+            yield chunk.assign(**{self.column: new_column})
+
+    @staticmethod
+    def _blank_down(column, last_val=None, ids=None):
+        """Blank each value equal to the one before it.
+
+        ``last_val`` stands in for the value before the first. In record
+        mode, ``ids`` gives the record of each row, and values are only
+        compared with the one before in the same record. Returns the new
+        column along with the value to carry on to the next chunk.
+        """
+        if is_arrow_string(column) and (last_val is None
+                                        or isinstance(last_val, str)):
+            return BlankDownOperation._blank_down_arrow(column, last_val, ids)
+        elif is_arrow_list(column):
+            # Arrow has no kernel to compare lists, so compare Python lists
+            new_column, last_val = BlankDownOperation._blank_down(
+                pd.Series(to_objects(column), index=column.index,
+                          name=column.name), last_val, ids)
+            return to_arrow_column(new_column), last_val
+
+        values = column.to_numpy()
+        if not len(values):
+            return column.copy(), last_val
+
+        repeated = np.empty(len(values), dtype=bool)
+        repeated[0] = bool(values[0] == last_val)
+        repeated[1:] = values[1:] == values[:-1]
+        if ids is not None:
+            repeated &= _continues_record(ids)
+
+        return column.mask(repeated, None), values[-1]
+
+    @staticmethod
+    def _blank_down_arrow(column, last_val=None, ids=None):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        array = to_arrow(column)
+        if not len(array):
+            return column.copy(), last_val
+
+        previous = pa.concat_arrays([pa.array([last_val], type=pa.string()),
+                                     array[:-1]])
+        repeated = pc.fill_null(pc.equal(array, previous), False)
+        if ids is not None:
+            repeated = pa.array(np.asarray(repeated) & _continues_record(ids))
+        blanked = pc.if_else(repeated, pa.nulls(len(array), type=pa.string()),
+                             array)
+        return from_arrow(blanked, column), array[-1].as_py()
 
 
 @operation('fill-down')
@@ -122,21 +482,31 @@ class FillDownOperation:
 
     Expects a ``dict`` as loaded from OpenRefine JSON script.
 
+    If the facets of ``engineConfig`` select only some rows, the others are
+    skipped over, as if they were not there.
+
     Args:
         parameters['description'] (str): Human-readable description
         parameters['columnName'] (str): Column to edit
+        parameters['engineConfig'] (dict): Facets selecting rows to edit
     """
 
+    row_local = False
+    supports_in_place = True
+
     def __init__(self, parameters):
         """Initialise the operation."""
         self.description = parameters['description']
         self.column = parameters['columnName']
+        self.engine = Engine(parameters.get('engineConfig'))
+        self.reads = self.engine.reads({self.column})
 
-    def __call__(self, data):
+    def __call__(self, data, in_place=False):
         """Execute the operation.
 
         Args:
             data (DataFrame): The data to transform.
+            in_place (bool): Whether ``data`` may be modified.
 
         Returns:
             DataFrame: The transformed data.
@@ -145,16 +515,207 @@ class FillDownOperation:
             TypeError: If data in the relevant column is not a string.
 
         """
-        new_column = data[self.column].copy()
+        mask = self.engine.mask(data)
+        new_column, _ = _filtered(self._fill_down, data[self.column], mask,
+                                  ids=_record_ids(self.engine, data))
+
+        self.engine.records.replace(data, new_column, mask)
+        return set_columns(data, {self.column: new_column}, in_place)
+
+    def stream(self, chunks):
+        """Execute the operation on consecutive chunks of a dataset.
+
+        The last non-blank value is carried over from one chunk to the next.
+        In record mode, the chunks are instead re-cut so that no record is
+        split between two (see :func:`~pyrefine.records.record_chunks`).
+
+        Args:
+            chunks (iterable): DataFrames to transform, in order.
+
+        Returns:
+            iterator: The transformed chunks.
+
+        """
+        if self.engine.record_based:
+            return map(self, record_chunks(chunks))
+        return self._stream(chunks)
+
+    def _stream(self, chunks):
         last_val = None
+        for chunk in chunks:
+            new_column, last_val = _filtered(
+                self._fill_down, chunk[self.column], self.engine.mask(chunk),
+                last_val)
+            yield chunk.assign(**{self.column: new_column})
+
+    @staticmethod
+    def _fill_down(column, last_val=None, ids=None):
+        """Replace each ``None`` with the closest non-``None`` value above.
+
+        ``last_val`` is used for any ``None`` values before the first
+        non-``None`` one. In record mode, ``ids`` gives the record of each
+        row, and values are only filled from the same record. Returns the
+        new column along with the value to carry on to the next chunk.
+        Other blank values such as NaN are left alone, but in Arrow-backed
+        columns all blank values are null and so are filled.
+        """
+        if is_arrow_string(column) and (last_val is None
+                                        or isinstance(last_val, str)):
+            return FillDownOperation._fill_down_arrow(column, last_val, ids)
+        elif is_arrow_list(column):
+            new_column, last_val = FillDownOperation._fill_down(
+                pd.Series(to_objects(column), index=column.index,
+                          name=column.name), last_val, ids)
+            return to_arrow_column(new_column), last_val
+
+        values = column.to_numpy()
+        blank = np.equal(values, None)
+        if not blank.any():
+            if len(values):
+                last_val = values[-1]
+            return column.copy(), last_val
+
+        sources = _fill_sources(blank, ids)
+        filled = values.take(sources)
+        leading = np.count_nonzero(sources < 0)
+        if leading:
+            filled[:leading].fill(last_val)
+        if sources[-1] >= 0:
+            last_val = values[sources[-1]]
+
+        return pd.Series(filled, index=column.index, name=column.name), \
+            last_val
+
+    @staticmethod
+    def _fill_down_arrow(column, last_val=None, ids=None):
+        import pyarrow.compute as pc
+
+        array = to_arrow(column)
+        if not array.null_count:
+            if len(array):
+                last_val = array[-1].as_py()
+            return column.copy(), last_val
+
+        if ids is not None:
+            sources = _fill_sources(np.asarray(array.is_null()), ids)
+            return from_arrow(array.take(sources), column), last_val
+
+        filled = pc.fill_null_forward(array)
+        if last_val is not None:
+            filled = pc.fill_null(filled, last_val)
+        if filled[-1].is_valid:
+            last_val = filled[-1].as_py()
+
+        return from_arrow(filled, column), last_val
+
+
+@operation('text-transform')
+class TextTransformOperation:
+    """Replace the values of a column with the results of an expression.
 
-        for i, val in enumerate(new_column):
-            if val is None:
-                new_column[i] = last_val
-            else:
-                last_val = val
+    Expects a ``dict`` as loaded from OpenRefine JSON script.
 
-        return data.assign(**{self.column: new_column})
+    The expression is evaluated over the whole column at once, vectorised
+    and memoized where possible, just as for
+    :class:`~pyrefine.ops.column.ColumnAdditionOperation` (see
+    :class:`~pyrefine.expressions.ColumnExpression`). Only the rows selected
+    by the facets of ``engineConfig`` are transformed.
+
+    With ``repeat`` set, the expression is applied again to its own results,
+    up to ``repeatCount`` more times, for as long as they keep changing.
+    Each time it is only evaluated for the values that changed last time.
+
+    Args:
+        parameters['description'] (str): Human-readable description
+        parameters['columnName'] (str): Column to transform
+        parameters['expression'] (str): Expression to compute new values
+        parameters['onError'] (str): What to do if the expression fails
+        parameters['repeat'] (bool): Whether to apply the expression again
+        parameters['repeatCount'] (int): The most times to repeat it
+        parameters['engineConfig'] (dict): Facets selecting rows to edit
+    """
+
+    row_local = True
+    supports_in_place = True
+
+    def __init__(self, parameters):
+        """Initialise the operation."""
+        self.description = parameters['description']
+        self.column = parameters['columnName']
+        self.expression = ColumnExpression(parameters['expression'],
+                                           on_error=parameters['onError'])
+        self.repeat_count = parameters.get('repeatCount', 10) \
+            if parameters.get('repeat', False) else 0
+        self.engine = Engine(parameters.get('engineConfig'))
+        self.row_local = self.engine.row_local
+        others = self.expression.columns
+        self.reads = self.engine.reads(
+            None if others is None else {self.column} | others)
+
+    def __call__(self, data, in_place=False):
+        """Execute the operation.
+
+        Args:
+            data (DataFrame): The data to transform.
+            in_place (bool): Whether ``data`` may be modified.
+
+        Returns:
+            DataFrame: The transformed data.
+
+        """
+        column = data[self.column]
+        mask = self.engine.mask(data)
+        if mask is None:
+            new_column = self._transform(column)
+        else:
+            new_column = update_rows(column, mask,
+                                     self._transform(column[mask]))
+
+        self.engine.records.replace(data, new_column, mask)
+        return set_columns(data, {self.column: new_column}, in_place)
+
+    def stream(self, chunks):
+        """Execute the operation on consecutive chunks of a dataset.
+
+        Only needed if the facets select records: the chunks are re-cut so
+        that no record is split between two (see
+        :func:`~pyrefine.records.record_chunks`).
+
+        Args:
+            chunks (iterable): DataFrames to transform, in order.
+
+        Returns:
+            iterator: The transformed chunks.
+
+        """
+        return map(self, record_chunks(chunks))
+
+    def _transform(self, column):
+        """Evaluate the expression, repeatedly if need be."""
+        new_column = self.expression(column)
+        old_values = to_objects(column)
+        for _ in range(self.repeat_count):
+            new_values = to_objects(new_column)
+            changed = _changed(old_values, new_values)
+            if not changed.any():
+                break
+            old_values = new_values
+            new_column = update_rows(new_column, changed,
+                                     self.expression(new_column[changed]))
+        return new_column
+
+
+def _changed(old_values, new_values):
+    """Return whether each pair of values differs, treating blanks as equal.
+
+    Both arguments are arrays of Python objects.
+    """
+    blank = pd.isnull(old_values) & pd.isnull(new_values)
+    with warnings.catch_warnings():
+        # Comparing mismatched types elementwise can warn
+        warnings.simplefilter('ignore')
+        changed = np.asarray(old_values != new_values, dtype=bool)
+    return changed & ~blank
 
 
 @operation('multivalued-cell-split')
@@ -163,29 +724,58 @@ class MultivaluedCellSplitOperation:
 
     Expects a ``dict`` as loaded from OpenRefine JSON script.
 
+    Arrow-backed strings are split into an Arrow list array (see
+    :mod:`pyrefine.arrow`): the items of all of the lists in one flat
+    array of strings, plus the offset at which each list starts. The whole
+    column is split at once, without creating a Python list for each cell.
+    Otherwise each value is split into a Python list. Either way, blank
+    values stay blank.
+
     Args:
         parameters['description'] (str): Human-readable description
         parameters['columnName'] (str): Column to edit
         parameters['separator'] (str): String on which to split values
     """
 
+    row_local = True
+    supports_in_place = True
+
     def __init__(self, parameters):
         """Initialise the operation."""
         self.description = parameters['description']
         self.column = parameters['columnName']
+        self.reads = {self.column}
         self.separator = parameters['separator']
 
+    def _split_arrow(self, column):
+        """Split Arrow-backed strings into Arrow-backed lists of strings."""
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        lists = pc.split_pattern(to_arrow(column), self.separator)
+        items = lists.flatten()
+        # Like _transform, strip the items only if a value was split
+        split = pc.greater(pc.list_value_length(lists), 1) \
+            .take(pc.list_parent_indices(lists))
+        items = pc.if_else(split, pc.utf8_trim_whitespace(items), items)
+
+        lists = pa.ListArray.from_arrays(
+            pc.subtract(lists.offsets, lists.offsets[0]), items,
+            mask=lists.is_null() if lists.null_count else None)
+        return from_arrow(lists, column)
+
     def _transform(self, value):
         if self.separator in value:
             return list(map(str.strip, value.split(self.separator)))
         else:
             return [value]
 
-    def __call__(self, data):
+    def __call__(self, data, in_place=False):
         """Execute the operation.
 
         Args:
             data (DataFrame): The data to transform.
+            in_place (bool): Whether ``data`` may be modified.
 
         Returns:
             DataFrame: The transformed data.
@@ -194,33 +784,67 @@ class MultivaluedCellSplitOperation:
             TypeError: If data in the relevant column is not a string.
 
         """
-        try:
-            return data.assign(**{self.column:
-                                  data[self.column].apply(self._transform)})
-        except AttributeError:
-            raise TypeError('Non-string data found in column "{}"'
-                            .format(self.column))
+        column = data[self.column]
+        if is_arrow_string(column) and self.separator:
+            new_column = self._split_arrow(column)
+        else:
+            try:
+                new_column = column.map(self._transform, na_action='ignore')
+            except (AttributeError, TypeError):
+                raise TypeError('Non-string data found in column "{}"'
+                                .format(self.column))
+
+        return set_columns(data, {self.column: new_column}, in_place)
 
 
 @operation('multivalued-cell-join')
-def multivalued_cell_join(params):
+class MultivaluedCellJoinOperation:
     """Join lists into single strings with a separator.
 
     Expects a ``dict`` as loaded from OpenRefine JSON script.
 
+    Arrow-backed lists are joined into Arrow-backed strings, and blank
+    values stay blank.
+
     Args:
         parameters['description'] (str): Human-readable description
         parameters['columnName'] (str): Column to edit
         parameters['separator'] (str): String with which to join values
     """
-    column = params['columnName']
-    sep = params['separator']
 
-    def exec_multivalued_cell_join(data):
-        return data.assign(**{column:
-                              data[column].apply(lambda x: sep.join(x))})
+    row_local = True
+    supports_in_place = True
 
-    return exec_multivalued_cell_join
+    def __init__(self, parameters):
+        """Initialise the operation."""
+        self.description = parameters['description']
+        self.column = parameters['columnName']
+        self.reads = {self.column}
+        self.separator = parameters['separator']
+
+    def __call__(self, data, in_place=False):
+        """Execute the operation.
+
+        Args:
+            data (DataFrame): The data to transform.
+            in_place (bool): Whether ``data`` may be modified.
+
+        Returns:
+            DataFrame: The transformed data.
+
+        Raises:
+            TypeError: If data in the relevant column is not a list.
+
+        """
+        column = data[self.column]
+        if is_arrow_list(column):
+            import pyarrow.compute as pc
+            joined = pc.binary_join(to_arrow(column), self.separator)
+            return set_columns(data, {self.column: from_arrow(joined, column)},
+                               in_place)
+
+        return set_columns(data, {self.column: column.map(
+            self.separator.join, na_action='ignore')}, in_place)
 
 
 @operation('transpose-rows-into-columns')
@@ -235,10 +859,13 @@ class TransposeRowsIntoColumnsOperation:
         parameters['rowCount'] (str): Number of rows to transpose
     """
 
+    row_local = False
+
     def __init__(self, parameters):
         """Initialise the operation."""
         self.description = parameters['description']
         self.column = parameters['columnName']
+        self.reads = {self.column}
         self.row_count = parameters['rowCount']
 
     def __call__(self, data):
@@ -251,14 +878,100 @@ class TransposeRowsIntoColumnsOperation:
             DataFrame: The transformed data.
 
         """
-        old_col = data[self.column]
-        new_col = [pd.Series(index=data.index, dtype=old_col.dtype)
-                   for _ in range(self.row_count)]
-        n_rows = len(old_col)
-        for i in range(self.row_count):
-            new_col[i][0:n_rows-i:self.row_count] \
-                = old_col[i:n_rows:self.row_count]
-
-        return data.drop(self.column, axis=1) \
-            .assign(**{'{} {}'.format(self.column, i + 1): new_col[i]
-                       for i in range(self.row_count)})
+        names = ['{} {}'.format(self.column, i + 1)
+                 for i in range(self.row_count)]
+        column = data[self.column]
+        if isinstance(column.dtype, np.dtype):
+            values = self._transpose(column.to_numpy())
+            # Passing the dtype stops pandas inferring types column by
+            # column, and the array is already laid out as a pandas block
+            new_data = pd.DataFrame(values.T, index=data.index,
+                                    columns=names, dtype=values.dtype,
+                                    copy=False)
+        else:
+            # Extension arrays can't be 2D, so build them one at a time
+            new_data = pd.DataFrame(
+                {name: self._take(column, i) for i, name in enumerate(names)},
+                index=data.index)
+
+        others = data.drop(columns=[self.column] + [
+            name for name in names if name in data.columns])
+        # Insert the other columns rather than concatenating, which would
+        # copy the new columns to consolidate them with others of their type
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', pd.errors.PerformanceWarning)
+            for i, (name, values) in enumerate(others.items()):
+                new_data.insert(i, name, values, allow_duplicates=True)
+        return new_data
+
+    def _transpose(self, values):
+        """Transpose a NumPy array of values into a 2D array.
+
+        Row ``i`` of the result is new column ``i``: its element
+        ``g * row_count`` holds value ``i`` of group ``g``, and its other
+        elements are missing. The array is allocated once, with a dtype
+        able to hold missing values (as for
+        :func:`pandas.api.extensions.take`), and filled by reshaping the
+        values rather than one column at a time.
+        """
+        count = self.row_count
+        if not len(values):
+            return np.empty((count, 0), dtype=values.dtype)
+        missing = pd.api.extensions.take(values[:0], np.array([-1]),
+                                         allow_fill=True)
+        # np.full is slow for object arrays, so fill an empty one instead
+        result = np.empty((count, len(values)), dtype=missing.dtype)
+        result.fill(missing[0])
+
+        complete = len(values) - len(values) % count
+        result[:, :complete:count] = values[:complete].reshape(-1, count).T
+        if complete < len(values):
+            result[:len(values) - complete, complete] = values[complete:]
+        return result
+
+    def _take(self, column, i):
+        """Return value i of each group at the group's first row."""
+        indexer = np.full(len(column), -1)
+        starts = np.arange(0, len(column) - i, self.row_count)
+        indexer[starts] = starts + i
+        return column.array.take(indexer, allow_fill=True)
+
+    def output_columns(self, columns):
+        """Return the columns that executing the operation would produce.
+
+        Args:
+            columns (list): The columns of the data before the operation.
+
+        Returns:
+            list: The columns afterwards.
+
+        """
+        return [col for col in columns if col != self.column] \
+            + ['{} {}'.format(self.column, i + 1)
+               for i in range(self.row_count)]
+
+    def stream(self, chunks):
+        """Execute the operation on consecutive chunks of a dataset.
+
+        Each chunk is cut at the start of its last incomplete group of
+        ``row_count`` rows, and the remainder is held back to be prepended
+        to the next chunk, so groups are never split across chunks.
+
+        Args:
+            chunks (iterable): DataFrames to transform, in order.
+
+        Yields:
+            DataFrame: The transformed chunks.
+
+        """
+        pending = None
+        for chunk in chunks:
+            if pending is not None:
+                chunk = pd.concat([pending, chunk])
+            complete = len(chunk) - len(chunk) % self.row_count
+            pending = chunk.iloc[complete:]
+            if complete:
+                yield self(chunk.iloc[:complete])
+
+        if pending is not None and len(pending):
+            yield self(pending)
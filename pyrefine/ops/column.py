@@ -5,11 +5,39 @@
     ColumnRemovalOperation
     ColumnRenameOperation
     ColumnMoveOperation
-    column_reorder_operation
-    column_addition_operation
+    ColumnReorderOperation
+    ColumnAdditionOperation
+    ColumnAdditionByFetchingURLsOperation
+    ColumnSplitOperation
+
+All of these operations but :class:`ColumnSplitOperation` and
+:class:`ColumnAdditionByFetchingURLsOperation` are row-local
+(``row_local = True``): they can be applied to a dataset one chunk of rows
+at a time. The exception is a column addition whose facets select records
+(see :mod:`pyrefine.facets`), which instead has a ``stream`` method
+applying it a record at a time. Fetching URLs also has a ``stream``
+method, so that it is kept in the main process rather than spread over
+workers. A column split cannot be applied in chunks at all, as the number
+of columns it creates depends on every row.
+
+For the benefit of :mod:`pyrefine.planner`, each operation lists the
+columns whose values it uses in ``reads`` (``None`` if that cannot be
+known) and has an ``output_columns`` method giving the columns it would
+produce from a given list of columns. They also support being executed
+in place (``supports_in_place = True``; see :mod:`pyrefine.ops.base`).
 """
+import warnings
+
+import numpy as np
+import pandas as pd
+
 from .base import operation
-from ..expressions import compile_expression
+from ..arrow import from_arrow, is_arrow_string, to_arrow_column, \
+    to_arrow_strings, to_objects
+from ..expressions import ColumnExpression
+from ..facets import Engine, expand_rows
+from ..fetching import ResponseCache, URLFetcher, default_cache_dir
+from ..records import blank_mask, record_chunks
 
 
 @operation('column-removal')
@@ -23,12 +51,27 @@ class ColumnRemovalOperation:
         parameters['columnName'] (str): Column to remove
     """
 
+    row_local = True
+    supports_in_place = True
+
     def __init__(self, parameters):
         """Initialise the operation."""
         self.description = parameters['description']
         self.column = parameters['columnName']
+        self.reads = set()
+
+    def output_columns(self, columns):
+        """Return the columns that executing the operation would produce.
+
+        Raises:
+            :exc:`KeyError`: If the column to be removed is not found.
+
+        """
+        if self.column not in columns:
+            raise KeyError(self.column)
+        return [col for col in columns if col != self.column]
 
-    def __call__(self, data):
+    def __call__(self, data, in_place=False):
         """Remove the specified column from ``data``.
 
         The column to remove is given by ``self.column``.
@@ -36,11 +79,15 @@ class ColumnRemovalOperation:
         Args:
             data (DataFrame): The data to transform. Not guaranteed
                 immutable.
+            in_place (bool): Whether ``data`` may be modified.
 
         Returns:
             DataFrame: The transformed data.
 
         """
+        if in_place:
+            del data[self.column]
+            return data
         return data.drop(self.column, axis=1)
 
 
@@ -56,42 +103,67 @@ class ColumnRenameOperation:
         parameters['newColumnName'] (str): New name for column
     """
 
+    row_local = True
+    supports_in_place = True
+
     def __init__(self, parameters):
         """Initialise the operation."""
         self.description = parameters['description']
         self.transform = {parameters['oldColumnName']:
                           parameters['newColumnName']}
+        self.reads = set()
+
+    def output_columns(self, columns):
+        """Return the columns that executing the operation would produce."""
+        return [self.transform.get(col, col) for col in columns]
 
-    def __call__(self, data):
+    def __call__(self, data, in_place=False):
         """Execute the operation.
 
         Args:
             data (DataFrame): The data to transform. Not guaranteed
                 immutable.
+            in_place (bool): Whether ``data`` may be modified.
 
         Returns:
             DataFrame: The transformed data.
 
         """
+        if in_place:
+            data.rename(columns=self.transform, inplace=True)
+            return data
         return data.rename(columns=self.transform)
 
 
 @operation('column-move')
 class ColumnMoveOperation:
-    """Move a specified column to a different position."""
+    """Move a specified column to a different position.
+
+    Expects a ``dict`` as loaded from OpenRefine JSON script.
+
+    Args:
+        parameters['description'] (str): Human-readable description
+        parameters['columnName'] (str): Column to move
+        parameters['index'] (int): New position for column
+    """
+
+    row_local = True
+    supports_in_place = True
 
     def __init__(self, parameters):
         """Initialise the operation."""
         self.description = parameters['description']
         self.column = parameters['columnName']
         self.index = parameters['index']
+        self.reads = set()
 
-    def __call__(self, data):
+    def __call__(self, data, in_place=False):
         """Execute the operation.
 
         Args:
             data (DataFrame): The data to transform. Not guaranteed
                 immutable.
+            in_place (bool): Whether ``data`` may be modified.
 
         Returns:
             DataFrame: The transformed data.
@@ -102,7 +174,21 @@ class ColumnMoveOperation:
             :exc:`KeyError`: If the column to be moved is not found.
 
         """
-        cols = list(data.columns)
+        columns = self.output_columns(data.columns)
+        if in_place:
+            return _reorder(data, columns)
+        return data[columns]
+
+    def output_columns(self, columns):
+        """Return the columns that executing the operation would produce.
+
+        Raises:
+            :exc:`IndexError`: If the target column index is less than 0 or
+                past the last column.
+            :exc:`KeyError`: If the column to be moved is not found.
+
+        """
+        cols = list(columns)
 
         if not (0 <= self.index < len(cols)):
             raise IndexError("Target column {} outside range (0, {})"
@@ -114,31 +200,562 @@ class ColumnMoveOperation:
         cols.remove(self.column)
         cols.insert(self.index, self.column)
 
-        return data[cols]
+        return cols
 
 
 @operation('column-reorder')
-def column_reorder_operation(params):
-    """Move a specified column to a different position."""
-    def exec_column_reorder_operation(data):
-        return data[params['columnNames']]
+class ColumnReorderOperation:
+    """Reorder columns, removing any that are not listed.
 
-    return exec_column_reorder_operation
+    Expects a ``dict`` as loaded from OpenRefine JSON script.
+
+    Args:
+        parameters['description'] (str): Human-readable description
+        parameters['columnNames'] (list): Columns to keep, in order
+    """
+
+    row_local = True
+    supports_in_place = True
+
+    def __init__(self, parameters):
+        """Initialise the operation."""
+        self.description = parameters['description']
+        self.columns = parameters['columnNames']
+        self.reads = set()
+
+    def output_columns(self, columns):
+        """Return the columns that executing the operation would produce.
+
+        Raises:
+            :exc:`KeyError`: If any of the listed columns is not found.
+
+        """
+        missing = [col for col in self.columns if col not in columns]
+        if missing:
+            raise KeyError(missing)
+        return list(self.columns)
+
+    def __call__(self, data, in_place=False):
+        """Execute the operation.
+
+        Args:
+            data (DataFrame): The data to transform. Not guaranteed
+                immutable.
+            in_place (bool): Whether ``data`` may be modified.
+
+        Returns:
+            DataFrame: The transformed data.
+
+        """
+        if in_place:
+            self.output_columns(data.columns)
+            for col in data.columns:
+                if col not in self.columns:
+                    del data[col]
+            return _reorder(data, self.columns)
+        return data[self.columns]
 
 
 @operation('column-addition')
-def column_addition_operation(params):
-    """Add a new column based on an existing one."""
-    base_column_name = params['baseColumnName']
-    new_column_name = params['newColumnName']
-    insert_index = params['columnInsertIndex']
-    expression = compile_expression(params['expression'],
-                                    on_error=params['onError'])
-
-    def exec_column_addition_operation(data):
-        new_cols = data.columns.insert(insert_index, new_column_name)
-        return data.assign(**{new_column_name:
-                              lambda row: expression(row[base_column_name])}) \
-                   .reindex(columns=new_cols)
-
-    return exec_column_addition_operation
+class ColumnAdditionOperation:
+    """Add a new column based on an existing one.
+
+    Expects a ``dict`` as loaded from OpenRefine JSON script.
+
+    The expression is only evaluated for the rows selected by the facets
+    of ``engineConfig`` (see :mod:`pyrefine.facets`), and the new column is
+    left blank in any others.
+
+    Args:
+        parameters['description'] (str): Human-readable description
+        parameters['baseColumnName'] (str): Column to pass to expression
+        parameters['newColumnName'] (str): Name of column to create
+        parameters['columnInsertIndex'] (int): Position of new column
+        parameters['expression'] (str): Expression to compute new values
+        parameters['onError'] (str): What to do if the expression fails
+        parameters['engineConfig'] (dict): Facets selecting rows to fill
+    """
+
+    row_local = True
+    supports_in_place = True
+
+    def __init__(self, parameters):
+        """Initialise the operation."""
+        self.description = parameters['description']
+        self.base_column = parameters['baseColumnName']
+        self.new_column = parameters['newColumnName']
+        self.insert_index = parameters['columnInsertIndex']
+        self.expression = ColumnExpression(parameters['expression'],
+                                           on_error=parameters['onError'])
+        self.engine = Engine(parameters.get('engineConfig'))
+        self.row_local = self.engine.row_local
+        others = self.expression.columns
+        self.reads = self.engine.reads(
+            None if others is None else {self.base_column} | others)
+
+    def output_columns(self, columns):
+        """Return the columns that executing the operation would produce."""
+        columns = list(columns)
+        columns.insert(self.insert_index, self.new_column)
+        return columns
+
+    def __call__(self, data, in_place=False):
+        """Execute the operation.
+
+        Args:
+            data (DataFrame): The data to transform. Not guaranteed
+                immutable.
+            in_place (bool): Whether ``data`` may be modified.
+
+        Returns:
+            DataFrame: The transformed data.
+
+        """
+        column = data[self.base_column]
+        mask = self.engine.mask(data)
+        if mask is None:
+            new_values = self.expression(column)
+        else:
+            new_values = expand_rows(self.expression(column[mask]), mask,
+                                     column)
+        return _insert_column(data, self.insert_index, self.new_column,
+                              new_values, in_place)
+
+    def stream(self, chunks):
+        """Execute the operation on consecutive chunks of a dataset.
+
+        Only needed if the facets select records: the chunks are re-cut so
+        that no record is split between two (see
+        :func:`~pyrefine.records.record_chunks`).
+
+        Args:
+            chunks (iterable): DataFrames to transform, in order.
+
+        Returns:
+            iterator: The transformed chunks.
+
+        """
+        return map(self, record_chunks(chunks))
+
+
+@operation('column-addition-by-fetching-urls')
+class ColumnAdditionByFetchingURLsOperation:
+    """Add a new column of the contents of URLs based on an existing column.
+
+    Expects a ``dict`` as loaded from OpenRefine JSON script.
+
+    The URL for each row selected by the facets of ``engineConfig`` is
+    given by an expression, and the text fetched from it becomes the value
+    of the new column. Blank URLs are not fetched. If a URL cannot be
+    fetched, the cell is left blank, or holds the exception if ``onError``
+    is "store-error".
+
+    URLs are fetched concurrently by a :class:`~pyrefine.fetching.URLFetcher`,
+    which keeps to the delay between requests to each host and caches the
+    responses on disk (see :mod:`pyrefine.fetching`). Fetching is done in
+    the process executing the script, so the operation is not row-local;
+    its ``stream`` method fetches the URLs for one chunk at a time.
+
+    Args:
+        parameters['description'] (str): Human-readable description
+        parameters['baseColumnName'] (str): Column to pass to expression
+        parameters['newColumnName'] (str): Name of column to create
+        parameters['columnInsertIndex'] (int): Position of new column
+        parameters['urlExpression'] (str): Expression to compute the URLs
+        parameters['onError'] (str): What to do if the expression or a
+            request fails
+        parameters['delay'] (int): Milliseconds between requests to a host
+        parameters['httpHeadersJson'] (list): Optional headers to send, as
+            ``{"name": ..., "value": ...}`` dicts
+        parameters['cacheResponses'] (bool): Whether to reuse responses
+            fetched before (default ``True``)
+        parameters['engineConfig'] (dict): Facets selecting rows to fill
+    """
+
+    row_local = False
+    supports_in_place = True
+
+    def __init__(self, parameters):
+        """Initialise the operation."""
+        self.description = parameters['description']
+        self.base_column = parameters['baseColumnName']
+        self.new_column = parameters['newColumnName']
+        self.insert_index = parameters['columnInsertIndex']
+        self.on_error = parameters['onError']
+        self.expression = ColumnExpression(parameters['urlExpression'],
+                                           on_error=self.on_error)
+        headers = {header['name']: header['value']
+                   for header in parameters.get('httpHeadersJson') or []
+                   if header.get('value')}
+        cache = None
+        if parameters.get('cacheResponses', True):
+            cache = ResponseCache(default_cache_dir())
+        self.fetcher = URLFetcher(delay=parameters.get('delay', 0) / 1000,
+                                  headers=headers, cache=cache)
+        self.engine = Engine(parameters.get('engineConfig'))
+        others = self.expression.columns
+        self.reads = self.engine.reads(
+            None if others is None else {self.base_column} | others)
+
+    def output_columns(self, columns):
+        """Return the columns that executing the operation would produce."""
+        columns = list(columns)
+        columns.insert(self.insert_index, self.new_column)
+        return columns
+
+    def __call__(self, data, in_place=False):
+        """Execute the operation.
+
+        Args:
+            data (DataFrame): The data to transform. Not guaranteed
+                immutable.
+            in_place (bool): Whether ``data`` may be modified.
+
+        Returns:
+            DataFrame: The transformed data.
+
+        """
+        column = data[self.base_column]
+        mask = self.engine.mask(data)
+        if mask is None:
+            new_values = self._fetch(self.expression(column))
+        else:
+            urls = self.expression(column[mask])
+            new_values = expand_rows(self._fetch(urls), mask, column)
+        return _insert_column(data, self.insert_index, self.new_column,
+                              new_values, in_place)
+
+    def stream(self, chunks):
+        """Execute the operation on consecutive chunks of a dataset.
+
+        The same fetcher is used for every chunk, so the delay between
+        requests to a host is kept to from one chunk to the next. If the
+        facets select records, the chunks are re-cut so that no record is
+        split between two (see :func:`~pyrefine.records.record_chunks`).
+
+        Args:
+            chunks (iterable): DataFrames to transform, in order.
+
+        Returns:
+            iterator: The transformed chunks.
+
+        """
+        if self.engine.record_based:
+            chunks = record_chunks(chunks)
+        return map(self, chunks)
+
+    def _fetch(self, urls):
+        """Fetch the text for a Series of URLs."""
+        values = to_objects(urls)
+        # Errors stored by the URL expression are kept as they are
+        errors = np.fromiter((isinstance(value, Exception)
+                              for value in values),
+                             dtype=bool, count=len(values))
+        fetch = ~blank_mask(urls) & ~errors
+
+        output = np.where(errors, values, None)
+        bodies = self.fetcher.fetch([str(value) for value in values[fetch]])
+        keep_errors = self.on_error == 'store-error'
+        for i, body in zip(np.flatnonzero(fetch), bodies):
+            if keep_errors or not isinstance(body, Exception):
+                output[i] = body
+        output = pd.Series(output, index=urls.index, name=urls.name)
+        if is_arrow_string(urls):
+            # Keep strings in the same representation as they came in
+            output = to_arrow_column(output)
+        return output
+
+
+def _insert_column(data, index, name, values, in_place):
+    """Insert a new column into ``data``, in place if allowed."""
+    if in_place and name not in data.columns:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', pd.errors.PerformanceWarning)
+            data.insert(index, name, values)
+        return data
+    new_cols = data.columns.insert(index, name)
+    return data.assign(**{name: values}).reindex(columns=new_cols)
+
+
+def _reorder(data, columns):
+    """Rearrange the columns of ``data`` in place.
+
+    Only the columns that are out of place are copied, one at a time,
+    rather than the whole dataset.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', pd.errors.PerformanceWarning)
+        for position, col in enumerate(columns):
+            if data.columns[position] != col:
+                data.insert(position, col, data.pop(col))
+    return data
+
+
+@operation('column-split')
+class ColumnSplitOperation:
+    """Split a column into several, by separator or by field lengths.
+
+    Expects a ``dict`` as loaded from OpenRefine JSON script.
+
+    The new columns are named after the original, numbered from 1, and
+    placed after it. As many are created as the value with the most pieces
+    has, or at most ``maxColumns`` if that is set, in which case the last
+    piece holds the rest of the value. Blank values are not split, and
+    neither are the values of any rows not selected by the facets of
+    ``engineConfig``.
+
+    With :mod:`pyarrow` installed, the whole column is split at once with
+    Arrow compute kernels into one flat array of pieces, from which every
+    new column is taken in turn, rather than by splitting each value in
+    Python. Otherwise pandas' vectorised string methods are used.
+
+    Like OpenRefine (which uses Java's ``Pattern.split``), splitting by a
+    regular expression without ``maxColumns`` drops any empty pieces at the
+    end of a value. With ``guessCellType``, pieces that are whole numbers
+    become integers and other finite numbers become floats.
+
+    Args:
+        parameters['description'] (str): Human-readable description
+        parameters['columnName'] (str): Column to split
+        parameters['mode'] (str): "separator" or "lengths"
+        parameters['separator'] (str): String or pattern to split on
+        parameters['regex'] (bool): Whether the separator is a pattern
+        parameters['maxColumns'] (int): The most columns to create, or 0
+        parameters['fieldLengths'] (list): Lengths of the pieces, in
+            "lengths" mode
+        parameters['guessCellType'] (bool): Whether to convert numbers
+        parameters['removeOriginalColumn'] (bool): Whether to remove the
+            column that was split
+        parameters['engineConfig'] (dict): Facets selecting rows to split
+    """
+
+    row_local = False
+    supports_in_place = True
+
+    def __init__(self, parameters):
+        """Initialise the operation."""
+        self.description = parameters['description']
+        self.column = parameters['columnName']
+        self.by_lengths = parameters.get('mode', 'separator') == 'lengths'
+        self.separator = parameters.get('separator')
+        self.regex = parameters.get('regex', False)
+        self.max_columns = parameters.get('maxColumns', 0) or 0
+        self.field_lengths = parameters.get('fieldLengths', [])
+        self.guess_cell_type = parameters.get('guessCellType', False)
+        self.remove_original = parameters.get('removeOriginalColumn', False)
+        self.engine = Engine(parameters.get('engineConfig'))
+        self.reads = self.engine.reads({self.column})
+
+    def output_columns(self, columns):
+        """Return the columns that executing the operation would produce.
+
+        Raises:
+            :exc:`KeyError`: Always, as the number of new columns depends
+                on the values being split.
+
+        """
+        raise KeyError('Columns split from "{}" depend on its values'
+                       .format(self.column))
+
+    def __call__(self, data, in_place=False):
+        """Execute the operation.
+
+        Args:
+            data (DataFrame): The data to transform. Not guaranteed
+                immutable.
+            in_place (bool): Whether ``data`` may be modified.
+
+        Returns:
+            DataFrame: The transformed data.
+
+        Raises:
+            :exc:`KeyError`: If the column to split is not found.
+
+        """
+        column = data[self.column]
+        selected = ~blank_mask(column)
+        mask = self.engine.mask(data)
+        if mask is not None:
+            selected &= mask
+
+        pieces = self._split(column[selected])
+        if self.guess_cell_type:
+            pieces = [_guess_cell_type(piece) for piece in pieces]
+
+        if not selected.all():
+            pieces = [expand_rows(piece, selected, column) for piece in pieces]
+
+        if not in_place:
+            data = data.copy()
+        position = data.columns.get_loc(self.column) + 1
+        if self.remove_original:
+            del data[self.column]
+            position -= 1
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', pd.errors.PerformanceWarning)
+            for i, piece in enumerate(pieces):
+                name = _unduplicated('{} {}'.format(self.column, i + 1),
+                                     data.columns)
+                data.insert(position + i, name, piece)
+        return data
+
+    def _split(self, column):
+        """Split non-blank values into a list of columns of pieces.
+
+        The pieces are Arrow-backed strings if the values were, or else
+        Python strings.
+        """
+        strings = column if column.dtype == object \
+            or is_arrow_string(column) else column.astype(str)
+        try:
+            array = to_arrow_strings(strings)
+        except (ImportError, TypeError):
+            # Convert anything but strings, as OpenRefine would
+            array = None
+            if not is_arrow_string(strings):
+                strings = strings.map(str)
+
+        if self.by_lengths:
+            return self._split_lengths(strings, array)
+
+        if array is not None:
+            import pyarrow as pa
+            import pyarrow.compute as pc
+            max_splits = self.max_columns - 1 if self.max_columns else None
+            try:
+                if self.regex:
+                    lists = pc.split_pattern_regex(array, self.separator,
+                                                   max_splits=max_splits)
+                else:
+                    lists = pc.split_pattern(array, self.separator,
+                                             max_splits=max_splits)
+            except pa.ArrowInvalid:
+                # A pattern Arrow's regular expressions do not support
+                pass
+            else:
+                return self._list_columns(lists, column)
+
+        pieces = strings.str.split(self.separator,
+                                   n=self.max_columns - 1 or -1,
+                                   expand=True, regex=bool(self.regex))
+        if not len(pieces.columns):
+            return []
+        values = pieces.to_numpy(dtype=object)
+        values[pd.isnull(values)] = None
+        if self.regex and not self.max_columns:
+            empty = (values == '') | np.equal(values, None)
+            trailing = np.logical_and.accumulate(empty[:, ::-1],
+                                                 axis=1)[:, ::-1]
+            values[trailing] = None
+            values = values[:, :values.shape[1] - trailing.all(axis=0).sum()]
+        return [pd.Series(values[:, i], index=column.index, name=column.name)
+                for i in range(values.shape[1])]
+
+    def _list_columns(self, lists, like):
+        """Take a column of the i-th pieces of an Arrow list array, for each i.
+
+        Only the offsets of the lists are used, to find the position of each
+        piece in the flat array of all of them. The pieces are taken as
+        Python strings unless ``like`` holds Arrow-backed strings, in which
+        case each piece is converted only once.
+        """
+        import pyarrow as pa
+
+        offsets = np.asarray(lists.offsets)
+        items = lists.values
+        starts, lengths = offsets[:-1], np.diff(offsets)
+
+        if self.regex and not self.max_columns and len(items):
+            # Drop trailing empty pieces, as Java's Pattern.split does
+            local = np.arange(len(items)) - np.repeat(starts, lengths)
+            kept = np.where(np.asarray(items) != '', local + 1, 0)
+            ends = np.maximum.reduceat(np.append(kept, 0),
+                                       np.minimum(starts, len(items)))
+            lengths = np.where(lengths > 0, ends, 0)
+
+        count = lengths.max() if len(lengths) else 0
+        if is_arrow_string(like):
+            return [from_arrow(items.take(pa.array(starts + i,
+                                                   mask=lengths <= i)), like)
+                    for i in range(count)]
+
+        items = items.to_numpy(zero_copy_only=False)
+        pieces = []
+        for i in range(count):
+            # Empty arrays of objects are full of None
+            values = np.empty(len(starts), dtype=object)
+            present = lengths > i
+            values[present] = items[starts[present] + i]
+            pieces.append(pd.Series(values, index=like.index,
+                                    name=like.name))
+        return pieces
+
+    def _split_lengths(self, strings, array):
+        """Cut values into pieces of the given lengths.
+
+        There are fewer pieces for shorter values.
+        """
+        bounds = np.cumsum([0] + list(self.field_lengths))
+        lengths = strings.str.len().to_numpy()
+        count = np.count_nonzero(bounds[:-1] < lengths.max()) \
+            if len(lengths) else 0
+
+        pieces = []
+        for start, stop in zip(bounds[:count], bounds[1:count + 1]):
+            if array is not None:
+                import pyarrow as pa
+                import pyarrow.compute as pc
+                piece = pc.utf8_slice_codeunits(array, start, stop)
+                piece = pc.if_else(pa.array(lengths > start), piece,
+                                   pa.nulls(len(piece), type=pa.string()))
+                piece = from_arrow(piece, strings)
+                if not is_arrow_string(strings):
+                    piece = pd.Series(to_objects(piece), index=strings.index,
+                                      name=strings.name)
+            else:
+                piece = strings.str.slice(start, stop) \
+                    .where(lengths > start, None)
+            pieces.append(piece)
+        return pieces
+
+
+_INTEGER = r'[+-]?[0-9]+'
+
+
+def _guess_cell_type(pieces):
+    """Convert the pieces that are numbers into numbers.
+
+    Like OpenRefine, pieces are stripped of whitespace for the purpose, and
+    whole numbers become integers, other finite numbers become floats, and
+    anything else is left alone. Each distinct piece is only parsed once.
+    """
+    codes, uniques = pd.factorize(pieces)
+    stripped = pd.Series(uniques, dtype=object).str.strip()
+    numbers = pd.to_numeric(stripped.to_numpy(), errors='coerce')
+    parsed = np.isfinite(numbers)
+    if not parsed.any():
+        return pieces
+
+    integers = parsed & stripped.str.fullmatch(_INTEGER) \
+        .to_numpy(dtype=bool, na_value=False)
+    guessed = np.asarray(uniques, dtype=object)
+    guessed[parsed] = numbers[parsed].tolist()
+    if integers.any():
+        guessed[integers] = pd.to_numeric(
+            stripped[integers].to_numpy()).tolist()
+
+    values = guessed.take(codes)
+    values[codes < 0] = None
+    column = pd.Series(values, index=pieces.index, name=pieces.name)
+    if parsed.all():
+        return column.infer_objects()
+    return to_arrow_column(column) if is_arrow_string(pieces) else column
+
+
+def _unduplicated(name, columns):
+    """Make a column name unique, as OpenRefine does."""
+    unique, i = name, 1
+    while unique in columns:
+        i += 1
+        unique = '{}{}'.format(name, i)
+    return unique
@@ -0,0 +1,123 @@
+"""Execute scripts using several processes at once.
+
+Most operations are row-local: each row is transformed independently of
+the others, so the data can be split into blocks of rows which are
+transformed in separate processes and then put back together.
+:class:`ParallelExecutor` does this for each run of consecutive row-local
+operations in a script. Order-dependent operations (such as fill-down)
+act as barriers: the blocks are reassembled and the operation is executed
+on the whole dataset in the main process.
+
+Operations are pickled to be sent to the worker processes. Expressions
+are sent as source code and compiled again by each worker (see
+:class:`~pyrefine.expressions.ColumnExpression`), so any expression caches
+are local to a worker.
+
+.. autosummary::
+
+    ParallelExecutor
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import groupby
+import os
+
+import numpy as np
+import pandas as pd
+
+
+def _apply(operations, block):
+    """Apply a list of operations to a block of rows, in a worker."""
+    for op in operations:
+        block = op(block)
+    return block
+
+
+def _concat(blocks):
+    """Reassemble blocks of rows, as if they had never been split.
+
+    Operations infer the types of the columns they create from the values
+    they see, so the same column may have a different dtype in different
+    blocks. Those columns are inferred again from all of their values.
+    """
+    result = pd.concat(blocks)
+    for column in result.columns:
+        dtypes = {block[column].dtype for block in blocks}
+        if len(dtypes) > 1:
+            values = pd.concat([block[column].astype(object)
+                                for block in blocks])
+            result[column] = values.infer_objects()
+    return result
+
+
+class ParallelExecutor:
+    """Execute the row-local operations of scripts in a process pool.
+
+    Example::
+
+        with ParallelExecutor(jobs=8) as executor:
+            output_data = executor.execute(script, input_data)
+
+    Args:
+        jobs (int): The number of worker processes. Defaults to the number
+            of CPUs.
+        min_rows (int): Datasets with fewer rows than this are transformed
+            in the main process, as the cost of sending them to the workers
+            would outweigh any gain.
+    """
+
+    def __init__(self, jobs=None, min_rows=10000):
+        """Configure the executor; workers are started when first needed."""
+        self.jobs = jobs or os.cpu_count() or 1
+        self.min_rows = min_rows
+        self._pool = None
+
+    def __enter__(self):
+        """Return the executor itself."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Shut down the worker processes."""
+        self.shutdown()
+
+    def shutdown(self):
+        """Shut down the worker processes, if any were started."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def execute(self, script, data):
+        """Execute all operations of a script on the provided dataset.
+
+        Args:
+            script (:class:`~pyrefine.script.Script`): The script to
+                execute.
+            data (:class:`pandas.DataFrame`): The data to transform. Not
+                guaranteed immutable.
+
+        Returns:
+            :class:`pandas.DataFrame`: The transformed data, the same as
+            would be returned by :meth:`Script.execute
+            <pyrefine.script.Script.execute>`.
+
+        """
+        stages = groupby(script.operations,
+                         key=lambda op: getattr(op, 'row_local', False))
+        for row_local, operations in stages:
+            operations = list(operations)
+            if row_local and self.jobs > 1 and len(data) >= self.min_rows:
+                data = self._map(operations, data)
+            else:
+                data = _apply(operations, data)
+        return data
+
+    def _map(self, operations, data):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.jobs)
+
+        bounds = np.linspace(0, len(data), self.jobs + 1, dtype=int)
+        blocks = (data.iloc[start:stop]
+                  for start, stop in zip(bounds[:-1], bounds[1:]))
+        return _concat(list(self._pool.map(partial(_apply, operations),
+                                           blocks)))
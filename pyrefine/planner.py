@@ -0,0 +1,353 @@
+"""Optimise scripts before executing them.
+
+OpenRefine records every step taken in a project, including steps whose
+effect is later undone: columns are renamed several times, added and then
+removed again, or edited by several mass-edits in a row. :class:`Plan`
+rewrites the operations of a script into an equivalent sequence that does
+less work:
+
+* consecutive column renames are fused into one;
+* consecutive mass-edits of the same column are merged into one, so the
+  column is only scanned once, if they have the same facets (which do not
+  depend on that column);
+* column removals are moved as early as possible, so that less data flows
+  through the operations in between; and
+* operations whose results are removed without being used are dropped,
+  such as column additions whose new column is removed unread.
+
+If the columns of the data are known, reorders that leave out columns are
+also split into removals followed by the reorder, so those removals can be
+moved too. Any columns removed at the very start of the plan need not be
+read at all; see :meth:`Script.project <pyrefine.script.Script.project>`.
+
+Rewrites rely on operations' ``reads`` attribute and ``output_columns``
+method (see :mod:`pyrefine.ops.column`): operations without them are never
+moved past or dropped. A removal can only be moved before an operation
+that inserts or moves a column by position if the columns of the data are
+known, so that the position can be adjusted.
+
+.. autosummary::
+
+    Plan
+"""
+
+import copy
+
+from .ops.cell import BlankDownOperation, FillDownOperation, \
+    MassEditOperation, TextTransformOperation
+from .ops.column import ColumnAdditionOperation, ColumnMoveOperation, \
+    ColumnRemovalOperation, ColumnRenameOperation, ColumnReorderOperation
+
+# Operations which only change the values of ``op.column`` in place
+_IN_PLACE = (MassEditOperation, FillDownOperation, BlankDownOperation,
+             TextTransformOperation)
+
+
+def _output_columns(op, columns):
+    """Return the columns after op, or None if they cannot be determined."""
+    if columns is None or getattr(op, 'reads', None) is None:
+        return None
+    elif not hasattr(op, 'output_columns'):
+        return list(columns)
+
+    try:
+        return op.output_columns(columns)
+    except (KeyError, IndexError):
+        return None
+
+
+class Plan:
+    """An optimised sequence of operations, equivalent to the original.
+
+    Example::
+
+        plan = Plan(script.operations, columns=data.columns)
+        print(plan.explain())
+
+    Args:
+        operations (list): The operations to optimise, in order. They are
+            not modified, but those left unchanged are shared by the plan.
+        columns (list): The columns of the data to which the operations
+            will be applied, if known. More rewrites are possible if so.
+
+    Attributes:
+        operations (list): The optimised operations, in order.
+        sources (list): For each optimised operation, a tuple of the
+            positions of the original operations it was made from.
+        rewrites (list): Descriptions of the operations fused or dropped.
+    """
+
+    def __init__(self, operations, columns=None):
+        """Optimise the operations."""
+        self.original = list(operations)
+        self.columns = None if columns is None else list(columns)
+        self.operations = list(operations)
+        self.sources = [(i,) for i in range(len(self.operations))]
+        self.rewrites = []
+
+        while (self._fuse_renames() or self._merge_mass_edits()
+               or self._split_reorders() or self._push_removal()):
+            pass
+
+    def __len__(self):
+        """Return the number of operations in the plan."""
+        return len(self.operations)
+
+    def _replace(self, start, stop, replacements):
+        """Replace operations[start:stop] with (op, sources) pairs."""
+        self.operations[start:stop] = [op for op, _ in replacements]
+        self.sources[start:stop] = [sources for _, sources in replacements]
+
+    def _describe(self, i):
+        sources = self.sources[i]
+        return '{} "{}"'.format(
+            ' + '.join('#{}'.format(source) for source in sources),
+            self.operations[i].description)
+
+    def _schemas(self):
+        """Return the columns of the data before each operation."""
+        schemas = []
+        columns = self.columns
+        for op in self.operations:
+            schemas.append(columns)
+            columns = _output_columns(op, columns)
+        return schemas
+
+    def _fuse_renames(self):
+        schemas = None
+        for i in range(len(self.operations) - 1):
+            first, second = self.operations[i:i + 2]
+            if not (isinstance(first, ColumnRenameOperation)
+                    and isinstance(second, ColumnRenameOperation)):
+                continue
+
+            # Like OpenRefine, assume that column names are unique
+            if schemas is None:
+                schemas = self._schemas()
+            if schemas[i] is not None:
+                after = first.output_columns(schemas[i])
+                if len(set(after)) < len(after):
+                    continue
+
+            transform = {}
+            for old, new in first.transform.items():
+                transform[old] = second.transform.get(new, new)
+            targets = set(first.transform.values())
+            for old, new in second.transform.items():
+                if old not in first.transform and old not in targets:
+                    transform[old] = new
+            transform = {old: new for old, new in transform.items()
+                         if old != new}
+
+            self.rewrites.append('Fused renames {} and {}'.format(
+                self._describe(i), self._describe(i + 1)))
+            sources = self.sources[i] + self.sources[i + 1]
+            if transform:
+                fused = copy.copy(first)
+                fused.transform = transform
+                fused.description = '; '.join([first.description,
+                                               second.description])
+                self._replace(i, i + 2, [(fused, sources)])
+            else:
+                self._replace(i, i + 2, [])
+            return True
+
+        return False
+
+    def _merge_mass_edits(self):
+        for i in range(len(self.operations) - 1):
+            first, second = self.operations[i:i + 2]
+            if not (isinstance(first, MassEditOperation)
+                    and isinstance(second, MassEditOperation)
+                    and first.column == second.column
+                    and first.engine.key == second.engine.key):
+                continue
+            # The first edit must not change which rows the second selects
+            if first.engine.facets and (first.engine.columns is None
+                                        or first.column
+                                        in first.engine.columns):
+                continue
+
+            merged = MassEditOperation({
+                'description': '; '.join([first.description,
+                                          second.description]),
+                'columnName': first.column,
+                'edits': first.edits + second.edits,
+                'engineConfig': first.engine.config})
+            merged.engine = first.engine
+            self.rewrites.append('Merged mass edits {} and {}'.format(
+                self._describe(i), self._describe(i + 1)))
+            self._replace(i, i + 2,
+                          [(merged, self.sources[i] + self.sources[i + 1])])
+            return True
+
+        return False
+
+    def _split_reorders(self):
+        schemas = None
+        for i, op in enumerate(self.operations):
+            if not isinstance(op, ColumnReorderOperation):
+                continue
+            if schemas is None:
+                schemas = self._schemas()
+            columns = schemas[i]
+            if columns is None or len(set(columns)) < len(columns):
+                continue
+
+            dropped = [col for col in columns if col not in op.columns]
+            if not dropped:
+                continue
+
+            removals = [ColumnRemovalOperation({
+                'description': 'Remove column {}'.format(col),
+                'columnName': col}) for col in dropped]
+            self.rewrites.append('Split removal of {} out of {}'.format(
+                ', '.join('"{}"'.format(col) for col in dropped),
+                self._describe(i)))
+            self._replace(i, i, [(removal, self.sources[i])
+                                 for removal in removals])
+            return True
+
+        return False
+
+    def _push_removal(self):
+        schemas = None
+        for i, removal in enumerate(self.operations):
+            if not isinstance(removal, ColumnRemovalOperation):
+                continue
+
+            # Removals never pass each other, so look past any before this
+            j = i - 1
+            while j >= 0 and isinstance(self.operations[j],
+                                        ColumnRemovalOperation):
+                if self.operations[j].column == removal.column:
+                    break
+                j -= 1
+            if j < 0 or isinstance(self.operations[j],
+                                   ColumnRemovalOperation):
+                continue
+
+            if schemas is None:
+                schemas = self._schemas()
+            if self._move_before(j, i, schemas[j]):
+                return True
+
+        return False
+
+    def _move_before(self, j, i, columns):
+        """Try to move the removal at i before the operation at j.
+
+        Args:
+            j (int): The position of the operation to move before. Only
+                removals may lie between it and the removal.
+            i (int): The position of the removal.
+            columns (list): The columns before operation j, or None.
+
+        Returns:
+            bool: Whether the plan was changed.
+
+        """
+        op, removal = self.operations[j], self.operations[i]
+        column = removal.column
+        reads = getattr(op, 'reads', None)
+        if reads is None:
+            return False
+        between = list(zip(self.operations[j + 1:i], self.sources[j + 1:i]))
+        moved = (removal, self.sources[i])
+
+        if column in reads:
+            if isinstance(op, _IN_PLACE) and op.column == column:
+                self.rewrites.append(
+                    'Dropped {} as column "{}" is removed by {}'.format(
+                        self._describe(j), column, self._describe(i)))
+                self._replace(j, j + 1, [])
+                return True
+            return False
+
+        if isinstance(op, ColumnAdditionOperation) \
+                and op.new_column == column:
+            if columns is not None and column in columns:
+                return False
+            self.rewrites.append(
+                'Dropped {} as column "{}" is removed by {} unread'.format(
+                    self._describe(j), column, self._describe(i)))
+            self._replace(j, i + 1, between)
+            return True
+
+        if isinstance(op, ColumnRenameOperation):
+            renamed = [old for old, new in op.transform.items()
+                       if new == column]
+            if renamed:
+                removal = copy.copy(removal)
+                removal.column = renamed[0]
+                moved = (removal, moved[1])
+                op = copy.copy(op)
+                op.transform = {old: new for old, new in op.transform.items()
+                                if old != renamed[0]}
+                if not op.transform:
+                    self.rewrites.append(
+                        'Dropped {} as the column it renames is removed by '
+                        '{}'.format(self._describe(j), self._describe(i)))
+                    self._replace(j, i + 1, [moved] + between)
+                    return True
+            elif column in op.transform:
+                return False
+
+        elif isinstance(op, ColumnReorderOperation):
+            if column not in op.columns:
+                return False
+            op = copy.copy(op)
+            op.columns = [col for col in op.columns if col != column]
+
+        elif isinstance(op, (ColumnAdditionOperation, ColumnMoveOperation)):
+            # These place a column by position, which must be adjusted
+            after = _output_columns(op, columns)
+            if after is None or column not in columns:
+                return False
+            after.remove(column)
+            if isinstance(op, ColumnMoveOperation) and op.column == column:
+                self.rewrites.append(
+                    'Dropped {} as column "{}" is removed by {}'.format(
+                        self._describe(j), column, self._describe(i)))
+                self._replace(j, j + 1, [])
+                return True
+            op = copy.copy(op)
+            if isinstance(op, ColumnAdditionOperation):
+                op.insert_index = after.index(op.new_column)
+            else:
+                op.index = after.index(op.column)
+
+        elif hasattr(op, 'output_columns'):
+            # Anything else that changes the columns must keep this one
+            after = _output_columns(op, columns)
+            if after is None or column not in columns \
+                    or after.count(column) != 1:
+                return False
+
+        self._replace(j, i + 1, [moved, (op, self.sources[j])] + between)
+        return True
+
+    def explain(self):
+        """Describe the optimised plan.
+
+        Returns:
+            str: A table of the optimised operations, giving the positions
+            of the original operations each was made from, followed by a
+            list of the operations fused or dropped.
+
+        """
+        lines = ['{} operations, optimised to {}:'.format(
+            len(self.original), len(self.operations))]
+        sources = [','.join(map(str, source)) for source in self.sources]
+        width = max([len('From')] + [len(source) for source in sources])
+        lines.append('  #  {}  Operation'.format('From'.ljust(width)))
+        for i, (op, source) in enumerate(zip(self.operations, sources)):
+            lines.append('{:3d}  {}  {}'.format(i, source.ljust(width),
+                                                op.description))
+
+        if self.rewrites:
+            lines.append('')
+            lines.append('Rewrites:')
+            lines.extend('  - ' + rewrite for rewrite in self.rewrites)
+
+        return '\n'.join(lines)
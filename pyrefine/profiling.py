@@ -0,0 +1,191 @@
+"""Instrument the execution of scripts.
+
+:meth:`Script.execute <pyrefine.script.Script.execute>` accepts a list of
+hooks, each of which is told before and after every operation is run. A
+hook is any object with ``before`` and ``after`` methods taking the same
+arguments as those of :class:`ExecutionHook`, so it is simple to forward
+events to an external metrics system. A hook may also have an ``error``
+method, to be told of an operation that raises an exception.
+:class:`Profiler` is a hook that records how long each operation took and
+how much memory it used.
+
+.. autosummary::
+
+    ExecutionHook
+    Profiler
+    OperationProfile
+"""
+
+from collections import namedtuple
+import json
+import time
+import tracemalloc
+
+
+class ExecutionHook:
+    """Base class for hooks passed to :meth:`Script.execute`.
+
+    All of the methods do nothing by default, so subclasses need only
+    override the one(s) they need.
+    """
+
+    def before(self, index, op, data):
+        """Call before an operation is executed.
+
+        Args:
+            index (int): Position of the operation in the script.
+            op: The operation about to be executed.
+            data (DataFrame): The data the operation will be given.
+        """
+        pass
+
+    def after(self, index, op, data):
+        """Call after an operation has been executed.
+
+        Args:
+            index (int): Position of the operation in the script.
+            op: The operation just executed.
+            data (DataFrame): The data the operation returned.
+        """
+        pass
+
+    def error(self, index, op, error):
+        """Call if an operation raises an exception, instead of ``after``.
+
+        The exception is raised again once every hook has been told.
+
+        Args:
+            index (int): Position of the operation in the script.
+            op: The operation that failed.
+            error (BaseException): The exception it raised.
+        """
+        pass
+
+
+OperationProfile = namedtuple('OperationProfile', [
+    'index', 'description', 'wall_time', 'cpu_time', 'peak_memory',
+    'rows_in', 'columns_in', 'rows_out', 'columns_out'])
+OperationProfile.__doc__ = """Measurements of a single executed operation.
+
+Times are in seconds. ``peak_memory`` is the most memory (in bytes)
+allocated by the operation at any one time, or ``None`` if memory was not
+being traced.
+"""
+
+
+class Profiler(ExecutionHook):
+    """Record time and memory used by each operation of a script.
+
+    Example::
+
+        profiler = Profiler()
+        script.execute(data, hooks=[profiler])
+        print(profiler.report())
+
+    Args:
+        memory (bool): Whether to trace memory allocations with
+            :mod:`tracemalloc`. This slows execution down noticeably.
+
+    Attributes:
+        records (list): An :class:`OperationProfile` for each operation
+            executed so far.
+    """
+
+    def __init__(self, memory=True):
+        """Initialise the profiler."""
+        self.memory = memory
+        self.records = []
+        self._started_tracing = False
+
+    def before(self, index, op, data):
+        """Note the state of things before an operation runs."""
+        self._shape_in = data.shape
+
+        if self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            elif hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            self._memory_in, _ = tracemalloc.get_traced_memory()
+
+        self._cpu_in = time.process_time()
+        self._wall_in = time.perf_counter()
+
+    def after(self, index, op, data):
+        """Record measurements for the operation just run."""
+        wall_time = time.perf_counter() - self._wall_in
+        cpu_time = time.process_time() - self._cpu_in
+
+        peak_memory = None
+        if self.memory:
+            _, peak = tracemalloc.get_traced_memory()
+            peak_memory = max(peak - self._memory_in, 0)
+            self._stop_tracing()
+
+        self.records.append(OperationProfile(
+            index=index,
+            description=getattr(op, 'description', repr(op)),
+            wall_time=wall_time,
+            cpu_time=cpu_time,
+            peak_memory=peak_memory,
+            rows_in=self._shape_in[0],
+            columns_in=self._shape_in[1],
+            rows_out=data.shape[0],
+            columns_out=data.shape[1]))
+
+    def error(self, index, op, error):
+        """Stop tracing memory, if this profiler started it."""
+        self._stop_tracing()
+
+    def _stop_tracing(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def report(self, format='table'):
+        """Summarise the recorded measurements.
+
+        Args:
+            format (str): Either "table", for a plain-text table, or "json".
+
+        Returns:
+            str: The formatted report.
+
+        Raises:
+            :exc:`ValueError`: If the format is not recognised.
+
+        """
+        if format == 'table':
+            return self._report_table()
+        elif format == 'json':
+            return json.dumps([record._asdict() for record in self.records],
+                              indent=2)
+        else:
+            raise ValueError('Unknown report format "{}"'.format(format))
+
+    def _report_table(self):
+        header = ('#', 'Wall (s)', 'CPU (s)', 'Peak (MiB)',
+                  'Rows', 'Columns', 'Operation')
+        rows = [(str(r.index),
+                 '{:.4f}'.format(r.wall_time),
+                 '{:.4f}'.format(r.cpu_time),
+                 '-' if r.peak_memory is None
+                 else '{:.1f}'.format(r.peak_memory / 2 ** 20),
+                 '{} -> {}'.format(r.rows_in, r.rows_out),
+                 '{} -> {}'.format(r.columns_in, r.columns_out),
+                 r.description)
+                for r in self.records]
+        rows.append(('', '{:.4f}'.format(sum(r.wall_time
+                                             for r in self.records)),
+                     '{:.4f}'.format(sum(r.cpu_time for r in self.records)),
+                     '', '', '', 'Total'))
+
+        widths = [max(len(row[i]) for row in [header] + rows)
+                  for i in range(len(header) - 1)]
+        lines = []
+        for row in [header] + rows:
+            cells = [cell.rjust(width) for cell, width in zip(row, widths)]
+            lines.append('  '.join(cells + [row[-1]]).rstrip())
+
+        return '\n'.join(lines)
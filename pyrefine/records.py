@@ -0,0 +1,259 @@
+"""Group the rows of a dataset into records.
+
+OpenRefine can treat a dataset as a series of records rather than of rows.
+A record starts at each row whose first column, the key column, is not
+blank, and carries on over the rows below it whose key is blank. Any rows
+before the first non-blank key form a record of their own.
+
+A :class:`RecordIndex` numbers the record of every row at once from the
+key column, so that operations in record mode (see :mod:`pyrefine.facets`)
+can work on whole records with array operations rather than looping over
+them. As a script transforms a dataset, a :class:`RecordTracker` keeps its
+index up to date: the index is reused for as long as the key column is
+unchanged, and patched rather than rebuilt when only some of its rows are
+edited.
+
+.. autosummary::
+
+    RecordIndex
+    RecordTracker
+    record_ids
+    record_chunks
+    blank_mask
+"""
+
+import numpy as np
+import pandas as pd
+
+from .arrow import is_arrow_list, is_arrow_string, to_arrow
+
+
+def blank_mask(column):
+    """Return a boolean array of the cells of a Series that are blank.
+
+    Like OpenRefine's ``isBlank``, missing values and empty strings are
+    blank.
+    """
+    if is_arrow_string(column):
+        import pyarrow.compute as pc
+        return np.asarray(pc.fill_null(pc.equal(to_arrow(column), ''), True))
+    elif is_arrow_list(column):
+        return column.isna().to_numpy()
+
+    values = column.to_numpy()
+    blank = pd.isnull(values)
+    if values.dtype == object:
+        blank |= np.fromiter((type(value) is str and not value
+                              for value in values),
+                             dtype=bool, count=len(values))
+    return blank
+
+
+def _same_values(new, old):
+    """Check whether two columns hold the same values.
+
+    Columns that share an array need not be compared, as operations never
+    modify arrays in place.
+    """
+    if new.array is old.array:
+        return True
+    if new.dtype == old.dtype and isinstance(new.dtype, np.dtype):
+        new_values = new.to_numpy().__array_interface__
+        old_values = old.to_numpy().__array_interface__
+        if all(new_values[key] == old_values[key]
+               for key in ('data', 'shape', 'strides')):
+            return True
+    return new.equals(old)
+
+
+class RecordIndex:
+    """The record to which each row of a dataset belongs.
+
+    Example::
+
+        records = RecordIndex.from_data(data)
+        first_rows = data[records.starts]
+
+    Args:
+        key (:class:`pandas.Series`): The key column, or ``None`` for a
+            dataset without columns.
+        starts (:class:`numpy.ndarray`): Whether each row starts a record,
+            if already known. Worked out from ``key`` otherwise.
+
+    Attributes:
+        key (:class:`pandas.Series`): The key column.
+        starts (:class:`numpy.ndarray`): Whether each row starts a record.
+        ids (:class:`numpy.ndarray`): The number of the record of each
+            row. Records are numbered in order from 1, with 0 for any rows
+            before the first record.
+    """
+
+    def __init__(self, key, starts=None):
+        """Work out the record of each row."""
+        if starts is None:
+            starts = ~blank_mask(key)
+        self.key = key
+        self.starts = starts
+        self.ids = np.cumsum(starts)
+        self.starts.flags.writeable = self.ids.flags.writeable = False
+
+    @classmethod
+    def from_data(cls, data):
+        """Index the records of a dataset, keyed by its first column."""
+        if not len(data.columns):
+            return cls(None, np.zeros(len(data), dtype=bool))
+        return cls(data.iloc[:, 0])
+
+    def __len__(self):
+        """Return the number of rows."""
+        return len(self.ids)
+
+    def matches(self, data):
+        """Check whether the index still describes the records of a dataset.
+
+        It does if the dataset has the same number of rows, and the same key
+        column with the same values.
+        """
+        if len(data) != len(self):
+            return False
+        elif self.key is None or not len(data.columns):
+            return self.key is None and not len(data.columns)
+        return data.columns[0] == self.key.name \
+            and _same_values(data.iloc[:, 0], self.key)
+
+    def any(self, mask):
+        """Select every row of each record in which any row is selected.
+
+        Args:
+            mask (:class:`numpy.ndarray`): Whether each row is selected.
+
+        Returns:
+            :class:`numpy.ndarray`: Whether each row's record is selected.
+
+        """
+        if not len(self):
+            return np.zeros(0, dtype=bool)
+        selected = np.bincount(self.ids[mask], minlength=self.ids[-1] + 1)
+        return selected[self.ids] > 0
+
+    def replace(self, key, mask=None):
+        """Index the records after some of the key values are replaced.
+
+        Only the replaced values are checked for blanks again.
+
+        Args:
+            key (:class:`pandas.Series`): The new key column.
+            mask (:class:`numpy.ndarray`): Which rows were replaced, or
+                ``None`` if any of them may have been.
+
+        Returns:
+            :class:`RecordIndex`: The new index.
+
+        """
+        if mask is None:
+            return RecordIndex(key)
+        starts = self.starts.copy()
+        starts[mask] = ~blank_mask(key[mask])
+        return RecordIndex(key, starts)
+
+
+class RecordTracker:
+    """Keep the record index of a dataset up to date as it is transformed.
+
+    The operations of a script share a tracker through their
+    :class:`~pyrefine.facets.Engine`. Each asks it for the records of the
+    dataset it is given, and tells it before replacing the values of a
+    column, in case that is the key column.
+
+    Attributes:
+        index (:class:`RecordIndex`): The last index, if any.
+        hits (int): How many times the last index was reused.
+        misses (int): How many indexes were built from scratch.
+    """
+
+    def __init__(self):
+        """Start without an index."""
+        self.index = None
+        self.hits = self.misses = 0
+
+    def __getstate__(self):
+        """Leave out the index, for pickling."""
+        state = self.__dict__.copy()
+        state['index'] = None
+        return state
+
+    def __call__(self, data):
+        """Return the record index of a dataset.
+
+        Args:
+            data (:class:`pandas.DataFrame`): The dataset.
+
+        Returns:
+            :class:`RecordIndex`: The index, which is reused if it still
+            matches the dataset.
+
+        """
+        if self.index is not None and self.index.matches(data):
+            self.hits += 1
+        else:
+            self.misses += 1
+            self.index = RecordIndex.from_data(data)
+        return self.index
+
+    def replace(self, data, column, mask=None):
+        """Note that the values of a column of a dataset are being replaced.
+
+        If it is the key column, the index of the dataset is patched to
+        match the new values.
+
+        Args:
+            data (:class:`pandas.DataFrame`): The dataset, as it was before.
+            column (:class:`pandas.Series`): The new values of the column.
+            mask (:class:`numpy.ndarray`): Which rows were replaced, or
+                ``None`` if any of them may have been.
+
+        """
+        index = self.index
+        if index is not None and index.key is not None \
+                and column.name == index.key.name and index.matches(data):
+            self.index = index.replace(column, mask)
+
+
+def record_ids(data):
+    """Work out which record each row of a dataset belongs to.
+
+    Returns:
+        :class:`numpy.ndarray`: The record number of each row; see
+        :class:`RecordIndex`.
+
+    """
+    return RecordIndex.from_data(data).ids
+
+
+def record_chunks(chunks):
+    """Re-cut the chunks of a dataset so that no record is split between two.
+
+    The last record of each chunk is held back and put in front of the next
+    chunk, so that operations in record mode can be applied one chunk at a
+    time.
+
+    Args:
+        chunks (iterable): :class:`pandas.DataFrame` chunks of the dataset,
+            in order.
+
+    Returns:
+        iterator: Chunks holding whole records, in order.
+
+    """
+    held = None
+    for chunk in chunks:
+        if held is not None:
+            chunk = pd.concat([held, chunk])
+        starts = np.flatnonzero(RecordIndex.from_data(chunk).starts)
+        last = starts[-1] if len(starts) else 0
+        if last:
+            yield chunk.iloc[:last]
+        held = chunk.iloc[last:]
+
+    if held is not None:
+        yield held
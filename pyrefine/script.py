@@ -3,7 +3,12 @@
 import json
 import os
 
+from .expressions import ColumnExpression, ExpressionCache
+from .facets import share_engines
 from .ops import create
+from .ops.column import ColumnRemovalOperation
+from .parallel import ParallelExecutor
+from .planner import Plan
 
 
 class Script(object):
@@ -15,27 +20,259 @@ class Script(object):
             self.parsed_script = json.loads(s)
             self.operations = [create(params)
                                for params in self.parsed_script]
+            share_engines(self.operations)
 
     def __len__(self):
         """Return the number of operations."""
         return len(self.operations)
 
-    def execute(self, data):
+    def plan(self, columns=None):
+        """Optimise the script's operations.
+
+        Args:
+            columns (list): The columns of the data the script will be
+                executed on, if known. More rewrites are possible if so.
+
+        Returns:
+            :class:`~pyrefine.planner.Plan`: The optimised plan.
+
+        """
+        return Plan(self.operations, columns)
+
+    def optimize(self, columns=None):
+        """Return an equivalent script with redundant operations removed.
+
+        See :mod:`pyrefine.planner` for the rewrites applied.
+
+        Args:
+            columns (list): The columns of the data the script will be
+                executed on, if known. If given, the optimised script must
+                only be executed on data with these columns.
+
+        Returns:
+            :class:`Script`: The optimised script.
+
+        """
+        optimized = Script()
+        optimized.operations = self.plan(columns).operations
+        return optimized
+
+    def project(self, columns):
+        """Optimise the script to read only the columns it needs.
+
+        Input columns that are removed before any operation uses them need
+        not be read at all. The script is optimised (see :meth:`optimize`)
+        so that such columns are removed at the very start; those removals
+        are then dropped, leaving a script to be executed on just the
+        remaining columns.
+
+        Args:
+            columns (list): The columns of the data the script will be
+                executed on.
+
+        Returns:
+            tuple: The optimised :class:`Script`, and a list of the columns
+            it needs, in their original order. The script must only be
+            executed on data with exactly those columns.
+
+        """
+        operations = self.plan(columns).operations
+        unused = set()
+        for op in operations:
+            if not isinstance(op, ColumnRemovalOperation) \
+                    or len(unused) + 1 >= len(columns):
+                break
+            unused.add(op.column)
+
+        projected = Script()
+        projected.operations = operations[len(unused):]
+        return projected, [col for col in columns if col not in unused]
+
+    def required_columns(self, columns):
+        """Find which input columns the script needs.
+
+        Args:
+            columns (list): The columns of the data the script will be
+                executed on.
+
+        Returns:
+            list: The columns that are used or kept by the script, in their
+            original order. See :meth:`project`.
+
+        """
+        return self.project(columns)[1]
+
+    def explain(self, columns=None):
+        """Describe how the script would be optimised.
+
+        Args:
+            columns (list): The columns of the data the script will be
+                executed on, if known.
+
+        Returns:
+            str: The optimised plan; see
+            :meth:`Plan.explain <pyrefine.planner.Plan.explain>`.
+
+        """
+        return self.plan(columns).explain()
+
+    def memoize(self, maxsize=10 ** 5, assume_pure=False):
+        """Evaluate expressions only once for each distinct value.
+
+        Gives each operation whose expression is pure (see
+        :func:`~pyrefine.expressions.is_pure`) its own
+        :class:`~pyrefine.expressions.ExpressionCache`. This pays off for
+        columns with many repeated values.
+
+        Args:
+            maxsize (int): The most results to cache for each expression,
+                or ``None`` for no limit.
+            assume_pure (bool): Cache the results of every expression,
+                even those that appear to depend on more than the value.
+
+        Returns:
+            dict: The cache for each memoized operation, keyed by the
+            operation's position in the script.
+
+        """
+        caches = {}
+        for index, op in enumerate(self.operations):
+            expression = getattr(op, 'expression', None)
+            if not isinstance(expression, ColumnExpression):
+                continue
+            if assume_pure:
+                expression.pure = True
+            if expression.pure:
+                expression.cache = caches[index] = ExpressionCache(maxsize)
+        return caches
+
+    def execute(self, data, hooks=(), in_place=False, checkpoints=None):
         """Execute all operations on the provided dataset.
 
+        By default each operation returns a copy of the whole dataset, so a
+        script of many operations makes many copies. With ``in_place`` set,
+        the dataset is instead passed from one operation to the next, and
+        operations that support it (see :mod:`pyrefine.ops.base`) replace,
+        add or remove its columns in place. Only a shallow copy is made at
+        the start, so ``data`` itself is left as it was, but the result may
+        share the arrays of any columns left untouched with it.
+
         Args:
             data (:class:`pandas.DataFrame`): The data to transform. Not
                 guaranteed immutable.
+            hooks (list): Objects to notify before and after each operation
+                is executed, or if it fails, such as a
+                :class:`~pyrefine.profiling.Profiler`. See
+                :class:`~pyrefine.profiling.ExecutionHook`.
+            in_place (bool): Whether to avoid copying the whole dataset for
+                each operation.
+            checkpoints (:class:`~pyrefine.checkpoints.CheckpointStore`):
+                Where to store the data after each operation, and to start
+                from the data after the last operation already stored
+                rather than executing the script from the beginning. Hooks
+                are only notified of the operations actually executed.
 
         Returns:
             :class:`pandas.DataFrame`: The transformed data.
 
+        Raises:
+            :exc:`ValueError`: If given checkpoints for a script not parsed
+                from JSON, such as an optimised script.
+
         """
-        for op in self.operations:
-            data = op(data)
+        start = 0
+        if checkpoints is not None:
+            steps = getattr(self, 'parsed_script', None)
+            if steps is None or len(steps) != len(self.operations):
+                raise ValueError('Checkpoints need the JSON parameters of '
+                                 'each operation, which only a parsed '
+                                 'script has')
+            keys = checkpoints.keys(data, steps)
+            start, resumed = checkpoints.resume(keys)
+            if resumed is not None:
+                data = resumed
+
+        if in_place:
+            data = data.copy(deep=False)
+
+        for index, op in enumerate(self.operations[start:], start):
+            for hook in hooks:
+                hook.before(index, op, data)
+
+            try:
+                if in_place and getattr(op, 'supports_in_place', False):
+                    data = op(data, in_place=True)
+                else:
+                    data = op(data)
+            except BaseException as error:
+                for hook in hooks:
+                    if hasattr(hook, 'error'):
+                        hook.error(index, op, error)
+                raise
+
+            for hook in hooks:
+                hook.after(index, op, data)
+
+            if checkpoints is not None:
+                checkpoints.put(keys[index + 1], data)
 
         return data
 
+    def execute_parallel(self, data, jobs=None):
+        """Execute all operations, spreading the work over several processes.
+
+        Consecutive row-local operations are applied to blocks of rows in a
+        pool of worker processes; see
+        :class:`~pyrefine.parallel.ParallelExecutor`. The result is the same
+        as that of :meth:`execute`.
+
+        Args:
+            data (:class:`pandas.DataFrame`): The data to transform. Not
+                guaranteed immutable.
+            jobs (int): The number of worker processes. Defaults to the
+                number of CPUs.
+
+        Returns:
+            :class:`pandas.DataFrame`: The transformed data.
+
+        """
+        with ParallelExecutor(jobs) as executor:
+            return executor.execute(self, data)
+
+    def execute_chunked(self, chunks):
+        """Execute all operations on a dataset supplied in chunks.
+
+        Row-local operations are applied to each chunk independently;
+        order-dependent operations carry state from one chunk to the next
+        via their ``stream`` method. Chunks are pulled through the whole
+        pipeline one at a time, so only a few need be held in memory.
+
+        Args:
+            chunks (iterable): :class:`pandas.DataFrame` chunks of the data
+                to transform, in order (e.g. as returned by
+                :func:`pandas.read_csv` with ``chunksize`` set). Not
+                guaranteed immutable.
+
+        Returns:
+            iterator: The transformed chunks, in order. These do not
+            necessarily correspond one-to-one with the input chunks.
+
+        Raises:
+            :exc:`RuntimeError`: If an operation cannot be executed in
+                chunks.
+
+        """
+        for op in self.operations:
+            if getattr(op, 'row_local', False):
+                chunks = map(op, chunks)
+            elif hasattr(op, 'stream'):
+                chunks = op.stream(chunks)
+            else:
+                raise RuntimeError('Operation "{}" cannot be executed in '
+                                   'chunks'.format(op.description))
+
+        return iter(chunks)
+
 
 def load_script(f):
     """Load and parse the script given.
@@ -0,0 +1,488 @@
+"""Serve scripts over HTTP from a pool of warm worker processes.
+
+Starting ``pyrefine execute`` for every file to be transformed means
+starting Python, importing pandas and compiling the script each time,
+which can take far longer than transforming a small file. A
+:class:`ScriptServer` instead holds scripts in memory and transforms data
+sent to it in a pool of worker processes that have already imported
+everything they need. Each worker parses a script, and compiles its
+expressions, the first time it is asked to execute it.
+
+:func:`make_server` puts a :class:`ScriptServer` behind a small HTTP API,
+on a TCP port or a Unix socket (see ``pyrefine serve``):
+
+``PUT /scripts/NAME``
+    Register the JSON script in the body as ``NAME``, replacing any script
+    of that name. Responds 201, or 400 with the problems found (see
+    :func:`~pyrefine.validation.validate`).
+``GET /scripts``
+    List the names of the scripts registered.
+``DELETE /scripts/NAME``
+    Forget a script.
+``POST /scripts/NAME``
+    Transform the data in the body with the script. The data is CSV unless
+    its ``Content-Type`` is that of Parquet or Feather (see
+    :data:`MEDIA_TYPES`), and the result is in the same format, unless
+    another is given as ``?format=``. Responds 422 if the script fails, or
+    503 if too many requests are waiting already.
+``GET /metrics``
+    Report the number of requests and their latency, as JSON (see
+    :meth:`ScriptServer.metrics`).
+
+Requests are transformed in the order they arrive, as many at a time as
+there are workers; the rest wait in a queue. Once ``max_pending`` requests
+are waiting or being transformed, more are turned away at once with 503
+rather than queued, so a client sending too much data learns to back off
+instead of timing out.
+
+.. autosummary::
+
+    ScriptServer
+    ServerBusy
+    make_server
+"""
+
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import importlib
+import io
+import json
+import os
+import socketserver
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from .io import FORMATS, read_data, write_data
+from .ops.base import OPERATION_MODULES
+from .validation import validate
+
+MEDIA_TYPES = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+    'feather': 'application/vnd.apache.arrow.file',
+}
+"""The media type of each data format, for ``Content-Type`` headers."""
+
+
+class ServerBusy(Exception):
+    """Raised when too many requests are waiting to be transformed."""
+
+
+_Result = namedtuple('_Result', ['data', 'rows', 'seconds'])
+
+# The scripts parsed by this worker process, by name, with their versions
+_worker_scripts = {}
+
+
+def _init_worker():
+    """Import everything a worker will need before any request arrives."""
+    import pandas                                   # noqa: F401
+    for module in set(OPERATION_MODULES.values()):
+        importlib.import_module(module)
+
+
+def _ready():
+    return os.getpid()
+
+
+def _transform(name, version, text, body, input_format, output_format,
+               arrow_strings):
+    """Transform one payload with a script, in a worker process."""
+    from .script import parse
+
+    start = time.perf_counter()
+    cached = _worker_scripts.get(name)
+    if cached is None or cached[0] != version:
+        cached = _worker_scripts[name] = (version, parse(text))
+    script = cached[1]
+
+    data = read_data(io.BytesIO(body), input_format,
+                     arrow_strings=arrow_strings)
+    data = script.execute(data, in_place=True)
+    if output_format == 'csv':
+        out = io.StringIO()
+        write_data(data, out, 'csv')
+        output = out.getvalue().encode('utf-8')
+    else:
+        out = io.BytesIO()
+        write_data(data, out, output_format)
+        output = out.getvalue()
+    return _Result(output, len(data), time.perf_counter() - start)
+
+
+def _summary(samples):
+    """Summarise a list of latencies, in seconds."""
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+    return {'count': len(ordered), 'mean': sum(ordered) / len(ordered),
+            'p50': percentile(50), 'p90': percentile(90),
+            'p99': percentile(99), 'max': ordered[-1]}
+
+
+class ScriptServer:
+    """Hold scripts in memory and execute them in warm worker processes.
+
+    The workers are started straight away, and import pandas and the
+    operations before any request arrives.
+
+    Example::
+
+        with ScriptServer(jobs=4) as server:
+            server.register('clean', open('clean.json').read())
+            output = server.transform('clean', open('in.csv', 'rb').read())
+
+    Args:
+        jobs (int): The number of worker processes. Defaults to the number
+            of CPUs.
+        max_pending (int): The most requests that may be waiting or being
+            transformed at once. Defaults to four per worker.
+        arrow_strings (bool): Whether to read strings into Arrow arrays.
+        samples (int): How many of the latest requests to keep the latency
+            of, for :meth:`metrics`.
+
+    Attributes:
+        scripts (dict): The JSON text of each script registered, by name.
+    """
+
+    def __init__(self, jobs=None, max_pending=None, arrow_strings=False,
+                 samples=1000):
+        """Start the worker processes."""
+        self.jobs = jobs or os.cpu_count() or 1
+        self.max_pending = max_pending or 4 * self.jobs
+        self.arrow_strings = arrow_strings
+        self.scripts = {}
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._counts = {'requests': 0, 'succeeded': 0, 'failed': 0,
+                        'rejected': 0}
+        self._latency = deque(maxlen=samples)
+        self._queue_time = deque(maxlen=samples)
+        self._script_latency = {}
+        self._samples = samples
+        self._pool = self._start_pool()
+
+    def __enter__(self):
+        """Return the server itself."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Shut down the worker processes."""
+        self.shutdown()
+
+    def _start_pool(self):
+        pool = ProcessPoolExecutor(max_workers=self.jobs,
+                                   initializer=_init_worker)
+        # Start every worker now, rather than while requests wait
+        for future in [pool.submit(_ready) for _ in range(self.jobs)]:
+            future.result()
+        return pool
+
+    def shutdown(self):
+        """Shut down the worker processes."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
+
+    def register(self, name, text):
+        """Register a script, replacing any other of the same name.
+
+        The script is checked and parsed here, so that mistakes are found
+        straight away rather than by the first request to use it.
+
+        Args:
+            name (str): The name to execute the script by.
+            text (str): The script, as JSON.
+
+        Returns:
+            :class:`~pyrefine.script.Script`: The parsed script.
+
+        Raises:
+            :exc:`ValueError`: If the script is not valid. For problems
+                found by :func:`~pyrefine.validation.validate`, the
+                second argument is the list of them.
+
+        """
+        from .script import parse
+
+        try:
+            operations = json.loads(text)
+        except ValueError as error:
+            raise ValueError('Invalid JSON: {}'.format(error), [])
+        problems = validate(operations)
+        if problems:
+            raise ValueError('Invalid script', problems)
+        try:
+            script = parse(text)
+        except Exception as error:
+            raise ValueError('{}: {}'.format(type(error).__name__, error),
+                             [])
+
+        with self._lock:
+            self.scripts[name] = text
+            self._versions[name] = self._versions.get(name, 0) + 1
+        return script
+
+    def unregister(self, name):
+        """Forget a script.
+
+        Raises:
+            :exc:`KeyError`: If no script of that name is registered.
+
+        """
+        with self._lock:
+            del self.scripts[name]
+
+    def transform(self, name, body, input_format='csv', output_format=None):
+        """Transform data with a registered script.
+
+        Blocks until a worker has transformed the data.
+
+        Args:
+            name (str): The name of the script.
+            body (bytes): The data, in a file format.
+            input_format (str): The format of ``body``.
+            output_format (str): The format to return the result in, by
+                default that of the input.
+
+        Returns:
+            tuple: The transformed data as :class:`bytes`, and its number
+            of rows.
+
+        Raises:
+            :exc:`KeyError`: If no script of that name is registered.
+            :exc:`ServerBusy`: If ``max_pending`` requests are already
+                waiting or being transformed.
+            :exc:`Exception`: Whatever the script raised, if it failed.
+
+        """
+        with self._lock:
+            text = self.scripts[name]
+            version = self._versions[name]
+            self._counts['requests'] += 1
+            if self._pending >= self.max_pending:
+                self._counts['rejected'] += 1
+                raise ServerBusy('{} requests are already pending'
+                                 .format(self.max_pending))
+            self._pending += 1
+            pool = self._pool
+
+        start = time.perf_counter()
+        try:
+            if pool is None:
+                raise RuntimeError('The server has been shut down')
+            future = pool.submit(
+                _transform, name, version, text, body, input_format,
+                output_format or input_format, self.arrow_strings)
+            result = future.result()
+        except BrokenProcessPool:
+            # A worker died, e.g. out of memory: replace the whole pool
+            self._restart(pool)
+            self._record(name, start, None)
+            raise
+        except Exception:
+            self._record(name, start, None)
+            raise
+        self._record(name, start, result)
+        return result.data, result.rows
+
+    def _restart(self, broken):
+        """Replace a broken pool, unless another request already has.
+
+        Requests wait for the new pool rather than find none.
+        """
+        with self._lock:
+            if broken is not self._pool:
+                return
+            broken.shutdown(wait=False)
+            self._pool = self._start_pool()
+
+    def _record(self, name, start, result):
+        latency = time.perf_counter() - start
+        with self._lock:
+            self._pending -= 1
+            self._counts['failed' if result is None else 'succeeded'] += 1
+            self._latency.append(latency)
+            self._script_latency.setdefault(
+                name, deque(maxlen=self._samples)).append(latency)
+            if result is not None:
+                self._queue_time.append(max(0, latency - result.seconds))
+
+    def metrics(self):
+        """Report on the requests served so far.
+
+        Latencies are in seconds, from a request being submitted until its
+        result is ready, and cover the latest ``samples`` requests. The
+        queue time is the part of that spent waiting for a worker and
+        sending the data to and from it.
+
+        Returns:
+            dict: ``requests`` (including rejected ones), ``succeeded``,
+            ``failed``, ``rejected``, ``pending``, ``max_pending``,
+            ``workers``, then ``latency`` and ``queue_time`` summaries
+            (``count``, ``mean``, ``p50``, ``p90``, ``p99`` and ``max``)
+            and the ``latency`` of each script under ``scripts``.
+
+        """
+        with self._lock:
+            return dict(
+                self._counts, pending=self._pending,
+                max_pending=self.max_pending, workers=self.jobs,
+                latency=_summary(self._latency),
+                queue_time=_summary(self._queue_time),
+                scripts={name: {'latency': _summary(samples)}
+                         for name, samples in self._script_latency.items()})
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Answer requests for the server's :class:`ScriptServer`."""
+
+    server_version = 'pyrefine'
+
+    def address_string(self):
+        # Clients of a Unix socket have no address
+        return self.client_address[0] if self.client_address else 'local'
+
+    def _reply(self, status, body=b'', content_type='application/json',
+               headers=()):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for header in headers:
+            self.send_header(*header)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, message, **details):
+        self._reply(status, dict(details, error=message))
+
+    def _body(self):
+        length = self.headers.get('Content-Length')
+        if length is None:
+            self._error(411, 'Content-Length is required')
+            return None
+        return self.rfile.read(int(length))
+
+    def _route(self):
+        """Split the path into the script name, if any, and the query."""
+        url = urlsplit(self.path)
+        parts = url.path.strip('/').split('/')
+        query = {key: values[-1]
+                 for key, values in parse_qs(url.query).items()}
+        return parts, query
+
+    def do_GET(self):
+        parts, _ = self._route()
+        scripts = self.server.scripts
+        if parts == ['scripts']:
+            self._reply(200, sorted(scripts.scripts))
+        elif parts == ['metrics']:
+            self._reply(200, scripts.metrics())
+        else:
+            self._error(404, 'Not found')
+
+    def do_PUT(self):
+        parts, _ = self._route()
+        if len(parts) != 2 or parts[0] != 'scripts':
+            return self._error(404, 'Not found')
+        body = self._body()
+        if body is None:
+            return
+        try:
+            text = body.decode('utf-8')
+        except UnicodeDecodeError:
+            return self._error(400, 'The script must be UTF-8')
+        try:
+            script = self.server.scripts.register(parts[1], text)
+        except ValueError as error:
+            message, problems = error.args
+            return self._error(400, message, problems=[
+                problem._asdict() for problem in problems])
+        self._reply(201, {'name': parts[1], 'operations': len(script)})
+
+    def do_DELETE(self):
+        parts, _ = self._route()
+        if len(parts) != 2 or parts[0] != 'scripts':
+            return self._error(404, 'Not found')
+        try:
+            self.server.scripts.unregister(parts[1])
+        except KeyError:
+            return self._error(404, 'No script named {}'.format(parts[1]))
+        self._reply(204)
+
+    def do_POST(self):
+        parts, query = self._route()
+        if len(parts) != 2 or parts[0] != 'scripts':
+            return self._error(404, 'Not found')
+        content_type = self.headers.get('Content-Type', MEDIA_TYPES['csv'])
+        formats = {media: format for format, media in MEDIA_TYPES.items()}
+        input_format = formats.get(content_type.split(';')[0].strip(),
+                                   'csv')
+        output_format = query.get('format', input_format)
+        if output_format not in FORMATS:
+            return self._error(400, 'Unknown format: {}'
+                                    .format(output_format))
+        if parts[1] not in self.server.scripts.scripts:
+            return self._error(404, 'No script named {}'.format(parts[1]))
+        body = self._body()
+        if body is None:
+            return
+
+        try:
+            data, rows = self.server.scripts.transform(
+                parts[1], body, input_format, output_format)
+        except ServerBusy as error:
+            return self._reply(503, {'error': str(error)},
+                               headers=[('Retry-After', '1')])
+        except Exception as error:
+            return self._error(422, '{}: {}'.format(type(error).__name__,
+                                                    error))
+        self._reply(200, data, MEDIA_TYPES[output_format],
+                    headers=[('X-Rows', str(rows))])
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn,
+                      socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        socketserver.UnixStreamServer.server_bind(self)
+        self.server_name, self.server_port = 'localhost', 0
+
+
+def make_server(scripts, host='127.0.0.1', port=8000, socket_path=None):
+    """Make an HTTP server for a :class:`ScriptServer`.
+
+    Each request is handled in its own thread, which waits for a worker
+    to transform its data.
+
+    Args:
+        scripts (ScriptServer): The scripts to serve.
+        host (str): The address to listen on.
+        port (int): The port to listen on, or 0 for any free port.
+        socket_path (str): A Unix socket to listen on instead of a port.
+
+    Returns:
+        :class:`socketserver.BaseServer`: The server, ready to
+        :meth:`~socketserver.BaseServer.serve_forever`.
+
+    """
+    if socket_path is not None:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = _UnixHTTPServer(socket_path, _Handler)
+    else:
+        server = ThreadingHTTPServer((host, port), _Handler)
+    server.scripts = scripts
+    return server
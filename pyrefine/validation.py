@@ -0,0 +1,289 @@
+"""Check scripts without executing them.
+
+:func:`validate` checks that a script is a list of operations pyrefine
+knows, each with the parameters it needs and of the right JSON types, and
+that their expressions and facets parse. It imports neither pandas nor the
+modules that define the operations, so it takes a few milliseconds, and
+can be run before every execution (see ``pyrefine validate``).
+
+A script that passes may still fail when executed, e.g. if it refers to
+columns the data does not have.
+
+.. autosummary::
+
+    validate
+    validate_script
+    Problem
+"""
+
+from collections import namedtuple
+import json
+import os
+
+from . import grel
+from .ops.base import _operations
+
+Problem = namedtuple('Problem', ['index', 'op', 'message'])
+Problem.__doc__ = """Something wrong with a script.
+
+Attributes:
+    index (int): The position of the operation in the script, or ``None``
+        if the problem is with the script as a whole.
+    op (str): The name of the operation, if known.
+    message (str): What is wrong.
+"""
+
+
+# Each check returns a list of what is wrong with a value, as tuples of
+# the path to the part that is wrong (a list of keys and indices) and a
+# message.
+
+def _json_type(*types):
+    """Check that a value is of one of the given JSON types."""
+    names = ' or '.join(_TYPE_NAMES[t] for t in types)
+
+    def check(value):
+        # JSON's true and false are not numbers
+        if isinstance(value, bool) and bool not in types \
+                or not isinstance(value, types):
+            return [([], 'must be ' + names)]
+        return []
+
+    return check
+
+
+_TYPE_NAMES = {str: 'a string', int: 'an integer', float: 'a number',
+               bool: 'true or false', list: 'an array', dict: 'an object',
+               type(None): 'null'}
+
+_STRING = _json_type(str)
+_INTEGER = _json_type(int)
+_NUMBER = _json_type(int, float)
+_BOOLEAN = _json_type(bool)
+_ARRAY = _json_type(list)
+_OBJECT = _json_type(dict)
+
+
+def _anything(value):
+    return []
+
+
+def _choice(*choices):
+    """Check that a value is one of the given strings."""
+    def check(value):
+        if value not in choices:
+            return [([], 'must be one of '
+                     + ', '.join(map(repr, choices)))]
+        return []
+
+    return check
+
+
+def _array_of(check_item):
+    """Check that a value is an array, and each of its items."""
+    def check(value):
+        if not isinstance(value, list):
+            return [([], 'must be an array')]
+        return [([i] + path, message)
+                for i, item in enumerate(value)
+                for path, message in check_item(item)]
+
+    return check
+
+
+def _expression(value):
+    """Check that an expression is a string that compiles."""
+    if not isinstance(value, str):
+        return [([], 'must be a string')]
+    language, code = grel.split_language(value)
+    if language == 'grel':
+        try:
+            grel.parse(code)
+        except grel.GrelSyntaxError as error:
+            return [([], 'is not valid GREL: {}'.format(error))]
+    elif language == 'jython':
+        # As compiled by pyrefine.expressions.compile_expression
+        source = '\n'.join(['def expression_func(value):']
+                           + ['    ' + line for line in code.splitlines()])
+        try:
+            compile(source, 'pyrefine_exp', 'exec')
+        except SyntaxError as error:
+            return [([], 'is not valid Jython: {}'.format(error.msg))]
+    else:
+        return [([], 'uses an unsupported language: {}'
+                 .format(language))]
+    return []
+
+
+def _object(required, optional=None):
+    """Check an object's parameters.
+
+    Args:
+        required (dict): Checks for the parameters it must have, by name.
+        optional (dict): Checks for those it may have.
+
+    """
+    optional = optional or {}
+
+    def check(value):
+        if not isinstance(value, dict):
+            return [([], 'must be an object')]
+        problems = [([name], 'is missing')
+                    for name in required if name not in value]
+        for checks in (required, optional):
+            for name, check_value in checks.items():
+                if name in value:
+                    problems.extend(([name] + path, message)
+                                    for path, message
+                                    in check_value(value[name]))
+        return problems
+
+    return check
+
+
+_FACET = {'columnName': _STRING, 'expression': _expression}
+
+_FACETS = {
+    'list': _object(dict(_FACET, selection=_array_of(_object(
+        {'v': _object({'v': _anything})})))),
+    'range': _object(_FACET, {'from': _NUMBER, 'to': _NUMBER}),
+    'text': _object(_FACET, {'query': _json_type(str, type(None)),
+                             'mode': _choice('text', 'regex')}),
+}
+
+
+def _facet(value):
+    if not isinstance(value, dict):
+        return [([], 'must be an object')]
+    facet_type = value.get('type', 'list')
+    if facet_type not in _FACETS:
+        return [(['type'], 'is unknown: "{}"'.format(facet_type))]
+    return _FACETS[facet_type](value)
+
+
+_ENGINE_CONFIG = _object({}, {
+    'mode': _choice('row-based', 'record-based'),
+    'facets': _array_of(_facet),
+})
+
+_ON_ERROR = _choice('set-to-blank', 'store-error', 'keep-original')
+
+_EDIT = _object({'from': _ARRAY, 'to': _anything,
+                 'fromBlank': _BOOLEAN})
+
+_OPERATIONS = {
+    'core/mass-edit': (
+        {'columnName': _STRING, 'edits': _array_of(_EDIT)},
+        {'engineConfig': _ENGINE_CONFIG}),
+    'core/blank-down': (
+        {'columnName': _STRING}, {'engineConfig': _ENGINE_CONFIG}),
+    'core/fill-down': (
+        {'columnName': _STRING}, {'engineConfig': _ENGINE_CONFIG}),
+    'core/text-transform': (
+        {'columnName': _STRING, 'expression': _expression,
+         'onError': _ON_ERROR},
+        {'repeat': _BOOLEAN, 'repeatCount': _INTEGER,
+         'engineConfig': _ENGINE_CONFIG}),
+    'core/multivalued-cell-split': (
+        {'columnName': _STRING, 'separator': _STRING}, {}),
+    'core/multivalued-cell-join': (
+        {'columnName': _STRING, 'separator': _STRING}, {}),
+    'core/transpose-rows-into-columns': (
+        {'columnName': _STRING, 'rowCount': _INTEGER}, {}),
+    'core/column-removal': ({'columnName': _STRING}, {}),
+    'core/column-rename': (
+        {'oldColumnName': _STRING, 'newColumnName': _STRING}, {}),
+    'core/column-move': ({'columnName': _STRING, 'index': _INTEGER}, {}),
+    'core/column-reorder': ({'columnNames': _array_of(_STRING)}, {}),
+    'core/column-addition': (
+        {'baseColumnName': _STRING, 'newColumnName': _STRING,
+         'columnInsertIndex': _INTEGER, 'expression': _expression,
+         'onError': _ON_ERROR},
+        {'engineConfig': _ENGINE_CONFIG}),
+    'core/column-addition-by-fetching-urls': (
+        {'baseColumnName': _STRING, 'newColumnName': _STRING,
+         'columnInsertIndex': _INTEGER, 'urlExpression': _expression,
+         'onError': _ON_ERROR},
+        {'delay': _NUMBER, 'cacheResponses': _BOOLEAN,
+         'httpHeadersJson': _json_type(list, type(None)),
+         'engineConfig': _ENGINE_CONFIG}),
+    'core/column-split': (
+        {'columnName': _STRING},
+        {'mode': _choice('separator', 'lengths'),
+         'separator': _json_type(str, type(None)), 'regex': _BOOLEAN,
+         'maxColumns': _json_type(int, type(None)),
+         'fieldLengths': _array_of(_INTEGER), 'guessCellType': _BOOLEAN,
+         'removeOriginalColumn': _BOOLEAN,
+         'engineConfig': _ENGINE_CONFIG}),
+}
+
+
+def validate(operations):
+    """Check the operations of a script.
+
+    Every operation needs a description. Parameters that pyrefine does not
+    use are ignored, as are operations that are not built in but have been
+    registered with :func:`~pyrefine.ops.base.operation`, since their
+    parameters are not known.
+
+    Args:
+        operations (list): The script, as loaded from JSON.
+
+    Returns:
+        list: A :class:`Problem` for each thing wrong with the script, in
+        order. The list is empty if there are none.
+
+    """
+    if not isinstance(operations, list):
+        return [Problem(None, None, 'The script must be an array of '
+                                    'operations')]
+
+    problems = []
+    for index, parameters in enumerate(operations):
+        op = parameters.get('op') if isinstance(parameters, dict) else None
+        if not isinstance(op, str):
+            check = _object({'op': _STRING})
+        elif op in _OPERATIONS:
+            required, optional = _OPERATIONS[op]
+            check = _object(dict(required, description=_STRING), optional)
+        elif op in _operations:
+            # Registered by a plugin, with parameters unknown here
+            continue
+        else:
+            problems.append(Problem(index, op, 'Unknown operation'))
+            continue
+        problems.extend(Problem(index, op, _describe(path, message))
+                        for path, message in check(parameters))
+    return problems
+
+
+def _describe(path, message):
+    """Describe a problem with part of an operation, e.g. "a.b[0] is..."."""
+    if not path:
+        return 'The operation ' + message
+    return ''.join(
+        '[{}]'.format(key) if isinstance(key, int)
+        else key if i == 0 else '.' + key
+        for i, key in enumerate(path)) + ' ' + message
+
+
+def validate_script(f):
+    """Load a script and check it.
+
+    Args:
+        f (:class:`file` or :class:`str`): Open file object or filename.
+
+    Returns:
+        list: The problems found, as for :func:`validate`, including the
+        script not being valid JSON.
+
+    """
+    if isinstance(f, (str, os.PathLike)):
+        f = open(f)
+
+    with f:
+        try:
+            operations = json.load(f)
+        except ValueError as error:
+            return [Problem(None, None, 'Invalid JSON: {}'.format(error))]
+    return validate(operations)
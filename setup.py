@@ -12,9 +12,14 @@ with open('HISTORY.rst') as history_file:
 
 requirements = [
     'Click>=6.0',
-    'pandas>=0.19.0',
+    'pandas>=1.5',
 ]
 
+extras_requirements = {
+    'arrow': ['pyarrow'],
+    'zstd': ['zstandard'],
+}
+
 test_requirements = [
     # TODO: put package test requirements here
 ]
@@ -38,7 +43,9 @@ setup(
         ]
     },
     include_package_data=True,
+    python_requires='>=3.8',
     install_requires=requirements,
+    extras_require=extras_requirements,
     license="MIT license",
     zip_safe=False,
     keywords='pyrefine',
@@ -48,9 +55,10 @@ setup(
         'License :: OSI Approved :: MIT License',
         'Natural Language :: English',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.4',
-        'Programming Language :: Python :: 3.5',
-        'Programming Language :: Python :: 3.6',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
     ],
     test_suite='tests',
     tests_require=test_requirements
@@ -0,0 +1,165 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pandas.util.testing as pdt
+import pytest
+
+from click.testing import CliRunner
+
+from .utils import FIXTURES_PATH
+
+import pyrefine
+from pyrefine import cli
+from pyrefine.arrow import is_arrow_list, is_arrow_string, to_objects, \
+    use_arrow_strings
+from pyrefine.io import read_data, write_data
+
+pytest.importorskip('pyarrow')
+
+
+def arrow_lists(values):
+    return use_arrow_strings(pd.DataFrame({'col': values}))['col']
+
+
+def create(op, **parameters):
+    return pyrefine.ops.create(dict(parameters, op='core/' + op,
+                                    description=op, columnName='col'))
+
+
+def test_use_arrow_strings():
+    data = pd.DataFrame({'strings': ['a', None, np.nan],
+                         'lists': [['a', 'b'], None, []],
+                         'mixed': ['a', 1, None],
+                         'numbers': [1, 2, 3]})
+
+    converted = use_arrow_strings(data)
+
+    assert is_arrow_string(converted['strings'])
+    assert is_arrow_list(converted['lists'])
+    assert converted['mixed'].dtype == object
+    assert converted['numbers'].dtype == np.int64
+    assert to_objects(converted['strings']).tolist() == ['a', None, None]
+    assert to_objects(converted['lists']).tolist() == [['a', 'b'], None, []]
+
+
+class TestMassEdit:
+
+    def edit(self, to, from_blank=False):
+        return create('mass-edit', edits=[
+            {'from': ['a', 'b'], 'fromBlank': from_blank, 'to': to}])
+
+    def test_strings(self):
+        column = pd.Series(['a', 'c', None, 'b'], dtype='string[pyarrow]')
+
+        result = self.edit('x', from_blank=True)(pd.DataFrame({'col': column}))
+
+        assert is_arrow_string(result['col'])
+        assert to_objects(result['col']).tolist() == ['x', 'c', 'x', 'x']
+
+    def test_edit_to_non_string(self):
+        column = pd.Series(['a', 'c'], dtype='string[pyarrow]')
+
+        result = self.edit(1)(pd.DataFrame({'col': column}))
+
+        assert result['col'].tolist() == [1, 'c']
+
+    def test_lists(self):
+        column = arrow_lists([['a', 'c'], None, [], ['b']]).iloc[1:]
+
+        result = self.edit('x')(pd.DataFrame({'col': column}))
+
+        assert is_arrow_list(result['col'])
+        assert result.index.tolist() == [1, 2, 3]
+        assert to_objects(result['col']).tolist() == [None, [], ['x']]
+
+    def test_blank_lists(self):
+        column = arrow_lists([['a', 'c'], None])
+
+        result = self.edit('x', from_blank=True)(pd.DataFrame({'col': column}))
+
+        assert result['col'].tolist() == [['x', 'c'], 'x']
+
+
+def test_split_and_join():
+    data = use_arrow_strings(pd.DataFrame({
+        'col': ['a | b |c', ' no split ', None]}))
+
+    split = create('multivalued-cell-split', separator='|')(data)
+    joined = create('multivalued-cell-join', separator=';')(split)
+
+    assert is_arrow_list(split['col'])
+    assert to_objects(split['col']).tolist() == [['a', 'b', 'c'],
+                                                 [' no split '], None]
+    assert is_arrow_string(joined['col'])
+    assert to_objects(joined['col']).tolist() == ['a;b;c', ' no split ',
+                                                  None]
+
+
+@pytest.mark.parametrize('op, expected', [
+    ('fill-down', [None, 'a', 'a', 'a', 'b', 'b']),
+    ('blank-down', [None, 'a', None, 'a', 'b', None]),
+])
+@pytest.mark.parametrize('chunksize', [1, 2, 6])
+def test_fill_and_blank_down(op, expected, chunksize):
+    data = use_arrow_strings(pd.DataFrame({
+        'col': [None, 'a', None, 'a', 'b', 'b']}))
+    script = pyrefine.parse(json.dumps([{
+        'op': 'core/' + op, 'description': op, 'columnName': 'col'}]))
+    chunks = (data.iloc[i:i + chunksize]
+              for i in range(0, len(data), chunksize))
+
+    result = pd.concat(script.execute_chunked(chunks))
+
+    assert is_arrow_string(result['col'])
+    assert to_objects(result['col']).tolist() == expected
+
+
+def test_blank_down_lists():
+    data = pd.DataFrame({'col': arrow_lists([['a'], ['a'], ['b'], None])})
+
+    result = create('blank-down')(data)
+
+    assert is_arrow_list(result['col'])
+    assert to_objects(result['col']).tolist() == [['a'], None, ['b'], None]
+
+
+def test_script_matches_objects():
+    data = pd.read_csv(FIXTURES_PATH / 'doaj-article-sample.csv')
+    script = pyrefine.load_script(FIXTURES_PATH / 'doaj-article-clean.json')
+
+    expected = script.execute(data)
+    actual = script.execute(use_arrow_strings(data))
+
+    assert actual.to_csv(index=False) == expected.to_csv(index=False)
+    assert actual.memory_usage(deep=True).sum() \
+        < expected.memory_usage(deep=True).sum()
+
+
+@pytest.mark.parametrize('name', ['data.parquet', 'data.feather'])
+def test_read_columnar(tmp_path, name):
+    path = str(tmp_path / name)
+    data = pd.DataFrame({'strings': ['a', None], 'numbers': [1, 2],
+                         'lists': arrow_lists([['a', 'b'], None])})
+    write_data(data, path)
+
+    result = read_data(path, arrow_strings=True)
+
+    assert is_arrow_string(result['strings'])
+    assert is_arrow_list(result['lists'])
+    assert result['numbers'].dtype == np.int64
+    pdt.assert_frame_equal(result, use_arrow_strings(data))
+
+
+@pytest.mark.parametrize('args', [[], ['--chunksize', '100']])
+def test_cli(args):
+    runner = CliRunner()
+    script = str(FIXTURES_PATH / 'doaj-article-clean.json')
+    data = str(FIXTURES_PATH / 'doaj-article-sample.csv')
+
+    expected = runner.invoke(cli.execute, [script, data] + args)
+    result = runner.invoke(cli.execute, [script, data, '--arrow-strings']
+                           + args)
+
+    assert result.exit_code == 0
+    assert result.output == expected.output
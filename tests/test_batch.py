@@ -0,0 +1,132 @@
+import shutil
+
+import pandas as pd
+import pytest
+
+from click.testing import CliRunner
+
+from .utils import FIXTURES_PATH
+
+import pyrefine
+from pyrefine import cli
+from pyrefine.batch import BatchExecutor, output_path
+
+SCRIPT = FIXTURES_PATH / 'doaj-article-clean.json'
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    """Three copies of the DOAJ sample, one of them in parts."""
+    data = pd.read_csv(FIXTURES_PATH / 'doaj-article-sample.csv')
+    in_dir = tmp_path / 'in'
+    in_dir.mkdir()
+    paths = []
+    for i, part in enumerate([data, data.iloc[:500], data.iloc[500:]]):
+        path = in_dir / 'drop-{}.csv'.format(i)
+        part.to_csv(path, index=False)
+        paths.append(str(path))
+    return paths
+
+
+@pytest.fixture
+def broken(tmp_path):
+    path = tmp_path / 'in' / 'broken.csv'
+    path.write_text('no,such,columns\n1,2,3\n')
+    return str(path)
+
+
+@pytest.mark.parametrize('format, expected', [
+    (None, 'out/drop.csv.gz'),
+    ('csv', 'out/drop.csv'),
+    ('parquet', 'out/drop.parquet'),
+])
+def test_output_path(format, expected):
+    assert output_path('in/drop.csv.gz', 'out', format).as_posix() \
+        == expected
+    assert output_path('in/drop.2020', 'out', format).name \
+        == 'drop.2020' + ('' if format is None else '.' + format)
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_matches_execute(inputs, tmp_path, jobs):
+    script = pyrefine.load_script(SCRIPT)
+    out_dir = tmp_path / 'out'
+
+    with BatchExecutor(script, jobs=jobs) as executor:
+        results = list(executor.execute(inputs, out_dir))
+
+    assert sorted(result.input for result in results) == inputs
+    for result in results:
+        assert result.error is None
+        expected = script.execute(pd.read_csv(result.input))
+        assert result.rows == len(expected)
+        with open(result.output) as f:
+            assert f.read() == expected.to_csv(index=False)
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_failure_isolated(inputs, broken, tmp_path, jobs):
+    script = pyrefine.load_script(SCRIPT)
+    out_dir = tmp_path / 'out'
+
+    with BatchExecutor(script, jobs=jobs) as executor:
+        results = {result.input: result
+                   for result in executor.execute(inputs + [broken],
+                                                  out_dir)}
+
+    assert results[broken].error.startswith('KeyError')
+    assert results[broken].rows is None
+    assert all(results[path].error is None for path in inputs)
+    # Nothing is left behind for the failed file
+    assert sorted(path.name for path in out_dir.iterdir()) \
+        == ['drop-0.csv', 'drop-1.csv', 'drop-2.csv']
+
+
+def test_clashing_outputs(inputs, tmp_path):
+    other = tmp_path / 'other'
+    other.mkdir()
+    shutil.copy(inputs[0], str(other))
+
+    with pytest.raises(ValueError):
+        BatchExecutor(pyrefine.load_script(SCRIPT)).execute(
+            [inputs[0], str(other / 'drop-0.csv')], tmp_path / 'out')
+
+
+def test_output_format(inputs, tmp_path):
+    pytest.importorskip('pyarrow')
+    script = pyrefine.load_script(SCRIPT)
+
+    results = list(BatchExecutor(script, jobs=1, output_format='parquet')
+                   .execute(inputs[:1], tmp_path / 'out'))
+
+    assert results[0].output.endswith('drop-0.parquet')
+    assert len(pd.read_parquet(results[0].output)) == results[0].rows
+
+
+def test_cli_batch(inputs, broken, tmp_path):
+    runner = CliRunner()
+    pattern = str(tmp_path / 'in' / 'drop-*.csv')
+    out_dir = str(tmp_path / 'out')
+
+    result = runner.invoke(cli.batch, [str(SCRIPT), pattern, '-d', out_dir,
+                                       '--jobs', '2'])
+    failed = runner.invoke(cli.batch, [str(SCRIPT), pattern, broken,
+                                       '-d', out_dir, '--jobs', '1'])
+
+    assert result.exit_code == 0
+    assert result.output.count('OK ') == 3
+    assert '3 files (0 failed)' in result.output
+    expected = runner.invoke(cli.execute, [str(SCRIPT), inputs[0]]).output
+    with open(str(tmp_path / 'out' / 'drop-0.csv')) as f:
+        assert f.read() == expected
+    assert failed.exit_code == 1
+    assert 'FAILED {}: KeyError'.format(broken) in failed.output
+    assert '4 files (1 failed)' in failed.output
+
+
+def test_cli_batch_no_inputs(tmp_path):
+    result = CliRunner().invoke(cli.batch, [
+        str(SCRIPT), str(tmp_path / '*.csv'), '-d', str(tmp_path)])
+
+    assert result.exit_code == 2
+    assert 'No input files match' in result.output
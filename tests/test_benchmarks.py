@@ -0,0 +1,25 @@
+# flake8: noqa
+
+# Make sure the benchmark suite keeps up with the operations registry
+
+import pytest
+
+from pyrefine.ops.base import OPERATION_MODULES
+
+from benchmarks import operations
+
+
+@pytest.mark.parametrize('name', sorted(OPERATION_MODULES))
+def test_operation_has_benchmark(name):
+    assert name in operations.CASES
+
+
+def test_operation_benchmark_params():
+    assert operations.Operation.params[0] == sorted(OPERATION_MODULES)
+
+
+@pytest.mark.parametrize('name', sorted(operations.CASES))
+def test_operation_benchmark_runs(name):
+    benchmark = operations.Operation()
+    benchmark.setup(name, 100)
+    benchmark.time_operation(name, 100)
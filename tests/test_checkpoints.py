@@ -0,0 +1,173 @@
+# flake8: noqa
+
+import json
+import os
+
+import pandas as pd
+import pytest
+from click.testing import CliRunner
+
+from .utils import FIXTURES_PATH
+
+import pyrefine
+from pyrefine import cli
+from pyrefine.arrow import use_arrow_strings
+from pyrefine.checkpoints import CheckpointStore
+
+SCRIPT = FIXTURES_PATH / 'doaj-article-clean.json'
+STEPS = json.loads(SCRIPT.read_text())
+
+
+@pytest.fixture(scope='module')
+def data():
+    return pd.read_csv(FIXTURES_PATH / 'doaj-article-sample.csv').iloc[:200]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CheckpointStore(tmp_path / 'checkpoints')
+
+
+def files(store):
+    return sorted(store.path.glob('*/*'))
+
+
+@pytest.mark.parametrize('in_place', [False, True])
+def test_resume(data, store, in_place):
+    expected = pyrefine.parse(json.dumps(STEPS)).execute(data)
+
+    first = pyrefine.parse(json.dumps(STEPS)).execute(
+        data, in_place=in_place, checkpoints=store)
+    second = pyrefine.parse(json.dumps(STEPS)).execute(
+        data, in_place=in_place, checkpoints=store)
+
+    pd.testing.assert_frame_equal(first, expected)
+    pd.testing.assert_frame_equal(second, expected)
+    assert len(files(store)) == len(STEPS)
+    assert (store.hits, store.misses) == (len(STEPS), len(STEPS))
+
+
+def test_changed_tail(data, store):
+    pyrefine.parse(json.dumps(STEPS)).execute(data, checkpoints=store)
+    changed = STEPS[:-1] + [dict(STEPS[-1], separator=' / ')]
+    expected = pyrefine.parse(json.dumps(changed)).execute(data)
+    store.hits = store.misses = 0
+
+    result = pyrefine.parse(json.dumps(changed)).execute(
+        data, checkpoints=store)
+
+    pd.testing.assert_frame_equal(result, expected)
+    assert (store.hits, store.misses) == (len(STEPS) - 1, 1)
+
+
+def test_changed_data(data, store):
+    pyrefine.parse(json.dumps(STEPS)).execute(data, checkpoints=store)
+    changed = data.copy()
+    changed.iloc[0, 0] = 'changed'
+    store.hits = store.misses = 0
+
+    pyrefine.parse(json.dumps(STEPS)).execute(changed, checkpoints=store)
+
+    assert (store.hits, store.misses) == (0, len(STEPS))
+
+
+def test_value_types(store):
+    steps = [{'op': 'core/text-transform', 'description': 'Add one',
+              'columnName': 'a', 'expression': 'grel:value + 1',
+              'onError': 'keep-original'}]
+    strings = pd.DataFrame({'a': ['1', 'a']})
+    mixed = pd.DataFrame({'a': [1, 'a']}, dtype=object)
+
+    assert store.keys(strings, steps) != store.keys(mixed, steps)
+    pyrefine.parse(json.dumps(steps)).execute(strings, checkpoints=store)
+    result = pyrefine.parse(json.dumps(steps)).execute(mixed,
+                                                       checkpoints=store)
+    pd.testing.assert_frame_equal(
+        result, pyrefine.parse(json.dumps(steps)).execute(mixed))
+
+
+def test_hooks_only_see_executed_operations(data, store):
+    pyrefine.parse(json.dumps(STEPS[:2])).execute(data, checkpoints=store)
+    profiler = pyrefine.Profiler()
+
+    pyrefine.parse(json.dumps(STEPS)).execute(data, hooks=[profiler],
+                                              checkpoints=store)
+
+    assert [record.index for record in profiler.records] == [2, 3, 4]
+
+
+@pytest.mark.parametrize('arrow_strings', [False, True])
+def test_formats(data, store, arrow_strings):
+    if arrow_strings:
+        pytest.importorskip('pyarrow')
+        data = use_arrow_strings(data)
+    script = pyrefine.parse(json.dumps(STEPS[:2]))
+    expected = script.execute(data)
+
+    script.execute(data, checkpoints=store)
+    keys = store.keys(data, STEPS[:2])
+    with open(store._file(keys[2]), 'rb') as f:
+        magic = f.read(6)
+    result = store.get(keys[2])
+
+    # Lists of strings are Python objects unless backed by Arrow
+    assert (magic == b'ARROW1') == arrow_strings
+    pd.testing.assert_frame_equal(result, expected)
+    assert result.equals(expected)
+
+
+def test_corrupt_checkpoint(data, store):
+    pyrefine.parse(json.dumps(STEPS)).execute(data, checkpoints=store)
+    keys = store.keys(data, STEPS)
+    store._file(keys[-1]).write_bytes(b'ARROW1 but not really')
+    store.hits = store.misses = 0
+
+    result = pyrefine.parse(json.dumps(STEPS)).execute(
+        data, checkpoints=store)
+
+    pd.testing.assert_frame_equal(
+        result, pyrefine.parse(json.dumps(STEPS)).execute(data))
+    assert (store.hits, store.misses) == (len(STEPS) - 1, 1)
+    pd.testing.assert_frame_equal(store.get(keys[-1]), result)
+
+
+def test_eviction(data, store):
+    store.put('a' * 64, data)
+    store.put('b' * 64, data)
+    os.utime(store._file('a' * 64), (0, 0))
+    os.utime(store._file('b' * 64), (1, 1))
+    size = store._file('a' * 64).stat().st_size
+    store.max_size = int(size * 2.5)
+
+    store.get('a' * 64)  # now the most recently used
+    store.put('c' * 64, data)
+
+    assert [path.name for path in files(store)] == ['a' * 64, 'c' * 64]
+    store.max_size = None
+    store.put('d' * 64, data)
+    assert len(files(store)) == 3
+
+
+def test_optimized_script(data, store):
+    script = pyrefine.parse(json.dumps(STEPS)).optimize()
+
+    with pytest.raises(ValueError):
+        script.execute(data, checkpoints=store)
+
+
+def test_cli(data, tmp_path):
+    runner = CliRunner(mix_stderr=False)
+    path = tmp_path / 'input.csv'
+    data.to_csv(path, index=False)
+    args = [str(SCRIPT), str(path), '--checkpoints', str(tmp_path / 'ckpt'),
+            '--profile']
+
+    first = runner.invoke(cli.execute, args)
+    second = runner.invoke(cli.execute, args)
+    rejected = runner.invoke(cli.execute, args + ['--jobs', '2'])
+
+    assert first.exit_code == 0, first.output
+    assert second.stdout == first.stdout
+    assert 'Checkpoints: 0 operations skipped, 5 executed' in first.stderr
+    assert 'Checkpoints: 5 operations skipped, 0 executed' in second.stderr
+    assert rejected.exit_code == 2
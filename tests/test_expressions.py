@@ -3,7 +3,14 @@
 import pytest
 from collections.abc import Callable
 
-from pyrefine.expressions import compile_expression, ExpressionError
+import numpy as np
+import pandas as pd
+import pandas.util.testing as pdt
+
+from pyrefine.arrow import is_arrow_string, to_objects
+from pyrefine.expressions import (_make_function, CodeCache, code_cache,
+                                  compile_expression, ColumnExpression,
+                                  ExpressionCache, ExpressionError, is_pure)
 
 
 def test_raises_error_for_unknown_language():
@@ -56,3 +63,255 @@ class TestPythonExpression:
         result = function(42)
 
         assert test(result), on_error
+
+
+class TestColumnExpression:
+
+    @pytest.fixture
+    def column(self):
+        return pd.Series(['Nov 2015', ' 9-30 Nov 2015 ', 'no date', '',
+                          None, np.NaN, 2016, ['a list']],
+                         index=np.arange(10, 18))
+
+    @pytest.fixture(params=['object', 'arrow'])
+    def strings(self, request):
+        column = pd.Series(['Nov 2015', ' 9-30 Nov 2015 ', 'no date', '',
+                            'Straße', 'İx', '²3'],
+                           index=np.arange(10, 17))
+        if request.param == 'arrow':
+            pytest.importorskip('pyarrow')
+            column = column.astype('string[pyarrow]')
+        return column
+
+    EXPRESSIONS = [
+        'jython:return value',
+        'jython:return value.strip().lower()',
+        'jython:return value.upper()',
+        'jython:return value.isdigit()',
+        'jython:return value.replace("Nov", "November")',
+        'jython:return value[1:-1]',
+        'jython:return value.split(" ")',
+        'jython:return len(value)',
+        'jython:return "%s (%s)" % (value.upper(), value)',
+        'jython:return "<" + value + ">"',
+        'jython:import re\n'
+        'result = re.search(r"\\d{4}", value)\n'
+        'return result.group(0)',
+        'jython:import re\n'
+        'match = re.match(r"\\s*(\\d+)(?:-(\\d+))?", value)\n'
+        'return match[2]',
+    ]
+
+    @pytest.mark.parametrize('expression', EXPRESSIONS)
+    @pytest.mark.parametrize('on_error', ['set-to-blank', 'keep-original'])
+    def test_matches_per_cell(self, column, expression, on_error):
+        expected = column.map(compile_expression(expression, on_error))
+        col_expression = ColumnExpression(expression, on_error)
+
+        actual = col_expression(column)
+
+        assert col_expression.vectorized is not None
+        pdt.assert_series_equal(actual, expected)
+
+    @pytest.mark.parametrize('expression', EXPRESSIONS)
+    @pytest.mark.parametrize('on_error', ['set-to-blank', 'keep-original'])
+    def test_vectorized_matches_per_cell(self, strings, expression, on_error):
+        function = compile_expression(expression, on_error)
+        expected = [function(value) for value in strings.astype(object)]
+
+        actual = ColumnExpression(expression, on_error)(strings)
+
+        assert actual.index.equals(strings.index)
+        assert to_objects(actual).tolist() == expected
+        if strings.dtype != object \
+                and all(isinstance(value, str) for value in expected):
+            assert is_arrow_string(actual)
+
+    @pytest.mark.parametrize('expression', [
+        'jython:return value * 3',
+        'jython:if value:\n    return value.lower()',
+        'jython:import json\nreturn json.dumps(value)',
+        'jython:import re\nreturn re.search(r"(a)\\1", value).group(0)',
+        'jython:import re\nreturn re.search(r"(a)", value).group(2)',
+    ])
+    def test_falls_back_to_per_cell(self, column, expression):
+        expected = column.map(compile_expression(expression))
+        col_expression = ColumnExpression(expression)
+
+        actual = col_expression(column)
+
+        assert col_expression.vectorized is None
+        pdt.assert_series_equal(actual, expected)
+
+    def test_store_error(self, column):
+        col_expression = ColumnExpression(
+            'jython:import re\nreturn re.search(r"\\d+", value).group(0)',
+            on_error='store-error')
+
+        actual = col_expression(column)
+
+        assert actual.iloc[:2].tolist() == ['2015', '9']
+        for value in actual.iloc[2:]:
+            assert isinstance(value, Exception)
+
+    def test_numeric_column(self):
+        column = pd.Series([1, 2, 3])
+
+        actual = ColumnExpression('jython:return value.strip()')(column)
+
+        assert actual.tolist() == [None, None, None]
+
+
+@pytest.mark.parametrize('expression,expected', [
+    ('jython:return value.lower()', True),
+    ('jython:import re\nreturn re.sub("a", "b", value)', True),
+    ('jython:return cells["Other"]["value"]', False),
+    ('jython:return row.index', False),
+    ('jython:import random\nreturn random.random()', False),
+    ('jython:from datetime import datetime\nreturn datetime.now()', False),
+    ('jython:global counter\ncounter += 1\nreturn counter', False),
+    ('jython:return (', False),
+    ('grel:value', True),
+    ('value.trim()', True),
+    ('cells["Other"].value', False),
+    ('now()', False),
+    ('clojure:value', False),
+])
+def test_is_pure(expression, expected):
+    assert is_pure(expression) == expected
+
+
+class TestMemoization:
+
+    @pytest.fixture
+    def column(self):
+        return pd.Series(['a', 'b', 'a', None, 'c', 'a', np.NaN, 'b'],
+                         index=np.arange(20, 28))
+
+    def test_matches_per_cell(self, column):
+        expression = 'jython:return value.upper() + "!"'
+        expected = column.map(compile_expression(expression))
+        cache = ExpressionCache()
+
+        actual = ColumnExpression(expression, cache=cache)(column)
+
+        pdt.assert_series_equal(actual, expected)
+        assert cache.cache_info() == (3, 3, 10 ** 5, 3)
+
+    def test_evaluates_each_value_once(self, column):
+        calls = []
+        expression = ColumnExpression('jython:return value',
+                                      cache=ExpressionCache())
+        function = expression.function
+        expression.function = lambda value: calls.append(value) \
+            or function(value)
+
+        expression(column)
+        expression(column)
+
+        strings = [value for value in calls if isinstance(value, str)]
+        assert sorted(strings) == ['a', 'b', 'c']
+
+    def test_cache_is_bounded(self, column):
+        cache = ExpressionCache(maxsize=2)
+
+        ColumnExpression('jython:return value', cache=cache)(column)
+
+        assert len(cache) == 2
+        assert cache.cache_info().misses == 3
+
+    def test_impure_expression_not_cached(self, column):
+        cache = ExpressionCache()
+        expression = ColumnExpression(
+            'jython:import random\nreturn value + str(random.random())',
+            cache=cache)
+
+        expression(column)
+
+        assert not expression.pure
+        assert cache.cache_info() == (0, 0, 10 ** 5, 0)
+
+    def test_equal_values_of_different_types(self):
+        cache = ExpressionCache()
+        expression = ColumnExpression('jython:return repr(value)',
+                                      cache=cache)
+
+        expression(pd.Series([1, 1]))
+        actual = expression(pd.Series([True, True]))
+
+        assert actual.tolist() == ['True', 'True']
+
+    def test_list_results_not_shared(self, column):
+        actual = ColumnExpression('jython:return value.split()',
+                                  cache=ExpressionCache())(column)
+
+        assert actual[20] == actual[22]
+        assert actual[20] is not actual[22]
+
+
+class TestCodeCache:
+
+    def test_compiled_once(self):
+        cache = CodeCache()
+
+        first = cache.get('value.trim()')
+
+        assert cache.get('value.trim()') is first
+        assert cache.get('value.trim()', 'store-error') is not first
+        assert cache.cache_info() == (1, 0, 2, 1024, 2)
+        assert first.pure and first.columns == frozenset()
+
+    def test_least_recently_used_discarded(self):
+        cache = CodeCache(maxsize=2)
+        for expression in ['value', 'value + 1', 'value', 'value + 2']:
+            cache.get(expression)
+
+        cache.get('value')
+        cache.get('value + 1')
+
+        assert (cache.hits, cache.misses) == (2, 4)
+        assert len(cache) == 2
+
+    def test_errors_not_cached(self):
+        cache = CodeCache()
+
+        for _ in range(2):
+            with pytest.raises(ExpressionError):
+                cache.get('value.trim(')
+
+        assert cache.cache_info() == (0, 0, 0, 1024, 0)
+
+    @pytest.mark.parametrize('expression, value, expected', [
+        ('value.replace(/a+/i, "-")', 'bAab', 'b-b'),
+        ('jython:return value.upper()', 'ab', 'AB'),
+    ])
+    def test_shared_on_disk(self, tmp_path, expression, value, expected):
+        CodeCache(path=tmp_path).get(expression)
+        cache = CodeCache(path=tmp_path)
+
+        compiled = cache.get(expression)
+
+        assert cache.cache_info()[:3] == (0, 1, 0)
+        function = _make_function(compiled.code, compiled.constants)
+        assert function(value) == expected
+
+    def test_corrupt_file_ignored(self, tmp_path):
+        CodeCache(path=tmp_path).get('value.length()')
+        for path in tmp_path.glob('*/*/*'):
+            path.write_bytes(b'not code')
+        cache = CodeCache(path=tmp_path)
+
+        compiled = cache.get('value.length()')
+
+        assert cache.cache_info()[:3] == (0, 0, 1)
+        assert _make_function(compiled.code, compiled.constants)('abc') == 3
+
+    def test_used_by_column_expression(self):
+        code_cache.get('cells["a"].value + value')
+        hits = code_cache.hits
+
+        expression = ColumnExpression('cells["a"].value + value')
+
+        assert code_cache.hits == hits + 1
+        assert expression.columns == {'a'}
+        assert not expression.pure
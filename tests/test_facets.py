@@ -0,0 +1,344 @@
+import json
+import pickle
+
+import numpy as np
+import pandas as pd
+import pandas.util.testing as pdt
+import pytest
+
+import pyrefine
+from pyrefine.arrow import to_objects, use_arrow_strings
+from pyrefine.facets import Engine
+from pyrefine.ops import create
+from pyrefine.planner import Plan
+
+
+def list_facet(column, choices, expression='value', **options):
+    return dict({'type': 'list', 'name': column, 'columnName': column,
+                 'expression': expression, 'omitBlank': False,
+                 'omitError': False, 'selectBlank': False,
+                 'selectError': False, 'invert': False,
+                 'selection': [{'v': {'v': choice, 'l': str(choice)}}
+                               for choice in choices]}, **options)
+
+
+def range_facet(column, start, stop, **options):
+    return dict({'type': 'range', 'name': column, 'columnName': column,
+                 'expression': 'value', 'from': start, 'to': stop,
+                 'selectNumeric': True, 'selectNonNumeric': False,
+                 'selectBlank': False, 'selectError': False}, **options)
+
+
+def text_facet(column, query, **options):
+    return dict({'type': 'text', 'name': column, 'columnName': column,
+                 'query': query, 'mode': 'text', 'caseSensitive': False,
+                 'invert': False}, **options)
+
+
+def engine_config(*facets, mode='row-based'):
+    return {'mode': mode, 'facets': list(facets)}
+
+
+def mask(data, *facets, mode='row-based'):
+    return Engine(engine_config(*facets, mode=mode)).mask(data).tolist()
+
+
+def mass_edit(column, old, new, config):
+    return create({'op': 'core/mass-edit', 'description': 'Edit',
+                   'engineConfig': config, 'columnName': column,
+                   'expression': 'value',
+                   'edits': [{'fromBlank': False, 'fromError': False,
+                              'from': [old], 'to': new}]})
+
+
+@pytest.fixture
+def data():
+    return pd.DataFrame({
+        'name': ['Ann', None, 'bob', 'Cy', '', None],
+        'size': [1.5, 2.0, np.nan, 7.0, 3.0, 10.0],
+        'mixed': [1, 'a', None, 4.5, True, ValueError('bad')],
+    })
+
+
+class TestListFacet:
+
+    def test_choices(self, data):
+        assert mask(data, list_facet('name', ['Ann', 'Cy'])) \
+            == [True, False, False, True, False, False]
+
+    def test_blank_and_invert(self, data):
+        facet = list_facet('name', ['Ann'], selectBlank=True, invert=True)
+
+        assert mask(data, facet) == [False, False, True, True, False, False]
+
+    def test_numbers(self, data):
+        assert mask(data, list_facet('size', [2, 7])) \
+            == [False, True, False, True, False, False]
+
+    @pytest.mark.parametrize('column, choices, expected', [
+        ('size', ['2', '7.0', 'x'], [False, True, False, True, False, False]),
+        ('year', ['2000'], [True, False, False, False, True, False]),
+        ('flag', ['true'], [True, False, True, False, False, True]),
+        ('date', ['2000-01-02'], [False, True] + [False] * 4),
+    ])
+    def test_text_choices(self, data, column, choices, expected):
+        data = data.assign(
+            year=[2000, 2001, 2002, 1999, 2000, 2010],
+            flag=[True, False, True, False, False, True],
+            date=pd.date_range('2000-01-01', periods=6))
+
+        assert mask(data, list_facet(column, choices)) == expected
+
+    def test_errors(self, data):
+        facet = list_facet('mixed', [], selectError=True)
+
+        assert mask(data, facet) == [False] * 5 + [True]
+
+    def test_facet_by_blank(self, data):
+        facet = list_facet('name', [True], expression='isBlank(value)')
+
+        assert mask(data, facet) == [False, True, False, False, True, True]
+
+    @pytest.mark.parametrize('arrow', [False, True])
+    def test_lists(self, arrow):
+        lists = pd.DataFrame({'col': [['a', 'b'], ['c'], None, []]})
+        if arrow:
+            pytest.importorskip('pyarrow')
+            lists = use_arrow_strings(lists)
+
+        assert mask(lists, list_facet('col', ['b', 'c'])) \
+            == [True, True, False, False]
+
+    def test_jython_expression(self, data):
+        facet = list_facet('name', ['A'],
+                           expression='jython:return value[:1].upper()')
+
+        assert mask(data, facet) == [True] + [False] * 5
+
+    def test_grel_expression(self, data):
+        facet = list_facet('name', [2, 3], expression='value.length()')
+
+        assert mask(data, facet) == [True, False, True, True, False, False]
+
+    def test_unknown_expression(self):
+        with pytest.raises(pyrefine.expressions.ExpressionError):
+            Engine(engine_config(list_facet('name', ['a'],
+                                            expression='value.noSuch()')))
+
+
+class TestRangeFacet:
+
+    def test_numbers(self, data):
+        assert mask(data, range_facet('size', 2, 10)) \
+            == [False, True, False, True, True, False]
+
+    def test_other_values(self, data):
+        facet = range_facet('mixed', 0, 2, selectNonNumeric=True,
+                            selectBlank=True)
+
+        assert mask(data, facet) == [True, True, True, False, True, False]
+
+
+class TestTextFacet:
+
+    @pytest.mark.parametrize('arrow', [False, True])
+    @pytest.mark.parametrize('options, expected', [
+        ({}, [False, False, True, False, False, False]),
+        ({'caseSensitive': True}, [False, False, False, False, False,
+                                   False]),
+        ({'mode': 'regex', 'query': '^[A-C]'},
+         [True, False, True, True, False, False]),
+        ({'invert': True}, [True, True, False, True, True, True]),
+    ])
+    def test_query(self, data, arrow, options, expected):
+        if arrow:
+            pytest.importorskip('pyarrow')
+            data = use_arrow_strings(data)
+
+        assert mask(data, dict(text_facet('name', 'OB'), **options)) \
+            == expected
+
+    def test_non_strings(self, data):
+        assert mask(data, text_facet('size', '.0')) \
+            == [False, True, False, True, True, True]
+
+    def test_empty_query_selects_all(self, data):
+        assert Engine(engine_config(text_facet('name', ''))).mask(data) \
+            is None
+
+
+def test_facets_combined(data):
+    assert mask(data, range_facet('size', 0, 5),
+                list_facet('name', [True], expression='isBlank(value)')) \
+        == [False, True, False, False, True, False]
+
+
+class TestRecords:
+
+    @pytest.fixture
+    def records(self):
+        return pd.DataFrame({'key': ['a', None, 'b', '', 'c', None],
+                             'item': ['x', 'y', 'y', 'z', 'x', 'x']})
+
+    def test_record_mode(self, records):
+        facet = list_facet('item', ['y'])
+
+        assert mask(records, facet, mode='record-based') \
+            == [True, True, True, True, False, False]
+
+    def test_every_facet_must_match(self, records):
+        facets = list_facet('item', ['y']), list_facet('item', ['z'])
+
+        assert mask(records, *facets, mode='record-based') \
+            == [False, False, True, True, False, False]
+
+
+class TestMaskCache:
+
+    def test_reused_until_column_changes(self, data):
+        engine = Engine(engine_config(list_facet('name', ['Ann'])))
+
+        first = engine.mask(data)
+        assert engine.mask(data.assign(size=0)) is first
+        assert engine.mask(data.assign(name='Ann')).all()
+        assert (engine.hits, engine.misses) == (1, 2)
+
+    def test_shared_by_script(self, data):
+        config = engine_config(list_facet('name', ['Ann', 'bob']))
+        script = pyrefine.parse(json.dumps([
+            {'op': 'core/mass-edit', 'description': 'Edit',
+             'engineConfig': config, 'columnName': column,
+             'expression': 'value',
+             'edits': [{'fromBlank': True, 'fromError': False,
+                        'from': [], 'to': 'blank'}]}
+            for column in ['size', 'mixed']]))
+        engine = script.operations[0].engine
+
+        result = script.execute(data)
+
+        assert script.operations[1].engine is engine
+        assert (engine.hits, engine.misses) == (1, 1)
+        assert result['mixed'].tolist()[:3] == [1, 'a', 'blank']
+
+    def test_not_pickled(self, data):
+        engine = Engine(engine_config(list_facet('name', ['Ann'])))
+        engine.mask(data)
+
+        copied = pickle.loads(pickle.dumps(engine))
+
+        assert copied._cached is None
+        assert copied.mask(data).tolist() == engine.mask(data).tolist()
+
+
+class TestOperations:
+
+    def test_mass_edit(self, data):
+        op = mass_edit('name', 'bob', 'Bob',
+                       engine_config(range_facet('size', 5, 20)))
+        data['name'] = ['bob'] * 6
+
+        result = op(data)
+
+        assert result['name'].tolist() == ['bob', 'bob', 'bob', 'Bob', 'bob',
+                                           'Bob']
+
+    def test_mass_edit_arrow(self, data):
+        pytest.importorskip('pyarrow')
+        op = mass_edit('name', 'bob', 'Bob',
+                       engine_config(list_facet('name', ['bob', 'Cy'])))
+
+        result = op(use_arrow_strings(data))
+
+        assert result['name'].dtype == 'string'
+        assert to_objects(result['name']).tolist() \
+            == ['Ann', None, 'Bob', 'Cy', '', None]
+
+    @pytest.mark.parametrize('chunksize', [None, 1, 4])
+    def test_fill_down(self, data, chunksize):
+        script = pyrefine.parse(json.dumps([{
+            'op': 'core/fill-down', 'description': 'Fill down',
+            'columnName': 'name',
+            'engineConfig': engine_config(range_facet('size', 2, 20))}]))
+
+        if chunksize is None:
+            result = script.execute(data)
+        else:
+            result = pd.concat(script.execute_chunked(
+                data.iloc[i:i + chunksize]
+                for i in range(0, len(data), chunksize)))
+
+        assert result['name'].tolist() == ['Ann', None, 'bob', 'Cy', '',
+                                           '']
+
+    @pytest.mark.parametrize('chunksize', [1, 2, 4])
+    def test_record_mode_chunked(self, data, chunksize):
+        script = pyrefine.parse(json.dumps([{
+            'op': 'core/mass-edit', 'description': 'Edit',
+            'engineConfig': engine_config(list_facet('mixed', [True]),
+                                          mode='record-based'),
+            'columnName': 'size', 'expression': 'value',
+            'edits': [{'fromBlank': True, 'fromError': False, 'from': [],
+                       'to': 0.0}]}]))
+        data.loc[5, 'size'] = np.nan
+
+        result = pd.concat(script.execute_chunked(
+            data.iloc[i:i + chunksize]
+            for i in range(0, len(data), chunksize)))
+
+        pdt.assert_frame_equal(result, script.execute(data))
+        assert result['size'].tolist()[3:] == [7.0, 3.0, 0.0]
+
+    def test_column_addition(self, data):
+        op = create({'op': 'core/column-addition', 'description': 'Add',
+                     'engineConfig': engine_config(
+                         list_facet('name', ['Ann', 'Cy'])),
+                     'baseColumnName': 'name', 'newColumnName': 'upper',
+                     'columnInsertIndex': 1,
+                     'expression': 'jython:return value.upper()',
+                     'onError': 'store-error'})
+
+        result = op(data)
+
+        assert list(result.columns) == ['name', 'upper', 'size', 'mixed']
+        assert result['upper'].where(result['upper'].notna(), None) \
+            .tolist() == ['ANN', None, None, 'CY', None, None]
+        assert op.reads == {'name'}
+
+    def test_in_place(self, data):
+        op = mass_edit('name', 'bob', 'Bob',
+                       engine_config(list_facet('size', [7.0],
+                                                selectBlank=True)))
+
+        pdt.assert_frame_equal(op(data.copy(), in_place=True), op(data))
+
+
+class TestPlanner:
+
+    def test_facets_read(self):
+        op = mass_edit('a', 'x', 'y', engine_config(list_facet('b', ['p'])))
+
+        assert op.reads == {'a', 'b'}
+        assert mass_edit('a', 'x', 'y', engine_config(
+            list_facet('b', ['p']), mode='record-based')).reads is None
+
+    def test_no_merge_when_facet_on_edited_column(self):
+        config = engine_config(list_facet('a', ['x']))
+        first = mass_edit('a', 'x', 'y', config)
+        second = mass_edit('a', 'y', 'z', config)
+        data = pd.DataFrame({'a': ['x', 'y']})
+
+        plan = Plan([first, second], data.columns)
+
+        assert len(plan) == 2
+        assert second(first(data))['a'].tolist() == ['y', 'y']
+
+    def test_merge_with_same_facets(self):
+        config = engine_config(list_facet('b', ['p']))
+        operations = [mass_edit('a', 'x', 'y', config),
+                      mass_edit('a', 'y', 'z', config)]
+        data = pd.DataFrame({'a': ['x', 'x'], 'b': ['p', 'q']})
+
+        plan = Plan(operations, data.columns)
+
+        assert len(plan) == 1
+        assert plan.operations[0](data)['a'].tolist() == ['z', 'x']
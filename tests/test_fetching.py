@@ -0,0 +1,251 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+from urllib.error import HTTPError
+
+import numpy as np
+import pandas as pd
+import pandas.util.testing as pdt
+import pytest
+
+import pyrefine
+from pyrefine.fetching import ResponseCache, URLFetcher
+
+from .test_operations import CommonOperationTests
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answer ``/<text>`` with the text, after ``?sleep=`` seconds.
+
+    Paths starting ``/missing`` are not found.
+    """
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.path, time.monotonic()))
+            server.open += 1
+            server.most_open = max(server.most_open, server.open)
+        try:
+            path, _, query = self.path.partition('?')
+            if query.startswith('sleep='):
+                time.sleep(float(query[6:]))
+            if not path.startswith('/missing'):
+                body = path[1:] + self.headers.get('X-Suffix', '')
+                self.send_response(200)
+                self.send_header('Content-Type',
+                                 'text/plain; charset=latin-1')
+                self.end_headers()
+                self.wfile.write(body.encode('latin-1'))
+            else:
+                self.send_error(404)
+        finally:
+            with server.lock:
+                server.open -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.lock = threading.Lock()
+    server.requests = []
+    server.open = server.most_open = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = 'http://127.0.0.1:{}'.format(server.server_port)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv('PYREFINE_CACHE_DIR', str(tmp_path))
+    return tmp_path / 'urls'
+
+
+class TestURLFetcher:
+
+    def test_fetch(self, server):
+        fetcher = URLFetcher()
+
+        bodies = fetcher.fetch([server.url + '/a',
+                                server.url + '/b'])
+
+        assert bodies == ['a', 'b']
+
+    def test_repeated_urls_fetched_once(self, server):
+        fetcher = URLFetcher()
+        urls = [server.url + '/' + text for text in 'abab']
+
+        assert fetcher.fetch(urls) == list('abab')
+        assert fetcher.requests == len(server.requests) == 2
+
+    def test_error(self, server):
+        bodies = URLFetcher().fetch([server.url + '/missing',
+                                     server.url + '/a'])
+
+        assert isinstance(bodies[0], HTTPError)
+        assert bodies[0].code == 404
+        assert bodies[1] == 'a'
+
+    def test_headers(self, server):
+        fetcher = URLFetcher(headers={'X-Suffix': '!'})
+
+        assert fetcher.fetch([server.url + '/a']) == ['a!']
+
+    def test_cache(self, server, cache_dir):
+        urls = [server.url + '/a', server.url + '/missing']
+        URLFetcher(cache=ResponseCache(cache_dir)).fetch(urls)
+
+        cache = ResponseCache(cache_dir)
+        fetcher = URLFetcher(cache=cache)
+        bodies = fetcher.fetch(urls)
+
+        assert bodies[0] == 'a'
+        # Only successful responses are cached
+        assert isinstance(bodies[1], HTTPError)
+        assert fetcher.requests == 1
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_cache_not_writable(self, server, tmp_path):
+        path = tmp_path / 'file'
+        path.write_text('')
+        cache = ResponseCache(path / 'urls')
+
+        assert URLFetcher(cache=cache).fetch([server.url + '/a']) == ['a']
+
+    def test_delay(self, server):
+        fetcher = URLFetcher(delay=0.1)
+        urls = [server.url + '/' + text for text in 'abc']
+
+        fetcher.fetch(urls[:2])
+        fetcher.fetch(urls[2:])
+
+        starts = sorted(start for _, start in server.requests)
+        assert np.diff(starts).min() >= 0.05
+
+    def test_per_host_limit(self, server):
+        fetcher = URLFetcher(max_connections=8, per_host=2)
+
+        fetcher.fetch([server.url + '/{}?sleep=0.05'.format(i)
+                       for i in range(8)])
+
+        assert server.most_open <= 2
+
+    def test_concurrent(self, server):
+        fetcher = URLFetcher(max_connections=8, per_host=8)
+        start = time.monotonic()
+
+        fetcher.fetch([server.url + '/{}?sleep=0.2'.format(i)
+                       for i in range(8)])
+
+        assert server.most_open > 1
+        assert time.monotonic() - start < 8 * 0.2
+
+    def test_in_event_loop(self, server):
+        import asyncio
+
+        async def fetch():
+            return URLFetcher().fetch([server.url + '/a'])
+
+        assert asyncio.run(fetch()) == ['a']
+
+
+class TestColumnAdditionByFetchingURLsOperation(CommonOperationTests):
+
+    op_class = pyrefine.ops.ColumnAdditionByFetchingURLsOperation
+
+    @pytest.fixture
+    def default_params(self, server):
+        return {'op': 'core/column-addition-by-fetching-urls',
+                'description': 'Fetch pages',
+                'engineConfig': {'mode': 'row-based', 'facets': []},
+                'baseColumnName': 'name',
+                'newColumnName': 'page',
+                'columnInsertIndex': 1,
+                'urlExpression':
+                    'jython:return "{}/" + value'.format(server.url),
+                'onError': 'set-to-blank',
+                'delay': 0}
+
+    @pytest.fixture
+    def base_data(self):
+        return pd.DataFrame({'name': ['ada', 'alan', None, 'ada', 'missing'],
+                             'size': [1, 2, 3, 4, 5]})
+
+    def test_fetch(self, default_params, base_data, server):
+        op = pyrefine.ops.create(default_params)
+
+        result = op(base_data)
+
+        assert list(result.columns) == ['name', 'page', 'size']
+        assert result['page'].tolist() == ['ada', 'alan', None, 'ada', None]
+        assert len(server.requests) == 3
+
+    def test_store_error(self, default_params, base_data):
+        op = pyrefine.ops.create(dict(default_params,
+                                      onError='store-error'))
+
+        result = op(base_data)
+
+        assert result['page'][0] == 'ada'
+        # The expression fails for a blank value, and the request for 404
+        assert isinstance(result['page'][2], TypeError)
+        assert isinstance(result['page'][4], HTTPError)
+
+    def test_rerun_uses_cache(self, default_params, base_data, server):
+        pyrefine.ops.create(default_params)(base_data)
+        op = pyrefine.ops.create(default_params)
+
+        result = op(base_data)
+
+        assert result['page'].tolist() == ['ada', 'alan', None, 'ada', None]
+        assert len(server.requests) == 4
+        assert op.fetcher.requests == 1
+
+    def test_no_cache(self, default_params, base_data, server):
+        params = dict(default_params, cacheResponses=False)
+        pyrefine.ops.create(params)(base_data)
+        pyrefine.ops.create(params)(base_data)
+
+        assert len(server.requests) == 6
+
+    def test_headers(self, default_params, base_data):
+        op = pyrefine.ops.create(dict(
+            default_params, httpHeadersJson=[
+                {'name': 'X-Suffix', 'value': '!'},
+                {'name': 'Referer', 'value': ''}]))
+
+        assert op(base_data)['page'][0] == 'ada!'
+
+    def test_facets(self, default_params, base_data, server):
+        op = pyrefine.ops.create(dict(default_params, engineConfig={
+            'mode': 'row-based', 'facets': [{
+                'type': 'range', 'name': 'size', 'columnName': 'size',
+                'expression': 'value', 'from': 2, 'to': 4,
+                'selectNumeric': True, 'selectNonNumeric': True,
+                'selectBlank': True, 'selectError': True}]}))
+
+        result = op(base_data)
+
+        assert result['page'][1] == 'alan'
+        assert result['page'].drop(1).isna().all()
+        assert [path for path, _ in server.requests] == ['/alan']
+
+    def test_delay_between_chunks(self, default_params, base_data, server):
+        script = pyrefine.parse(json.dumps([dict(default_params,
+                                                 delay=100)]))
+        chunks = (base_data.iloc[i:i + 1] for i in range(len(base_data)))
+
+        result = pd.concat(script.execute_chunked(chunks))
+
+        pdt.assert_frame_equal(
+            result.reset_index(drop=True),
+            script.execute(base_data).reset_index(drop=True))
+        starts = sorted(start for _, start in server.requests)
+        assert np.diff(starts).min() >= 0.05
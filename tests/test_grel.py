@@ -0,0 +1,289 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+import pandas.util.testing as pdt
+import pytest
+
+from pyrefine import grel
+from pyrefine.arrow import is_arrow_string, to_objects
+from pyrefine.expressions import (ColumnExpression, ExpressionError,
+                                  compile_expression, referenced_columns)
+
+
+def evaluate(expression, value):
+    return compile_expression(expression, on_error='store-error')(value)
+
+
+class TestParse:
+
+    def test_method_calls_are_function_calls(self):
+        assert grel.parse('value.trim()') == grel.parse('trim(value)')
+
+    def test_precedence(self):
+        tree = grel.parse('1 + 2 * 3 == 7')
+
+        assert tree.value == '=='
+        assert tree.args[0].value == '+'
+        assert tree.args[0].args[1].value == '*'
+
+    def test_regex_or_division(self):
+        assert grel.parse('value.split(/,\\s*/)').args[1].type == 'regex'
+        assert grel.parse('value.length() / 2').value == '/'
+
+    def test_subscripts(self):
+        assert grel.parse('value[1]') == grel.parse('value.get(1)')
+        assert grel.parse('value[1, 3]') == grel.parse('value.get(1, 3)')
+
+    def test_string_escapes(self):
+        assert grel.parse(r'"a\"b\né"').value == 'a"b\né'
+        assert grel.parse(r"'it\'s \u00e9'").value == "it's é"
+
+    @pytest.mark.parametrize('code', [
+        'value.trim(',
+        'value +',
+        'value.noSuchFunction()',
+        'with(value, "x", x)',
+        'if(value, 1)',
+        'value @ 2',
+        '/unterminated',
+    ])
+    def test_invalid(self, code):
+        with pytest.raises(grel.GrelSyntaxError):
+            grel.parse(code)
+
+    def test_invalid_expression_error(self):
+        with pytest.raises(ExpressionError):
+            compile_expression('grel:value.trim(')
+
+
+@pytest.mark.parametrize('expression, value, expected', [
+    ('value', 'a', 'a'),
+    ('grel:value.trim().toUppercase()', ' a b ', 'A B'),
+    ('value.toTitlecase()', 'the QUICK fox', 'The Quick Fox'),
+    ('value + 1', 'a', 'a1'),
+    ('value + 1', 2, 3),
+    ('value + null', None, None),
+    ('value + "!"', None, '!'),
+    ('7 / 2', None, 3),
+    ('-7 / 2', None, -3),
+    ('7.0 / 2', None, 3.5),
+    ('value.length()', 'abc', 3),
+    ('value.substring(1, -1)', 'abcd', 'bc'),
+    ('value[-2, 10]', 'abcd', 'cd'),
+    ('value[10]', 'abcd', None),
+    ('value.split(",")', 'a,,b,', ['a', 'b']),
+    ('value.split(",", true)', 'a,,b,', ['a', '', 'b', '']),
+    ('value.split(/,\\s*/)', 'a, b,c,,', ['a', 'b', 'c']),
+    ('value.splitByLengths(2, 1)', 'abcdef', ['ab', 'c']),
+    ('value.match(/(\\d+)-(\\d+)/)', '10-20', ['10', '20']),
+    ('value.match(/(\\d+)-(\\d+)/)', 'x10-20', None),
+    ('value.match(/(\\d+)(x)?/)[1]', '10', None),
+    ('value.find(/\\d/)', 'a1b2', ['1', '2']),
+    ('value.replace("a", "o")', 'banana', 'bonono'),
+    ('value.replace(/(\\w)(\\d)/, "$2$1")', 'a1 b2', '1a 2b'),
+    ('value.replace(/A/i, "-")', 'aA', '--'),
+    ('value.replaceChars("ab", "x")', 'abc', 'xc'),
+    ('value.contains(/\\d/)', 'a1', True),
+    ('value.startsWith("ab")', 'abc', True),
+    ('value.indexOf("c")', 'abc', 2),
+    ('value.chomp("s")', 'cats', 'cat'),
+    ('value.fingerprint()', ' Ça, va ÇA ', 'ca va'),
+    ('value.toNumber()', ' 42 ', 42),
+    ('value.toNumber()', '4.5', 4.5),
+    ('value.toNumber() + 1', '1e3', 1001.0),
+    ('value.toString()', 2.0, '2.0'),
+    ('value.toString()', True, 'true'),
+    ('value.toDate().toString()', '2020-03-04', '2020-03-04T00:00:00Z'),
+    ('value.toDate(false).toString()', '03/04/2020', '2020-04-03T00:00:00Z'),
+    ('value.toDate("dd MMM yyyy").toString("yyyy/MM/dd")', '04 Mar 2020',
+     '2020/03/04'),
+    ('value.toDate().datePart("year")', '2020-03-04', 2020),
+    ('forEach(value.split(","), v, v.trim()).join("|")', 'a, b', 'a|b'),
+    ('forEachIndex(value.split(","), i, v, i + v).join("")', 'a,b', '0a1b'),
+    ('filter(value.split(","), v, v != "b")', 'a,b,c', ['a', 'c']),
+    ('forNonBlank(value, v, v + "!", "blank")', '', 'blank'),
+    ('with(value.trim(), v, v + v)', ' a ', 'aa'),
+    ('if(value == "a", "yes", "no")', 'a', 'yes'),
+    ('if("TRUE", 1, 2)', None, 1),
+    ('if(value.length() > 2, "long", "short")', 'ab', 'short'),
+    ('and(value.startsWith("a"), not(value.endsWith("a")))', 'ab', True),
+    ('isBlank(value)', '', True),
+    ('isBlank(value)', float('nan'), True),
+    ('isNonBlank(value.trim())', None, True),
+    ('isError(value.trim())', None, True),
+    ('isNumeric(value)', '1.5', True),
+    ('isNull(value)', None, True),
+    ('[1, 2, 2].uniques().length()', None, 2),
+    ('value.split(",").reverse()', 'a,b', ['b', 'a']),
+    ('value.parseJson().a', '{"a": [1]}', [1]),
+    ('value.type()', 1.5, 'number'),
+    ('value.md5()', 'a', '0cc175b9c0f1b6a831c399e269772661'),
+    ('round(2.5) + floor(-1.5) + max(1, 2)', None, 3),
+    ('1 == 1.0', None, True),
+    ('true == 1', None, False),
+    ('value.length() % 3', 'abcd', 1),
+])
+def test_evaluate(expression, value, expected):
+    assert evaluate(expression, value) == expected
+
+
+@pytest.mark.parametrize('expression, value, error', [
+    ('value.trim()', 3, TypeError),
+    ('value.toNumber()', 'abc', ValueError),
+    ('value.toDate()', 'no date', ValueError),
+    ('value.match(/a/)[0]', 'b', TypeError),
+    ('cells["a"].value', 'a', NameError),
+    ('1 / 0', None, ZeroDivisionError),
+])
+def test_errors(expression, value, error):
+    assert isinstance(evaluate(expression, value), error)
+
+
+@pytest.mark.parametrize('on_error, expected', [
+    ('set-to-blank', None),
+    ('keep-original', 3),
+])
+def test_on_error(on_error, expected):
+    assert compile_expression('value.trim()', on_error)(3) == expected
+
+
+@pytest.mark.parametrize('pattern, expected', [
+    ('yyyy-MM-dd', '%Y-%m-%d'),
+    ('dd/MMM/yy HH:mm', '%d/%b/%y %H:%M'),
+    ("EEE, d MMMM yyyy 'at' h a", '%a, %d %B %Y at %I %p'),
+    ("'100%' yyyy", '100%% %Y'),
+])
+def test_java_date_format(pattern, expected):
+    assert grel.java_date_format(pattern) == expected
+
+
+@pytest.mark.parametrize('expression, expected', [
+    ('cells["Date"].value + cells.Time.value', {'Date', 'Time'}),
+    ('value.trim()', set()),
+    ('forEach(row.columnNames, c, c)', None),
+    ('cells[value].value', None),
+])
+def test_referenced_columns(expression, expected):
+    assert referenced_columns(expression) == expected
+
+
+class TestColumnExpression:
+
+    @pytest.fixture(params=['object', 'arrow'])
+    def strings(self, request):
+        column = pd.Series(['Nov 2015', ' 9-30 Nov 2015 ', 'no date', '',
+                            '2015-11-09', 'a,b', ',a,,b', '12', ' 3.5',
+                            '99999999999999999999', 'TRUE', 'Straße',
+                            'İx', '²3'],
+                           index=np.arange(10, 24))
+        if request.param == 'arrow':
+            pytest.importorskip('pyarrow')
+            column = column.astype('string[pyarrow]')
+        return column
+
+    EXPRESSIONS = [
+        'value',
+        'value.trim().toLowercase()',
+        'grel:value.strip().toUppercase()',
+        'value.replace("Nov", "November")',
+        'value.replace(/(\\d+)-(\\d+)/, "$2 to $1")',
+        'value.split(",")',
+        'value.split(",", true)',
+        'value.split(" ")[0]',
+        'value.split(",").length()',
+        'value.match(/\\s*(\\d+)-(\\d+).*/)',
+        'value.match(/\\s*(\\d+)(?:-(\\d+))?.*/)[1]',
+        'value.toNumber()',
+        'value.toNumber() * 2 - 1',
+        'value.toDate().toString()',
+        'value.toDate("yyyy-MM-dd")',
+        'value.length()',
+        'value.length() + 1',
+        '"<" + value.trim() + "> " + value.length()',
+        'value[1, -1]',
+        'value.substring(2)',
+        'value[3]',
+        'value.contains("Nov")',
+        'value.contains(/\\d{4}/)',
+        'value.startsWith(" ")',
+        'value.indexOf("a")',
+        'value == "12"',
+        'value.length() >= 8',
+        'if(value.contains(","), value.split(",")[0], value)',
+        'if(value.startsWith(" "), null, value.length())',
+        'if(value, "yes", "no")',
+        'with(value.trim(), v, v + v)',
+        'and(isNonBlank(value), not(value.contains(" ")))',
+        'isBlank(value.trim())',
+        'value.toNumber().toString()',
+    ]
+
+    @pytest.mark.parametrize('expression', EXPRESSIONS)
+    @pytest.mark.parametrize('on_error', ['set-to-blank', 'store-error'])
+    def test_vectorized_matches_per_cell(self, strings, expression,
+                                         on_error):
+        function = compile_expression(expression, on_error)
+        # As pandas would hold them, e.g. None as NaN among numbers
+        expected = pd.Series([function(value)
+                              for value in strings.astype(object)],
+                             dtype=object).infer_objects()
+        col_expression = ColumnExpression(expression, on_error)
+
+        actual = col_expression(strings)
+
+        assert col_expression.vectorized is not None
+        assert actual.index.equals(strings.index)
+        for value, result in zip(to_objects(actual), to_objects(expected)):
+            if isinstance(result, Exception):
+                assert type(value) is type(result)
+            elif result is None or result is pd.NaT \
+                    or isinstance(result, float) and np.isnan(result):
+                assert value is None or pd.isna(value)
+            else:
+                assert value == result and type(value) is type(result)
+
+    def test_arrow_strings_stay_arrow(self, strings):
+        actual = ColumnExpression('value.trim() + "!"')(strings)
+
+        assert is_arrow_string(actual) == is_arrow_string(strings)
+
+    def test_mixed_column(self):
+        column = pd.Series([' a ', None, 3, np.nan, ' b'])
+
+        actual = ColumnExpression('value.trim()', 'keep-original')(column)
+
+        pdt.assert_series_equal(actual, pd.Series(['a', None, 3, np.nan,
+                                                   'b']))
+
+    def test_dates(self):
+        column = pd.Series(['2020-03-04', '1 May 2021'])
+
+        actual = ColumnExpression('value.toDate()')(column)
+
+        pdt.assert_series_equal(actual, pd.to_datetime(column, utc=True))
+
+    @pytest.mark.parametrize('expression', [
+        'value.fingerprint()',
+        'value.split(/,/)',
+        'value.toTitlecase()',
+        'cells["a"].value',
+    ])
+    def test_falls_back_to_per_cell(self, expression):
+        column = pd.Series(['a,b', 'c'])
+        col_expression = ColumnExpression(expression, 'store-error')
+
+        actual = col_expression(column)
+
+        assert col_expression.vectorized is None
+        assert [type(value) for value in actual] \
+            == [type(evaluate(expression, value)) for value in column]
+
+    def test_pickle(self):
+        expression = ColumnExpression('value.trim()')
+
+        restored = pickle.loads(pickle.dumps(expression))
+
+        assert restored.language == 'grel'
+        assert restored.vectorized is not None
+        assert restored(pd.Series([' a'])).tolist() == ['a']
@@ -0,0 +1,269 @@
+from io import BytesIO, StringIO
+import json
+import zipfile
+
+import pandas as pd
+import pandas.util.testing as pdt
+import pytest
+
+from click.testing import CliRunner
+
+from .utils import FIXTURES_PATH
+
+from pyrefine import cli
+from pyrefine.io import detect_format, read_columns, read_data, write_data
+
+pytest.importorskip('pyarrow')
+
+
+@pytest.fixture
+def doaj_data():
+    return pd.read_csv(FIXTURES_PATH / 'doaj-article-sample.csv')
+
+
+@pytest.mark.parametrize('name, expected', [
+    ('data.csv', 'csv'),
+    ('data.CSV.gz', 'csv'),
+    ('data.csv.zst', 'csv'),
+    ('data.parquet', 'parquet'),
+    ('data.pq', 'parquet'),
+    ('data.feather', 'feather'),
+    ('data.arrow', 'feather'),
+    ('data.txt', 'csv'),
+])
+def test_detect_format_from_name(tmp_path, name, expected):
+    assert detect_format(str(tmp_path / name)) == expected
+
+
+@pytest.mark.parametrize('format', ['parquet', 'feather'])
+def test_detect_format_from_contents(tmp_path, doaj_data, format):
+    path = str(tmp_path / 'data')
+    write_data(doaj_data, path, format=format)
+
+    assert detect_format(path) == format
+    pdt.assert_frame_equal(read_data(path), doaj_data)
+
+
+@pytest.mark.parametrize('name', [
+    'data.csv', 'data.csv.gz', 'data.csv.bz2', 'data.csv.xz',
+    'data.csv.zip', 'data.parquet', 'data.feather',
+])
+def test_round_trip(tmp_path, doaj_data, name):
+    path = str(tmp_path / name)
+
+    write_data(doaj_data, path)
+
+    pdt.assert_frame_equal(read_data(path), doaj_data)
+    assert read_columns(path) == list(doaj_data.columns)
+
+
+def test_round_trip_zstd(tmp_path, doaj_data):
+    pytest.importorskip('zstandard')
+    path = str(tmp_path / 'data.csv.zst')
+
+    write_data(doaj_data, path)
+
+    pdt.assert_frame_equal(read_data(path), doaj_data)
+
+
+def test_gzip_detected_from_contents(tmp_path, doaj_data):
+    path = str(tmp_path / 'data')
+    doaj_data.to_csv(path, index=False, compression='gzip')
+
+    pdt.assert_frame_equal(read_data(path), doaj_data)
+
+
+@pytest.mark.parametrize('name', ['data.csv', 'data.parquet',
+                                  'data.feather'])
+def test_read_columns(tmp_path, doaj_data, name):
+    path = str(tmp_path / name)
+    columns = [col for col in doaj_data.columns
+               if col in ('Title', 'Publisher', 'Date')]
+    write_data(doaj_data, path)
+
+    pdt.assert_frame_equal(read_data(path, columns=columns),
+                           doaj_data[columns])
+
+
+@pytest.mark.parametrize('name', ['data.csv', 'data.parquet',
+                                  'data.feather'])
+def test_read_chunks(tmp_path, doaj_data, name):
+    path = str(tmp_path / name)
+    write_data((doaj_data.iloc[i:i + 300]
+                for i in range(0, len(doaj_data), 300)), path)
+
+    chunks = list(read_data(path, chunksize=100))
+
+    assert max(len(chunk) for chunk in chunks) <= 100
+    pdt.assert_frame_equal(pd.concat(chunks, ignore_index=True), doaj_data)
+
+
+def test_write_chunks_with_different_types(tmp_path):
+    path = str(tmp_path / 'data.parquet')
+    chunks = [pd.DataFrame({'a': [1.5, 2.5]}), pd.DataFrame({'a': [3, 4]})]
+
+    write_data(chunks, path)
+
+    pdt.assert_frame_equal(read_data(path),
+                           pd.DataFrame({'a': [1.5, 2.5, 3, 4]}))
+
+
+@pytest.mark.parametrize('name', ['data.parquet', 'data.feather'])
+def test_write_chunks_with_wider_types(tmp_path, name):
+    path = str(tmp_path / name)
+    chunks = [pd.DataFrame({'a': [1, 2], 'b': [None, None]}),
+              pd.DataFrame({'a': [1.5, 4.0], 'b': [True, False]}),
+              pd.DataFrame({'a': ['foo', None], 'b': [None, True]})]
+
+    write_data(chunks, path)
+
+    pdt.assert_frame_equal(read_data(path), pd.DataFrame({
+        'a': ['1', '2', '1.5', '4', 'foo', None],
+        'b': [None, None, True, False, None, True]}))
+    assert list(tmp_path.iterdir()) == [tmp_path / name]
+
+
+def test_write_chunks_with_lists_and_strings(tmp_path):
+    path = tmp_path / 'data.parquet'
+    chunks = [pd.DataFrame({'a': [['x'], ['y']]}),
+              pd.DataFrame({'a': ['z', None]})]
+
+    with pytest.raises(ValueError):
+        write_data(chunks, str(path))
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_write_chunks_to_zip(tmp_path):
+    with pytest.raises(ValueError):
+        write_data(iter([pd.DataFrame({'a': [1]})]),
+                   str(tmp_path / 'data.csv.zip'))
+
+
+def test_write_zip(tmp_path, doaj_data):
+    path = str(tmp_path / 'data.csv.zip')
+
+    write_data(doaj_data, path)
+
+    pdt.assert_frame_equal(read_data(path), doaj_data)
+    with zipfile.ZipFile(path) as archive:
+        assert archive.namelist() == ['data.csv']
+
+
+@pytest.mark.parametrize('name', ['data.parquet', 'data.feather'])
+def test_write_chunks_with_blank_first_chunk(tmp_path, name):
+    path = str(tmp_path / name)
+    chunks = [pd.DataFrame({'a': [None, None], 'b': [1, 2]}),
+              pd.DataFrame({'a': ['x', None], 'b': [3.5, None]}),
+              pd.DataFrame({'a': [None, 'y'], 'b': [5, 6]})]
+
+    write_data(chunks, path)
+
+    pdt.assert_frame_equal(read_data(path), pd.DataFrame({
+        'a': [None, None, 'x', None, None, 'y'],
+        'b': [1, 2, 3.5, None, 5, 6]}))
+
+
+@pytest.mark.parametrize('name', ['data.parquet', 'data.feather'])
+def test_write_no_chunks(tmp_path, name):
+    path = tmp_path / name
+
+    write_data(iter([]), str(path))
+
+    assert read_data(str(path)).shape == (0, 0)
+
+
+@pytest.mark.parametrize('name', ['input.csv', 'input.parquet',
+                                  'input.feather'])
+def test_cli_chunked_empty_input(tmp_path, doaj_data, name):
+    script = str(FIXTURES_PATH / 'doaj-article-clean.json')
+    data = str(tmp_path / name)
+    outfile = str(tmp_path / 'output.parquet')
+    write_data(doaj_data.iloc[:0], data)
+
+    result = CliRunner().invoke(cli.execute, [script, data, '-o', outfile,
+                                              '--chunksize', '100'])
+
+    assert result.exit_code == 0, result.output
+    assert list(read_data(outfile).columns) == list(doaj_data.columns)
+
+
+@pytest.mark.parametrize('name', ['output.parquet', 'output.feather',
+                                  '-'])
+def test_cli_chunked_wider_types(tmp_path, name):
+    script = tmp_path / 'script.json'
+    script.write_text('[]')
+    data = tmp_path / 'input.csv'
+    data.write_text('a\n1\n2\n1.5\n4\nfoo\n')
+    args = [str(script), str(data), '-o', name, '--chunksize', '2']
+    if name == '-':
+        args += ['--output-format', 'parquet']
+    else:
+        args[3] = str(tmp_path / name)
+
+    result = CliRunner().invoke(cli.execute, args)
+
+    assert result.exit_code == 0, result.output
+    output = BytesIO(result.stdout_bytes) if name == '-' else args[3]
+    pdt.assert_frame_equal(
+        read_data(output, 'parquet' if name == '-' else None),
+        pd.DataFrame({'a': ['1', '2', '1.5', '4', 'foo']}))
+
+
+def test_cli_chunked_zip(tmp_path):
+    script = str(FIXTURES_PATH / 'doaj-article-clean.json')
+    data = str(FIXTURES_PATH / 'doaj-article-sample.csv')
+    outfile = tmp_path / 'output.csv.zip'
+
+    result = CliRunner().invoke(cli.execute, [
+        script, data, '-o', str(outfile), '--chunksize', '100'])
+
+    assert result.exit_code == 2
+    assert not outfile.exists()
+
+
+@pytest.mark.parametrize('args', [[], ['--chunksize', '100'],
+                                  ['--optimize']])
+def test_cli_columnar(tmp_path, doaj_data, args):
+    script = str(FIXTURES_PATH / 'doaj-article-clean.json')
+    data = str(tmp_path / 'input.parquet')
+    outfile = str(tmp_path / 'output.feather')
+    write_data(doaj_data, data)
+    runner = CliRunner()
+
+    expected = runner.invoke(cli.execute, [
+        script, str(FIXTURES_PATH / 'doaj-article-sample.csv')])
+    result = runner.invoke(cli.execute, [script, data, '-o', outfile] + args)
+
+    assert result.exit_code == 0
+    pdt.assert_frame_equal(read_data(outfile).fillna('').astype(str),
+                           read_data(StringIO(expected.output))
+                           .fillna('').astype(str))
+
+
+def test_cli_compressed_csv(tmp_path, doaj_data):
+    script = tmp_path / 'script.json'
+    script.write_text(json.dumps([{
+        'op': 'core/column-removal', 'description': 'Remove column',
+        'columnName': 'DOI'}]))
+    data = str(tmp_path / 'input.csv.gz')
+    outfile = str(tmp_path / 'output.csv.bz2')
+    write_data(doaj_data, data)
+
+    result = CliRunner().invoke(cli.execute, [str(script), data,
+                                              '-o', outfile])
+
+    assert result.exit_code == 0
+    pdt.assert_frame_equal(read_data(outfile),
+                           doaj_data.drop(columns=['DOI']))
+
+
+def test_cli_output_format(tmp_path, doaj_data):
+    script = str(FIXTURES_PATH / 'doaj-article-clean.json')
+    data = str(FIXTURES_PATH / 'doaj-article-sample.csv')
+    outfile = str(tmp_path / 'output')
+
+    result = CliRunner().invoke(cli.execute, [
+        script, data, '-o', outfile, '--output-format', 'parquet'])
+
+    assert result.exit_code == 0
+    assert detect_format(outfile) == 'parquet'
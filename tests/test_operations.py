@@ -7,8 +7,12 @@ import numpy as np
 import pandas.util.testing as pdt
 
 from collections.abc import Callable
+import importlib
+import json
 
 import pyrefine
+from pyrefine.arrow import is_arrow_list, is_arrow_string, to_arrow_column, \
+    to_objects, use_arrow_strings
 
 
 def assert_op_changes_data(params, *, base_data, expected_data):
@@ -33,6 +37,15 @@ class TestOperation:
         with pytest.raises(RuntimeError):
             pyrefine.ops.create({'op': 'does not exist'})
 
+    def test_registry_lists_every_operation(self):
+        from pyrefine.ops.base import OPERATION_MODULES, _operations
+
+        for module in set(OPERATION_MODULES.values()):
+            importlib.import_module(module)
+
+        assert {name: cls.__module__ for name, cls in _operations.items()
+                if name.startswith('core/')} == OPERATION_MODULES
+
 
 class CommonOperationTests:
 
@@ -49,6 +62,50 @@ class CommonOperationTests:
         op(base_data)
         pdt.assert_frame_equal(orig_data, base_data)
 
+    def test_in_place(self, default_params, base_data):
+        op = pyrefine.ops.create(default_params)
+        if not getattr(op, 'supports_in_place', False):
+            pytest.skip('Operation is not executed in place')
+        data = base_data.copy()
+
+        result = op(data, in_place=True)
+
+        assert result is data
+        pdt.assert_frame_equal(result, op(base_data))
+
+    @pytest.mark.parametrize('chunksize', [1, 3, 4])
+    def test_chunked_execution(self, default_params, base_data, chunksize):
+        script = pyrefine.parse(json.dumps([default_params]))
+        chunks = (base_data.iloc[i:i + chunksize]
+                  for i in range(0, len(base_data), chunksize))
+
+        actual_data = pd.concat(script.execute_chunked(chunks))
+
+        pdt.assert_frame_equal(script.execute(base_data), actual_data)
+
+    def test_arrow_strings(self, default_params, base_data):
+        pytest.importorskip('pyarrow')
+        op = pyrefine.ops.create(default_params)
+        arrow_data = use_arrow_strings(base_data)
+
+        expected_data = op(base_data)
+        actual_data = op(arrow_data)
+
+        assert list(actual_data.columns) == list(expected_data.columns)
+        for name in expected_data.columns:
+            actual, expected = actual_data[name], expected_data[name]
+            assert [_blank_to_none(val) for val in to_objects(actual)] \
+                == [_blank_to_none(val) for val in to_objects(expected)]
+            if expected.dtype == object \
+                    and to_arrow_column(expected).dtype != object:
+                assert is_arrow_string(actual) or is_arrow_list(actual)
+
+
+def _blank_to_none(value):
+    if not isinstance(value, list) and pd.isnull(value):
+        return None
+    return value
+
 
 class TestMassEditOperation(CommonOperationTests):
 
@@ -128,6 +185,45 @@ class TestMassEditOperation(CommonOperationTests):
                               ['right', 'foo bar', 'baz', 'right'],
                               'questionable', ['right', 'right']]))
 
+    def test_chained_edits(self, base_data, default_params):
+        assert_op_changes_data(
+            dict(default_params,
+                 edits=[{'from': ['wrong'], 'to': 'questionable',
+                         'fromBlank': False, 'fromError': False},
+                        {'from': ['questionable', 'right'], 'to': 'ok',
+                         'fromBlank': True, 'fromError': False}]),
+            base_data=base_data,
+            expected_data=base_data.assign(
+                needs_fixing=['ok', 'ok', 'ok', 'ok', 'ok']))
+
+    def test_fromblank_ignores_list_items(self, base_data, default_params):
+        assert_op_changes_data(
+            dict(default_params,
+                 edits=[{'from': ['wrong'], 'to': None,
+                         'fromBlank': False, 'fromError': False},
+                        {'from': [], 'to': 'blank',
+                         'fromBlank': True, 'fromError': False}]),
+            base_data=base_data.assign(
+                needs_fixing=['wrong', None, ['wrong', 'right'],
+                              'questionable', []]),
+            expected_data=base_data.assign(
+                needs_fixing=['blank', 'blank', [None, 'right'],
+                              'questionable', []]))
+
+    def test_many_edits(self, base_data, default_params):
+        assert_op_changes_data(
+            dict(default_params,
+                 edits=[{'from': [f'value {i}', f'Value {i}'],
+                         'to': f'VALUE {i}',
+                         'fromBlank': False, 'fromError': False}
+                        for i in range(500)]),
+            base_data=base_data.assign(
+                needs_fixing=['value 1', 'Value 499', ['value 7', 'x'],
+                              'value 500', None]),
+            expected_data=base_data.assign(
+                needs_fixing=['VALUE 1', 'VALUE 499', ['VALUE 7', 'x'],
+                              'value 500', None]))
+
 
 class TestBlankDownOperation(CommonOperationTests):
 
@@ -155,6 +251,33 @@ class TestBlankDownOperation(CommonOperationTests):
                 tidy_up=['one', 'two', None, 'three', 'four',
                          None, None, None, 'five', None]))
 
+    def test_blank_down_non_default_index(self, default_params, base_data):
+        base_data.index = np.arange(10, 0, -1)
+        assert_op_changes_data(
+            default_params,
+            base_data=base_data,
+            expected_data=base_data.assign(
+                tidy_up=['one', 'two', None, 'three', 'four',
+                         None, None, None, 'five', None]))
+
+    def test_blank_down_numeric(self, default_params, base_data):
+        assert_op_changes_data(
+            dict(default_params, columnName='id'),
+            base_data=base_data.assign(id=[1, 1, 2, 3, 3, 3, 1, 2, 2, 2]),
+            expected_data=base_data.assign(
+                id=[1, np.NaN, 2, 3, np.NaN, np.NaN, 1, 2, np.NaN, np.NaN]))
+
+    def test_nan_never_blanked(self, default_params, base_data):
+        base_data = base_data.assign(
+            tidy_up=['one', np.NaN, np.NaN, None, None,
+                     'two', 'two', np.NaN, 'two', 'two'])
+        assert_op_changes_data(
+            default_params,
+            base_data=base_data,
+            expected_data=base_data.assign(
+                tidy_up=['one', np.NaN, np.NaN, None, None,
+                         'two', None, np.NaN, 'two', None]))
+
 
 class TestFillDownOperation(CommonOperationTests):
 
@@ -182,6 +305,40 @@ class TestFillDownOperation(CommonOperationTests):
                 tidy_up=['one', 'two', 'two', 'three', 'four',
                          'four', 'four', 'four', 'five', 'five']))
 
+    def test_fill_down_non_default_index(self, default_params, base_data):
+        base_data.index = np.arange(10, 0, -1)
+        assert_op_changes_data(
+            default_params,
+            base_data=base_data,
+            expected_data=base_data.assign(
+                tidy_up=['one', 'two', 'two', 'three', 'four',
+                         'four', 'four', 'four', 'five', 'five']))
+
+    def test_leading_blanks_stay_blank(self, default_params, base_data):
+        base_data = base_data.assign(
+            tidy_up=[None, None, 'one', None, 'two',
+                     None, None, None, 'three', None])
+        assert_op_changes_data(
+            default_params,
+            base_data=base_data,
+            expected_data=base_data.assign(
+                tidy_up=[None, None, 'one', 'one', 'two',
+                         'two', 'two', 'two', 'three', 'three']))
+
+    def test_nan_not_filled(self, default_params, base_data):
+        base_data = base_data.assign(
+            tidy_up=['one', np.NaN, None, 'two', None,
+                     np.NaN, None, None, 'three', None])
+        result = pyrefine.ops.create(default_params)(base_data)
+
+        expected = ['one', np.NaN, np.NaN, 'two', 'two',
+                    np.NaN, np.NaN, np.NaN, 'three', 'three']
+        for actual_val, expected_val in zip(result.tidy_up, expected):
+            if expected_val is np.NaN:
+                assert actual_val is not None and np.isnan(actual_val)
+            else:
+                assert actual_val == expected_val
+
 
 class TestMultivaluedCellSplitOperation(CommonOperationTests):
 
@@ -210,6 +367,29 @@ class TestMultivaluedCellSplitOperation(CommonOperationTests):
                           ['No splitting here'],
                           ['Item 1', 'item 2', 'item_3']]))
 
+    @pytest.mark.parametrize('arrow', [False, True])
+    def test_split_blanks(self, default_params, base_data, arrow):
+        column = pd.Series(['a|b', None, np.nan])
+        if arrow:
+            pytest.importorskip('pyarrow')
+            column = column.astype('string[pyarrow]')
+        op = pyrefine.ops.create(default_params)
+
+        result = op(base_data.assign(split_me=column))
+
+        assert is_arrow_list(result['split_me']) == arrow
+        values = to_objects(result['split_me']).tolist()
+        assert values[0] == ['a', 'b']
+        assert pd.isna(values[1:]).all()
+
+    def test_split_python_strings_into_lists(self, default_params,
+                                             base_data):
+        result = pyrefine.ops.create(default_params)(base_data)
+
+        assert result['split_me'].dtype == object
+        assert type(result['split_me'][0]) is list
+        repr(result)
+
     def test_split_numeric_column(self, default_params, base_data):
         assert_op_raises(dict(default_params, columnName='id'),
                          base_data, TypeError)
@@ -337,6 +517,25 @@ class TestTransposeRowsIntoColumnsOperation(CommonOperationTests):
             base_data=base_data,
             expected_data=expected_data)
 
+    def test_transpose_booleans(self, default_params, base_data):
+        base_data['transpose'] = [True, False] * 5
+        op = pyrefine.ops.create(dict(default_params, rowCount=3))
+
+        result = op(base_data)
+
+        assert result['transpose 1'].where(result['transpose 1'].notna(),
+                                           None).tolist() == [
+            True, None, None, False, None, None, True, None, None, False]
+
+    def test_more_rows_than_data(self, default_params, base_data):
+        op = pyrefine.ops.create(dict(default_params, rowCount=12))
+
+        result = op(base_data.iloc[:3])
+
+        assert list(result.columns) == op.output_columns(base_data.columns)
+        assert result.iloc[0, 1:4].tolist() == ['one', 'two', 'three']
+        assert result.iloc[:, 4:].isnull().all().all()
+
 
 class TestColumnRemovalOperation(CommonOperationTests):
 
@@ -552,3 +751,178 @@ class TestColumnAdditionOperation(CommonOperationTests):
 
         for i, value in enumerate(actual_data.fifth):
             assert isinstance(value, RuntimeError), f'{i}: {value}'
+
+
+class TestTextTransformOperation(CommonOperationTests):
+
+    @pytest.fixture
+    def default_params(self):
+        return {"op": "core/text-transform",
+                "description": "Text transform on cells in column name",
+                "engineConfig": {
+                    "mode": "row-based",
+                    "facets": []
+                },
+                "columnName": "name",
+                "expression": "jython:return value.strip().title()",
+                "onError": "keep-original",
+                "repeat": False,
+                "repeatCount": 10}
+
+    @pytest.fixture
+    def base_data(self):
+        return pd.DataFrame({'id': np.arange(5),
+                             'name': [' ada lovelace', 'ALAN turing ', None,
+                                      'grace hopper', '']})
+
+    def test_transform(self, default_params, base_data):
+        assert_op_changes_data(
+            default_params,
+            base_data=base_data,
+            expected_data=base_data.assign(
+                name=['Ada Lovelace', 'Alan Turing', None, 'Grace Hopper',
+                      '']))
+
+    def test_keep_original_on_error(self, default_params, base_data):
+        result = pyrefine.ops.create(default_params)(base_data)
+
+        assert result['name'][2] is None
+
+    def test_repeat(self, default_params, base_data):
+        params = dict(default_params, repeat=True, repeatCount=3,
+                      expression='jython:return value[1:]')
+
+        result = pyrefine.ops.create(params)(base_data)
+
+        assert result['name'].tolist() == [' lovelace', ' turing ', None,
+                                           'e hopper', '']
+
+    def test_repeat_until_unchanged(self, default_params, base_data):
+        params = dict(default_params, repeat=True, repeatCount=100,
+                      expression='jython:return value.replace("  ", " ")')
+        base_data['name'] = ['a' + ' ' * 40 + 'b', 'c d', None, 'e', '']
+
+        result = pyrefine.ops.create(params)(base_data)
+
+        assert result['name'].tolist() == ['a b', 'c d', None, 'e', '']
+
+    def test_memoized(self, default_params, base_data):
+        script = pyrefine.parse(json.dumps([default_params]))
+        caches = script.memoize()
+
+        script.execute(pd.concat([base_data] * 3))
+
+        assert caches[0].misses == 4
+
+
+class TestColumnSplitOperation(CommonOperationTests):
+
+    @pytest.fixture
+    def default_params(self):
+        return {"op": "core/column-split",
+                "description": "Split column range by separator",
+                "engineConfig": {
+                    "mode": "row-based",
+                    "facets": []
+                },
+                "columnName": "range",
+                "guessCellType": True,
+                "removeOriginalColumn": True,
+                "mode": "separator",
+                "separator": "-",
+                "regex": False,
+                "maxColumns": 0}
+
+    @pytest.fixture
+    def base_data(self):
+        return pd.DataFrame({'id': np.arange(5),
+                             'range': ['9-30', '2-2', None, '17-18-x', '']})
+
+    @staticmethod
+    def values(column):
+        return [_blank_to_none(value) for value in column]
+
+    def test_split(self, default_params, base_data):
+        result = pyrefine.ops.create(default_params)(base_data)
+
+        assert list(result.columns) == ['id', 'range 1', 'range 2',
+                                        'range 3']
+        assert self.values(result['range 1']) == [9, 2, None, 17, None]
+        assert self.values(result['range 2']) == [30, 2, None, 18, None]
+        assert self.values(result['range 3']) == [None, None, None, 'x',
+                                                  None]
+
+    def test_keep_original_strings(self, default_params, base_data):
+        params = dict(default_params, guessCellType=False,
+                      removeOriginalColumn=False)
+
+        result = pyrefine.ops.create(params)(base_data)
+
+        assert list(result.columns) == ['id', 'range', 'range 1', 'range 2',
+                                        'range 3']
+        assert self.values(result['range 1']) == ['9', '2', None, '17', None]
+
+    @pytest.mark.parametrize('arrow', [False, True])
+    def test_max_columns(self, default_params, base_data, arrow):
+        if arrow:
+            pytest.importorskip('pyarrow')
+            base_data = use_arrow_strings(base_data)
+        params = dict(default_params, maxColumns=2)
+
+        result = pyrefine.ops.create(params)(base_data)
+
+        assert self.values(result['range 2']) == [30, 2, None, '18-x', None]
+
+    @pytest.mark.parametrize('arrow', [False, True])
+    def test_regex(self, default_params, base_data, arrow):
+        base_data['range'] = ['9 to 30', '2-2', None, '17 - 18 - -', '']
+        if arrow:
+            pytest.importorskip('pyarrow')
+            base_data = use_arrow_strings(base_data)
+        params = dict(default_params, regex=True, separator=r'\s*(?:-|to)\s*')
+
+        result = pyrefine.ops.create(params)(base_data)
+
+        # Trailing empty pieces are dropped, as by Java's Pattern.split
+        assert list(result.columns) == ['id', 'range 1', 'range 2']
+        assert self.values(result['range 2']) == [30, 2, None, 18, None]
+
+    def test_lengths(self, default_params, base_data):
+        params = dict(default_params, mode='lengths', fieldLengths=[1, 2, 3])
+
+        result = pyrefine.ops.create(params)(base_data)
+
+        assert list(result.columns) == ['id', 'range 1', 'range 2',
+                                        'range 3']
+        assert self.values(result['range 2']) == [-3, -2, None, '7-',
+                                                  None]
+        assert self.values(result['range 3']) == [0, None, None, '18-',
+                                                  None]
+
+    def test_unduplicated_names(self, default_params, base_data):
+        base_data['range 2'] = 0
+
+        result = pyrefine.ops.create(default_params)(base_data)
+
+        assert list(result.columns) == ['id', 'range 1', 'range 22',
+                                        'range 3', 'range 2']
+
+    def test_facets(self, default_params, base_data):
+        params = dict(default_params, engineConfig={
+            'mode': 'row-based',
+            'facets': [{'type': 'range', 'name': 'id', 'columnName': 'id',
+                        'expression': 'value', 'from': 1, 'to': 3,
+                        'selectNumeric': True, 'selectNonNumeric': False,
+                        'selectBlank': False, 'selectError': False}]})
+
+        result = pyrefine.ops.create(params)(base_data)
+
+        assert list(result.columns) == ['id', 'range 1', 'range 2']
+        assert self.values(result['range 1']) == [None, 2, None, None, None]
+
+    @pytest.mark.parametrize('chunksize', [1, 3, 4])
+    def test_chunked_execution(self, default_params, base_data, chunksize):
+        script = pyrefine.parse(json.dumps([default_params]))
+
+        with pytest.raises(RuntimeError):
+            list(script.execute_chunked([base_data]))
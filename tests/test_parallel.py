@@ -0,0 +1,94 @@
+import json
+import pickle
+
+import pandas as pd
+import pandas.util.testing as pdt
+import pytest
+
+from click.testing import CliRunner
+
+from .utils import FIXTURES_PATH
+
+import pyrefine
+from pyrefine import cli
+from pyrefine.expressions import ColumnExpression, ExpressionCache
+from pyrefine.parallel import ParallelExecutor
+
+
+@pytest.fixture
+def doaj_data():
+    return pd.read_csv(FIXTURES_PATH / 'doaj-article-sample.csv')
+
+
+@pytest.fixture
+def doaj_script():
+    return pyrefine.load_script(FIXTURES_PATH / 'doaj-article-clean.json')
+
+
+def test_column_expression_pickles():
+    expression = ColumnExpression('jython:return value.upper()',
+                                  on_error='keep-original',
+                                  cache=ExpressionCache(10))
+
+    copy = pickle.loads(pickle.dumps(expression))
+
+    assert copy.on_error == 'keep-original'
+    assert copy.cache.maxsize == 10
+    assert copy.function('a') == 'A'
+    assert copy.vectorized is not None
+
+
+def test_operations_pickle(doaj_script):
+    for op in doaj_script.operations:
+        pickle.loads(pickle.dumps(op))
+
+
+@pytest.mark.parametrize('jobs', [1, 2, 3])
+def test_matches_serial(doaj_data, doaj_script, jobs):
+    expected = doaj_script.execute(doaj_data.copy())
+
+    with ParallelExecutor(jobs=jobs, min_rows=0) as executor:
+        result = executor.execute(doaj_script, doaj_data)
+
+    pdt.assert_frame_equal(result, expected)
+
+
+def test_barriers():
+    script = pyrefine.parse(json.dumps([
+        {'op': 'core/column-addition', 'description': 'Add column',
+         'engineConfig': {'mode': 'row-based', 'facets': []},
+         'newColumnName': 'length', 'columnInsertIndex': 1,
+         'baseColumnName': 'name', 'onError': 'set-to-blank',
+         'expression': 'jython:return len(value)'},
+        {'op': 'core/fill-down', 'description': 'Fill down',
+         'columnName': 'length'},
+        {'op': 'core/column-rename', 'description': 'Rename',
+         'oldColumnName': 'length', 'newColumnName': 'size'},
+    ]))
+    data = pd.DataFrame({'name': ['a', None, 'bbb', None, None, 'cc'] * 5})
+    expected = script.execute(data.copy())
+
+    with ParallelExecutor(jobs=4, min_rows=0) as executor:
+        result = executor.execute(script, data)
+
+    pdt.assert_frame_equal(result, expected)
+
+
+def test_small_data_not_sent_to_workers(doaj_data, doaj_script):
+    executor = ParallelExecutor(jobs=2)
+
+    executor.execute(doaj_script, doaj_data)
+
+    assert executor._pool is None
+
+
+def test_cli_jobs(doaj_data):
+    runner = CliRunner()
+    script = str(FIXTURES_PATH / 'doaj-article-clean.json')
+    data = str(FIXTURES_PATH / 'doaj-article-sample.csv')
+
+    result = runner.invoke(cli.execute, [script, data])
+    parallel = runner.invoke(cli.execute, [script, data, '--jobs', '2'])
+
+    assert parallel.exit_code == 0
+    assert parallel.output == result.output
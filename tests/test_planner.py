@@ -0,0 +1,270 @@
+import json
+
+import pandas as pd
+import pandas.util.testing as pdt
+import pytest
+
+from click.testing import CliRunner
+
+from .utils import FIXTURES_PATH
+
+import pyrefine
+from pyrefine import cli
+from pyrefine.ops import create
+from pyrefine.planner import Plan
+
+
+def rename(old, new):
+    return create({'op': 'core/column-rename',
+                   'description': 'Rename {} to {}'.format(old, new),
+                   'oldColumnName': old, 'newColumnName': new})
+
+
+def remove(column):
+    return create({'op': 'core/column-removal',
+                   'description': 'Remove {}'.format(column),
+                   'columnName': column})
+
+
+def add(base, new, index, expression='jython:return value.upper()'):
+    return create({'op': 'core/column-addition',
+                   'description': 'Add {}'.format(new),
+                   'engineConfig': {'mode': 'row-based', 'facets': []},
+                   'baseColumnName': base, 'newColumnName': new,
+                   'columnInsertIndex': index, 'expression': expression,
+                   'onError': 'set-to-blank'})
+
+
+def mass_edit(column, old, new):
+    return create({'op': 'core/mass-edit',
+                   'description': 'Edit {}'.format(column),
+                   'columnName': column, 'expression': 'value',
+                   'edits': [{'fromBlank': False, 'fromError': False,
+                              'from': [old], 'to': new}]})
+
+
+@pytest.fixture
+def data():
+    return pd.DataFrame({'a': ['x', 'y', None, 'x'],
+                         'b': ['p', 'q', 'r', 's'],
+                         'c': ['1', '2', '3', '4']})
+
+
+def check_equivalent(operations, data, columns=True):
+    plan = Plan(operations, data.columns if columns else None)
+
+    expected = data.copy()
+    for op in operations:
+        expected = op(expected)
+    actual = data.copy()
+    for op in plan.operations:
+        actual = op(actual)
+
+    pdt.assert_frame_equal(actual, expected)
+    return plan
+
+
+def test_fuses_renames(data):
+    plan = check_equivalent([rename('a', 'd'), rename('d', 'e'),
+                             rename('b', 'f')], data)
+
+    assert len(plan) == 1
+    assert plan.operations[0].transform == {'a': 'e', 'b': 'f'}
+    assert plan.sources == [(0, 1, 2)]
+
+
+def test_drops_renames_that_cancel_out(data):
+    plan = check_equivalent([rename('a', 'd'), rename('d', 'a')], data)
+
+    assert len(plan) == 0
+
+
+def test_merges_mass_edits(data):
+    plan = check_equivalent([mass_edit('a', 'x', 'z'),
+                             mass_edit('a', 'z', 'w'),
+                             mass_edit('b', 'p', 'z')], data)
+
+    assert len(plan) == 2
+    assert plan.sources == [(0, 1), (2,)]
+
+
+def test_drops_unread_addition(data):
+    plan = check_equivalent([add('a', 'd', 1), mass_edit('b', 'p', 'z'),
+                             remove('d')], data)
+
+    assert [type(op).__name__ for op in plan.operations] \
+        == ['MassEditOperation']
+
+
+def test_keeps_addition_that_is_read(data):
+    plan = check_equivalent([add('a', 'd', 1), add('d', 'e', 0),
+                             remove('d')], data)
+
+    assert len(plan) == 3
+
+
+def test_drops_edits_of_removed_column(data):
+    plan = check_equivalent([mass_edit('a', 'x', 'z'), remove('a')], data)
+
+    assert plan.sources == [(1,)]
+
+
+def test_pushes_removal_before_positional_ops(data):
+    move = create({'op': 'core/column-move', 'description': 'Move c',
+                   'columnName': 'c', 'index': 0})
+    plan = check_equivalent([add('b', 'd', 3), move, remove('a')], data)
+
+    assert plan.sources == [(2,), (0,), (1,)]
+    assert plan.operations[1].insert_index == 2
+
+
+def test_positional_ops_need_columns(data):
+    plan = check_equivalent([add('b', 'd', 3), remove('a')], data,
+                            columns=False)
+
+    assert plan.sources == [(0,), (1,)]
+
+
+def test_removal_follows_renamed_column(data):
+    plan = check_equivalent([rename('a', 'd'), rename('b', 'e'),
+                             mass_edit('c', '1', '0'), remove('d')], data)
+
+    assert isinstance(plan.operations[0], type(remove('a')))
+    assert plan.operations[0].column == 'a'
+    assert plan.operations[1].transform == {'b': 'e'}
+
+
+@pytest.mark.parametrize('expression', [
+    'jython:return cells["a"]["value"]',
+    'jython:return row',
+])
+def test_removal_not_moved_past_readers(data, expression):
+    plan = check_equivalent([add('b', 'd', 0, expression), remove('a')],
+                            data)
+
+    assert plan.sources == [(0,), (1,)]
+
+
+def test_splits_reorder(data):
+    reorder = create({'op': 'core/column-reorder', 'description': 'Reorder',
+                      'columnNames': ['c', 'b']})
+    plan = check_equivalent([add('b', 'd', 0), reorder], data)
+
+    # Column d is then removed unread, so is never added
+    assert [type(op).__name__ for op in plan.operations] \
+        == ['ColumnRemovalOperation', 'ColumnReorderOperation']
+    assert plan.operations[0].column == 'a'
+
+
+def test_explain(data):
+    plan = Plan([rename('a', 'd'), rename('d', 'e'), add('b', 'f', 0),
+                 remove('f')])
+
+    explanation = plan.explain()
+
+    assert explanation.startswith('4 operations, optimised to 1:')
+    assert '0,1' in explanation
+    assert 'Fused renames #0 "Rename a to d" and #1 "Rename d to e"' \
+        in explanation
+    assert 'Dropped #2 "Add f"' in explanation
+
+
+@pytest.mark.parametrize('op', ['core/fill-down', 'core/blank-down'])
+def test_record_mode_reads_key_column(op):
+    # Records depend on the first column, even with no facets
+    data = pd.DataFrame({'a': ['k1', 'k2', None, None],
+                         'b': ['x', None, None, None]})
+    fill = create({'op': op, 'description': 'Fill b', 'columnName': 'b',
+                   'engineConfig': {'mode': 'record-based', 'facets': []}})
+    script = pyrefine.Script()
+    script.operations = [fill, remove('a')]
+
+    assert fill.reads is None
+    check_equivalent(script.operations, data)
+    check_equivalent(script.operations, data, columns=False)
+    projected, columns = script.project(data.columns)
+    assert columns == ['a', 'b']
+    pdt.assert_frame_equal(projected.execute(data[columns].copy()),
+                           script.execute(data.copy()))
+
+
+def test_script_optimize():
+    script = pyrefine.load_script(FIXTURES_PATH / 'doaj-article-clean.json')
+    data = pd.read_csv(FIXTURES_PATH / 'doaj-article-sample.csv')
+
+    optimized = script.optimize(data.columns)
+
+    assert len(optimized) < len(script)
+    pdt.assert_frame_equal(optimized.execute(data.copy()),
+                           script.execute(data.copy()))
+
+
+def test_script_project(data):
+    script = pyrefine.Script()
+    script.operations = [add('b', 'd', 1), mass_edit('c', '1', '0'),
+                         remove('a'), remove('b')]
+
+    projected, columns = script.project(data.columns)
+
+    assert columns == ['b', 'c']
+    assert script.required_columns(data.columns) == columns
+    pdt.assert_frame_equal(projected.execute(data[columns].copy()),
+                           script.execute(data.copy()))
+
+
+def test_script_project_keeps_a_column(data):
+    script = pyrefine.Script()
+    script.operations = [remove('a'), remove('b'), remove('c')]
+
+    projected, columns = script.project(data.columns)
+
+    assert columns == ['c']
+    assert projected.execute(data[columns]).shape == (4, 0)
+
+
+def test_cli_reads_only_required_columns(tmp_path, monkeypatch):
+    script = tmp_path / 'script.json'
+    script.write_text(json.dumps([
+        {'op': 'core/column-removal', 'description': 'Remove column',
+         'columnName': col}
+        for col in ['Title', 'DOI', 'Publisher', 'Date']]))
+    data = str(FIXTURES_PATH / 'doaj-article-sample.csv')
+    read_csv = pd.read_csv
+    usecols = []
+    monkeypatch.setattr(pd, 'read_csv', lambda *args, **kwargs:
+                        usecols.append(kwargs.get('usecols'))
+                        or read_csv(*args, **kwargs))
+    runner = CliRunner()
+
+    result = runner.invoke(cli.execute, [str(script), data])
+    optimized = runner.invoke(cli.execute, [str(script), data, '--optimize'])
+
+    assert optimized.exit_code == 0
+    assert optimized.output == result.output
+    assert usecols[0] is None
+    assert len(usecols[-1]) == len(read_csv(data).columns) - 4
+
+
+@pytest.mark.parametrize('args', [[], ['--chunksize', '100']])
+def test_cli_optimize(args):
+    runner = CliRunner()
+    script = str(FIXTURES_PATH / 'doaj-article-clean.json')
+    data = str(FIXTURES_PATH / 'doaj-article-sample.csv')
+
+    result = runner.invoke(cli.execute, [script, data] + args)
+    optimized = runner.invoke(cli.execute, [script, data, '--optimize']
+                              + args)
+
+    assert optimized.exit_code == 0
+    assert optimized.output == result.output
+
+
+def test_cli_explain():
+    runner = CliRunner()
+    script = str(FIXTURES_PATH / 'doaj-article-clean.json')
+    data = str(FIXTURES_PATH / 'doaj-article-sample.csv')
+
+    result = runner.invoke(cli.explain, [script, data])
+
+    assert result.exit_code == 0
+    assert 'Merged mass edits' in result.output
@@ -0,0 +1,163 @@
+# flake8: noqa
+
+import json
+import tracemalloc
+
+import pytest
+
+import pandas as pd
+import numpy as np
+import pandas.util.testing as pdt
+
+from click.testing import CliRunner
+
+from .utils import FIXTURES_PATH
+
+import pyrefine
+from pyrefine import cli
+
+
+@pytest.fixture
+def script():
+    return pyrefine.parse(json.dumps([
+        {'op': 'core/column-removal', 'description': 'Remove column b',
+         'columnName': 'b'},
+        {'op': 'core/fill-down', 'description': 'Fill down column a',
+         'columnName': 'a'},
+    ]))
+
+
+@pytest.fixture
+def data():
+    return pd.DataFrame({'a': ['x', None, 'y', None],
+                         'b': np.arange(4)})
+
+
+class RecordingHook(pyrefine.ExecutionHook):
+
+    def __init__(self):
+        self.events = []
+
+    def before(self, index, op, data):
+        self.events.append(('before', index, op.description, data.shape))
+
+    def after(self, index, op, data):
+        self.events.append(('after', index, op.description, data.shape))
+
+    def error(self, index, op, error):
+        self.events.append(('error', index, op.description, type(error)))
+
+
+def test_hooks_called_around_each_operation(script, data):
+    hook = RecordingHook()
+
+    script.execute(data, hooks=[hook])
+
+    assert hook.events == [
+        ('before', 0, 'Remove column b', (4, 2)),
+        ('after', 0, 'Remove column b', (4, 1)),
+        ('before', 1, 'Fill down column a', (4, 1)),
+        ('after', 1, 'Fill down column a', (4, 1)),
+    ]
+
+
+def test_hooks_told_of_errors(script, data):
+    hook = RecordingHook()
+
+    with pytest.raises(KeyError):
+        script.execute(data.drop(columns='b'), hooks=[hook])
+
+    assert hook.events == [
+        ('before', 0, 'Remove column b', (4, 1)),
+        ('error', 0, 'Remove column b', KeyError),
+    ]
+
+
+def test_hooks_do_not_change_result(script, data):
+    pdt.assert_frame_equal(script.execute(data),
+                           script.execute(data, hooks=[RecordingHook(),
+                                                       pyrefine.Profiler()]))
+
+
+class TestProfiler:
+
+    @pytest.mark.parametrize('memory', [True, False])
+    def test_records_each_operation(self, script, data, memory):
+        profiler = pyrefine.Profiler(memory=memory)
+
+        script.execute(data, hooks=[profiler])
+
+        assert [r.description for r in profiler.records] \
+            == ['Remove column b', 'Fill down column a']
+        first = profiler.records[0]
+        assert first.index == 0
+        assert (first.rows_in, first.columns_in) == (4, 2)
+        assert (first.rows_out, first.columns_out) == (4, 1)
+        for record in profiler.records:
+            assert record.wall_time >= 0
+            assert record.cpu_time >= 0
+            if memory:
+                assert record.peak_memory >= 0
+            else:
+                assert record.peak_memory is None
+
+    def test_stops_tracing_on_error(self, script, data):
+        with pytest.raises(KeyError):
+            script.execute(data.drop(columns='b'),
+                           hooks=[pyrefine.Profiler()])
+
+        assert not tracemalloc.is_tracing()
+
+    def test_json_report(self, script, data):
+        profiler = pyrefine.Profiler()
+        script.execute(data, hooks=[profiler])
+
+        report = json.loads(profiler.report('json'))
+
+        assert [r['description'] for r in report] \
+            == ['Remove column b', 'Fill down column a']
+        assert set(report[0]) == set(pyrefine.profiling.OperationProfile
+                                     ._fields)
+
+    def test_table_report(self, script, data):
+        profiler = pyrefine.Profiler()
+        script.execute(data, hooks=[profiler])
+
+        lines = profiler.report('table').splitlines()
+
+        assert len(lines) == 4
+        assert lines[1].endswith('Remove column b')
+        assert '4 -> 4' in lines[1]
+        assert '2 -> 1' in lines[1]
+        assert lines[-1].endswith('Total')
+
+    def test_unknown_report_format(self):
+        with pytest.raises(ValueError):
+            pyrefine.Profiler().report('xml')
+
+
+class TestCLIProfile:
+
+    @pytest.mark.parametrize('fmt', ['table', 'json'])
+    def test_profile(self, fmt):
+        runner = CliRunner(mix_stderr=False)
+        result = runner.invoke(cli.execute,
+                               [str(FIXTURES_PATH / 'doaj-article-clean.json'),
+                                str(FIXTURES_PATH / 'doaj-article-sample.csv'),
+                                '--profile', '--profile-format', fmt])
+
+        with open(FIXTURES_PATH / 'doaj-article-sample-cleaned.csv') as f:
+            expected_data = f.read()
+
+        assert result.exit_code == 0
+        assert result.stdout == expected_data
+        assert 'Join multi-valued cells' in result.stderr
+
+    def test_profile_with_chunksize(self):
+        runner = CliRunner()
+        result = runner.invoke(cli.execute,
+                               [str(FIXTURES_PATH / 'doaj-article-clean.json'),
+                                str(FIXTURES_PATH / 'doaj-article-sample.csv'),
+                                '--profile', '--chunksize', '10'])
+
+        assert result.exit_code != 0
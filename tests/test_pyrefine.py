@@ -16,6 +16,7 @@ import pytest
 from click.testing import CliRunner
 
 from tempfile import mktemp
+import json
 import pandas as pd
 import pandas.util.testing as pdt
 
@@ -97,6 +98,42 @@ class TestCLI:
             actual_data = f.read()
         assert actual_data == expected_data
 
+    @pytest.mark.parametrize('chunksize', ['7', '100', '5000'])
+    def test_cli_execute_chunked(self, doaj_script_filename,
+                                 doaj_data_filename,
+                                 doaj_data_clean_filename,
+                                 chunksize):
+        runner = CliRunner()
+        result = runner.invoke(cli.execute,
+                               [doaj_script_filename, doaj_data_filename,
+                                '--chunksize', chunksize])
+
+        with open(doaj_data_clean_filename) as f:
+            expected_data = f.read()
+
+        assert result.exit_code == 0
+        assert result.output == expected_data
+
+    def test_cli_execute_memoized(self, doaj_data_filename, tmp_path):
+        runner = CliRunner(mix_stderr=False)
+        script = tmp_path / 'script.json'
+        script.write_text(json.dumps([{
+            'op': 'core/column-addition', 'description': 'Add column',
+            'engineConfig': {'mode': 'row-based', 'facets': []},
+            'newColumnName': 'Publisher (lower)', 'columnInsertIndex': 1,
+            'baseColumnName': 'Publisher', 'onError': 'set-to-blank',
+            'expression': 'jython:return value.lower()'}]))
+        script = str(script)
+
+        result = runner.invoke(cli.execute, [script, doaj_data_filename])
+        memoized = runner.invoke(cli.execute, [script, doaj_data_filename,
+                                               '--memoize', '--profile'])
+
+        assert memoized.exit_code == 0
+        assert memoized.stdout == result.stdout
+        assert 'Expression cache for operation' in memoized.stderr
+        assert 'Compiled expressions:' in memoized.stderr
+
 
 class TestScript:
 
@@ -142,3 +179,66 @@ class TestScript:
         result = script.execute(doaj_data)
 
         pdt.assert_frame_equal(result, doaj_data_clean)
+
+    def test_whole_script_in_place(self, doaj_data, doaj_data_clean,
+                                   doaj_script):
+        script = pyrefine.parse(doaj_script)
+        original = doaj_data.copy()
+
+        result = script.execute(doaj_data, in_place=True)
+
+        pdt.assert_frame_equal(result, doaj_data_clean)
+        pdt.assert_frame_equal(doaj_data, original)
+
+    def test_whole_script_chunked(self, doaj_data, doaj_data_clean,
+                                  doaj_script):
+        script = pyrefine.parse(doaj_script)
+        chunks = (doaj_data.iloc[i:i + 64]
+                  for i in range(0, len(doaj_data), 64))
+
+        result = pd.concat(script.execute_chunked(chunks))
+
+        pdt.assert_frame_equal(result, doaj_data_clean)
+
+    def test_memoize(self):
+        script = pyrefine.parse(json.dumps([
+            {'op': 'core/column-addition', 'description': 'Add column',
+             'engineConfig': {'mode': 'row-based', 'facets': []},
+             'newColumnName': 'upper', 'columnInsertIndex': 1,
+             'baseColumnName': 'name', 'onError': 'set-to-blank',
+             'expression': 'jython:return value.upper()'},
+            {'op': 'core/column-addition', 'description': 'Add column',
+             'engineConfig': {'mode': 'row-based', 'facets': []},
+             'newColumnName': 'row', 'columnInsertIndex': 1,
+             'baseColumnName': 'name', 'onError': 'set-to-blank',
+             'expression': 'jython:return row'},
+        ]))
+        data = pd.DataFrame({'name': ['a', 'b', 'a', 'a']})
+        expected = script.execute(data)
+
+        caches = script.memoize()
+        result = script.execute(data)
+
+        pdt.assert_frame_equal(result, expected)
+        assert list(caches) == [0]
+        assert caches[0].cache_info()[:2] == (2, 2)
+
+    def test_order_dependent_ops_chunked(self):
+        script = pyrefine.parse(json.dumps([
+            {'op': 'core/fill-down', 'description': 'Fill down',
+             'columnName': 'fill'},
+            {'op': 'core/blank-down', 'description': 'Blank down',
+             'columnName': 'blank'},
+            {'op': 'core/transpose-rows-into-columns',
+             'description': 'Transpose', 'columnName': 'transpose',
+             'rowCount': 3},
+        ]))
+        data = pd.DataFrame({
+            'fill': ['a', None, None, 'b', None, None, None, 'c'],
+            'blank': ['x', 'x', 'x', 'y', 'y', 'x', 'x', 'x'],
+            'transpose': list('abcdefgh')})
+        chunks = (data.iloc[i:i + 2] for i in range(0, len(data), 2))
+
+        result = pd.concat(script.execute_chunked(chunks))
+
+        pdt.assert_frame_equal(result, script.execute(data))
@@ -0,0 +1,160 @@
+import json
+import pickle
+
+import numpy as np
+import pandas as pd
+import pandas.util.testing as pdt
+import pytest
+
+import pyrefine
+from pyrefine.arrow import to_objects, use_arrow_strings
+from pyrefine.records import RecordIndex, RecordTracker, record_chunks, \
+    record_ids
+
+
+@pytest.fixture
+def records():
+    return pd.DataFrame({'key': ['a', None, 'b', '', 'c', None],
+                         'item': ['x', None, 'x', 'x', None, 'y']})
+
+
+def fill_down(column, mode='record-based', op='fill-down'):
+    return pyrefine.parse(json.dumps([{
+        'op': 'core/' + op, 'description': 'Fill down',
+        'columnName': column, 'engineConfig': {'mode': mode, 'facets': []}}]))
+
+
+class TestRecordIndex:
+
+    def test_record_ids(self, records):
+        assert record_ids(records).tolist() == [1, 1, 2, 2, 3, 3]
+
+    def test_leading_blank_rows(self):
+        data = pd.DataFrame({'key': [None, 'a', None]})
+
+        assert record_ids(data).tolist() == [0, 1, 1]
+
+    def test_no_columns(self):
+        assert record_ids(pd.DataFrame(index=range(3))).tolist() == [0] * 3
+
+    def test_any(self, records):
+        index = RecordIndex.from_data(records)
+        mask = np.array([False, False, False, True, False, False])
+
+        assert index.any(mask).tolist() \
+            == [False, False, True, True, False, False]
+
+    def test_replace(self, records):
+        index = RecordIndex.from_data(records)
+        key = pd.Series(['a', 'z', 'b', '', None, None], name='key')
+
+        replaced = index.replace(key, np.array([False, True] + [False] * 4))
+
+        assert replaced.ids.tolist() == [1, 2, 3, 3, 4, 4]
+        assert index.replace(key).ids.tolist() == [1, 2, 3, 3, 3, 3]
+
+    def test_matches(self, records):
+        index = RecordIndex.from_data(records)
+
+        assert index.matches(records)
+        assert index.matches(records.copy())
+        assert not index.matches(records.iloc[1:])
+        assert not index.matches(records[['item', 'key']])
+        assert not index.matches(records.assign(key='a'))
+
+
+class TestRecordTracker:
+
+    def test_reused_while_key_unchanged(self, records):
+        tracker = RecordTracker()
+
+        first = tracker(records)
+        assert tracker(records.assign(item=None)) is first
+        assert tracker(records.assign(key='a')).ids.tolist() == [1, 2, 3, 4,
+                                                                 5, 6]
+        assert (tracker.hits, tracker.misses) == (1, 2)
+
+    def test_patched_when_key_replaced(self, records):
+        tracker = RecordTracker()
+        tracker(records)
+        key = pd.Series(['a', 'z', 'b', '', 'c', None], name='key')
+        mask = np.array([False, True] + [False] * 4)
+
+        tracker.replace(records, key, mask)
+
+        assert tracker(records.assign(key=key)).ids.tolist() \
+            == [1, 2, 3, 3, 4, 4]
+        assert (tracker.hits, tracker.misses) == (1, 1)
+
+    def test_not_pickled(self, records):
+        tracker = RecordTracker()
+        tracker(records)
+
+        assert pickle.loads(pickle.dumps(tracker)).index is None
+
+
+@pytest.mark.parametrize('sizes', [[6], [1] * 6, [2, 3, 1], [0, 4, 2]])
+def test_record_chunks(records, sizes):
+    bounds = np.cumsum([0] + sizes)
+    chunks = [records.iloc[start:stop]
+              for start, stop in zip(bounds[:-1], bounds[1:])]
+
+    recut = list(record_chunks(chunks))
+
+    pdt.assert_frame_equal(pd.concat(recut), records)
+    assert all(record_ids(chunk)[0] == 1 for chunk in recut)
+
+
+class TestRecordMode:
+
+    @pytest.mark.parametrize('arrow', [False, True])
+    def test_fill_down(self, records, arrow):
+        if arrow:
+            pytest.importorskip('pyarrow')
+            records = use_arrow_strings(records)
+
+        result = fill_down('item').execute(records)
+
+        assert to_objects(result['item']).tolist() \
+            == ['x', 'x', 'x', 'x', None, 'y']
+
+    @pytest.mark.parametrize('arrow', [False, True])
+    def test_blank_down(self, records, arrow):
+        if arrow:
+            pytest.importorskip('pyarrow')
+            records = use_arrow_strings(records)
+
+        result = fill_down('item', op='blank-down').execute(records)
+
+        assert to_objects(result['item']).tolist() \
+            == ['x', None, 'x', None, None, 'y']
+
+    def test_rows_fill_across_records(self, records):
+        result = fill_down('item', mode='row-based').execute(records)
+
+        assert result['item'].tolist() == ['x', 'x', 'x', 'x', 'x', 'y']
+
+    @pytest.mark.parametrize('chunksize', [1, 2, 4])
+    def test_chunked(self, records, chunksize):
+        script = fill_down('item')
+
+        result = pd.concat(script.execute_chunked(
+            records.iloc[i:i + chunksize]
+            for i in range(0, len(records), chunksize)))
+
+        pdt.assert_frame_equal(result, script.execute(records))
+
+    def test_fill_down_key(self, records):
+        script = pyrefine.parse(json.dumps([
+            {'op': 'core/fill-down', 'description': 'Fill down',
+             'columnName': column,
+             'engineConfig': {'mode': 'record-based', 'facets': []}}
+            for column in ['key', 'item']]))
+
+        result = script.execute(records, in_place=True)
+
+        # Filling the key column makes a record of each row
+        assert result['item'].tolist() == ['x', None, 'x', 'x', None, 'y']
+        tracker = script.operations[0].engine.records
+        assert script.operations[1].engine.records is tracker
+        assert tracker.misses == 1
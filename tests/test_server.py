@@ -0,0 +1,245 @@
+# flake8: noqa
+
+import http.client
+import io
+import json
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+import pytest
+
+from .utils import FIXTURES_PATH
+
+import pyrefine
+from pyrefine.server import ScriptServer, ServerBusy, make_server
+
+SCRIPT = (FIXTURES_PATH / 'doaj-article-clean.json').read_text()
+
+
+@pytest.fixture(scope='module')
+def data():
+    return pd.read_csv(FIXTURES_PATH / 'doaj-article-sample.csv').iloc[:200]
+
+
+@pytest.fixture(scope='module')
+def scripts():
+    with ScriptServer(jobs=2) as scripts:
+        yield scripts
+
+
+@pytest.fixture(scope='module')
+def url(scripts):
+    httpd = make_server(scripts, port=0)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield 'http://127.0.0.1:{}'.format(httpd.server_address[1])
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def request(url, method='GET', body=None, headers=None):
+    """Make a request, returning the status, headers and body."""
+    req = urllib.request.Request(url, data=body, method=method,
+                                 headers=headers or {})
+    try:
+        with urllib.request.urlopen(req) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as error:
+        return error.code, error.headers, error.read()
+
+
+def test_transform(url, data):
+    status, _, body = request(url + '/scripts/doaj', 'PUT', SCRIPT.encode())
+    assert status == 201
+    assert json.loads(body) == {'name': 'doaj', 'operations': 5}
+
+    status, headers, body = request(url + '/scripts/doaj', 'POST',
+                                    data.to_csv(index=False).encode(),
+                                    {'Content-Type': 'text/csv'})
+
+    assert status == 200
+    expected = pyrefine.parse(SCRIPT).execute(data)
+    assert body.decode() == expected.to_csv(index=False)
+    assert headers['X-Rows'] == str(len(expected))
+    assert 'doaj' in json.loads(request(url + '/scripts')[2])
+
+
+def test_parquet(url, data):
+    pytest.importorskip('pyarrow')
+    request(url + '/scripts/doaj', 'PUT', SCRIPT.encode())
+    buffer = io.BytesIO()
+    data.to_parquet(buffer, index=False)
+
+    status, headers, body = request(
+        url + '/scripts/doaj?format=feather', 'POST', buffer.getvalue(),
+        {'Content-Type': 'application/vnd.apache.parquet'})
+
+    assert status == 200
+    assert headers['Content-Type'] == 'application/vnd.apache.arrow.file'
+    result = pd.read_feather(io.BytesIO(body))
+    assert list(result.columns) \
+        == list(pyrefine.parse(SCRIPT).execute(data).columns)
+
+
+def test_replace_script(url):
+    removal = [{'op': 'core/column-removal', 'description': 'Remove',
+                'columnName': 'b'}]
+    rename = [{'op': 'core/column-rename', 'description': 'Rename',
+               'oldColumnName': 'a', 'newColumnName': 'c'}]
+    outputs = []
+    for script in [removal, rename]:
+        request(url + '/scripts/swap', 'PUT', json.dumps(script).encode())
+        outputs.append(request(url + '/scripts/swap', 'POST',
+                               b'a,b\n1,2\n')[2])
+
+    assert outputs == [b'a\n1\n', b'c,b\n1,2\n']
+
+
+def test_invalid_script(url):
+    script = [{'op': 'core/column-move', 'description': 'Move',
+               'columnName': 'a', 'index': 'first'}]
+
+    status, _, body = request(url + '/scripts/bad', 'PUT',
+                              json.dumps(script).encode())
+
+    assert status == 400
+    assert json.loads(body)['problems'] == [{
+        'index': 0, 'op': 'core/column-move',
+        'message': 'index must be an integer'}]
+    assert request(url + '/scripts/bad', 'POST', b'a\n1\n')[0] == 404
+
+
+def test_failed_transform(url, scripts):
+    request(url + '/scripts/doaj', 'PUT', SCRIPT.encode())
+    failed = scripts.metrics()['failed']
+
+    status, _, body = request(url + '/scripts/doaj', 'POST',
+                              b'no,such,columns\n1,2,3\n')
+
+    assert status == 422
+    assert json.loads(body)['error'].startswith('KeyError')
+    assert scripts.metrics()['failed'] == failed + 1
+
+
+def test_delete(url):
+    request(url + '/scripts/gone', 'PUT', b'[]')
+
+    assert request(url + '/scripts/gone', 'DELETE')[0] == 204
+    assert request(url + '/scripts/gone', 'DELETE')[0] == 404
+    assert 'gone' not in json.loads(request(url + '/scripts')[2])
+
+
+def test_metrics(url, data):
+    request(url + '/scripts/doaj', 'PUT', SCRIPT.encode())
+    for _ in range(3):
+        request(url + '/scripts/doaj', 'POST',
+                data.to_csv(index=False).encode())
+
+    status, _, body = request(url + '/metrics')
+    metrics = json.loads(body)
+
+    assert status == 200
+    assert metrics['succeeded'] >= 3
+    assert metrics['pending'] == 0
+    assert metrics['workers'] == 2
+    latency = metrics['scripts']['doaj']['latency']
+    assert 0 < latency['p50'] <= latency['p99'] <= latency['max']
+    assert metrics['queue_time']['count'] == metrics['succeeded']
+
+
+def test_busy(url, scripts):
+    request(url + '/scripts/doaj', 'PUT', SCRIPT.encode())
+    scripts._pending = scripts.max_pending
+    try:
+        status, headers, _ = request(url + '/scripts/doaj', 'POST', b'a\n1\n')
+    finally:
+        scripts._pending = 0
+
+    assert status == 503
+    assert headers['Retry-After'] == '1'
+    assert scripts.metrics()['rejected'] >= 1
+
+
+def test_concurrent_requests(scripts, data):
+    scripts.register('doaj', SCRIPT)
+    body = data.to_csv(index=False).encode()
+    expected = scripts.transform('doaj', body)
+    results = []
+
+    threads = [threading.Thread(
+        target=lambda: results.append(scripts.transform('doaj', body)))
+        for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [expected] * 6
+
+
+def test_worker_crash(data):
+    crash = json.dumps([{
+        'op': 'core/text-transform', 'description': 'Crash',
+        'engineConfig': {'mode': 'row-based', 'facets': []},
+        'columnName': 'Title', 'expression': 'jython:import os\nos._exit(1)',
+        'onError': 'keep-original', 'repeat': False, 'repeatCount': 10}])
+    body = data.to_csv(index=False).encode()
+
+    with ScriptServer(jobs=2) as scripts:
+        scripts.register('crash', crash)
+        scripts.register('doaj', SCRIPT)
+        broken = scripts._pool
+        with pytest.raises(BrokenProcessPool):
+            scripts.transform('crash', body)
+        restarted = scripts._pool
+        # Other requests that failed on the same pool leave the new one be
+        scripts._restart(broken)
+
+        assert restarted not in (None, broken)
+        assert scripts._pool is restarted
+        assert scripts.transform('doaj', body)[1] == len(data)
+        assert scripts.metrics()['failed'] == 1
+
+
+class UnixConnection(http.client.HTTPConnection):
+
+    def __init__(self, path):
+        super().__init__('localhost')
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+
+def test_cli_serve_unix_socket(tmp_path):
+    path = str(tmp_path / 'pyrefine.sock')
+    script = tmp_path / 'script.json'
+    script.write_text(json.dumps([{
+        'op': 'core/column-rename', 'description': 'Rename',
+        'oldColumnName': 'a', 'newColumnName': 'b'}]))
+    server = subprocess.Popen([
+        sys.executable, '-m', 'pyrefine.cli', 'serve', '--socket', path,
+        '--jobs', '1', '--script', 'rename={}'.format(script)])
+    try:
+        for _ in range(200):
+            if (tmp_path / 'pyrefine.sock').exists():
+                break
+            time.sleep(0.05)
+        connection = UnixConnection(path)
+        connection.request('POST', '/scripts/rename', b'a\n1\n',
+                           {'Content-Type': 'text/csv'})
+        response = connection.getresponse()
+
+        assert response.status == 200
+        assert response.read() == b'b\n1\n'
+    finally:
+        server.terminate()
+        assert server.wait(timeout=30) == 0
@@ -0,0 +1,111 @@
+# flake8: noqa
+
+import io
+import json
+import subprocess
+import sys
+
+import pytest
+from click.testing import CliRunner
+
+from .utils import FIXTURES_PATH
+
+from pyrefine import cli
+from pyrefine.ops.base import OPERATION_MODULES
+from pyrefine.validation import _OPERATIONS, validate, validate_script
+
+
+def transform(**params):
+    return dict({'op': 'core/text-transform', 'description': 'Trim',
+                 'columnName': 'a', 'expression': 'value.trim()',
+                 'onError': 'keep-original'}, **params)
+
+
+def test_every_operation_checked():
+    assert set(_OPERATIONS) == set(OPERATION_MODULES)
+
+
+@pytest.mark.parametrize('name', ['doaj-article-clean.json',
+                                  'example_script.json',
+                                  'workshops-script.json'])
+def test_fixtures_valid(name):
+    assert validate_script(FIXTURES_PATH / name) == []
+
+
+@pytest.mark.parametrize('operation, message', [
+    (transform(columnName=1), 'columnName must be a string'),
+    (transform(onError='ignore'), 'onError must be one of'),
+    (transform(repeatCount=True), 'repeatCount must be an integer'),
+    (transform(expression='value.trim('), 'expression is not valid GREL'),
+    (transform(expression='jython:return (value'),
+     'expression is not valid Jython'),
+    (transform(expression='clojure:(str value)'),
+     'expression uses an unsupported language'),
+    ({'op': 'core/column-removal', 'columnName': 'a'},
+     'description is missing'),
+    ({'op': 'core/no-such-thing'}, 'Unknown operation'),
+    ({'description': 'No op'}, 'op is missing'),
+    (['core/column-removal'], 'The operation must be an object'),
+    (transform(engineConfig={'facets': [{'type': 'list', 'columnName': 'b',
+                                         'expression': 'value.length(',
+                                         'selection': []}]}),
+     'engineConfig.facets[0].expression is not valid GREL'),
+    (transform(engineConfig={'facets': [{'type': 'timeline'}]}),
+     'engineConfig.facets[0].type is unknown'),
+])
+def test_invalid(operation, message):
+    problems = validate([transform(), operation])
+
+    assert len(problems) == 1
+    assert problems[0].index == 1
+    assert problems[0].message.startswith(message)
+
+
+def test_every_problem_reported():
+    problems = validate([transform(columnName=None, onError=None)])
+
+    assert [problem.message.split()[0] for problem in problems] \
+        == ['columnName', 'onError']
+
+
+@pytest.mark.parametrize('script, message', [
+    ('{"op": "core/column-removal"}', 'The script must be an array'),
+    ('[{"op": ', 'Invalid JSON'),
+])
+def test_invalid_script(script, message):
+    problems = validate_script(io.StringIO(script))
+
+    assert problems[0].index is None
+    assert problems[0].message.startswith(message)
+
+
+def test_cli_validate(tmp_path):
+    runner = CliRunner()
+    script = tmp_path / 'script.json'
+    script.write_text(json.dumps([transform(), transform(onError='ignore')]))
+
+    valid = runner.invoke(cli.validate,
+                          [str(FIXTURES_PATH / 'doaj-article-clean.json')])
+    invalid = runner.invoke(cli.validate, [str(script)])
+
+    assert valid.exit_code == 0
+    assert valid.output == 'OK\n'
+    assert invalid.exit_code == 1
+    assert invalid.output.startswith(
+        'Operation 1 (core/text-transform): onError must be one of')
+
+
+def test_pandas_not_imported():
+    script = FIXTURES_PATH / 'workshops-script.json'
+    code = ('import sys\n'
+            'from click.testing import CliRunner\n'
+            'from pyrefine import cli\n'
+            'result = CliRunner().invoke(cli.main, ["validate", {!r}])\n'
+            'assert result.exit_code == 0, result.output\n'
+            'print(sorted(name for name in ("pandas", "numpy") '
+            'if name in sys.modules))').format(str(script))
+
+    output = subprocess.run([sys.executable, '-c', code], check=True,
+                            capture_output=True, text=True).stdout
+
+    assert output == '[]\n'